@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Compare the legacy JSON serialisation of a large job list with the
+available serialisation backends
+
+    python benchmarks/job_list_serialisation.py [number of jobs]
+"""
+import gzip
+import json
+import sys
+import timeit
+from openeo_grass_gis_driver.job_schemas import JobInformation, JobList
+from openeo_grass_gis_driver.schema_base import EoLink, JSON_BACKENDS
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+def legacy_as_dict_without_nones(o):
+    """The serialisation of the objects before the fields were precomputed"""
+    return {key: getattr(o, key) for key in type(o)._json_fields if getattr(o, key, None) is not None}
+
+
+def legacy_to_json(obj):
+    """The serialisation of JsonableObject.to_json() before the backends were introduced"""
+    return json.dumps(obj, default=lambda o: legacy_as_dict_without_nones(o), sort_keys=False, indent=2)
+
+
+def create_job_list(number: int) -> JobList:
+    jobs = []
+    for i in range(number):
+        job = JobInformation(job_id=f"user-job::{i}", title=f"Job {i}", description="Benchmark job",
+                             status="finished", process_graph=None, output=None,
+                             submitted="2018-01-01 00:00:00", updated="2018-01-01 00:10:00",
+                             links=[EoLink(href=f"https://actinia.mundialis.de/resource/{i}.tiff")])
+        job.additional_info = {"status": "finished", "resource_id": f"resource_id-{i}",
+                               "progress": {"step": 5, "num_of_steps": 5}}
+        jobs.append(job)
+    return JobList(jobs=jobs)
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = 5
+    job_list = create_job_list(number)
+    # Compute the field lists
+    JSON_BACKENDS["json"](job_list, False)
+
+    candidates = [("legacy (indent=2)", lambda: legacy_to_json(job_list))]
+    for name, backend in JSON_BACKENDS.items():
+        candidates.append((f"{name} compact", lambda backend=backend: backend(job_list, False)))
+        candidates.append((f"{name} pretty", lambda backend=backend: backend(job_list, True)))
+
+    print(f"Serialisation of a JobList with {number} jobs, best of {repeat} runs")
+    for name, function in candidates:
+        seconds = min(timeit.repeat(function, number=1, repeat=repeat))
+        document = function().encode("utf-8")
+        print(f"{name:20} {seconds * 1000:8.1f} ms {len(document):10} bytes "
+              f"{len(gzip.compress(document, 6)):9} bytes gzip")
+
+
+if __name__ == "__main__":
+    main()
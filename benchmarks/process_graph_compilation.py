@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""Measure the compilation of large synthetic v0.4 process graphs
+
+The graphs are built from the nodes of the process graph examples and are compiled
+with the process converters of the driver:
+
+    chain:   get_data -> filter_bbox -> filter_bbox -> ... (a deep chain)
+    fan-in:  many get_data nodes that are the inputs of a single raster_exporter node
+    diamond: layers of two NDVI2 nodes that both consume the two nodes of the
+             previous layer, the upstream subgraph is shared by all consumers
+
+The topological compiler of ProcessGraph compiles each node once. The recursive
+analysis of the equivalent nested process description, that compiles the upstream
+subgraph again for each consumer, is shown for comparison on the graphs where it
+terminates in reasonable time.
+
+    python benchmarks/process_graph_compilation.py [number of nodes]
+"""
+import sys
+import time
+from copy import deepcopy
+from openeo_grass_gis_driver.actinia_processing.base import CompilationContext, ProcessGraph, \
+    analyse_process_graph, PROCESS_DICT
+from openeo_grass_gis_driver.utils.process_graph_examples_v04 import FILTER_BBOX, NDVI_STRDS
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+GET_DATA_NODE = NDVI_STRDS["process_graph"]["get_red_data"]
+FILTER_BBOX_NODE = FILTER_BBOX["process_graph"]["filter_bbox_1"]
+
+# The output names of the NDVI2 nodes grow with each layer of the diamond
+MAX_DIAMOND_NODES = 1001
+
+
+def create_chain(number: int) -> dict:
+    graph = {"get_data_0": deepcopy(GET_DATA_NODE)}
+    for i in range(1, number):
+        node = deepcopy(FILTER_BBOX_NODE)
+        node["arguments"]["data"] = {"from_node": f"filter_bbox_{i - 1}" if i > 1 else "get_data_0"}
+        graph[f"filter_bbox_{i}"] = node
+    return {"title": "Chain", "description": "Deep chain", "process_graph": graph}
+
+
+def create_fan_in(number: int) -> dict:
+    graph = {}
+    arguments = {}
+    for i in range(number - 1):
+        graph[f"get_data_{i}"] = deepcopy(GET_DATA_NODE)
+        arguments[f"data_{i}"] = {"from_node": f"get_data_{i}"}
+    graph["raster_exporter_1"] = dict(process_id="raster_exporter", arguments=arguments)
+    return {"title": "Fan-in", "description": "Wide fan-in", "process_graph": graph}
+
+
+def create_diamond(number: int) -> dict:
+    graph = {"get_data_0": deepcopy(GET_DATA_NODE)}
+    previous = ["get_data_0"]
+    for layer in range((min(number, MAX_DIAMOND_NODES) - 1) // 2):
+        current = []
+        for side in ("left", "right"):
+            graph[f"ndvi_{side}_{layer}"] = dict(process_id="NDVI2",
+                                                 arguments=dict(red={"from_node": previous[0]},
+                                                                nir={"from_node": previous[-1]}))
+            current.append(f"ndvi_{side}_{layer}")
+        previous = current
+    return {"title": "Diamond", "description": "Shared subgraphs", "process_graph": graph}
+
+
+def create_nested(graph: dict) -> list:
+    """Convert the nodes of a v0.4 process graph into nested v0.3 process descriptions,
+    the descriptions of the shared nodes are shared by all consumers
+
+    :param graph: The v0.4 process graph
+    :return: The nested process descriptions of the nodes that are not consumed by other nodes
+    """
+
+    nodes = graph["process_graph"]
+    processes = {}
+
+    def resolve(value):
+        if isinstance(value, dict) and "from_node" in value:
+            return processes[value["from_node"]]
+        return value
+
+    pg = ProcessGraph(graph)
+    for node in pg.topological_order():
+        process = dict(process_id=nodes[node.id]["process_id"])
+        process.update((key, resolve(value)) for key, value in nodes[node.id]["arguments"].items())
+        processes[node.id] = process
+
+    return [processes[node.id] for node in pg.root_nodes]
+
+
+def measure(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 4 * number))
+
+    print(f"Compilation of synthetic process graphs with {number} nodes with the converters "
+          f"{', '.join(sorted(PROCESS_DICT))}")
+    for name, create in (("chain", create_chain), ("fan-in", create_fan_in), ("diamond", create_diamond)):
+        description = create(number)
+        build_seconds, graph = measure(lambda: ProcessGraph(description))
+        compile_seconds, (outputs, processes) = measure(
+            lambda: graph.to_actinia_process_chain(CompilationContext()))
+        print(f"{name:8} build {build_seconds * 1000:8.1f} ms compile {compile_seconds * 1000:8.1f} ms "
+              f"{len(graph.node_dict):8} nodes {len(processes):8} steps")
+
+        # The recursive analysis doubles the work with each diamond layer
+        layers = 14 if name == "diamond" else number
+        small = create(layers * 2 + 1 if name == "diamond" else layers)
+        nested = create_nested(small)
+        recursive_seconds, processes = measure(
+            lambda: [step for process in nested
+                     for step in analyse_process_graph({"process_graph": process}, CompilationContext())[1]])
+        print(f"{'':8} recursive analysis of {len(small['process_graph'])} nodes "
+              f"{recursive_seconds * 1000:8.1f} ms {len(processes):8} steps")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,3 +9,4 @@ from . import reduce_time_process
 # from . import udf_reduce_time
 from . import raster_exporter
 from . import zonal_statistics
+from . import band_math_process
@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
 from typing import List, Tuple, Dict, Optional
 from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
+from openeo_grass_gis_driver.actinia_processing.actinia_session import ActiniaSessionPool
+from openeo_grass_gis_driver.actinia_processing.actinia_nodes import NODE_POOL
+from openeo_grass_gis_driver.actinia_processing.circuit_breaker import CIRCUIT_BREAKERS
+from openeo_grass_gis_driver.actinia_processing.single_flight import SingleFlight
+from openeo_grass_gis_driver.lru_cache import LRUCache
 import requests
 
 __license__ = "Apache License, Version 2.0"
@@ -15,23 +20,161 @@ class ActiniaInterface(object):
     This is the interface class to the actinia REST service that uses GRASS GIS as backend
     """
 
-    PROCESS_LOCATION = {}
+    # Functions that are called with (location, mapset) when the driver modifies a mapset
+    MAPSET_CHANGE_LISTENERS = []
+    # The concurrent identical GET requests of all interfaces, that share a single request in flight
+    SINGLE_FLIGHT = SingleFlight()
+    # The (location, mapset) of the submitted persistent processing resources, that modify
+    # the mapset when they are finished
+    PERSISTENT_RESOURCES = LRUCache(maxsize=ActiniaConfig.JOB_POLL_MAX_FINAL)
 
-    def __init__(self, config: ActiniaConfig=None):
+    def __init__(self, config: ActiniaConfig=None, node: str=None):
+        """Constructor
+
+        :param config: The actinia configuration
+        :param node: The base url of the actinia node that receives all requests,
+                     the requests are routed over the actinia node pool if None
+        """
 
         if config is None:
             config = ActiniaConfig
 
+        self.config = config
         self.host = config.HOST
         self.port = config.PORT
-        self.base_url = "%(host)s:%(port)s/latest" % {"host": self.host, "port": self.port}
+        self.node = node
         self.auth = (config.USER, config.PASSWORD)
         self.user = config.USER
+        self.timeout = (config.CONNECT_TIMEOUT, config.READ_TIMEOUT)
+
+    @property
+    def base_url(self) -> str:
+        return self._base_url()
+
+    def _base_url(self, location: str=None, resource_id: str=None) -> str:
+        """Return the base url of the actinia node of a request
+
+        :param location: The location of the request
+        :param resource_id: The resource of the request, its owner node receives the request
+        :return: The base url of the node
+        """
+        if self.node is not None:
+            return self.node
+        return NODE_POOL.select(location=location, resource_id=resource_id, config=self.config)
 
     def set_auth(self, user: str, password: str):
         self.auth = (user, password)
         self.user = user
 
+    def _request(self, method: str, url: str, timeout=None, **kwargs) -> requests.Response:
+        """Send a request over the shared keep-alive session of the actinia host
+
+        Requests to actinia endpoints whose circuit is open fail immediately with a CircuitOpenError.
+        Concurrent GET requests of the same url with the same credentials share a single request
+        in flight and its response, if SINGLE_FLIGHT is enabled.
+
+        :param method: The HTTP method
+        :param url: The url of the request
+        :param timeout: The timeout in seconds or a (connect, read) tuple,
+                        the configured default timeouts are used if None
+        :param kwargs: Additional arguments for requests, the authentication
+                       of this interface is used if no auth argument was provided
+        :return: The response
+        """
+        if timeout is None:
+            timeout = self.timeout
+        kwargs.setdefault("auth", self.auth)
+
+        CIRCUIT_BREAKERS.before_request(method, url)
+
+        if method == "GET" and set(kwargs) == {"auth"} and self.config.SINGLE_FLIGHT:
+            # The response content is read by the request in flight, so that all callers can read it
+            return self.SINGLE_FLIGHT.do((kwargs["auth"], url),
+                                         lambda: self._send(method, url, timeout, read_content=True, **kwargs))
+
+        return self._send(method, url, timeout, **kwargs)
+
+    def _send(self, method: str, url: str, timeout, read_content: bool=False, **kwargs) -> requests.Response:
+        session = ActiniaSessionPool.get_session(url, self.config)
+        try:
+            r = session.request(method=method, url=url, timeout=timeout, **kwargs)
+            if read_content:
+                r.content
+        except requests.RequestException as e:
+            CIRCUIT_BREAKERS.record(method, url, None)
+            if isinstance(e, requests.ConnectionError):
+                NODE_POOL.report_failure(url)
+            raise
+
+        CIRCUIT_BREAKERS.record(method, url, r.status_code)
+        return r
+
+    @staticmethod
+    def notify_mapset_change(location: str, mapset: str):
+        """Inform all registered listeners that the content of a mapset was modified
+
+        :param location: The location of the mapset
+        :param mapset: The modified mapset
+        """
+        for listener in ActiniaInterface.MAPSET_CHANGE_LISTENERS:
+            listener(location, mapset)
+
+    @staticmethod
+    def notify_resource_finished(resource_id: str):
+        """Release a resource that reached a final state or was removed from its actinia node
+        and inform the listeners about the mapset of a persistent processing resource
+
+        :param resource_id: The actinia resource id
+        """
+        NODE_POOL.finish(resource_id)
+        mapset = ActiniaInterface.PERSISTENT_RESOURCES.pop(resource_id)
+        if mapset is not None:
+            ActiniaInterface.notify_mapset_change(*mapset)
+
+    @staticmethod
+    def connection_statistics() -> dict:
+        """Return the keep-alive connection hit and miss counts for each actinia host
+
+        :return: A dictionary with the statistics of each host
+        """
+        return ActiniaSessionPool.statistics()
+
+    @staticmethod
+    def node_statistics() -> list:
+        """Return the health and the number of outstanding resources of the configured actinia nodes
+
+        :return: A list with the statistics of each node
+        """
+        return NODE_POOL.statistics()
+
+    @staticmethod
+    def coalescing_statistics() -> dict:
+        """Return the number of sent GET requests, the number of requests that shared a request
+        in flight (hits) and the fan-in of the shared requests
+
+        :return: A dictionary with the statistics
+        """
+        return ActiniaInterface.SINGLE_FLIGHT.statistics()
+
+    @staticmethod
+    def health() -> dict:
+        """Return the cached health of the actinia nodes and the state of the circuits of their endpoints
+
+        :return: A dictionary with the overall status, the nodes and the circuits
+        """
+        nodes = NODE_POOL.health()
+        circuits = CIRCUIT_BREAKERS.statistics()
+
+        if not any(node["healthy"] for node in nodes):
+            status = "unavailable"
+        elif all(node["healthy"] for node in nodes) and all(c["state"] == "closed" for c in circuits):
+            status = "ok"
+        else:
+            status = "degraded"
+
+        return {"status": status, "nodes": nodes, "circuits": circuits,
+                "coalescing": ActiniaInterface.coalescing_statistics()}
+
     @staticmethod
     def layer_def_to_components(layer: str) -> Tuple[Optional[str], Optional[str], Optional[str], str]:
         """Convert the name of a layer in the openeo framework into GRASS GIS definitions
@@ -49,9 +192,6 @@ class ActiniaInterface(object):
 
         location, mapset, datatype, map_name = layer.split(".", 3)
 
-        # Store the location in the global location dict
-        ActiniaInterface.PROCESS_LOCATION[location] = location
-
         return location, mapset, datatype, map_name
 
     @staticmethod
@@ -72,18 +212,18 @@ class ActiniaInterface(object):
 
         return layer_name
 
-    def check_health(self) -> bool:
+    def check_health(self, timeout=None) -> bool:
 
         url = self.base_url + "/health_check"
-        r = requests.get(url=url)
+        r = self._request("GET", url=url, timeout=timeout, auth=None)
 
         if r.status_code == 200:
             return True
 
         return False
 
-    def _send_get_request(self, url: str) -> Tuple[int, dict]:
-        r = requests.get(url=url, auth=self.auth)
+    def _send_get_request(self, url: str, timeout=None) -> Tuple[int, dict]:
+        r = self._request("GET", url=url, timeout=timeout)
         data = r.text
 
         if r.status_code == 200:
@@ -92,15 +232,16 @@ class ActiniaInterface(object):
 
         return r.status_code, data
 
-    def _send_post_request(self, url: str, process_chain: dict) -> Tuple[int, dict]:
+    def _send_post_request(self, url: str, process_chain: dict, timeout=None, node: str=None) -> Tuple[int, dict]:
         """Send a post request and return the return status and the Actinia response
 
         :param url:
         :param process_chain:
+        :param timeout: The request timeout, the configured default is used if None
+        :param node: The base url of the node of the request, that owns the created resource
         :return:
         """
-        r = requests.post(url=url, auth=self.auth,
-                          json=process_chain)
+        r = self._request("POST", url=url, timeout=timeout, json=process_chain)
         data = r.text
 
         try:
@@ -108,11 +249,15 @@ class ActiniaInterface(object):
         except:
             pass
 
+        if node is not None and r.status_code == 200 and isinstance(data, dict) and "resource_id" in data:
+            NODE_POOL.assign(data["resource_id"], node)
+
         return r.status_code, data
 
-    def resource_info(self, resource_id: str) -> Tuple[int, dict]:
-        url = "%(base)s/resources/%(user)s/%(rid)s" % {"base": self.base_url, "user": self.user, "rid": resource_id}
-        r = requests.get(url=url, auth=self.auth)
+    def resource_info(self, resource_id: str, timeout=None) -> Tuple[int, dict]:
+        url = "%(base)s/resources/%(user)s/%(rid)s" % {"base": self._base_url(resource_id=resource_id),
+                                                       "user": self.user, "rid": resource_id}
+        r = self._request("GET", url=url, timeout=timeout)
         data = r.text
 
         try:
@@ -122,11 +267,15 @@ class ActiniaInterface(object):
 
         return r.status_code, data
 
-    def delete_resource(self, resource_id: str) -> Tuple[int, dict]:
-        url = "%(base)s/resources/%(user)s/%(rid)s" % {"base": self.base_url, "user": self.user, "rid": resource_id}
-        r = requests.delete(url=url, auth=self.auth)
+    def delete_resource(self, resource_id: str, timeout=None) -> Tuple[int, dict]:
+        url = "%(base)s/resources/%(user)s/%(rid)s" % {"base": self._base_url(resource_id=resource_id),
+                                                       "user": self.user, "rid": resource_id}
+        r = self._request("DELETE", url=url, timeout=timeout)
         data = r.text
 
+        if r.status_code in (200, 404):
+            self.notify_resource_finished(resource_id)
+
         try:
             data = r.json()
         except:
@@ -134,9 +283,24 @@ class ActiniaInterface(object):
 
         return r.status_code, data
 
-    def list_locations(self) -> Tuple[int, dict]:
+    def download_resource_file(self, url: str, filename: str, timeout=None) -> int:
+        """Download an exported file of a resource
+
+        :param url: The url of the file from the resource information
+        :param filename: The name of the local file
+        :param timeout: The request timeout, the configured default is used if None
+        :return: The status code
+        """
+        with self._request("GET", url=url, timeout=timeout, stream=True) as r:
+            if r.status_code == 200:
+                with open(filename, "wb") as f:
+                    for chunk in r.iter_content(chunk_size=1024 * 1024):
+                        f.write(chunk)
+            return r.status_code
+
+    def list_locations(self, timeout=None) -> Tuple[int, dict]:
         url = "%(base)s/locations" % {"base": self.base_url}
-        r = requests.get(url=url, auth=self.auth)
+        r = self._request("GET", url=url, timeout=timeout)
         data = r.text
 
         if r.status_code == 200:
@@ -145,13 +309,16 @@ class ActiniaInterface(object):
 
         return r.status_code, data
 
-    def create_mapset(self, location: str, mapset: str="PERMANENT") -> Tuple[int, dict]:
-        url = "%(base)s/locations/%(location)s/mapsets/%(mapset)s" % {"base": self.base_url,
+    def create_mapset(self, location: str, mapset: str="PERMANENT", timeout=None) -> Tuple[int, dict]:
+        url = "%(base)s/locations/%(location)s/mapsets/%(mapset)s" % {"base": self._base_url(location),
                                                                       "location": location,
                                                                       "mapset": mapset}
-        r = requests.post(url=url, auth=self.auth)
+        r = self._request("POST", url=url, timeout=timeout)
         data = r.text
 
+        if r.status_code == 200:
+            self.notify_mapset_change(location, mapset)
+
         try:
             data = r.json()
         except:
@@ -159,13 +326,16 @@ class ActiniaInterface(object):
 
         return r.status_code, data
 
-    def delete_mapset(self, location: str, mapset: str="PERMANENT") -> Tuple[int, dict]:
-        url = "%(base)s/locations/%(location)s/mapsets/%(mapset)s" % {"base": self.base_url,
+    def delete_mapset(self, location: str, mapset: str="PERMANENT", timeout=None) -> Tuple[int, dict]:
+        url = "%(base)s/locations/%(location)s/mapsets/%(mapset)s" % {"base": self._base_url(location),
                                                                       "location": location,
                                                                       "mapset": mapset}
-        r = requests.delete(url=url, auth=self.auth)
+        r = self._request("DELETE", url=url, timeout=timeout)
         data = r.text
 
+        if r.status_code == 200:
+            self.notify_mapset_change(location, mapset)
+
         try:
             data = r.json()
         except:
@@ -173,36 +343,65 @@ class ActiniaInterface(object):
 
         return r.status_code, data
 
-    def list_mapsets(self, location: str) -> Tuple[int, dict]:
-        url = "%(base)s/locations/%(location)s/mapsets" % {"base": self.base_url,
+    def list_mapsets(self, location: str, timeout=None) -> Tuple[int, dict]:
+        url = "%(base)s/locations/%(location)s/mapsets" % {"base": self._base_url(location),
                                                            "location": location}
-        return self._send_get_request(url)
+        return self._send_get_request(url, timeout=timeout)
 
-    def mapset_info(self, location: str, mapset: str) -> Tuple[int, dict]:
-        url = "%(base)s/locations/%(location)s/mapsets/%(mapset)s/info" % {"base": self.base_url,
+    def mapset_info(self, location: str, mapset: str, timeout=None) -> Tuple[int, dict]:
+        url = "%(base)s/locations/%(location)s/mapsets/%(mapset)s/info" % {"base": self._base_url(location),
                                                                            "location": location,
                                                                            "mapset": mapset}
-        return self._send_get_request(url)
+        return self._send_get_request(url, timeout=timeout)
 
-    def list_raster(self, location: str, mapset: str) -> Tuple[int, dict]:
-        url = "%(base)s/locations/%(location)s/mapsets/%(mapset)s/raster_layers" % {"base": self.base_url,
+    def list_raster(self, location: str, mapset: str, timeout=None) -> Tuple[int, dict]:
+        url = "%(base)s/locations/%(location)s/mapsets/%(mapset)s/raster_layers" % {"base": self._base_url(location),
                                                                                     "location": location,
                                                                                     "mapset": mapset}
-        return self._send_get_request(url)
+        return self._send_get_request(url, timeout=timeout)
+
+    def delete_raster_layer(self, location: str, mapset: str, layer: str, timeout=None) -> Tuple[int, dict]:
+        url = "%(base)s/locations/%(location)s/mapsets/%(mapset)s/raster_layers/%(layer)s" % {
+            "base": self._base_url(location), "location": location, "mapset": mapset, "layer": layer}
+        r = self._request("DELETE", url=url, timeout=timeout)
+        data = r.text
 
-    def list_vector(self, location: str, mapset: str) -> Tuple[int, dict]:
-        url = "%(base)s/locations/%(location)s/mapsets/%(mapset)s/vector_layers" % {"base": self.base_url,
+        try:
+            data = r.json()
+        except:
+            pass
+
+        if r.status_code == 200:
+            self.notify_mapset_change(location, mapset)
+
+        return r.status_code, data
+
+    def list_vector(self, location: str, mapset: str, timeout=None) -> Tuple[int, dict]:
+        url = "%(base)s/locations/%(location)s/mapsets/%(mapset)s/vector_layers" % {"base": self._base_url(location),
                                                                                     "location": location,
                                                                                     "mapset": mapset}
-        return self._send_get_request(url)
+        return self._send_get_request(url, timeout=timeout)
 
-    def list_strds(self, location: str, mapset: str)  -> Tuple[int, dict]:
-        url = "%(base)s/locations/%(location)s/mapsets/%(mapset)s/strds" % {"base": self.base_url,
+    def list_strds(self, location: str, mapset: str, timeout=None) -> Tuple[int, dict]:
+        url = "%(base)s/locations/%(location)s/mapsets/%(mapset)s/strds" % {"base": self._base_url(location),
                                                                             "location": location,
                                                                             "mapset": mapset}
-        return self._send_get_request(url)
+        return self._send_get_request(url, timeout=timeout)
+
+    def list_strds_raster_layers(self, location: str, mapset: str, strds: str, timeout=None) -> Tuple[int, dict]:
+        """Return the raster layers of a space-time raster dataset with their time stamps
+
+        :param location: The location of the strds
+        :param mapset: The mapset of the strds
+        :param strds: The name of the strds
+        :param timeout: The request timeout, the configured default is used if None
+        :return: Status code and the json data (status, json)
+        """
+        url = "%(base)s/locations/%(location)s/mapsets/%(mapset)s/strds/%(strds)s/raster_layers" % {
+            "base": self._base_url(location), "location": location, "mapset": mapset, "strds": strds}
+        return self._send_get_request(url, timeout=timeout)
 
-    def layer_info(self, layer_name: str) -> Tuple[int, dict]:
+    def layer_info(self, layer_name: str, timeout=None) -> Tuple[int, dict]:
         """Return informations about the requested layer, that can be of type raster, vector or strds
 
         :param layer_name:
@@ -213,74 +412,91 @@ class ActiniaInterface(object):
             datatype = "raster_layers"
         if datatype == "vector":
             datatype = "vector_layers"
-        url = "%(base)s/locations/%(location)s/mapsets/%(mapset)s/%(dtype)s/%(layer)s" % {"base": self.base_url,
-                                                                                          "location": location,
-                                                                                          "mapset": mapset,
-                                                                                          "dtype": datatype,
-                                                                                          "layer": layer}
-        return self._send_get_request(url)
-
-    def check_layer_exists(self, layer_name: str) -> bool:
+        url = "%(base)s/locations/%(location)s/mapsets/%(mapset)s/%(dtype)s/%(layer)s" % {
+            "base": self._base_url(location), "location": location, "mapset": mapset, "dtype": datatype,
+            "layer": layer}
+        return self._send_get_request(url, timeout=timeout)
+
+    def check_layer_exists(self, layer_name: str, timeout=None) -> bool:
         """Return True if the strds exists, False otherwise
 
         :param strds_name: The name of the strds
         :return: True if the strds exists, False otherwise
         """
         # Get region information about the required strds and check if it exists
-        status_code, layer_info = self.layer_info(layer_name=layer_name)
+        status_code, layer_info = self.layer_info(layer_name=layer_name, timeout=timeout)
 
         if status_code != 200:
             return False
 
         return True
 
-    def async_persistent_processing(self, location: str, mapset: str, process_chain: dict) -> Tuple[int, dict]:
+    def async_persistent_processing(self, location: str, mapset: str, process_chain: dict,
+                                    timeout=None) -> Tuple[int, dict]:
         """Send a process chain to the Actinia backend to be run asynchronously in a persistent database
 
         :param location: The location in which to process
         :param mapset: The new mapset to generate
         :param process_chain: The process chain that must be executed
+        :param timeout: The request timeout, the configured default is used if None
         :return: Status code and the json data (status, json)
         """
 
-        url = "%(base)s/locations/%(location)s/mapsets/%(mapset)s/processing_async" % {"base": self.base_url,
+        node = self._base_url(location)
+        url = "%(base)s/locations/%(location)s/mapsets/%(mapset)s/processing_async" % {"base": node,
                                                                                        "location": location,
                                                                                        "mapset": mapset}
-        return self._send_post_request(url=url, process_chain=process_chain)
+        status_code, data = self._send_post_request(url=url, process_chain=process_chain, timeout=timeout,
+                                                    node=node)
+
+        # The mapset is modified when the resource is finished, the listeners are informed
+        # when the job status tracker polled its final state
+        if status_code == 200 and isinstance(data, dict) and "resource_id" in data:
+            self.PERSISTENT_RESOURCES.set(data["resource_id"], (location, mapset))
+
+        return status_code, data
 
-    def async_ephemeral_processing(self, location: str, process_chain: dict) -> Tuple[int, dict]:
+    def async_ephemeral_processing(self, location: str, process_chain: dict,
+                                   timeout=None) -> Tuple[int, dict]:
         """Send a process chain to the Actinia backend to be run asynchronously in a ephemeral database
 
         :param location: The location in which to process
         :param process_chain: The process chain that must be executed
+        :param timeout: The request timeout, the configured default is used if None
         :return: Status code and the json data (status, json)
         """
 
-        url = "%(base)s/locations/%(location)s/processing_async" % {"base": self.base_url,
+        node = self._base_url(location)
+        url = "%(base)s/locations/%(location)s/processing_async" % {"base": node,
                                                                     "location": location}
-        return self._send_post_request(url=url, process_chain=process_chain)
+        return self._send_post_request(url=url, process_chain=process_chain, timeout=timeout, node=node)
 
-    def sync_ephemeral_processing_validation(self, location: str, process_chain: dict) -> Tuple[int, dict]:
+    def sync_ephemeral_processing_validation(self, location: str, process_chain: dict,
+                                             timeout=None) -> Tuple[int, dict]:
         """Send a process chain to the Actinia backend to be validated
 
         :param location: The location in which to process
         :param process_chain: The process chain that must be executed
+        :param timeout: The request timeout, the configured default is used if None
         :return: Status code and the json data (status, json)
         """
 
-        url = "%(base)s/locations/%(location)s/process_chain_validation_sync" % {"base": self.base_url,
+        url = "%(base)s/locations/%(location)s/process_chain_validation_sync" % {"base": self._base_url(location),
                                                                                  "location": location}
-        return self._send_post_request(url=url, process_chain=process_chain)
+        return self._send_post_request(url=url, process_chain=process_chain, timeout=timeout)
 
-    def async_ephemeral_processing_export(self, location: str, process_chain: dict) -> Tuple[int, dict]:
+    def async_ephemeral_processing_export(self, location: str, process_chain: dict,
+                                          timeout=None) -> Tuple[int, dict]:
         """Send a process chain to the Actinia backend to be run asynchronously in a ephemeral database
         with export capabilities
 
         :param location: The location in which to process
         :param process_chain: The process chain that must be executed
+        :param timeout: The request timeout, the configured default is used if None
         :return: Status code and the json data (status, json)
         """
 
-        url = "%(base)s/locations/%(location)s/processing_async_export" % {"base": self.base_url,
+        node = self._base_url(location)
+        url = "%(base)s/locations/%(location)s/processing_async_export" % {"base": node,
                                                                                "location": location}
-        return self._send_post_request(url=url, process_chain=process_chain)
+        return self._send_post_request(url=url, process_chain=process_chain, timeout=timeout, node=node)
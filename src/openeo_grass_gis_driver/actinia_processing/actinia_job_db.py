@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
-from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
-from sqlitedict import SqliteDict
+from collections.abc import MutableMapping
+from typing import Iterator, Optional
+from openeo_grass_gis_driver.database import get_database
 
 __license__ = "Apache License, Version 2.0"
 __author__ = "Sören Gebbert"
@@ -9,8 +10,83 @@ __maintainer__ = "Soeren Gebbert"
 __email__ = "soerengebbert@googlemail.com"
 
 
-class ActiniaJobDB(SqliteDict):
+class ActiniaJobDB(MutableMapping):
     """This is the storage of all actinia jobs that where committed
+
+    It maps the openEO job ids to the actinia resource ids, that are stored
+    in the indexed actinia_id column of the job table, and the actinia resource
+    ids to the base url of the actinia node that owns the resource.
     """
     def __init__(self):
-        SqliteDict.__init__(self, filename=ActiniaConfig.ACTINIA_JOB_DB, autocommit=True)
+        self.db = get_database()
+
+    def __getitem__(self, job_id: str) -> str:
+        row = self.db.execute("SELECT actinia_id FROM jobs WHERE job_id = ? AND actinia_id IS NOT NULL",
+                              (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(job_id)
+        return row[0]
+
+    def __setitem__(self, job_id: str, actinia_id: str):
+        if self.db.execute("UPDATE jobs SET actinia_id = ? WHERE job_id = ?", (actinia_id, job_id)).rowcount == 0:
+            raise KeyError(f"Job {job_id} is not in the job database")
+
+    def __delitem__(self, job_id: str):
+        self.db.execute("DELETE FROM actinia_resources WHERE resource_id = "
+                        "(SELECT actinia_id FROM jobs WHERE job_id = ?)", (job_id,))
+        if self.db.execute("UPDATE jobs SET actinia_id = NULL WHERE job_id = ? AND actinia_id IS NOT NULL",
+                           (job_id,)).rowcount == 0:
+            raise KeyError(job_id)
+
+    def __contains__(self, job_id) -> bool:
+        return self.db.execute("SELECT 1 FROM jobs WHERE job_id = ? AND actinia_id IS NOT NULL",
+                               (job_id,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for row in self.db.execute("SELECT job_id FROM jobs WHERE actinia_id IS NOT NULL "
+                                   "ORDER BY rowid").fetchall():
+            yield row[0]
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM jobs WHERE actinia_id IS NOT NULL").fetchone()[0]
+
+    def clear(self):
+        self.db.execute("UPDATE jobs SET actinia_id = NULL")
+        self.db.execute("DELETE FROM actinia_resources")
+
+    def job_id(self, actinia_id: str) -> Optional[str]:
+        """Return the openEO job id of an actinia resource
+
+        :param actinia_id: The actinia resource id
+        :return: The job id or None if the resource belongs to no job
+        """
+        row = self.db.execute("SELECT job_id FROM jobs WHERE actinia_id = ?", (actinia_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def node(self, actinia_id: str) -> Optional[str]:
+        """Return the actinia node that owns a resource
+
+        :param actinia_id: The actinia resource id
+        :return: The base url of the node or None if the node is unknown
+        """
+        row = self.db.execute("SELECT node FROM actinia_resources WHERE resource_id = ?", (actinia_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def set_node(self, actinia_id: str, node: str):
+        """Remember the actinia node that owns a resource
+
+        :param actinia_id: The actinia resource id
+        :param node: The base url of the node
+        """
+        self.db.execute("INSERT OR REPLACE INTO actinia_resources VALUES (?, ?)", (actinia_id, node))
+
+    def prune(self, actinia_id: str) -> bool:
+        """Forget the node of a finished resource that belongs to no job and no job tile
+
+        :param actinia_id: The actinia resource id
+        :return: True if the node was removed
+        """
+        return self.db.execute("DELETE FROM actinia_resources WHERE resource_id = ? AND "
+                               "NOT EXISTS (SELECT 1 FROM jobs WHERE actinia_id = ?) AND "
+                               "NOT EXISTS (SELECT 1 FROM job_tiles WHERE resource_id = ?)",
+                               (actinia_id, actinia_id, actinia_id)).rowcount > 0
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+import itertools
+import threading
+import time
+import traceback
+import zlib
+from typing import Callable, Dict, List, Optional, Set
+from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
+from openeo_grass_gis_driver.actinia_processing.actinia_session import ActiniaSessionPool
+from openeo_grass_gis_driver.lru_cache import LRUCache
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+def node_url(host: str, port) -> str:
+    """Return the base url of the actinia API of a node"""
+    return "%(host)s:%(port)s/latest" % {"host": host, "port": port}
+
+
+def node_definitions(config: ActiniaConfig = None) -> List[dict]:
+    """Return the configured actinia nodes as list of {"url": base url, "locations": locations or None}
+
+    The single HOST/PORT node is used if no ACTINIA_NODES are configured.
+
+    :param config: The actinia configuration
+    :return: The list of node definitions in the configured order
+    """
+
+    if config is None:
+        config = ActiniaConfig
+
+    nodes = getattr(config, "ACTINIA_NODES", None) or [{"host": config.HOST, "port": config.PORT}]
+    return [{"url": node_url(node["host"], node["port"]),
+             "locations": frozenset(node["locations"]) if node.get("locations") else None} for node in nodes]
+
+
+class ActiniaNode(object):
+    """The routing state of a single actinia node"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.healthy = True
+        # The monotonic time of the last health check, None if the node was never checked
+        self.checked: Optional[float] = None
+        self.ejected: Optional[float] = None
+        self.ejections = 0
+        # The ids of the submitted resources of this node that are not finished
+        self.outstanding: Set[str] = set()
+
+    def to_dict(self) -> dict:
+        return {"url": self.url,
+                "healthy": self.healthy,
+                "checked": None if self.checked is None else round(time.monotonic() - self.checked, 1),
+                "ejections": self.ejections,
+                "outstanding": len(self.outstanding)}
+
+
+class ActiniaNodePool(object):
+    """This class routes the requests of the driver to a pool of actinia nodes
+
+    The nodes are selected by the configured ACTINIA_ROUTING policy among the healthy nodes
+    that serve the location of a request:
+
+        - round_robin: The nodes are used in turn
+        - least_outstanding: The node with the least submitted and not finished resources
+        - location_affinity: All requests of a location are sent to the same node,
+          so that its caches of the location are reused
+
+    The health of the nodes is checked every ACTINIA_HEALTH_INTERVAL seconds in a background
+    thread and cached. Nodes that fail a health check or a request are ejected from the
+    routing and admitted again when a later health check succeeds. If all nodes are ejected,
+    the requests are routed to all nodes, so that the callers receive the actinia errors.
+
+    The node that owns a resource is remembered in the actinia job database, so that the
+    status requests, downloads and deletions of the resource are sent to the same node.
+    """
+
+    POLICIES = ("round_robin", "least_outstanding", "location_affinity")
+
+    def __init__(self, check: Optional[Callable[[str], bool]] = None):
+        """Constructor
+
+        :param check: A function that returns the health of the node with the provided url,
+                      the check_health request of the ActiniaInterface is used if None
+        """
+        self._nodes: Dict[str, ActiniaNode] = {}
+        self._owners = LRUCache(maxsize=ActiniaConfig.JOB_POLL_MAX_FINAL)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._check = check
+        self._checking = False
+        self._health_lock = threading.Lock()
+
+    def _node(self, url: str) -> ActiniaNode:
+        node = self._nodes.get(url)
+        if node is None:
+            node = self._nodes[url] = ActiniaNode(url)
+        return node
+
+    def nodes(self, config: ActiniaConfig = None) -> List[ActiniaNode]:
+        """Return the state of the configured nodes"""
+
+        with self._lock:
+            return [self._node(definition["url"]) for definition in node_definitions(config)]
+
+    def select(self, location: Optional[str] = None, resource_id: Optional[str] = None,
+               config: ActiniaConfig = None) -> str:
+        """Select the node of a request, the node that owns the resource of the request
+        or a node that is selected with the configured routing policy
+
+        :param location: The location of the request or None if the request is not bound to a location
+        :param resource_id: The resource of the request or None if the request is not bound to a resource
+        :param config: The actinia configuration
+        :return: The base url of the selected node
+        """
+
+        if config is None:
+            config = ActiniaConfig
+
+        definitions = node_definitions(config)
+        if len(definitions) == 1:
+            return definitions[0]["url"]
+
+        if resource_id is not None:
+            owner = self.owner(resource_id)
+            if owner in [definition["url"] for definition in definitions]:
+                return owner
+
+        self.refresh(config)
+
+        with self._lock:
+            serving = [definition["url"] for definition in definitions
+                       if location is None or definition["locations"] is None or location in definition["locations"]]
+            if not serving:
+                serving = [definition["url"] for definition in definitions]
+            candidates = [url for url in serving if self._node(url).healthy] or serving
+
+            policy = getattr(config, "ACTINIA_ROUTING", "round_robin")
+            if policy == "location_affinity" and location is not None:
+                return candidates[zlib.crc32(location.encode()) % len(candidates)]
+
+            offset = next(self._counter) % len(candidates)
+            candidates = candidates[offset:] + candidates[:offset]
+            if policy == "least_outstanding":
+                return min(candidates, key=lambda url: len(self._node(url).outstanding))
+            return candidates[0]
+
+    def owner(self, resource_id: str) -> Optional[str]:
+        """Return the base url of the node that owns a resource
+
+        :param resource_id: The actinia resource id
+        :return: The base url or None if the owner is unknown
+        """
+
+        from openeo_grass_gis_driver.actinia_processing.actinia_job_db import ActiniaJobDB
+
+        url = self._owners.get(resource_id)
+        if url is None:
+            url = ActiniaJobDB().node(resource_id)
+            if url is not None:
+                self._owners.set(resource_id, url)
+        return url
+
+    def assign(self, resource_id: str, url: str):
+        """Remember the node that accepted a resource, the resource is outstanding until it is released
+
+        :param resource_id: The actinia resource id
+        :param url: The base url of the node
+        """
+
+        from openeo_grass_gis_driver.actinia_processing.actinia_job_db import ActiniaJobDB
+
+        with self._lock:
+            self._node(url).outstanding.add(resource_id)
+        self._owners.set(resource_id, url)
+        ActiniaJobDB().set_node(resource_id, url)
+
+    def release(self, resource_id: str):
+        """Remove a finished or deleted resource from the outstanding resources of its node"""
+
+        with self._lock:
+            for node in self._nodes.values():
+                node.outstanding.discard(resource_id)
+
+    def finish(self, resource_id: str):
+        """Release a finished or deleted resource and forget its node if the resource belongs to no job,
+        the nodes of the job resources are kept for the requests of the job until the job is deleted
+
+        :param resource_id: The actinia resource id
+        """
+
+        from openeo_grass_gis_driver.actinia_processing.actinia_job_db import ActiniaJobDB
+
+        self.release(resource_id)
+        if ActiniaJobDB().prune(resource_id):
+            self._owners.pop(resource_id)
+
+    def report_failure(self, url: str):
+        """Eject the node of a request url that failed with a connection error
+
+        :param url: The url of the failed request
+        """
+
+        key = ActiniaSessionPool.host_key(url)
+        with self._lock:
+            for node in self._nodes.values():
+                if node.healthy and ActiniaSessionPool.host_key(node.url) == key:
+                    self._set_health(node, False)
+
+    def _set_health(self, node: ActiniaNode, healthy: bool):
+        if node.healthy and not healthy:
+            node.ejected = time.monotonic()
+            node.ejections += 1
+        node.healthy = healthy
+
+    def refresh(self, config: ActiniaConfig = None):
+        """Start a background health check of the nodes whose cached health is older than ACTINIA_HEALTH_INTERVAL"""
+
+        if config is None:
+            config = ActiniaConfig
+
+        now = time.monotonic()
+        with self._lock:
+            if self._checking:
+                return
+            due = [self._node(definition["url"]) for definition in node_definitions(config)]
+            due = [node for node in due if node.checked is None or now - node.checked >= config.ACTINIA_HEALTH_INTERVAL]
+            if not due:
+                return
+            self._checking = True
+
+        threading.Thread(target=self._check_nodes, args=(due, config), name="actinia-health-check",
+                         daemon=True).start()
+
+    def _check_nodes(self, nodes: List[ActiniaNode], config: ActiniaConfig):
+        try:
+            self.check_nodes(nodes, config)
+        finally:
+            with self._lock:
+                self._checking = False
+
+    def check_nodes(self, nodes: Optional[List[ActiniaNode]] = None, config: ActiniaConfig = None):
+        """Check the health of the nodes and eject or admit them
+
+        :param nodes: The nodes to check, all configured nodes if None
+        :param config: The actinia configuration
+        """
+
+        if nodes is None:
+            nodes = self.nodes(config)
+
+        for node in nodes:
+            try:
+                healthy = self._check_node(node.url, config)
+            except Exception:
+                traceback.print_exc()
+                healthy = False
+            with self._lock:
+                node.checked = time.monotonic()
+                self._set_health(node, healthy)
+
+    def health(self, config: ActiniaConfig = None) -> List[dict]:
+        """Return the cached health of the configured nodes, the nodes whose health is older
+        than ACTINIA_HEALTH_INTERVAL are checked first
+
+        Concurrent callers wait for the same check, hence the nodes are checked at most once
+        per interval independently of the number of callers.
+
+        :param config: The actinia configuration
+        :return: The statistics of the nodes
+        """
+
+        if config is None:
+            config = ActiniaConfig
+
+        with self._health_lock:
+            now = time.monotonic()
+            due = [node for node in self.nodes(config)
+                   if node.checked is None or now - node.checked >= config.ACTINIA_HEALTH_INTERVAL]
+            if due:
+                self.check_nodes(due, config)
+
+        return self.statistics(config)
+
+    def probe(self, url: str) -> bool:
+        """Check the health of the node of a request url
+
+        :param url: The url of a request
+        :return: True if the node is healthy or the url belongs to no configured node
+        """
+
+        key = ActiniaSessionPool.host_key(url)
+        nodes = [node for node in self.nodes() if ActiniaSessionPool.host_key(node.url) == key]
+        if not nodes:
+            return True
+        self.check_nodes(nodes)
+        return nodes[0].healthy
+
+    def _check_node(self, url: str, config: ActiniaConfig = None) -> bool:
+        if self._check is not None:
+            return self._check(url)
+
+        import requests
+        from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+
+        try:
+            return ActiniaInterface(config, node=url).check_health(
+                timeout=(config or ActiniaConfig).ACTINIA_HEALTH_TIMEOUT)
+        except requests.RequestException:
+            return False
+
+    def statistics(self, config: ActiniaConfig = None) -> List[dict]:
+        """Return the health and the number of outstanding resources of the configured nodes"""
+
+        nodes = self.nodes(config)
+        with self._lock:
+            return [node.to_dict() for node in nodes]
+
+
+NODE_POOL = ActiniaNodePool()
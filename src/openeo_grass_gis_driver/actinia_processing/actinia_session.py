@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import threading
+from typing import Dict
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+def create_retry(config: ActiniaConfig) -> Retry:
+    """Create the retry policy for requests to actinia
+
+    Only idempotent requests are retried, the processing POST requests are sent exactly once.
+    The HTTP status is returned to the caller after the last retry, hence no exception is raised
+    for error status codes.
+
+    :param config: The actinia configuration
+    :return: The urllib3 retry policy
+    """
+
+    kwargs = dict(total=config.MAX_RETRIES,
+                  connect=config.MAX_RETRIES,
+                  read=config.MAX_RETRIES,
+                  backoff_factor=config.RETRY_BACKOFF,
+                  status_forcelist=(502, 503, 504),
+                  raise_on_status=False)
+    methods = frozenset(["HEAD", "GET", "DELETE", "OPTIONS"])
+
+    try:
+        return Retry(allowed_methods=methods, **kwargs)
+    except TypeError:
+        # urllib3 < 1.26
+        return Retry(method_whitelist=methods, **kwargs)
+
+
+class ActiniaSessionPool(object):
+    """This class manages shared keep-alive HTTP sessions, one session with
+    its own connection pool for each actinia host.
+
+    The sessions are created on first use and shared between all ActiniaInterface
+    instances and threads of a worker process.
+    """
+
+    _sessions: Dict[str, requests.Session] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def host_key(url: str) -> str:
+        """Return the scheme://host:port part of an url that identifies the connection pool
+
+        :param url: The url of an actinia request
+        :return: The host key
+        """
+        parts = urlsplit(url)
+        return "%s://%s" % (parts.scheme, parts.netloc)
+
+    @classmethod
+    def get_session(cls, url: str, config: ActiniaConfig = None) -> requests.Session:
+        """Return the shared session for the actinia host of the provided url
+
+        :param url: The base url of the actinia host
+        :param config: The actinia configuration that is used when the session must be created
+        :return: The shared session
+        """
+
+        if config is None:
+            config = ActiniaConfig
+
+        key = cls.host_key(url)
+
+        session = cls._sessions.get(key)
+        if session is not None:
+            return session
+
+        with cls._lock:
+            session = cls._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=config.POOL_CONNECTIONS,
+                                      pool_maxsize=config.POOL_MAXSIZE,
+                                      pool_block=config.POOL_BLOCK,
+                                      max_retries=create_retry(config))
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                cls._sessions[key] = session
+
+        return session
+
+    @classmethod
+    def statistics(cls) -> dict:
+        """Return the connection reuse statistics of all actinia hosts
+
+        A hit is a request that was sent over an already open keep-alive connection,
+        a miss is a request that required a new connection.
+
+        :return: A dictionary with hits, misses and the number of requests per host
+        """
+
+        stats = {}
+
+        with cls._lock:
+            sessions = list(cls._sessions.items())
+
+        for key, session in sessions:
+            requests_sent = 0
+            connections = 0
+
+            adapters = {id(adapter): adapter for adapter in session.adapters.values()}
+            for adapter in adapters.values():
+                pools = adapter.poolmanager.pools
+                for pool_key in list(pools.keys()):
+                    pool = pools.get(pool_key)
+                    if pool is None:
+                        continue
+                    requests_sent += pool.num_requests
+                    connections += pool.num_connections
+
+            stats[key] = {"requests": requests_sent,
+                          "hits": requests_sent - connections,
+                          "misses": connections}
+
+        return stats
+
+    @classmethod
+    def close(cls):
+        """Close all sessions and their connection pools"""
+
+        with cls._lock:
+            for session in cls._sessions.values():
+                session.close()
+            cls._sessions = {}
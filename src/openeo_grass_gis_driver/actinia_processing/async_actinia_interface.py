@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Optional, Iterable, Awaitable, List, Any
+from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
+from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the worker pool that runs the blocking actinia requests of all asyncio clients
+
+    :return: The shared thread pool executor
+    """
+    global _EXECUTOR
+
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                _EXECUTOR = ThreadPoolExecutor(max_workers=ActiniaConfig.ASYNC_MAX_WORKERS,
+                                               thread_name_prefix="actinia")
+    return _EXECUTOR
+
+
+async def gather_bounded(coroutines: Iterable[Awaitable], limit: int = None) -> List[Any]:
+    """Run the provided coroutines concurrently with at most limit of them in flight
+
+    The results are returned in the order of the provided coroutines.
+
+    :param coroutines: The coroutines to run
+    :param limit: The maximum number of concurrently running coroutines,
+                  the configured ASYNC_CONCURRENCY is used if None
+    :return: The list of results
+    """
+
+    if limit is None:
+        limit = ActiniaConfig.ASYNC_CONCURRENCY
+
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*[bounded(coroutine) for coroutine in coroutines])
+
+
+def run_async(coroutine: Awaitable) -> Any:
+    """Run a coroutine to completion from synchronous code, like a flask resource method
+
+    :param coroutine: The coroutine to run
+    :return: The result of the coroutine
+    """
+    return asyncio.run(coroutine)
+
+
+class AsyncActiniaInterface(object):
+    """
+    This is the asyncio counterpart of the ActiniaInterface class with the same method surface.
+
+    The requests are sent by a shared worker pool over the pooled keep-alive sessions
+    of the ActiniaInterface, hence independent requests can be awaited concurrently.
+    """
+
+    def __init__(self, config: ActiniaConfig = None, iface: ActiniaInterface = None):
+
+        if iface is None:
+            iface = ActiniaInterface(config)
+
+        self.iface = iface
+
+    def set_auth(self, user: str, password: str):
+        self.iface.set_auth(user, password)
+
+    @property
+    def user(self) -> str:
+        return self.iface.user
+
+    @property
+    def base_url(self) -> str:
+        return self.iface.base_url
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+    @staticmethod
+    def notify_mapset_change(location: str, mapset: str):
+        ActiniaInterface.notify_mapset_change(location, mapset)
+
+    @staticmethod
+    def notify_resource_finished(resource_id: str):
+        ActiniaInterface.notify_resource_finished(resource_id)
+
+    @staticmethod
+    def connection_statistics() -> dict:
+        return ActiniaInterface.connection_statistics()
+
+    @staticmethod
+    def node_statistics() -> list:
+        return ActiniaInterface.node_statistics()
+
+    @staticmethod
+    def coalescing_statistics() -> dict:
+        return ActiniaInterface.coalescing_statistics()
+
+    @staticmethod
+    def health() -> dict:
+        return ActiniaInterface.health()
+
+    @staticmethod
+    def layer_def_to_components(layer: str) -> Tuple[Optional[str], Optional[str], Optional[str], str]:
+        return ActiniaInterface.layer_def_to_components(layer)
+
+    @staticmethod
+    def layer_def_to_grass_map_name(layer: str) -> str:
+        return ActiniaInterface.layer_def_to_grass_map_name(layer)
+
+    async def check_health(self, timeout=None) -> bool:
+        return await self._run(self.iface.check_health, timeout=timeout)
+
+    async def resource_info(self, resource_id: str, timeout=None) -> Tuple[int, dict]:
+        return await self._run(self.iface.resource_info, resource_id, timeout=timeout)
+
+    async def delete_resource(self, resource_id: str, timeout=None) -> Tuple[int, dict]:
+        return await self._run(self.iface.delete_resource, resource_id, timeout=timeout)
+
+    async def download_resource_file(self, url: str, filename: str, timeout=None) -> int:
+        return await self._run(self.iface.download_resource_file, url, filename, timeout=timeout)
+
+    async def list_locations(self, timeout=None) -> Tuple[int, dict]:
+        return await self._run(self.iface.list_locations, timeout=timeout)
+
+    async def create_mapset(self, location: str, mapset: str = "PERMANENT", timeout=None) -> Tuple[int, dict]:
+        return await self._run(self.iface.create_mapset, location, mapset, timeout=timeout)
+
+    async def delete_mapset(self, location: str, mapset: str = "PERMANENT", timeout=None) -> Tuple[int, dict]:
+        return await self._run(self.iface.delete_mapset, location, mapset, timeout=timeout)
+
+    async def list_mapsets(self, location: str, timeout=None) -> Tuple[int, dict]:
+        return await self._run(self.iface.list_mapsets, location, timeout=timeout)
+
+    async def mapset_info(self, location: str, mapset: str, timeout=None) -> Tuple[int, dict]:
+        return await self._run(self.iface.mapset_info, location, mapset, timeout=timeout)
+
+    async def list_raster(self, location: str, mapset: str, timeout=None) -> Tuple[int, dict]:
+        return await self._run(self.iface.list_raster, location, mapset, timeout=timeout)
+
+    async def delete_raster_layer(self, location: str, mapset: str, layer: str, timeout=None) -> Tuple[int, dict]:
+        return await self._run(self.iface.delete_raster_layer, location, mapset, layer, timeout=timeout)
+
+    async def list_vector(self, location: str, mapset: str, timeout=None) -> Tuple[int, dict]:
+        return await self._run(self.iface.list_vector, location, mapset, timeout=timeout)
+
+    async def list_strds(self, location: str, mapset: str, timeout=None) -> Tuple[int, dict]:
+        return await self._run(self.iface.list_strds, location, mapset, timeout=timeout)
+
+    async def list_strds_raster_layers(self, location: str, mapset: str, strds: str,
+                                       timeout=None) -> Tuple[int, dict]:
+        return await self._run(self.iface.list_strds_raster_layers, location, mapset, strds, timeout=timeout)
+
+    async def layer_info(self, layer_name: str, timeout=None) -> Tuple[int, dict]:
+        return await self._run(self.iface.layer_info, layer_name, timeout=timeout)
+
+    async def check_layer_exists(self, layer_name: str, timeout=None) -> bool:
+        return await self._run(self.iface.check_layer_exists, layer_name, timeout=timeout)
+
+    async def async_persistent_processing(self, location: str, mapset: str, process_chain: dict,
+                                          timeout=None) -> Tuple[int, dict]:
+        return await self._run(self.iface.async_persistent_processing, location, mapset,
+                               process_chain, timeout=timeout)
+
+    async def async_ephemeral_processing(self, location: str, process_chain: dict,
+                                         timeout=None) -> Tuple[int, dict]:
+        return await self._run(self.iface.async_ephemeral_processing, location, process_chain,
+                               timeout=timeout)
+
+    async def sync_ephemeral_processing_validation(self, location: str, process_chain: dict,
+                                                   timeout=None) -> Tuple[int, dict]:
+        return await self._run(self.iface.sync_ephemeral_processing_validation, location, process_chain,
+                               timeout=timeout)
+
+    async def async_ephemeral_processing_export(self, location: str, process_chain: dict,
+                                                timeout=None) -> Tuple[int, dict]:
+        return await self._run(self.iface.async_ephemeral_processing_export, location, process_chain,
+                               timeout=timeout)
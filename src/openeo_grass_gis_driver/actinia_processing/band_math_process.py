@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+import ast
+import json
+import math
+import operator
+from typing import Optional, Tuple
+from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph, PROCESS_DICT, \
+    PROCESS_DESCRIPTION_DICT, FUSED_INPUTS, CompilationContext
+from openeo_grass_gis_driver.process_schemas import Parameter, ProcessDescription, ReturnValue
+from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+PROCESS_NAME = "band_math"
+
+# The element-wise operators of the expressions, the r.mapcalc operator and the function to fold constants
+BINARY_OPERATORS = {ast.Add: ("+", operator.add),
+                    ast.Sub: ("-", operator.sub),
+                    ast.Mult: ("*", operator.mul),
+                    ast.Div: ("/", operator.truediv),
+                    ast.Pow: ("^", operator.pow)}
+
+# The r.mapcalc functions that can be used in expressions and their number of arguments
+FUNCTIONS = {"abs": 1, "sqrt": 1, "exp": 1, "log": 1, "float": 1, "round": 1, "min": None, "max": None}
+
+# The band indices that are expanded into expressions of their bands
+INDICES = {"ndvi": ("(nir - red) / (nir + red)", ("nir", "red"))}
+
+# The processes that are fused into the expression of the band math process that uses their result,
+# the NDVI process selects its bands by name from the outputs of its imagery and passes the other
+# outputs through, hence it is not a single expression of its inputs
+FUSED_PROCESSES = ("band_math", "NDVI2")
+
+# The range of the integer numbers of r.mapcalc, larger integers are not folded
+MAPCALC_INT_RANGE = (-2 ** 31 + 1, 2 ** 31 - 1)
+
+# Integer powers with larger exponents are not folded
+MAX_FOLDED_EXPONENT = 64
+
+
+def create_process_description():
+
+    p_expression = Parameter(description="The element-wise expression that is computed from the bands. "
+                                         "The expression may use the operators + - * / **, numbers, the "
+                                         "names of the bands, the functions abs, sqrt, exp, log, float, round, "
+                                         "min, max and the index ndvi(nir, red).",
+                             schema={"type": "string", "examples": ["(nir - red) / (nir + red)",
+                                                                    "2.5 * (nir - red) / (nir + 6 * red + 1)"]},
+                             required=True)
+
+    p_bands = Parameter(description="The bands of the expression, the name of each band and any openEO process "
+                                    "object that returns a single raster or space-time raster dataset. "
+                                    "Band math and NDVI2 processes are fused into the expression.",
+                        schema={"type": "object", "additionalProperties": {"type": "object",
+                                                                           "format": "eodata"}},
+                        required=True)
+
+    p_color = Parameter(description="The color table of the result that is applied if the result is exported",
+                        schema={"type": "string", "examples": ["ndvi", "grey", "viridis"]},
+                        required=False)
+
+    rv = ReturnValue(description="Processed EO data.",
+                     schema={"type": "object", "format": "eodata"})
+
+    simple_example = {
+        "process_id": PROCESS_NAME,
+        "expression": "ndvi(nir, red) * 100",
+        "color": "ndvi",
+        "bands": {
+            "red": {
+                "process_id": "get_data",
+                "data_id": "nc_spm_08.landsat.strds.lsat5_red"
+            },
+            "nir": {
+                "process_id": "get_data",
+                "data_id": "nc_spm_08.landsat.strds.lsat5_nir"
+            }
+        }
+    }
+
+    examples = dict(simple_example=simple_example)
+
+    pd = ProcessDescription(name=PROCESS_NAME,
+                            description="Compute an element-wise expression of raster or space-time raster bands "
+                                        "in a single pass. Nested band math and NDVI computations are fused "
+                                        "into a single expression and constant sub expressions are folded.",
+                            summary="Compute an element-wise expression of raster bands in a single pass",
+                            parameters={"expression": p_expression, "bands": p_bands, "color": p_color},
+                            returns=rv,
+                            examples=examples)
+
+    return json.loads(pd.to_json())
+
+
+PROCESS_DESCRIPTION_DICT[PROCESS_NAME] = create_process_description()
+
+
+def parse_expression(expression: str) -> ast.AST:
+    """Parse a band math expression and check that it contains only supported elements
+
+    :param expression: The expression
+    :return: The expression tree
+    """
+
+    try:
+        tree = ast.parse(expression, mode="eval").body
+    except SyntaxError as e:
+        raise Exception(f"Process {PROCESS_NAME} has an invalid expression <{expression}>: {e.msg}")
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.BinOp, ast.UnaryOp, ast.Name, ast.Load, ast.USub, ast.UAdd)):
+            continue
+        if isinstance(node, ast.operator) and type(node) in BINARY_OPERATORS:
+            continue
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) \
+                and not isinstance(node.value, bool) \
+                and (not isinstance(node.value, float) or math.isfinite(node.value)):
+            continue
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords and \
+                (node.func.id in FUNCTIONS or node.func.id in INDICES):
+            continue
+        raise Exception(f"Process {PROCESS_NAME} does not support <{ast.dump(node)}> in expression <{expression}>")
+
+    return tree
+
+
+class _Substitute(ast.NodeTransformer):
+    """Replace the band names and the indices of an expression tree"""
+
+    def __init__(self, bands: dict):
+        self.bands = bands
+
+    def visit_Name(self, node):
+        if node.id not in self.bands:
+            raise Exception(f"Process {PROCESS_NAME} uses the undefined band <{node.id}>")
+        return self.bands[node.id]
+
+    def visit_Call(self, node):
+        if node.func.id in INDICES:
+            expression, arguments = INDICES[node.func.id]
+            if len(node.args) != len(arguments):
+                raise Exception(f"The index {node.func.id} requires the arguments {', '.join(arguments)}")
+            bands = {name: self.visit(argument) for name, argument in zip(arguments, node.args)}
+            return _Substitute(bands).visit(parse_expression(expression))
+
+        count = FUNCTIONS[node.func.id]
+        if count is not None and len(node.args) != count:
+            raise Exception(f"The function {node.func.id} requires {count} arguments")
+        node.args = [self.visit(argument) for argument in node.args]
+        return node
+
+
+def _is_number(node: ast.AST, value=None) -> bool:
+    if not isinstance(node, ast.Constant):
+        return False
+    return value is None or node.value == value
+
+
+def _is_mapcalc_number(value) -> bool:
+    """Return True if the number can be written as r.mapcalc constant, r.mapcalc can not
+    parse inf and nan and has 32 bit integers"""
+    if isinstance(value, float):
+        return math.isfinite(value)
+    return MAPCALC_INT_RANGE[0] <= value <= MAPCALC_INT_RANGE[1]
+
+
+def _fold(op, left, right) -> Optional[ast.Constant]:
+    """Compute a binary operation of two constants
+
+    :param op: The operator type
+    :param left: The left constant value
+    :param right: The right constant value
+    :return: The constant of the result or None if the result can not be written as r.mapcalc constant
+    """
+
+    if op is ast.Pow and isinstance(left, int) and isinstance(right, int) and abs(right) > MAX_FOLDED_EXPONENT:
+        return None
+    try:
+        value = BINARY_OPERATORS[op][1](left, right)
+    except (ZeroDivisionError, OverflowError):
+        return None
+    if not isinstance(value, (int, float)) or not _is_mapcalc_number(value):
+        return None
+    return ast.Constant(value=value)
+
+
+def fold_constants(node: ast.AST) -> ast.AST:
+    """Evaluate the constant sub expressions of an expression tree, combine the constants
+    of chained additions and multiplications and remove the additions of zero and the
+    multiplications and divisions by one
+
+    Constant sub expressions, which results can not be written as r.mapcalc constant,
+    like 1e300 * 1e300, are not folded.
+
+    :param node: The expression tree
+    :return: The folded expression tree
+    """
+
+    if isinstance(node, ast.UnaryOp):
+        operand = fold_constants(node.operand)
+        if isinstance(node.op, ast.UAdd):
+            return operand
+        if _is_number(operand) and _is_mapcalc_number(-operand.value):
+            return ast.Constant(value=-operand.value)
+        return ast.UnaryOp(op=node.op, operand=operand)
+
+    if isinstance(node, ast.BinOp):
+        left = fold_constants(node.left)
+        right = fold_constants(node.right)
+        op = type(node.op)
+
+        if _is_number(left) and _is_number(right):
+            constant = _fold(op, left.value, right.value)
+            if constant is not None:
+                return constant
+        # Combine the constants of associative operations (x + 1) + 2 -> x + 3
+        if op in (ast.Add, ast.Mult) and _is_number(right) and isinstance(left, ast.BinOp) \
+                and type(left.op) is op and _is_number(left.right):
+            constant = _fold(op, left.right.value, right.value)
+            if constant is not None:
+                left, right = left.left, constant
+        if op is ast.Add and _is_number(left, 0):
+            return right
+        if op in (ast.Add, ast.Sub) and _is_number(right, 0):
+            return left
+        if op is ast.Mult and _is_number(left, 1):
+            return right
+        if op in (ast.Mult, ast.Div, ast.Pow) and _is_number(right, 1):
+            return left
+        return ast.BinOp(left=left, op=node.op, right=right)
+
+    if isinstance(node, ast.Call):
+        node.args = [fold_constants(argument) for argument in node.args]
+
+    return node
+
+
+def _is_float(node: ast.AST) -> bool:
+    """Return True if the expression tree is computed with floating point numbers"""
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, float)
+    if isinstance(node, ast.Call):
+        return node.func.id == "float"
+    return isinstance(node, ast.BinOp) and isinstance(node.op, ast.Div)
+
+
+def to_mapcalc(node: ast.AST) -> str:
+    """Convert an expression tree into a r.mapcalc expression
+
+    Divisions are computed with floating point numbers.
+
+    :param node: The expression tree
+    :return: The r.mapcalc expression
+    """
+
+    if isinstance(node, ast.Constant):
+        return repr(node.value)
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.UnaryOp):
+        return f"-({to_mapcalc(node.operand)})"
+    if isinstance(node, ast.Call):
+        return f"{node.func.id}({', '.join(to_mapcalc(argument) for argument in node.args)})"
+
+    left = to_mapcalc(node.left)
+    right = to_mapcalc(node.right)
+    if isinstance(node.op, ast.Div) and not _is_float(node.left):
+        left = f"float({left})"
+    return f"({left} {BINARY_OPERATORS[type(node.op)][0]} {right})"
+
+
+def build_expression_tree(process: dict, context: CompilationContext, inputs: list, process_list: list,
+                          output_names: list) -> ast.AST:
+    """Build the expression tree of a band math or NDVI2 process, the band math and NDVI2
+    processes of the bands are fused into the tree
+
+    :param process: The band math or NDVI2 process description
+    :param context: The compilation context
+    :param inputs: The list of input datasets of the tree that is extended
+    :param process_list: The list of process chain steps of the bands that is extended
+    :param output_names: The names of the other outputs of the bands that are passed through
+    :return: The expression tree
+    """
+
+    if process["process_id"] == "NDVI2":
+        expression = "ndvi(nir, red)"
+        band_processes = {"red": process.get("red"), "nir": process.get("nir")}
+    else:
+        if "expression" not in process:
+            raise Exception("Process %s requires parameter <expression>" % PROCESS_NAME)
+        if not isinstance(process.get("bands"), dict) or not process["bands"]:
+            raise Exception("Process %s requires parameter <bands>" % PROCESS_NAME)
+        expression = process["expression"]
+        band_processes = process["bands"]
+
+    bands = {}
+    for name, band_process in band_processes.items():
+        # The bands of a flattened process graph reference the nodes of the band processes
+        band = context.node_process(band_process)
+        if not isinstance(band, dict) or "process_id" not in band:
+            raise Exception("Process %s requires a process for band <%s>" % (process["process_id"], name))
+
+        if band["process_id"] in FUSED_PROCESSES:
+            bands[name] = build_expression_tree(band, context, inputs, process_list, output_names)
+            continue
+
+        input_names, band_process_list = analyse_process_graph(dict(band=band_process), context)
+        process_list.extend(band_process_list)
+        if not input_names:
+            raise Exception("Process %s requires an input dataset for band <%s>" % (process["process_id"], name))
+
+        # The last input is the band, all other inputs are passed through
+        output_names.extend(input_names[:-1])
+        inputs.append(input_names[-1])
+        bands[name] = ast.Name(id=ActiniaInterface.layer_def_to_grass_map_name(input_names[-1]), ctx=ast.Load())
+
+    return substitute_bands(expression, bands)
+
+
+def substitute_bands(expression: str, bands: dict) -> ast.AST:
+    """Parse an expression and replace its band names and indices
+
+    :param expression: The expression
+    :param bands: The expression trees of the band names
+    :return: The expression tree
+    """
+    return _Substitute(bands).visit(parse_expression(expression))
+
+
+def create_process_chain_entry(expression: str, input_names: list, output_name: str,
+                               context: CompilationContext, basename: str = PROCESS_NAME) -> dict:
+    """Create a Actinia process description that computes the expression with r.mapcalc if all inputs
+    are raster layers, otherwise with t.rast.mapcalc
+
+    :param expression: The r.mapcalc expression
+    :param input_names: The names of the input datasets
+    :param output_name: The name of the output dataset
+    :param context: The compilation context
+    :param basename: The basename of the maps of the output space-time raster dataset
+    :return: A Actinia process chain description
+    :raises Exception: If raster layers are combined with space-time raster datasets
+    """
+
+    rn = context.create_step_id()
+    output_name = ActiniaInterface.layer_def_to_grass_map_name(output_name)
+
+    datatypes = {ActiniaInterface.layer_def_to_components(name)[2] for name in input_names}
+    # t.rast.mapcalc computes the expression for the maps of space-time raster datasets only
+    if "raster" in datatypes and len(datatypes) > 1:
+        raise Exception("Process %s can not combine raster layers and space-time raster datasets in "
+                        "the expression of the inputs %s" % (basename, ", ".join(input_names)))
+    if datatypes == {"raster"}:
+        return {"id": "r_mapcalc_%i" % rn,
+                "module": "r.mapcalc",
+                "inputs": [{"param": "expression",
+                            "value": "%s = %s" % (output_name, expression)}]}
+
+    grass_names = []
+    for name in input_names:
+        name = ActiniaInterface.layer_def_to_grass_map_name(name)
+        if name not in grass_names:
+            grass_names.append(name)
+
+    return {"id": "t_rast_mapcalc_%i" % rn,
+            "module": "t.rast.mapcalc",
+            "inputs": [{"param": "expression",
+                        "value": "%s = %s" % (output_name, expression)},
+                       {"param": "inputs",
+                        "value": ",".join(grass_names)},
+                       {"param": "basename",
+                        "value": basename},
+                       {"param": "output",
+                        "value": output_name}]}
+
+
+def compile_expression(tree: ast.AST, inputs: list, context: CompilationContext, process_name: str = PROCESS_NAME,
+                       basename: str = PROCESS_NAME, color: Optional[str] = None) -> Tuple[str, dict]:
+    """Fold an expression tree and create the single step that computes it
+
+    :param tree: The expression tree of the inputs
+    :param inputs: The names of the input datasets, the output is named after the first input
+    :param context: The compilation context
+    :param process_name: The name of the process that is appended to the output name
+    :param basename: The basename of the maps of the output space-time raster dataset
+    :param color: The color table of the result, that is only applied if the result is exported
+    :return: (output_name, actinia_process)
+    """
+
+    expression = to_mapcalc(fold_constants(tree))
+
+    if not inputs:
+        raise Exception("Process %s requires at least one input dataset" % process_name)
+
+    location, mapset, datatype, layer_name = ActiniaInterface.layer_def_to_components(inputs[0])
+    output_name = "%s_%s" % (layer_name, process_name)
+    context.add_name(output_name)
+
+    pc = create_process_chain_entry(expression, inputs, output_name, context=context, basename=basename)
+
+    if color is not None:
+        context.add_color_table(output_name, color, temporal=pc["module"] == "t.rast.mapcalc")
+
+    return output_name, pc
+
+
+def get_process_list(process, context: CompilationContext, process_name: str = PROCESS_NAME,
+                     basename: str = PROCESS_NAME):
+    """Analyse the process description and return the Actinia process chain and the name of the processing result
+
+    :param process: The band math or NDVI2 process description
+    :param context: The compilation context
+    :param process_name: The name of the process that is appended to the output name
+    :param basename: The basename of the maps of the output space-time raster dataset
+    :return: (output_names, actinia_process_list)
+    """
+
+    output_names = []
+    process_list = []
+    inputs = []
+
+    tree = build_expression_tree(process, context, inputs, process_list, output_names)
+    output_name, pc = compile_expression(tree, inputs, context, process_name=process_name,
+                                         basename=basename, color=process.get("color"))
+    output_names.append(output_name)
+    process_list.append(pc)
+
+    return output_names, process_list
+
+
+PROCESS_DICT[PROCESS_NAME] = get_process_list
+FUSED_INPUTS[PROCESS_NAME] = set(FUSED_PROCESSES)
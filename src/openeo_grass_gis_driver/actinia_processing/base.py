@@ -1,10 +1,26 @@
 # -*- coding: utf-8 -*-
-
-from typing import Set, Dict, Optional, Tuple
+import hashlib
+import json
+from copy import deepcopy
+from random import randint
+from typing import Callable, Set, Dict, List, Optional, Tuple
+from openeo_grass_gis_driver.actinia_processing.config import Config
+from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+from openeo_grass_gis_driver.actinia_processing.process_chain_optimizer import is_region_change
+from openeo_grass_gis_driver.lru_cache import LRUCache
 
 # This is the process dictionary that is used to store all processes of the Actinia wrapper
 PROCESS_DESCRIPTION_DICT = {}
 PROCESS_DICT = {}
+# The processes that fuse some of their input processes into their own process chain steps,
+# process id -> the process ids of the fused inputs. Nodes of a process graph that are
+# fused by all their consumers are not compiled on their own.
+FUSED_INPUTS: Dict[str, Set[str]] = {}
+
+# The cache of the compiled process graphs, the canonical graph hash -> (output_names, process_list, location)
+COMPILE_CACHE = LRUCache(maxsize=Config.COMPILE_CACHE_SIZE)
+# The configuration settings that change the compiled process chains, they are part of the compile cache key
+COMPILE_CONFIG = ("DETERMINISTIC_STEP_IDS", "FILTER_DATERANGE_MODE", "ZONAL_STATISTICS_MODE")
 
 
 __license__ = "Apache License, Version 2.0"
@@ -14,36 +30,230 @@ __maintainer__ = "Soeren Gebbert"
 __email__ = "soerengebbert@googlemail.com"
 
 
-def analyse_process_graph(graph: dict):
+class CompilationContext(object):
+    """The state of a single process graph compilation
+
+    The context is passed to all process converters of a compilation. It collects the
+    locations and datasets that are used by the process graph and the names that were
+    generated for the process results, and it numbers the steps of the process chain.
+    Each compilation has its own context, hence compilations can run concurrently.
+    """
+
+    def __init__(self, deterministic_step_ids: Optional[bool] = None):
+        """Constructor
+
+        :param deterministic_step_ids: Number the steps of the process chain consecutively,
+                                       the configured DETERMINISTIC_STEP_IDS is used if None
+        """
+
+        if deterministic_step_ids is None:
+            deterministic_step_ids = Config.DETERMINISTIC_STEP_IDS
+
+        self.deterministic_step_ids = deterministic_step_ids
+        self.locations: Dict[str, str] = {}
+        self.datasets: List[str] = []
+        self.names: List[str] = []
+        # The output names of the compiled process graph nodes, node id -> output_name_list
+        self.node_outputs: Dict[str, list] = {}
+        # The process descriptions of the process graph nodes, node id -> process description
+        self.node_processes: Dict[str, dict] = {}
+        # The color tables of the results that are applied if the results are exported,
+        # result name -> (color, temporal)
+        self.color_tables: Dict[str, Tuple[str, bool]] = {}
+        # The vector maps that were imported from the polygon sources, source -> map name
+        self.vector_imports: Dict[str, str] = {}
+        # The zone rasters that were rasterized from the polygon sources, source -> map name
+        self.zone_rasters: Dict[str, str] = {}
+        self._step_counter = 0
+
+    def create_step_id(self) -> int:
+        """Return the numeric id of a new step of the actinia process chain
+
+        The steps are numbered consecutively if deterministic step ids are used,
+        so that the same process graph is always compiled into the same process chain.
+        Otherwise random ids are used.
+
+        :return: The step id
+        """
+
+        if not self.deterministic_step_ids:
+            return randint(0, 1000000)
+
+        self._step_counter += 1
+        return self._step_counter
+
+    def node_process(self, process):
+        """Return the process description of a node reference, other values are returned unchanged
+
+        :param process: A process description or a {"from_node": node_id} reference
+        :return: The process description
+        """
+
+        if isinstance(process, dict) and "from_node" in process:
+            return self.node_processes.get(process["from_node"], process)
+        return process
+
+    def add_dataset(self, data_id: str):
+        """Record a dataset of the process graph and its location
+
+        :param data_id: The name of the dataset in the form location.mapset.datatype.name
+        """
+
+        self.datasets.append(data_id)
+        location, mapset, datatype, layer_name = ActiniaInterface.layer_def_to_components(data_id)
+        if location is not None:
+            self.locations[location] = location
+
+    def add_name(self, name: str):
+        """Record a name that was generated for a process result
+
+        :param name: The generated name
+        """
+        self.names.append(name)
+
+    def add_color_table(self, name: str, color: str, temporal: bool = False):
+        """Record the color table of a result, it is applied by the exporter of the result
+
+        :param name: The name of the result
+        :param color: The name of the color table
+        :param temporal: True if the result is a space-time raster dataset
+        """
+        self.color_tables[name] = (color, temporal)
+
+    @property
+    def location(self) -> str:
+        """The single location of the process graph
+
+        :raises ProcessLocationError: If the data of the process graph is not located in a single location
+        """
+
+        if len(self.locations) != 1:
+            raise ProcessLocationError("Processes can only be defined for a single location!")
+        return list(self.locations.keys())[0]
+
+
+def analyse_process_graph(graph: dict, context: Optional[CompilationContext] = None):
     """Analyse a process graph and call the required subprocess analysis
 
     This function return the list of input names for the next process and the
     Actinia process chain that was build before.
 
+    Inputs that reference a node of a process graph with {"from_node": node_id} were
+    compiled before, their output names are taken from the compilation context.
+
     :param graph: The process description
+    :param context: The compilation context, a new context is created if None
     :return: (output_name_list, process_list)
     """
 
     if graph is None:
         raise Exception("Empty process graph")
 
+    if context is None:
+        context = CompilationContext()
+
     process_list = []
     output_name_list = []
 
     for key in graph:
         process = graph[key]
 
-        if "process_id" in process:
+        if isinstance(process, dict) and "from_node" in process:
+            output_name_list.extend(context.node_outputs[process["from_node"]])
+
+        elif isinstance(process, dict) and "process_id" in process:
 
             if process["process_id"] not in PROCESS_DICT:
                 raise Exception("Unsupported process id, available processes: %s" % PROCESS_DICT.keys())
 
-            outputs, processes = PROCESS_DICT[process["process_id"]](process)
+            outputs, processes = PROCESS_DICT[process["process_id"]](process, context)
             process_list.extend(processes)
             output_name_list.extend(outputs)
 
     return output_name_list, process_list
 
+
+class ProcessLocationError(Exception):
+    """Raised if the data of a process graph is not located in a single location"""
+    pass
+
+
+def process_graph_hash(graph: dict) -> str:
+    """Return the hash of the canonical JSON representation of a process graph
+
+    :param graph: The process graph
+    :return: The hex digest of the SHA-256 hash
+    """
+
+    canonical = json.dumps(graph, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def flatten_process_graph(graph: dict) -> dict:
+    """Convert a v0.3 process graph, that nests the input processes into the processes that
+    consume them, into a v0.4 process graph description of nodes that reference their inputs
+
+    Identical nested processes become a single node, hence a subgraph that is the input
+    of several processes is compiled once. The node ids are derived from the hash of the
+    process and the ids of its inputs. Processes in lists are kept, they are not inputs.
+
+    :param graph: The v0.3 process graph
+    :return: The v0.4 process graph description
+    """
+
+    nodes = {}
+
+    def replace(value):
+        if isinstance(value, dict):
+            if "process_id" in value:
+                return {"from_node": add_node(value)}
+            return {key: replace(item) for key, item in value.items()}
+        return value
+
+    def add_node(process: dict) -> str:
+        arguments = {key: replace(value) for key, value in process.items() if key != "process_id"}
+        node = {"process_id": process["process_id"], "arguments": arguments}
+        node_id = "%s_%s" % (process["process_id"], process_graph_hash(node)[:16])
+        nodes.setdefault(node_id, node)
+        return node_id
+
+    for process in graph.values():
+        if isinstance(process, dict) and "process_id" in process:
+            add_node(process)
+
+    return {"title": "", "description": "", "process_graph": nodes}
+
+
+def compile_process_graph(graph: dict) -> Tuple[list, list, str]:
+    """Compile a process graph into an actinia process chain and return the location of its data
+
+    The v0.3 process graph is flattened into a ProcessGraph, that compiles each node once.
+    The compilation results are cached by the canonical hash of the process graph and
+    the COMPILE_CONFIG settings, hence resubmitted process graphs are not compiled again.
+    The cached results are copied, so that the caller can modify them.
+
+    :param graph: The process graph
+    :return: (output_name_list, process_list, location)
+    :raises ProcessLocationError: If the data of the process graph is not located in a single location
+    """
+
+    key = (process_graph_hash(graph),) + tuple(getattr(Config, name) for name in COMPILE_CONFIG)
+    result = COMPILE_CACHE.get(key)
+
+    if result is None:
+        context = CompilationContext()
+        process_graph = ProcessGraph(flatten_process_graph(graph))
+        output_name_list, process_list = process_graph.to_actinia_process_chain(context)
+
+        result = (output_name_list, process_list, context.location)
+        COMPILE_CACHE.set(key, result)
+
+    return deepcopy(result)
+
+
+def compile_cache_statistics() -> dict:
+    return COMPILE_CACHE.statistics()
+
 ###############################################################################
 ####### Version 0.4 of the API ################################################
 ###############################################################################
@@ -61,7 +271,10 @@ class ProcessNode:
         if "arguments" in self.process:
             self.arguments = self.process["arguments"]
         self.parents: Set[ProcessNode] = set()
-        self.child: Optional[ProcessNode] = None
+        # The nodes that compute the inputs of this node in the order of the arguments
+        self.inputs: List[ProcessNode] = []
+        # The nodes that consume the output of this node in the order of their definition
+        self.children: List[ProcessNode] = []
 
         self._process_description = process_description
         self._was_processed = False
@@ -74,36 +287,72 @@ class ProcessNode:
     def processed(self, flag: bool):
         self._was_processed = flag
 
+    @property
+    def child(self) -> Optional["ProcessNode"]:
+        """The first node that consumes the output of this node, None if this is a root node"""
+        if self.children:
+            return self.children[0]
+        return None
+
     def __str__(self):
 
-        child_id = None
-        if self.child is not None:
-            child_id = self.child.id
+        child_ids = [node.id for node in self.children]
 
         parent_ids = list()
         if self.parents:
             parent_ids = [node.id for node in self.parents]
 
-        return f"Node: {self.id} parents: {parent_ids} child: {child_id}"
+        return f"Node: {self.id} parents: {parent_ids} children: {child_ids}"
 
-    def get_parent_ids(self) -> set:
+    def get_parent_ids(self) -> List[str]:
+        """Return the ids of the nodes that are referenced in the arguments in the order of the arguments,
+        the references in callbacks are not followed, they reference the nodes of the callback
+
+        :return: The list of unique parent ids
+        """
 
         if not self.arguments:
-            return set()
+            return []
+
+        parent_ids = []
 
-        parent_ids = set()
+        def find(value):
+            if isinstance(value, dict):
+                if "from_node" in value:
+                    if value["from_node"] not in parent_ids:
+                        parent_ids.append(value["from_node"])
+                    return
+                for key, item in value.items():
+                    if key != "callback":
+                        find(item)
+            elif isinstance(value, list):
+                for item in value:
+                    find(item)
 
-        for key in self.arguments:
-            if isinstance(self.arguments[key], dict):
-                if "from_node" in self.arguments[key]:
-                    parent_ids.add(self.arguments[key]["from_node"])
+        find(self.arguments)
 
         return parent_ids
 
+    def to_process(self) -> dict:
+        """Return the process description of this node in the form that the process converters accept,
+        the arguments are the parameters of the process and the inputs reference their nodes
+
+        :return: The process description
+        """
+        process = {"process_id": self.process_id}
+        if self.arguments:
+            process.update(self.arguments)
+        return process
+
     def asDict(self) -> dict:
         return self._process_description
 
 
+class ProcessGraphCycleError(Exception):
+    """Raised if the nodes of a process graph form a cycle"""
+    pass
+
+
 class ProcessGraph:
     """This class represents a process graph
 
@@ -135,6 +384,8 @@ class ProcessGraph:
     def build_process_graph_from_description(self, graph_description: dict):
         """Build the directed process graph from the graph description
 
+        Each edge of the graph is visited once, hence the graph is build in O(V+E).
+
         :param graph_description: The description of the graph as dictionary
         :return: The set of child nodes that are the roots of the process graph
         """
@@ -147,19 +398,131 @@ class ProcessGraph:
         # Create node connections
         for node in self.node_dict.values():
             # Connect parents with childs
-            parent_ids = node.get_parent_ids()
-            if parent_ids:
-                for parent_id in parent_ids:
-                    parent_node = self.node_dict[parent_id]
-                    node.parents.add(parent_node)
-                    parent_node.child = node
+            for parent_id in node.get_parent_ids():
+                if parent_id not in self.node_dict:
+                    raise Exception(f"Node <{node.id}> references the missing node <{parent_id}>")
+                parent_node = self.node_dict[parent_id]
+                node.parents.add(parent_node)
+                node.inputs.append(parent_node)
+                parent_node.children.append(node)
 
         for node in self.node_dict.values():
-            if node.child is None:
+            if not node.children:
                 self.root_nodes.add(node)
 
+    def topological_order(self) -> List[ProcessNode]:
+        """Return the nodes of the process graph ordered so that each node follows its parents
+
+        The nodes are sorted depth-first in O(V+E), each node follows the subgraphs of its
+        inputs in the order of its arguments, and nodes that do not depend on each other keep
+        the order of their definition. Hence the steps of an input subgraph are not interleaved
+        with the steps of other subgraphs, as in the nested v0.3 process graphs.
+
+        :return: The list of ordered nodes
+        :raises ProcessGraphCycleError: If the nodes of the process graph form a cycle
+        """
+
+        order = []
+        # node id -> False while the inputs of the node are visited, True when the node is ordered
+        ordered: Dict[str, bool] = {}
+
+        for start in self.node_dict.values():
+            if start.id in ordered:
+                continue
+
+            ordered[start.id] = False
+            stack = [(start, iter(start.inputs))]
+            while stack:
+                node, inputs = stack[-1]
+                for parent in inputs:
+                    if parent.id not in ordered:
+                        ordered[parent.id] = False
+                        stack.append((parent, iter(parent.inputs)))
+                        break
+                    if ordered[parent.id] is False:
+                        cycle_ids = [entry.id for entry, entry_inputs in stack]
+                        cycle_ids = sorted(cycle_ids[cycle_ids.index(parent.id):])
+                        raise ProcessGraphCycleError(f"The process graph contains a cycle between the nodes: "
+                                                     f"{', '.join(cycle_ids)}")
+                else:
+                    stack.pop()
+                    ordered[node.id] = True
+                    order.append(node)
+
+        return order
+
+    def to_actinia_process_chain(self, context: Optional[CompilationContext] = None,
+                                 node_compiler: Optional[Callable] = None) -> Tuple[list, list]:
+        """Compile the process graph into an actinia process chain
+
+        The nodes are compiled in topological order, each node exactly once. The outputs
+        of a node are stored in the node_outputs of the compilation context, where all
+        nodes that consume them look them up, so that a shared subgraph is compiled once.
+        Nodes that are fused by all their consumers, see FUSED_INPUTS, are not compiled
+        on their own.
+
+        The computational region is a state of the process chain, that the steps of a
+        node inherit from the subgraphs of its inputs. If the region of the inputs was
+        changed by another consumer of a shared input, the region change of the inputs
+        is repeated before the steps of the node.
+
+        :param context: The compilation context, a new context is created if None
+        :param node_compiler: The function (node, context) -> (output_name_list, process_list)
+                              that compiles a single node, process_node_to_actinia_process_chain if None
+        :return: (output_name_list, process_list) the output names are those of the root nodes
+        :raises ProcessGraphCycleError: If the nodes of the process graph form a cycle
+        """
+
+        if context is None:
+            context = CompilationContext()
+
+        if node_compiler is None:
+            node_compiler = process_node_to_actinia_process_chain
+
+        process_list = []
+        output_name_list = []
+
+        # node id -> the last region change that is in effect after the steps of the node
+        regions: Dict[str, Optional[dict]] = {}
+        current_region = None
 
-def process_node_to_actinia_process_chain(node: ProcessNode) -> Tuple[list, list]:
+        order = self.topological_order()
+        for node in order:
+            context.node_processes[node.id] = node.to_process()
+
+        for node in order:
+            region = None
+            for parent in reversed(node.inputs):
+                if regions.get(parent.id) is not None:
+                    region = regions[parent.id]
+                    break
+            regions[node.id] = region
+
+            if node.children and all(node.process_id in FUSED_INPUTS.get(child.process_id, ())
+                                     for child in node.children):
+                continue
+
+            if region is not None and region is not current_region:
+                process_list.append(dict(deepcopy(region), id="g_region_%i" % context.create_step_id()))
+                current_region = region
+
+            outputs, processes = node_compiler(node, context)
+            context.node_outputs[node.id] = outputs
+            process_list.extend(processes)
+            node.processed = True
+
+            for step in processes:
+                if is_region_change(step):
+                    regions[node.id] = current_region = step
+
+            if not node.children:
+                output_name_list.extend(outputs)
+
+        return output_name_list, process_list
+
+
+def process_node_to_actinia_process_chain(node: ProcessNode,
+                                          context: Optional[CompilationContext] = None) -> Tuple[list, list]:
     """This function calls the openEO process node to actinia process chain converter process
     based on the node process_id.
 
@@ -167,19 +530,24 @@ def process_node_to_actinia_process_chain(node: ProcessNode) -> Tuple[list, list
     process converter and sets the node status to processed==True.
 
     :param node: A single process node
+    :param context: The compilation context, a new context is created if None
     :return: (output_name_list, process_list)
     """
 
     if node is None:
         raise Exception("Missing process node")
 
+    if context is None:
+        context = CompilationContext()
+
     process_list = []
     output_name_list = []
 
     if node.process_id not in PROCESS_DICT:
         raise Exception("Unsupported process id, available processes: %s" % PROCESS_DICT.keys())
 
-    outputs, processes = PROCESS_DICT[node.process_id](node)
+    process = context.node_processes.get(node.id) or node.to_process()
+    outputs, processes = PROCESS_DICT[node.process_id](process, context)
     process_list.extend(processes)
     output_name_list.extend(outputs)
 
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
+from openeo_grass_gis_driver.actinia_processing.actinia_session import ActiniaSessionPool
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+# The HTTP status codes of actinia responses that count as failures of the backend
+FAILURE_STATUS_CODES = {500, 502, 503, 504}
+
+
+def endpoint_class(method: str, url: str) -> str:
+    """Return the endpoint class of an actinia request, each class has its own circuit per node
+
+    :param method: The HTTP method
+    :param url: The url of the request
+    :return: "health", "processing", "resources" or "data"
+    """
+
+    path = urlsplit(url).path
+    if path.endswith("/health_check"):
+        return "health"
+    if method == "POST" and ("processing" in path or "process_chain_validation" in path):
+        return "processing"
+    if "/resource" in path:
+        return "resources"
+    return "data"
+
+
+class CircuitOpenError(Exception):
+    """The request was not sent, because the circuit of the actinia endpoint is open"""
+
+    def __init__(self, node: str, endpoint: str, retry_after: float):
+        Exception.__init__(self, f"The actinia {endpoint} endpoints of {node} are unavailable, "
+                                 f"retry after {int(retry_after + 0.999)} seconds")
+        self.node = node
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class CircuitBreaker(object):
+    """The circuit of one endpoint class of an actinia node
+
+    The circuit is closed while the requests succeed. It opens after failure_threshold
+    consecutive failures and the requests fail immediately without being sent. After
+    reset_timeout seconds the circuit is half-open, a single probe checks the health of the
+    node and closes the circuit if the node is healthy, otherwise the circuit opens again.
+    """
+
+    def __init__(self, node: str, endpoint: str, failure_threshold: int, reset_timeout: float):
+        self.node = node
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened: Optional[float] = None
+        self.trips = 0
+
+    def retry_after(self, now: float) -> float:
+        if self.opened is None:
+            return 0
+        return max(self.opened + self.reset_timeout - now, 0)
+
+    def to_dict(self) -> dict:
+        return {"node": self.node,
+                "endpoint": self.endpoint,
+                "state": self.state,
+                "failures": self.failures,
+                "trips": self.trips,
+                "retry_after": round(self.retry_after(time.monotonic()), 1)}
+
+
+class CircuitBreakerRegistry(object):
+    """This class manages the circuit breakers of all actinia nodes and endpoint classes
+
+    The health check requests are never blocked, because they are the probes of the
+    half-open circuits. The rejected request of the current thread is remembered, so that
+    the flask resources can answer with 503 even if they handled the error themselves.
+    """
+
+    def __init__(self, probe: Optional[Callable[[str], bool]] = None):
+        """Constructor
+
+        :param probe: A function that checks the health of the node of a request url,
+                      the health check of the actinia node pool is used if None
+        """
+        self._circuits: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._probe = probe
+
+    def _circuit(self, node: str, endpoint: str) -> CircuitBreaker:
+        circuit = self._circuits.get((node, endpoint))
+        if circuit is None:
+            thresholds = ActiniaConfig.CIRCUIT_FAILURE_THRESHOLDS
+            circuit = CircuitBreaker(node=node, endpoint=endpoint,
+                                     failure_threshold=thresholds.get(endpoint, thresholds.get("data", 5)),
+                                     reset_timeout=ActiniaConfig.CIRCUIT_RESET_TIMEOUT)
+            self._circuits[(node, endpoint)] = circuit
+        return circuit
+
+    def before_request(self, method: str, url: str):
+        """Check the circuit of a request before it is sent
+
+        :param method: The HTTP method
+        :param url: The url of the request
+        :raises CircuitOpenError: If the circuit is open or another request probes the half-open circuit
+        """
+
+        endpoint = endpoint_class(method, url)
+        if not ActiniaConfig.CIRCUIT_BREAKER or endpoint == "health":
+            return
+
+        node = ActiniaSessionPool.host_key(url)
+        with self._lock:
+            circuit = self._circuit(node, endpoint)
+            now = time.monotonic()
+            if circuit.state == "closed":
+                return
+            if circuit.state == "half_open" or circuit.retry_after(now) > 0:
+                self._reject(circuit, now)
+            circuit.state = "half_open"
+
+        # This request probes the half-open circuit
+        healthy = self._check(url)
+        with self._lock:
+            if healthy:
+                circuit.state = "closed"
+                circuit.failures = 0
+                circuit.opened = None
+                return
+            circuit.state = "open"
+            circuit.opened = time.monotonic()
+            self._reject(circuit, circuit.opened)
+
+    def _reject(self, circuit: CircuitBreaker, now: float):
+        error = CircuitOpenError(node=circuit.node, endpoint=circuit.endpoint,
+                                 retry_after=max(circuit.retry_after(now), 1))
+        self._local.rejection = error
+        raise error
+
+    def _check(self, url: str) -> bool:
+        if self._probe is not None:
+            return self._probe(url)
+
+        from openeo_grass_gis_driver.actinia_processing.actinia_nodes import NODE_POOL
+        return NODE_POOL.probe(url)
+
+    def record(self, method: str, url: str, status_code: Optional[int]):
+        """Record the outcome of a request
+
+        :param method: The HTTP method
+        :param url: The url of the request
+        :param status_code: The HTTP status code or None if the request failed without response
+        """
+
+        endpoint = endpoint_class(method, url)
+        if not ActiniaConfig.CIRCUIT_BREAKER or endpoint == "health":
+            return
+
+        with self._lock:
+            circuit = self._circuit(ActiniaSessionPool.host_key(url), endpoint)
+            if status_code is not None and status_code not in FAILURE_STATUS_CODES:
+                circuit.failures = 0
+                return
+            circuit.failures += 1
+            if circuit.state == "closed" and circuit.failures >= circuit.failure_threshold:
+                circuit.state = "open"
+                circuit.opened = time.monotonic()
+                circuit.trips += 1
+
+    def clear_rejection(self):
+        """Forget the rejected request of the current thread"""
+        self._local.rejection = None
+
+    def rejection(self) -> Optional[CircuitOpenError]:
+        """Return the last rejected request of the current thread since clear_rejection() was called"""
+        return getattr(self._local, "rejection", None)
+
+    def statistics(self) -> List[dict]:
+        """Return the state of all circuits"""
+
+        with self._lock:
+            return [circuit.to_dict() for circuit in self._circuits.values()]
+
+    def reset(self):
+        """Close all circuits"""
+
+        with self._lock:
+            self._circuits = {}
+
+
+CIRCUIT_BREAKERS = CircuitBreakerRegistry()
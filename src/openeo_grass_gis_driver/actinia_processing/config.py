@@ -17,9 +17,134 @@ class Config:
     LOCATIONS=["nc_spm_08"]
     USER="user"
     PASSWORD="test"
-    # The database file that stores the graphs
+    # The pool of actinia nodes that process the requests, a list of {"host": ..., "port": ...,
+    # "locations": [...]} entries, a node without locations serves all locations. The single
+    # HOST/PORT node is used if the list is empty
+    ACTINIA_NODES=[]
+    # The routing of the requests to the nodes: "round_robin", "least_outstanding" or "location_affinity"
+    ACTINIA_ROUTING="round_robin"
+    # The interval in seconds of the cached health checks of the nodes, unhealthy nodes are ejected
+    # from the routing until a health check succeeds, and the timeout in seconds of a health check
+    ACTINIA_HEALTH_INTERVAL=10
+    ACTINIA_HEALTH_TIMEOUT=2
+    # The database file that stores the jobs, the actinia jobs and the process graphs
+    DATABASE="%s/.openeo_grass_gis_driver.sqlite"%os.environ["HOME"]
+    # The legacy database files of the graphs, the jobs and the actinia jobs,
+    # they are migrated into the DATABASE file when it is created
     GRAPH_DB="%s/.graph_db_file.sqlite"%os.environ["HOME"]
-    # The database file that stores the jobs
     JOB_DB="%s/.job_db_file.sqlite"%os.environ["HOME"]
-    # The database file that stores the actinia jobs
     ACTINIA_JOB_DB="%s/.actinia_job_db_file.sqlite"%os.environ["HOME"]
+    # The number of connection pools and the maximum number of keep-alive connections
+    # per pool that are shared by all requests to an actinia host
+    POOL_CONNECTIONS=4
+    POOL_MAXSIZE=16
+    # Block if all connections of a pool are in use, instead of opening a throw-away connection
+    POOL_BLOCK=False
+    # The number of retries and the exponential backoff factor in seconds for idempotent requests
+    MAX_RETRIES=3
+    RETRY_BACKOFF=0.5
+    # The default connect and read timeouts in seconds for a single request to actinia
+    CONNECT_TIMEOUT=5
+    READ_TIMEOUT=60
+    # The circuit breakers of the actinia endpoints, the circuit of an endpoint class of a node opens
+    # after the configured number of consecutive failures and the requests fail immediately with 503,
+    # after CIRCUIT_RESET_TIMEOUT seconds a health check of the node decides whether the circuit closes
+    CIRCUIT_BREAKER=True
+    CIRCUIT_FAILURE_THRESHOLDS={"processing": 3, "resources": 5, "data": 5}
+    CIRCUIT_RESET_TIMEOUT=30
+    # Whether concurrent identical GET requests with the same credentials share a single request in flight
+    SINGLE_FLIGHT=True
+    # The number of worker threads that send the requests of the asyncio actinia clients
+    # and the maximum number of concurrent requests of a single fan-out
+    ASYNC_MAX_WORKERS=32
+    ASYNC_CONCURRENCY=16
+    # The time to live in seconds of the cached collection listings, the time in seconds
+    # a listing is served stale while it is refreshed in the background and the maximum
+    # number of cached listings
+    CATALOGUE_TTL=300
+    CATALOGUE_MAX_STALE=3600
+    CATALOGUE_MAX_ENTRIES=10000
+    # The maximum number and the time to live in seconds of cached layer information
+    # and mapset projections, and the maximum number of cached coordinate transformations
+    LAYER_INFO_CACHE_SIZE=1024
+    LAYER_INFO_CACHE_TTL=600
+    TRANSFORM_CACHE_SIZE=64
+    # The maximum number of cached verified credentials and the time in seconds
+    # after which credentials must be verified by actinia again
+    AUTH_CACHE_SIZE=1024
+    AUTH_CACHE_TTL=300
+    # The minimum and maximum interval in seconds and the backoff factor of the job status polling,
+    # the number of remembered results of finished resources and the maximum long-poll time in seconds
+    JOB_POLL_MIN_INTERVAL=0.5
+    JOB_POLL_MAX_INTERVAL=30
+    JOB_POLL_BACKOFF=1.5
+    JOB_POLL_MAX_FINAL=1024
+    JOB_LONG_POLL_MAX=60
+    # The interval in seconds in which long-polling clients re-read the job status from the job database,
+    # so that status changes stored by other worker processes are noticed
+    JOB_LONG_POLL_DB_INTERVAL=1
+    # The admission queue of the jobs, the waiting jobs are released to actinia while less than
+    # QUEUE_MAX_RUNNING actinia resources are running and their owner has less than QUEUE_USER_MAX_RUNNING
+    # released jobs that are not finished. The default and the maximum priority of the jobs and the
+    # interval in seconds in which the queue is checked for free capacity
+    QUEUE_MAX_RUNNING=16
+    QUEUE_USER_MAX_RUNNING=4
+    QUEUE_DEFAULT_PRIORITY=0
+    QUEUE_MAX_PRIORITY=10
+    QUEUE_DISPATCH_INTERVAL=5
+    # The default and the maximum number of jobs in a page of the job listing
+    JOB_LIST_LIMIT=100
+    JOB_LIST_MAX_LIMIT=1000
+    # The JSON serialisation backend of the responses: "json", "orjson" or "auto",
+    # that uses orjson if it is installed
+    JSON_BACKEND="auto"
+    # The minimum size in bytes of responses that are compressed and the gzip and brotli
+    # compression levels, brotli is only offered if the brotli package is installed
+    COMPRESSION_MIN_SIZE=1024
+    GZIP_LEVEL=6
+    BROTLI_QUALITY=5
+    # The maximum number of cached process graph compilations and whether the steps of the compiled
+    # process chains are numbered consecutively, so that equal graphs compile into equal process chains
+    COMPILE_CACHE_SIZE=256
+    DETERMINISTIC_STEP_IDS=True
+    # Whether the process chains are optimized before they are sent to actinia and the names
+    # of the applied optimizer rules, all registered rules are applied if None
+    PROCESS_CHAIN_OPTIMIZER=True
+    PROCESS_CHAIN_OPTIMIZER_RULES=None
+    # The subsetting of space-time raster datasets by filter_daterange, "view" registers the existing
+    # maps of the date range in the new dataset, "extract" copies the maps with map algebra
+    FILTER_DATERANGE_MODE="view"
+    # The default mode of zonal_statistics, "mask" computes the statistics of all polygons together
+    # with a mask, "zones" rasterizes the polygons and computes the statistics of each polygon
+    ZONAL_STATISTICS_MODE="mask"
+    # The cache of the rasterized zonal statistics polygons in persistent mapsets with this prefix,
+    # the polygons of cached sources and regions are not imported and rasterized again. The maximum
+    # number of cached zone rasters, the maximum size in bytes of a cached polygon source and the time
+    # in seconds after which the content of a polygon source is hashed again. Only the http(s) sources
+    # of the listed hosts are downloaded and hashed by the driver, the other sources are not cached
+    ZONE_CACHE=False
+    ZONE_CACHE_MAPSET="openeo_zone_cache"
+    ZONE_CACHE_SOURCE_HOSTS=[]
+    ZONE_CACHE_SIZE=256
+    ZONE_CACHE_MAX_SOURCE_SIZE=50*1024*1024
+    ZONE_CACHE_SOURCE_TTL=300
+    # The directory of the parsed zonal statistics of the jobs and the number of rows
+    # of a table that are streamed at once
+    ZONAL_RESULT_DIRECTORY="%s/.openeo_zonal_results"%os.environ["HOME"]
+    ZONAL_RESULT_CHUNK_SIZE=10000
+    # The tiling of jobs with large extents, per-pixel process chains with more than TILE_SIZE
+    # cells in a direction are split into tiles of TILE_SIZE x TILE_SIZE cells, that are
+    # processed as separate actinia jobs. TILE_SIZE=0 disables the tiling. The maximum number of
+    # concurrently processed tiles of a job, whether the exports of the tiles are stitched into one
+    # mosaic per result and the directory of the mosaics
+    TILE_SIZE=4096
+    TILE_PARALLELISM=4
+    TILE_MOSAIC=True
+    TILE_RESULT_DIRECTORY="%s/.openeo_tile_results"%os.environ["HOME"]
+    # The temporal chunking of reduce_time, associative reductions of space-time raster datasets
+    # with more than TEMPORAL_WINDOW_SIZE maps are computed in time windows, that are processed as
+    # separate actinia jobs and merged by a final job. TEMPORAL_WINDOW_SIZE=0 disables the chunking.
+    # The maximum number of time windows and the prefix of the mapsets of the partial results
+    TEMPORAL_WINDOW_SIZE=200
+    TEMPORAL_MAX_WINDOWS=16
+    TEMPORAL_MAPSET_PREFIX="openeo_window"
@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
 import json
-from random import randint
 from openeo_grass_gis_driver.process_schemas import Parameter, ProcessDescription, ReturnValue
-from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph, PROCESS_DICT, PROCESS_DESCRIPTION_DICT
+from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph, PROCESS_DICT, \
+    PROCESS_DESCRIPTION_DICT, CompilationContext
 
 __license__ = "Apache License, Version 2.0"
 __author__ = "Sören Gebbert"
@@ -71,7 +71,7 @@ PROCESS_DESCRIPTION_DICT[PROCESS_NAME] = create_process_description()
 
 
 def create_process_chain_entry(left: float, right: float, top:float,
-                               bottom: float, width_res: float, height_res: float) -> dict:
+                               bottom: float, width_res: float, height_res: float, context: CompilationContext) -> dict:
     """Create a Actinia command of the process chain that uses g.region to create a valid computational region
     for the provide input strds
 
@@ -84,10 +84,11 @@ def create_process_chain_entry(left: float, right: float, top:float,
     :param bottom:
     :param width_res:
     :param height_res:
+    :param context: The compilation context
     :return: A Actinia process chain description
     """
 
-    rn = randint(0, 1000000)
+    rn = context.create_step_id()
 
     pc = {"id": "g_region_%i" % rn,
           "module": "g.region",
@@ -101,38 +102,44 @@ def create_process_chain_entry(left: float, right: float, top:float,
     return pc
 
 
-def get_process_list(process):
+def get_process_list(process, context: CompilationContext):
     """Analyse the process description and return the Actinia process chain and the name of the processing result
 
     :param process: The process description
+    :param context: The compilation context
     :return: (output_names, actinia_process_list)
     """
 
-    input_names, process_list = analyse_process_graph(process)
+    input_names, process_list = analyse_process_graph(process, context)
     output_names = []
 
-    if "spatial_extent" not in process.keys():
+    # The v0.4 process graphs provide the extent as separate arguments
+    if "spatial_extent" in process.keys():
+        spatial_extent = process["spatial_extent"]
+    elif "left" in process.keys():
+        spatial_extent = process
+    else:
         raise Exception("Process %s requires parameter <spatial_extent>" % PROCESS_NAME)
 
-    if "left" not in process["spatial_extent"] or \
-            "right" not in process["spatial_extent"] or \
-            "top" not in process["spatial_extent"] or \
-            "bottom" not in process["spatial_extent"] or \
-            "width_res" not in process["spatial_extent"] or \
-            "height_res" not in process["spatial_extent"]:
+    if "left" not in spatial_extent or \
+            "right" not in spatial_extent or \
+            "top" not in spatial_extent or \
+            "bottom" not in spatial_extent or \
+            "width_res" not in spatial_extent or \
+            "height_res" not in spatial_extent:
         raise Exception("Process %s requires parameter left, right, top, bottom, "
                         "width_res, height_res" % PROCESS_NAME)
 
-    left = process["spatial_extent"]["left"]
-    right = process["spatial_extent"]["right"]
-    top = process["spatial_extent"]["top"]
-    bottom = process["spatial_extent"]["bottom"]
-    width_res = process["spatial_extent"]["width_res"]
-    height_res = process["spatial_extent"]["height_res"]
+    left = spatial_extent["left"]
+    right = spatial_extent["right"]
+    top = spatial_extent["top"]
+    bottom = spatial_extent["bottom"]
+    width_res = spatial_extent["width_res"]
+    height_res = spatial_extent["height_res"]
 
     pc = create_process_chain_entry(left=left, right=right, top=top,
                                     bottom=bottom, width_res=width_res,
-                                    height_res=height_res)
+                                    height_res=height_res, context=context)
     process_list.append(pc)
 
     for input_name in input_names:
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
-from random import randint
 import json
-from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph, PROCESS_DICT, PROCESS_DESCRIPTION_DICT
+from typing import Optional
+from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph, PROCESS_DICT, \
+    PROCESS_DESCRIPTION_DICT, CompilationContext
 from openeo_grass_gis_driver.process_schemas import Parameter, ProcessDescription, ReturnValue
 from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+from openeo_grass_gis_driver.actinia_processing.config import Config
 
 __license__ = "Apache License, Version 2.0"
 __author__ = "Sören Gebbert"
@@ -55,14 +57,26 @@ def create_process_description():
 PROCESS_DESCRIPTION_DICT[PROCESS_NAME] = create_process_description()
 
 
-def create__process_chain_entry(input_name, start_time, end_time, output_name):
+def create__process_chain_entry(input_name, start_time, end_time, output_name, context: CompilationContext,
+                                mode: Optional[str] = None):
     """Create a Actinia command of the process chain that uses t.rast.extract to create a subset of a strds
 
+    In view mode t.rast.extract registers the existing maps of the date range in the new
+    strds without map algebra, so that the maps are neither computed nor written again.
+    In extract mode the maps are copied into new maps.
+
     :param strds_name: The name of the strds
     :param start_time:
     :param end_time:
+    :param context: The compilation context
+    :param mode: The subset mode "view" or "extract", the configured FILTER_DATERANGE_MODE is used if None
     :return: A Actinia process chain description
     """
+    if mode is None:
+        mode = Config.FILTER_DATERANGE_MODE
+    if mode not in ("view", "extract"):
+        raise Exception("Unsupported mode <%s> of process %s" % (mode, PROCESS_NAME))
+
     location, mapset, datatype, layer_name = ActiniaInterface.layer_def_to_components(input_name)
     input_name = layer_name
     if mapset is not None:
@@ -70,31 +84,34 @@ def create__process_chain_entry(input_name, start_time, end_time, output_name):
     base_name = "%s_extract" % layer_name
 
     # Get info about the time series to extract its resolution settings and bbox
-    rn = randint(0, 1000000)
+    rn = context.create_step_id()
 
     pc = {"id": "t_rast_extract_%i" % rn,
           "module": "t.rast.extract",
           "inputs": [{"param": "input", "value": input_name},
                      {"param": "where", "value": "start_time >= '%(start)s' "
                                                  "AND end_time <= '%(end)s'" % {"start": start_time, "end": end_time}},
-                     {"param": "output", "value": output_name},
-                     {"param": "expression", "value": "1.0 * %s" % input_name},
-                     {"param": "basename", "value": base_name},
-                     {"param": "suffix", "value": "num"}]}
+                     {"param": "output", "value": output_name}]}
+
+    if mode == "extract":
+        pc["inputs"].extend([{"param": "expression", "value": "1.0 * %s" % input_name},
+                             {"param": "basename", "value": base_name},
+                             {"param": "suffix", "value": "num"}])
 
     return pc
 
 
-def get_process_list(process):
+def get_process_list(process, context: CompilationContext):
     """Analyse the process description and return the Actinia process chain and the name of the processing result
     strds that was filtered by start and end date
 
     :param process: The process description
+    :param context: The compilation context
     :return: (output_names, actinia_process_list)
     """
 
     # Get the input description and the process chain to attach this process
-    input_names, process_list = analyse_process_graph(process)
+    input_names, process_list = analyse_process_graph(process, context)
     output_names = []
 
     for input_name in input_names:
@@ -108,6 +125,7 @@ def get_process_list(process):
 
         output_name = "%s_%s" % (layer_name, PROCESS_NAME)
         output_names.append(output_name)
+        context.add_name(output_name)
 
         start_time = None
         end_time = None
@@ -120,7 +138,7 @@ def get_process_list(process):
         pc = create__process_chain_entry(input_name=input_name,
                                          start_time=start_time,
                                          end_time=end_time,
-                                         output_name=output_name)
+                                         output_name=output_name, context=context)
         process_list.append(pc)
 
     return output_names, process_list
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
-from random import randint
 import json
-from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph, PROCESS_DICT, PROCESS_DESCRIPTION_DICT
+from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph, PROCESS_DICT, \
+    PROCESS_DESCRIPTION_DICT, CompilationContext
 from openeo_grass_gis_driver.process_schemas import Parameter, ProcessDescription, ReturnValue
 from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
 
@@ -70,12 +70,13 @@ def create_process_description():
 PROCESS_DESCRIPTION_DICT[PROCESS_NAME] = create_process_description()
 
 
-def create_process_chain_entry(input_name):
+def create_process_chain_entry(input_name, context: CompilationContext):
     """Create a Actinia process description that uses t.rast.series to create the minimum
     value of the time series.
 
     :param input_time_series: The input time series name
     :param output_map: The name of the output map
+    :param context: The compilation context
     :return: A Actinia process chain description
     """
 
@@ -84,7 +85,7 @@ def create_process_chain_entry(input_name):
     if mapset is not None:
         input_name = layer_name + "@" + mapset
 
-    rn = randint(0, 1000000)
+    rn = context.create_step_id()
 
     pc = {}
 
@@ -109,23 +110,29 @@ def create_process_chain_entry(input_name):
     return pc
 
 
-def get_process_list(process):
+def get_process_list(process, context: CompilationContext):
     """Analyse the process description and return the Actinia process chain and the name of the processing result
 
     :param process: The process description
+    :param context: The compilation context
     :return: (output_names, actinia_process_list)
     """
 
-    input_names, process_list = analyse_process_graph(process)
+    input_names, process_list = analyse_process_graph(process, context)
     output_names = []
 
-    # First analyse the data entrie
-    if "data_id" not in process:
+    # First analyse the data entrie, the v0.4 process graphs provide it as name of the data argument
+    data_id = process.get("data_id")
+    if data_id is None and isinstance(process.get("data"), dict):
+        data_id = process["data"].get("name")
+    if data_id is None:
         raise Exception("Process %s requires parameter <data_id>" % PROCESS_NAME)
 
-    output_names.append(process["data_id"])
+    output_names.append(data_id)
+    # The location of the dataset is the location of the process chain
+    context.add_dataset(data_id)
 
-    pc = create_process_chain_entry(input_name=process["data_id"])
+    pc = create_process_chain_entry(input_name=data_id, context=context)
     process_list.append(pc)
 
     # Then add the input to the output
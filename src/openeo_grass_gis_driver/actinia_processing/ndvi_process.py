@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
-from random import randint
+import ast
 import json
-from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph, PROCESS_DICT, PROCESS_DESCRIPTION_DICT
+from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph, PROCESS_DICT, \
+    PROCESS_DESCRIPTION_DICT, CompilationContext
 from openeo_grass_gis_driver.process_schemas import Parameter, ProcessDescription, ReturnValue
 from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+from openeo_grass_gis_driver.actinia_processing import band_math_process, ndvi_2_process
 
 __license__ = "Apache License, Version 2.0"
 __author__ = "Sören Gebbert"
@@ -62,50 +64,11 @@ def create_process_description():
 PROCESS_DESCRIPTION_DICT[PROCESS_NAME] = create_process_description()
 
 
-def create_process_chain_entry(nir_time_series, red_time_series, output_time_series):
-    """Create a Actinia process description that uses t.rast.series to create the minimum
-    value of the time series.
-
-    :param nir_time_series: The NIR band time series name
-    :param red_time_series: The RED band time series name
-    :param output_time_series: The name of the output time series
-    :return: A list of Actinia process chain descriptions
-    """
-    nir_time_series = ActiniaInterface.layer_def_to_grass_map_name(nir_time_series)
-    red_time_series = ActiniaInterface.layer_def_to_grass_map_name(red_time_series)
-    output_name = ActiniaInterface.layer_def_to_grass_map_name(output_time_series)
-
-    rn = randint(0, 1000000)
-
-    pc = [
-        {"id": "t_rast_mapcalc_%i" % rn,
-         "module": "t.rast.mapcalc",
-         "inputs": [{"param": "expression",
-                     "value": "%(result)s = float((%(nir)s - %(red)s)/"
-                              "(%(nir)s + %(red)s))" % {"result": output_name,
-                                                        "nir": nir_time_series,
-                                                        "red": red_time_series}},
-                    {"param": "inputs",
-                     "value": "%(nir)s,%(red)s" % {"nir": nir_time_series,
-                                                   "red": red_time_series}},
-                    {"param": "basename",
-                     "value": "ndvi"},
-                    {"param": "output",
-                     "value": output_name}]},
-        {"id": "t_rast_color_%i" % rn,
-         "module": "t.rast.colors",
-         "inputs": [{"param": "input",
-                     "value": output_name},
-                    {"param": "color",
-                     "value": "ndvi"}]}]
-
-    return pc
-
-
-def get_process_list(process):
+def get_process_list(process, context: CompilationContext):
     """Analyse the process description and return the Actinia process chain and the name of the processing result
 
     :param args: The process description arguments
+    :param context: The compilation context
     :return: (output_names, actinia_process_list)
     """
     output_names = []
@@ -117,9 +80,13 @@ def get_process_list(process):
     if "nir" not in process:
         raise Exception("Process %s requires parameter <nir>" % PROCESS_NAME)
 
+    # The v0.4 process graphs provide the red and nir bands as inputs, like the NDVI2 process
+    if isinstance(process["red"], dict) or isinstance(process["nir"], dict):
+        return ndvi_2_process.get_process_list(process, context)
+
     red_strds = None
     nir_strds = None
-    input_names, process_list = analyse_process_graph(process)
+    input_names, process_list = analyse_process_graph(process, context)
 
     # Find the red and nir datasets in the input
     for input_name in input_names:
@@ -137,12 +104,15 @@ def get_process_list(process):
     if not nir_strds:
         raise Exception("Process %s requires an input strds for band <nir>" % PROCESS_NAME)
 
-    location, mapset, datatype, layer_name = ActiniaInterface.layer_def_to_components(red_strds)
-    output_name = "%s_%s" % (layer_name, PROCESS_NAME)
+    # The NDVI is computed by the band math expression, the ndvi color table is applied if the result is exported
+    bands = {"nir": ast.Name(id=ActiniaInterface.layer_def_to_grass_map_name(nir_strds), ctx=ast.Load()),
+             "red": ast.Name(id=ActiniaInterface.layer_def_to_grass_map_name(red_strds), ctx=ast.Load())}
+    tree = band_math_process.substitute_bands("ndvi(nir, red)", bands)
+    output_name, pc = band_math_process.compile_expression(tree, [red_strds, nir_strds], context,
+                                                           process_name=PROCESS_NAME, basename="ndvi",
+                                                           color="ndvi")
     output_names.append(output_name)
-
-    pc = create_process_chain_entry(nir_strds, red_strds, output_name)
-    process_list.extend(pc)
+    process_list.append(pc)
 
     return output_names, process_list
 
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+import logging
+import re
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from openeo_grass_gis_driver.actinia_processing.config import Config
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+logger = logging.getLogger(__name__)
+
+# The optimizer rules, the name of the rule and the function (process_list, result_names) -> process_list
+# that returns the optimized process list, the rules are applied in the order of their registration
+OPTIMIZER_RULES: Dict[str, Callable[[List[dict], Set[str]], List[dict]]] = {}
+
+# The modules that only print information about a map
+PROBE_MODULES = {"r.info", "v.info", "t.info"}
+# The modules that neither depend on nor change the computational region
+REGION_INDEPENDENT_MODULES = PROBE_MODULES | {"importer"}
+# The modules that change the metadata of an existing map
+MODIFIER_MODULES = {"r.colors", "t.rast.colors", "r.support", "t.support"}
+# The g.region parameters that define the whole computational region
+FULL_REGION_PARAMETERS = ({"n", "s", "e", "w", "ewres", "nsres"}, {"n", "s", "e", "w", "res"},
+                          {"region"}, {"raster"})
+
+_NAME_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+
+_STATISTICS_LOCK = threading.Lock()
+_STATISTICS = {"process_chains": 0, "steps_before": 0, "steps_after": 0}
+
+
+def optimizer_rule(name: str):
+    """Register a function as optimizer rule
+
+    :param name: The name of the rule
+    """
+
+    def register(function):
+        OPTIMIZER_RULES[name] = function
+        return function
+
+    return register
+
+
+def _parameters(step: dict) -> Dict[str, str]:
+    return {entry["param"]: entry.get("value") for entry in step.get("inputs", []) if "param" in entry}
+
+
+def _names(values: Iterable) -> Set[str]:
+    names = set()
+    for value in values:
+        if isinstance(value, str):
+            names.update(_NAME_PATTERN.findall(value))
+    return names
+
+
+def _step_names(step: dict) -> Set[str]:
+    """Return the names that are referenced by the inputs and outputs of a step"""
+    values = [entry.get("value") for entry in step.get("inputs", []) + step.get("outputs", [])]
+    return _names(values)
+
+
+def _step_key(step: dict) -> tuple:
+    """The identity of a step without its id"""
+    inputs = tuple(sorted((entry.get("param"), str(entry.get("value"))) for entry in step.get("inputs", [])))
+    return step.get("module"), inputs, step.get("flags", "")
+
+
+def is_region_change(step: dict) -> bool:
+    """Return True if the step is a g.region call that changes the computational region"""
+    if step.get("module") != "g.region":
+        return False
+    return bool(set(_parameters(step)) - {"save"})
+
+
+def _is_full_region(step: dict) -> bool:
+    parameters = set(_parameters(step))
+    return any(required <= parameters for required in FULL_REGION_PARAMETERS)
+
+
+def _is_export(step: dict) -> bool:
+    return step.get("module") == "exporter" or any("export" in entry for entry in step.get("outputs", []))
+
+
+@optimizer_rule("duplicate_probes")
+def remove_duplicate_probes(process_list: List[dict], result_names: Set[str]) -> List[dict]:
+    """Remove the r.info, v.info and t.info probes of maps that were already probed"""
+
+    seen = set()
+    optimized = []
+    for step in process_list:
+        if step.get("module") in PROBE_MODULES:
+            key = _step_key(step)
+            if key in seen:
+                continue
+            seen.add(key)
+        optimized.append(step)
+    return optimized
+
+
+@optimizer_rule("redundant_regions")
+def collapse_region_changes(process_list: List[dict], result_names: Set[str]) -> List[dict]:
+    """Remove the g.region calls that are replaced by a following g.region call before
+    the region was used, and the g.region calls that set the region again"""
+
+    optimized = []
+    # The index of the last region change in the optimized list that was not used yet
+    pending = None
+    for step in process_list:
+        if is_region_change(step):
+            if pending is not None:
+                if _step_key(optimized[pending]) == _step_key(step):
+                    continue
+                if _is_full_region(step):
+                    del optimized[pending]
+            optimized.append(step)
+            pending = len(optimized) - 1
+            continue
+
+        if step.get("module") not in REGION_INDEPENDENT_MODULES:
+            pending = None
+        optimized.append(step)
+    return optimized
+
+
+@optimizer_rule("trailing_region_restore")
+def remove_trailing_region_restore(process_list: List[dict], result_names: Set[str]) -> List[dict]:
+    """Remove the restore of a saved region at the end of a process chain and the unused save
+
+    The region is used by the exports of a process chain, hence the region is only
+    removed from process chains without exports.
+    """
+
+    if any(_is_export(step) for step in process_list):
+        return process_list
+
+    optimized = list(process_list)
+    index = len(optimized) - 1
+    while index >= 0 and optimized[index].get("module") in REGION_INDEPENDENT_MODULES:
+        index -= 1
+
+    if index < 0 or optimized[index].get("module") != "g.region":
+        return optimized
+    parameters = _parameters(optimized[index])
+    if set(parameters) != {"region"}:
+        return optimized
+
+    region = parameters["region"]
+    del optimized[index]
+
+    references = [i for i, step in enumerate(optimized) if region in _step_names(step)]
+    if len(references) == 1 and set(_parameters(optimized[references[0]])) == {"save"}:
+        del optimized[references[0]]
+
+    return optimized
+
+
+@optimizer_rule("dead_steps")
+def remove_dead_steps(process_list: List[dict], result_names: Set[str]) -> List[dict]:
+    """Remove the steps that create maps that are neither used by a later step nor a result
+    of the process chain and the steps that only modify these maps"""
+
+    live = _names(result_names)
+    optimized = []
+    for step in reversed(process_list):
+        parameters = _parameters(step)
+        module = step.get("module")
+
+        if module in MODIFIER_MODULES:
+            maps = _names([parameters.get("input"), parameters.get("map")])
+            if maps and not maps & live:
+                continue
+        elif "output" in parameters and not _is_export(step):
+            if not _names([parameters["output"]]) & live:
+                continue
+
+        live = live | _step_names(step)
+        optimized.append(step)
+
+    optimized.reverse()
+    return optimized
+
+
+def optimize_process_chain(process_list: List[dict], result_names: Optional[Iterable[str]] = None,
+                           rules: Optional[List[str]] = None) -> Tuple[List[dict], dict]:
+    """Apply the optimizer rules to an actinia process chain
+
+    :param process_list: The list of steps of the process chain, it is not modified
+    :param result_names: The names of the results of the process chain that must be kept
+    :param rules: The names of the applied rules, the configured PROCESS_CHAIN_OPTIMIZER_RULES
+                  or all registered rules if None
+    :return: (optimized_process_list, statistics) the statistics contain the number of steps
+             before and after the optimization and the number of steps that each rule removed
+    """
+
+    if rules is None:
+        rules = Config.PROCESS_CHAIN_OPTIMIZER_RULES
+    if rules is None:
+        rules = list(OPTIMIZER_RULES)
+
+    unknown = set(rules) - set(OPTIMIZER_RULES)
+    if unknown:
+        raise Exception(f"Unknown process chain optimizer rules: {', '.join(sorted(unknown))}")
+
+    result_names = set(result_names or [])
+    optimized = list(process_list)
+    statistics = {"steps_before": len(optimized), "rules": {}}
+
+    for name in rules:
+        steps = len(optimized)
+        optimized = OPTIMIZER_RULES[name](optimized, result_names)
+        statistics["rules"][name] = steps - len(optimized)
+
+    statistics["steps_after"] = len(optimized)
+
+    with _STATISTICS_LOCK:
+        _STATISTICS["process_chains"] += 1
+        _STATISTICS["steps_before"] += statistics["steps_before"]
+        _STATISTICS["steps_after"] += statistics["steps_after"]
+
+    logger.info("Optimized process chain from %i to %i steps %s", statistics["steps_before"],
+                statistics["steps_after"], statistics["rules"])
+
+    return optimized, statistics
+
+
+def prepare_process_chain(process_list: List[dict], result_names: Optional[Iterable[str]] = None) -> dict:
+    """Create the actinia process chain that is sent to actinia, the process list is
+    optimized if PROCESS_CHAIN_OPTIMIZER is enabled
+
+    :param process_list: The list of steps of the compiled process graph
+    :param result_names: The names of the results of the process graph
+    :return: The process chain
+    """
+
+    if Config.PROCESS_CHAIN_OPTIMIZER:
+        process_list, statistics = optimize_process_chain(process_list, result_names)
+
+    return dict(list=process_list, version="1")
+
+
+def optimizer_statistics() -> dict:
+    """Return the number of optimized process chains and their summed steps before and after the optimization"""
+    with _STATISTICS_LOCK:
+        return dict(_STATISTICS)
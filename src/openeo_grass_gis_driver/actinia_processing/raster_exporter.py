@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
-from random import randint
 import json
-from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph, PROCESS_DICT, PROCESS_DESCRIPTION_DICT
+from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph, PROCESS_DICT, \
+    PROCESS_DESCRIPTION_DICT, CompilationContext
 from openeo_grass_gis_driver.process_schemas import Parameter, ProcessDescription, ReturnValue
 from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
 
@@ -55,22 +55,37 @@ def create_process_description():
 PROCESS_DESCRIPTION_DICT[PROCESS_NAME] = create_process_description()
 
 
-def create_process_chain_entry(input_name):
-    """Create a Actinia command of the process chain that computes the regional statistics based on a
-    strds and a polygon.
+def create_process_chain_entry(input_name, context: CompilationContext):
+    """Create a Actinia command of the process chain that exports a raster layer, the color
+    table of the layer is set before the export if it was recorded in the compilation context
 
     :param input_name: The name of the raster layer
+    :param context: The compilation context
     :return: A Actinia process chain description
     """
 
+    color_table = context.color_tables.get(input_name)
     location, mapset, datatype, layer_name = ActiniaInterface.layer_def_to_components(input_name)
     input_name = layer_name
     if mapset is not None:
         input_name = layer_name + "@" + mapset
 
-    rn = randint(0, 1000000)
+    rn = context.create_step_id()
     pc = []
 
+    if color_table is not None:
+        color, temporal = color_table
+        if temporal:
+            pc.append({"id": "t_rast_colors_%i" % rn,
+                       "module": "t.rast.colors",
+                       "inputs": [{"param": "input", "value": input_name},
+                                  {"param": "color", "value": color}]})
+        else:
+            pc.append({"id": "r_colors_%i" % rn,
+                       "module": "r.colors",
+                       "inputs": [{"param": "map", "value": input_name},
+                                  {"param": "color", "value": color}]})
+
     exporter = {
         "id": "exporter_%i" % rn,
         "module": "exporter",
@@ -83,16 +98,17 @@ def create_process_chain_entry(input_name):
     return pc
 
 
-def get_process_list(args):
+def get_process_list(args, context: CompilationContext):
     """Analyse the process description and return the Actinia process chain and the name of the processing result layer
     which is a single raster layer
 
     :param args: The process description
+    :param context: The compilation context
     :return: (output_names, actinia_process_list)
     """
 
     # Get the input description and the process chain to attach this process
-    input_names, process_list = analyse_process_graph(args)
+    input_names, process_list = analyse_process_graph(args, context)
     output_names = []
 
     # Pipe the inputs to the outputs
@@ -100,7 +116,7 @@ def get_process_list(args):
         output_name = input_name
         output_names.append(output_name)
 
-        pc = create_process_chain_entry(input_name=input_name)
+        pc = create_process_chain_entry(input_name=input_name, context=context)
         process_list.extend(pc)
 
     return output_names, process_list
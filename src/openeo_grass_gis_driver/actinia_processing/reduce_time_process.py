@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
-from random import randint
 import json
-from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph, PROCESS_DICT, PROCESS_DESCRIPTION_DICT
+from copy import deepcopy
+from typing import List, Set
+from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph, PROCESS_DICT, \
+    PROCESS_DESCRIPTION_DICT, CompilationContext
 from openeo_grass_gis_driver.process_schemas import Parameter, ProcessDescription, ReturnValue
 from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+from openeo_grass_gis_driver.actinia_processing.process_chain_optimizer import optimizer_rule, is_region_change
 
 __license__ = "Apache License, Version 2.0"
 __author__ = "Sören Gebbert"
@@ -58,17 +61,18 @@ def create_process_description():
 PROCESS_DESCRIPTION_DICT[PROCESS_NAME] = create_process_description()
 
 
-def create_process_chain_entry(input_name, method, output_name):
+def create_process_chain_entry(input_name, method, output_name, context: CompilationContext):
     """Create a Actinia process description that uses t.rast.series to reduce a time series.
 
     :param input_time_series: The input time series name
     :param method: The method for time reduction
     :param output_map: The name of the output map
+    :param context: The compilation context
     :return: A Actinia process chain description
     """
     input_name = ActiniaInterface.layer_def_to_grass_map_name(input_name)
 
-    rn = randint(0, 1000000)
+    rn = context.create_step_id()
 
     pc = {"id": "t_rast_series_%i" % rn,
           "module": "t.rast.series",
@@ -80,15 +84,16 @@ def create_process_chain_entry(input_name, method, output_name):
     return pc
 
 
-def get_process_list(process):
+def get_process_list(process, context: CompilationContext):
     """Analyse the process description and return the Actinia process chain
     and the name of the processing result layer
     which is a single raster layer
 
     :param args: The process description arguments
+    :param context: The compilation context
     :return: (output_names, actinia_process_list)
     """
-    input_names, process_list = analyse_process_graph(process)
+    input_names, process_list = analyse_process_graph(process, context)
     output_names = []
 
     if "method" not in process:
@@ -97,12 +102,68 @@ def get_process_list(process):
     for input_name in input_names:
         location, mapset, datatype, layer_name = ActiniaInterface.layer_def_to_components(input_name)
         output_name = "%s_%s" % (layer_name, PROCESS_NAME)
+        # Several reductions of the same input need distinct names
+        if output_name in context.names:
+            output_name = "%s_%s_%s" % (layer_name, PROCESS_NAME, process["method"])
         output_names.append(output_name)
+        context.add_name(output_name)
 
-        pc = create_process_chain_entry(input_name, process["method"], output_name)
+        pc = create_process_chain_entry(input_name, process["method"], output_name, context=context)
         process_list.append(pc)
 
     return output_names, process_list
 
 
 PROCESS_DICT[PROCESS_NAME] = get_process_list
+
+
+@optimizer_rule("fused_series")
+def fuse_series_steps(process_list: List[dict], result_names: Set[str]) -> List[dict]:
+    """Merge the t.rast.series steps that reduce the same input in the same region into
+    a single step with multiple methods and outputs, so that the time series is read once
+
+    The merged step replaces the first of the steps, the outputs keep their names so that
+    the consumers of the outputs are not changed.
+    """
+
+    optimized = []
+    # The merged steps by their input parameters and flags, the index in the optimized list
+    merged = {}
+    for step in process_list:
+        parameters = {entry.get("param"): entry.get("value") for entry in step.get("inputs", [])}
+
+        if step.get("module") == "t.rast.series" and "method" in parameters and "output" in parameters:
+            key = (tuple(sorted((param, str(value)) for param, value in parameters.items()
+                                if param not in ("method", "output"))), step.get("flags", ""))
+            if key not in merged:
+                merged[key] = len(optimized)
+                optimized.append(step)
+                continue
+
+            index = merged[key]
+            target = optimized[index]
+            target_parameters = {entry["param"]: entry for entry in target["inputs"]}
+            methods = target_parameters["method"]["value"].split(",")
+            outputs = target_parameters["output"]["value"].split(",")
+            if parameters["output"] in outputs:
+                continue
+
+            # Copy the step, the compiled process list is not modified
+            target = deepcopy(target)
+            for entry in target["inputs"]:
+                if entry["param"] == "method":
+                    entry["value"] = ",".join(methods + [parameters["method"]])
+                elif entry["param"] == "output":
+                    entry["value"] = ",".join(outputs + [parameters["output"]])
+            optimized[index] = target
+            continue
+
+        # The pixels of the inputs change with the region, the mask and new versions of the inputs
+        produced = {entry.get("value") for entry in step.get("inputs", []) if entry.get("param") == "output"}
+        if is_region_change(step) or step.get("module") == "r.mask":
+            merged = {}
+        elif produced:
+            merged = {key: index for key, index in merged.items() if dict(key[0]).get("input") not in produced}
+        optimized.append(step)
+
+    return optimized
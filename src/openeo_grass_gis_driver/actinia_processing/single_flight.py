@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+class _Call(object):
+    """A call in flight and the callers that wait for its result"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.waiters = 0
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight(object):
+    """This class coalesces concurrent calls with the same key into a single call
+
+    The first caller of a key runs the call, the callers that arrive while the call is
+    in flight wait for it and receive the same result or exception. The result is not
+    cached, a call that starts after the previous call of the key finished runs again.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._executed = 0
+        self._hits = 0
+        self._max_fan_in = 0
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        """Run func or wait for the call in flight with the same key
+
+        :param key: The key of the call
+        :param func: The function that is called if no call of the key is in flight
+        :return: The result of the call
+        """
+
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._hits += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._executed += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self._max_fan_in = max(self._max_fan_in, call.waiters + 1)
+            call.event.set()
+
+        return call.result
+
+    def statistics(self) -> dict:
+        """Return the number of executed calls, the number of callers that shared a call in flight (hits),
+        the maximum and mean number of callers per executed call (fan-in) and the number of calls in flight
+
+        :return: A dictionary with the statistics
+        """
+
+        with self._lock:
+            return {"calls": self._executed,
+                    "hits": self._hits,
+                    "max_fan_in": self._max_fan_in,
+                    "mean_fan_in": round((self._executed + self._hits) / self._executed, 2) if self._executed else 0,
+                    "in_flight": len(self._calls)}
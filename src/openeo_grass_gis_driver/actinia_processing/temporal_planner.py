@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+import math
+import re
+from copy import deepcopy
+from typing import Dict, List, Optional, Tuple
+from openeo_grass_gis_driver.actinia_processing.config import Config
+from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+from openeo_grass_gis_driver.actinia_processing.tile_planner import Tile, TilePlan
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+def _nsum(terms: List[str]) -> str:
+    """The sum of the non-null terms, null if all terms are null"""
+    return "if(isnull(nmax(%s)), null(), %s)" % (", ".join(terms),
+                                                 " + ".join("if(isnull(%s), 0, %s)" % (t, t) for t in terms))
+
+
+# The associative reduction methods of t.rast.series, the partial methods that are computed in each
+# time window and the function that creates the r.mapcalc expression that merges the partial results
+# from the lists of partial result names of each partial method
+ASSOCIATIVE_METHODS = {
+    "minimum": (("minimum",), lambda partials: "nmin(%s)" % ", ".join(partials["minimum"])),
+    "maximum": (("maximum",), lambda partials: "nmax(%s)" % ", ".join(partials["maximum"])),
+    "sum": (("sum",), lambda partials: _nsum(partials["sum"])),
+    "count": (("count",), lambda partials: _nsum(partials["count"])),
+    "average": (("sum", "count"), lambda partials: "if(%(count)s > 0, float(%(sum)s) / (%(count)s), null())" %
+                {"sum": _nsum(partials["sum"]), "count": _nsum(partials["count"])}),
+}
+
+# The modules that may precede the reductions in a process chain that is split into time windows
+PRECEDING_MODULES = {"t.info", "r.info", "g.region"}
+# The modules that may be placed between the reductions
+PROBE_MODULES = {"t.info", "r.info"}
+# The modules that may follow the reductions, they use the merged results
+FOLLOWING_MODULES = {"r.colors", "exporter"}
+
+
+def _parameters(step: dict) -> Dict[str, str]:
+    return {entry["param"]: entry.get("value") for entry in step.get("inputs", []) if "param" in entry}
+
+
+def find_series_input(process_list: List[dict]) -> Optional[str]:
+    """Return the input of a process chain that reduces a single space-time raster dataset
+    with associative methods and can be split into time windows
+
+    :param process_list: The list of steps of the process chain
+    :return: The name of the space-time raster dataset or None if the process chain can not be split
+    """
+
+    input_name = None
+    following = False
+    for step in process_list:
+        module = step.get("module")
+        parameters = _parameters(step)
+        if module == "t.rast.series":
+            if following or parameters.get("method") not in ASSOCIATIVE_METHODS or "where" in parameters:
+                return None
+            if input_name not in (None, parameters.get("input")):
+                return None
+            input_name = parameters.get("input")
+        elif input_name is None and module not in PRECEDING_MODULES:
+            return None
+        elif input_name is not None and module in PROBE_MODULES and not following:
+            continue
+        elif input_name is not None:
+            if module not in FOLLOWING_MODULES:
+                return None
+            following = True
+
+    return input_name
+
+
+def time_windows(start_times: List[str], window_size: int, max_windows: int) -> List[Tuple[str, Optional[str]]]:
+    """Split the sorted start times of the maps into windows of window_size maps
+
+    :param start_times: The sorted start times of the maps
+    :param window_size: The number of maps of a window
+    :param max_windows: The maximum number of windows, the window size is increased if required
+    :return: The (start, end) of the windows, the end is excluded and None for the last window
+    """
+
+    window_size = max(window_size, int(math.ceil(len(start_times) / max(max_windows, 1))))
+    starts = []
+    for index in range(0, len(start_times), window_size):
+        # Maps with the same start time are in the same window
+        if not starts or start_times[index] != starts[-1]:
+            starts.append(start_times[index])
+    return list(zip(starts, starts[1:] + [None]))
+
+
+def window_mapset(job_id: str, index: int) -> str:
+    return "%s_%s_%i" % (Config.TEMPORAL_MAPSET_PREFIX, re.sub(r"[^A-Za-z0-9_]", "_", job_id), index)
+
+
+def plan_windows(process_list: List[dict], start_times: List[str], job_id: str,
+                 window_size: Optional[int] = None) -> Optional[TilePlan]:
+    """Split the associative reductions of a process chain into time windows
+
+    Each time window computes the partial results of the reductions of the maps with a start
+    time in the window with a single t.rast.series call and stores them in a mapset of the window.
+    The final stage merges the partial results with r.mapcalc into the results of the process chain
+    and runs the steps that follow the reductions.
+
+    :param process_list: The list of steps of the process chain
+    :param start_times: The start times of the maps of the reduced space-time raster dataset
+    :param job_id: The id of the job that is used in the mapset names of the windows
+    :param window_size: The number of maps of a time window, the configured TEMPORAL_WINDOW_SIZE is used if None
+    :return: The plan of the windows and the final stage or None if the process chain is not split
+    """
+
+    window_size = Config.TEMPORAL_WINDOW_SIZE if window_size is None else window_size
+    input_name = find_series_input(process_list)
+    if not window_size or input_name is None or len(start_times) <= window_size:
+        return None
+
+    windows = time_windows(sorted(start_times), window_size, Config.TEMPORAL_MAX_WINDOWS)
+    if len(windows) <= 1:
+        return None
+
+    first = [step.get("module") for step in process_list].index("t.rast.series")
+    preceding = [step for step in process_list[:first] if step.get("module") in PRECEDING_MODULES]
+    following = [step for step in process_list if step.get("module") in FOLLOWING_MODULES]
+    series = [step for step in process_list if step.get("module") == "t.rast.series"]
+
+    # The partial results of each output, output -> {partial method: partial result name}
+    partials = {}
+    for step in series:
+        parameters = _parameters(step)
+        methods = ASSOCIATIVE_METHODS[parameters["method"]][0]
+        partials[parameters["output"]] = {method: "%s_%s" % (parameters["output"], method) for method in methods}
+
+    methods = [method for names in partials.values() for method in names]
+    outputs = [name for names in partials.values() for name in names.values()]
+
+    tiles = []
+    for index, (start, end) in enumerate(windows):
+        where = "start_time >= '%s'" % start
+        if end is not None:
+            where += " AND start_time < '%s'" % end
+        window_list = deepcopy(preceding)
+        window_list.append({"id": "t_rast_series_window_%i" % index,
+                            "module": "t.rast.series",
+                            "inputs": [{"param": "input", "value": input_name},
+                                       {"param": "method", "value": ",".join(methods)},
+                                       {"param": "output", "value": ",".join(outputs)},
+                                       {"param": "where", "value": where}],
+                            "flags": series[0].get("flags", "")})
+        tiles.append(Tile(index=index, row=index, col=0, extent={"start": start, "end": end},
+                          process_list=window_list, mapset=window_mapset(job_id, index), result_names=outputs))
+
+    merge_list = [deepcopy(step) for step in preceding if step.get("module") == "g.region"]
+    for output, names in partials.items():
+        method = _parameters([step for step in series if _parameters(step)["output"] == output][0])["method"]
+        window_names = {partial: ["%s@%s" % (name, tile.mapset) for tile in tiles]
+                        for partial, name in names.items()}
+        merge_list.append({"id": "r_mapcalc_%s" % output,
+                           "module": "r.mapcalc",
+                           "inputs": [{"param": "expression",
+                                       "value": "%s = %s" % (output, ASSOCIATIVE_METHODS[method][1](window_names))}]})
+    merge_list.extend(deepcopy(following))
+
+    tiles.append(Tile(index=len(tiles), row=len(tiles), col=0, extent={"start": windows[0][0], "end": None},
+                      process_list=merge_list, stage=1))
+
+    return TilePlan(rows=len(tiles), cols=1, tiles=tiles, mosaic=False)
+
+
+def plan_temporal_windows(process_list: List[dict], job_id: str, iface: ActiniaInterface,
+                          location: str) -> Optional[TilePlan]:
+    """Split the associative reductions of a process chain into time windows, if the
+    reduced space-time raster dataset has more than TEMPORAL_WINDOW_SIZE maps
+
+    :param process_list: The list of steps of the process chain
+    :param job_id: The id of the job
+    :param iface: The actinia interface that lists the maps of the space-time raster dataset
+    :param location: The location of the process chain
+    :return: The plan or None if the process chain is not split
+    """
+
+    input_name = find_series_input(process_list)
+    if not Config.TEMPORAL_WINDOW_SIZE or input_name is None or "@" not in input_name:
+        return None
+
+    strds, mapset = input_name.split("@", 1)
+    code, maps = iface.list_strds_raster_layers(location=location, mapset=mapset, strds=strds)
+    if code != 200 or not isinstance(maps, list):
+        return None
+
+    start_times = [str(entry["start_time"]) for entry in maps if isinstance(entry, dict) and entry.get("start_time")]
+    return plan_windows(process_list, start_times, job_id)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+import math
+from copy import deepcopy
+from typing import Dict, List, Optional, Tuple
+from openeo_grass_gis_driver.actinia_processing.config import Config
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+# The modules that compute each pixel from the pixels at the same position, process chains
+# that use only these modules compute the same pixels in each tile as in the whole region
+PER_PIXEL_MODULES = {"t.info", "r.info", "r.mapcalc", "t.rast.mapcalc", "t.rast.series",
+                     "t.rast.extract", "r.colors", "t.rast.colors", "exporter"}
+
+# The parameters of the region step that sets the extent of the process chain
+BOUNDS_PARAMETERS = ("n", "s", "e", "w", "ewres", "nsres")
+
+
+def _parameters(step: dict) -> Dict[str, str]:
+    return {entry["param"]: entry.get("value") for entry in step.get("inputs", []) if "param" in entry}
+
+
+def _coordinate(value: float) -> str:
+    return repr(round(value, 10))
+
+
+class Tile(object):
+    """A part of a tiled process chain, a spatial tile or a time window, that is processed as actinia job"""
+
+    def __init__(self, index: int, row: int, col: int, extent: dict, process_list: List[dict],
+                 stage: int = 0, mapset: Optional[str] = None, result_names: Optional[List[str]] = None):
+        """Constructor
+
+        :param index: The index of the tile in the plan
+        :param row: The row of the tile in the grid, starting at the top
+        :param col: The column of the tile in the grid, starting at the left
+        :param extent: The n, s, e, w bounds of a spatial tile or the start and end of a time window
+        :param process_list: The process chain steps of the tile
+        :param stage: The tiles of a stage are processed after all tiles of the previous stages were finished
+        :param mapset: The persistent mapset of the tile results or None if the results are exported
+        :param result_names: The names of the results of the tile, the results of the plan are used if None
+        """
+        self.index = index
+        self.row = row
+        self.col = col
+        self.extent = extent
+        self.process_list = process_list
+        self.stage = stage
+        self.mapset = mapset
+        self.result_names = result_names
+
+
+class TilePlan(object):
+    """The decomposition of a process chain into a grid of tiles"""
+
+    def __init__(self, rows: int, cols: int, tiles: List[Tile], mosaic: bool):
+        """Constructor
+
+        :param rows: The number of tile rows
+        :param cols: The number of tile columns
+        :param tiles: The tiles in row major order and in the order of their stages
+        :param mosaic: Whether the exports of the tiles are stitched into one mosaic per result
+        """
+        self.rows = rows
+        self.cols = cols
+        self.tiles = tiles
+        self.mosaic = mosaic
+
+
+def find_bounds_step(process_list: List[dict]) -> Optional[int]:
+    """Return the index of the single region step that sets the bounds of a per-pixel process chain
+
+    :param process_list: The list of steps of the process chain
+    :return: The index of the region step or None if the process chain can not be tiled
+    """
+
+    bounds_step = None
+    has_export = False
+    for index, step in enumerate(process_list):
+        module = step.get("module")
+        if module == "g.region":
+            if bounds_step is not None or set(_parameters(step)) != set(BOUNDS_PARAMETERS) or step.get("flags"):
+                return None
+            bounds_step = index
+        elif module not in PER_PIXEL_MODULES:
+            return None
+        elif module == "exporter":
+            has_export = True
+        elif module in ("r.mapcalc", "t.rast.mapcalc") and "[" in _parameters(step).get("expression", ""):
+            # Neighbourhood operators read pixels of the adjacent tiles
+            return None
+
+    return bounds_step if has_export else None
+
+
+def plan_tiles(process_list: List[dict], tile_size: Optional[int] = None,
+               mosaic: Optional[bool] = None) -> Optional[TilePlan]:
+    """Split a process chain with a large extent into a grid of tiles
+
+    Each tile has a copy of the process chain in which the region step that sets the bounds
+    is replaced by the bounds of the tile. The tile bounds are aligned to the cells of the
+    region, the tiles of the last row and column are cut at the bounds of the region.
+
+    Only per-pixel process chains with a single region step and exports are tiled, so that
+    the exports of the tiles can be stitched together.
+
+    :param process_list: The list of steps of the process chain
+    :param tile_size: The width and height of the tiles in cells, the configured TILE_SIZE is used if None
+    :param mosaic: Whether the exports are stitched, the configured TILE_MOSAIC is used if None
+    :return: The tile plan or None if the process chain is not tiled
+    """
+
+    tile_size = Config.TILE_SIZE if tile_size is None else tile_size
+    mosaic = Config.TILE_MOSAIC if mosaic is None else mosaic
+    if not tile_size:
+        return None
+
+    index = find_bounds_step(process_list)
+    if index is None:
+        return None
+
+    try:
+        region = {key: float(value) for key, value in _parameters(process_list[index]).items()}
+    except (TypeError, ValueError):
+        return None
+    if region["ewres"] <= 0 or region["nsres"] <= 0:
+        return None
+
+    cols, rows = grid_shape(region, tile_size)
+    if rows * cols <= 1:
+        return None
+
+    resolution = _parameters(process_list[index])
+    tiles = []
+    for row in range(rows):
+        for col in range(cols):
+            bounds = tile_bounds(region, tile_size, row, col)
+            tile_list = deepcopy(process_list)
+            tile_list[index]["inputs"] = [{"param": key, "value": _coordinate(bounds[key])}
+                                          for key in ("n", "s", "e", "w")]
+            tile_list[index]["inputs"] += [{"param": key, "value": resolution[key]} for key in ("ewres", "nsres")]
+            tiles.append(Tile(index=len(tiles), row=row, col=col, extent=bounds, process_list=tile_list))
+
+    return TilePlan(rows=rows, cols=cols, tiles=tiles, mosaic=mosaic)
+
+
+def grid_shape(region: Dict[str, float], tile_size: int) -> Tuple[int, int]:
+    """Return the number of (columns, rows) of the tile grid of a region"""
+
+    width = int(round((region["e"] - region["w"]) / region["ewres"]))
+    height = int(round((region["n"] - region["s"]) / region["nsres"]))
+    return max(int(math.ceil(width / tile_size)), 1), max(int(math.ceil(height / tile_size)), 1)
+
+
+def tile_bounds(region: Dict[str, float], tile_size: int, row: int, col: int) -> Dict[str, float]:
+    """Return the n, s, e, w bounds of a tile of the grid of a region"""
+
+    w = region["w"] + col * tile_size * region["ewres"]
+    n = region["n"] - row * tile_size * region["nsres"]
+    return {"n": n,
+            "s": max(n - tile_size * region["nsres"], region["s"]),
+            "e": min(w + tile_size * region["ewres"], region["e"]),
+            "w": w}
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
-from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph, PROCESS_DICT, PROCESS_DESCRIPTION_DICT
+from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph, PROCESS_DICT, \
+    PROCESS_DESCRIPTION_DICT, CompilationContext
 from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
 
 __license__ = "Apache License, Version 2.0"
@@ -27,13 +28,14 @@ DOC = {
 PROCESS_DESCRIPTION_DICT[PROCESS_NAME] = DOC
 
 
-def create_process_chain_entry(input_name, python_file_url, output_name):
+def create_process_chain_entry(input_name, python_file_url, output_name, context: CompilationContext):
     """Create a Actinia command of the process chain that uses g.region to create a valid computational region
     for the provide input strds
 
     :param strds_name: The name of the strds
     :param python_file_url: The URL to the python file that defines the UDF
     :param output_name: The name of the output raster layer
+    :param context: The compilation context
     :return: A Actinia process chain description
     """
 
@@ -56,16 +58,17 @@ def create_process_chain_entry(input_name, python_file_url, output_name):
     return pc
 
 
-def get_process_list(args):
+def get_process_list(args, context: CompilationContext):
     """Analyse the process description and return the Actinia process chain and the name of the processing result layer
     which is a single raster layer
 
     :param args: The process description
+    :param context: The compilation context
     :return: (output_names, actinia_process_list)
     """
 
     # Get the input description and the process chain to attach this process
-    input_names, process_list = analyse_process_graph(args)
+    input_names, process_list = analyse_process_graph(args, context)
     output_names = []
 
     for input_name in input_names:
@@ -73,6 +76,7 @@ def get_process_list(args):
         location, mapset, datatype, layer_name = ActiniaInterface.layer_def_to_components(input_name)
         output_name = "%s_%s" % (layer_name, PROCESS_NAME)
         output_names.append(output_name)
+        context.add_name(output_name)
 
         if "python_file_url" in args:
             python_file_url = args["python_file_url"]
@@ -81,7 +85,7 @@ def get_process_list(args):
 
         pc = create_process_chain_entry(input_name=input_name,
                                         python_file_url=python_file_url,
-                                        output_name=output_name)
+                                        output_name=output_name, context=context)
         process_list.append(pc)
 
     return output_names, process_list
@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
-from random import randint
 import json
-from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph, PROCESS_DICT, PROCESS_DESCRIPTION_DICT
+from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph, PROCESS_DICT, \
+    PROCESS_DESCRIPTION_DICT, CompilationContext
 from openeo_grass_gis_driver.process_schemas import Parameter, ProcessDescription, ReturnValue
 from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+from openeo_grass_gis_driver.actinia_processing.config import Config
 
 __license__ = "Apache License, Version 2.0"
 __author__ = "Sören Gebbert"
@@ -24,6 +25,14 @@ def create_process_description():
                            schema={"type": "string"},
                            required=True)
 
+    p_mode = Parameter(description="The mode of the computation, \"mask\" computes the statistics of the area "
+                                   "of all polygons, \"zones\" rasterizes the polygons once and computes "
+                                   "the statistics of each polygon and each map of the time series in a "
+                                   "single pass, the rows of the result are identified by the polygon category",
+                       schema={"type": "string", "default": "mask"},
+                       required=False)
+    p_mode.enum = ["mask", "zones"]
+
     rv = ReturnValue(description="Processed EO data.",
                      schema={"type": "object", "format": "eodata"})
 
@@ -44,7 +53,7 @@ def create_process_description():
                                         "mean, min, max, mean_of_abs, stddev, variance, "
                                         "coeff_var, sum, null_cells, cells",
                             summary="Compute the zonal statistics of a time series using a vector polygon.",
-                            parameters={"imagery": p_imagery, "polygons": p_polygons},
+                            parameters={"imagery": p_imagery, "polygons": p_polygons, "mode": p_mode},
                             returns=rv,
                             examples=examples)
 
@@ -54,7 +63,7 @@ def create_process_description():
 PROCESS_DESCRIPTION_DICT[PROCESS_NAME] = create_process_description()
 
 
-def create_process_chain_entry(input_name, polygons):
+def create_process_chain_entry(input_name, polygons, context: CompilationContext):
     """Create a Actinia command of the process chain that computes the regional statistics based on a
     strds and a polygon.
 
@@ -63,6 +72,7 @@ def create_process_chain_entry(input_name, polygons):
 
     :param input_name: The name of the strds
     :param polygons: The URL to the vector file that defines the regions of interest
+    :param context: The compilation context
     :return: A Actinia process chain description
     """
 
@@ -71,7 +81,7 @@ def create_process_chain_entry(input_name, polygons):
     if mapset is not None:
         input_name = layer_name + "@" + mapset
 
-    rn = randint(0, 1000000)
+    rn = context.create_step_id()
     pc = []
 
     importer = {
@@ -139,18 +149,103 @@ def create_process_chain_entry(input_name, polygons):
     return pc
 
 
-def get_process_list(process):
+def create_zones_process_chain_entry(input_name, polygons, context: CompilationContext):
+    """Create a Actinia command of the process chain that computes the statistics of each polygon
+    and each map of a strds in a single pass.
+
+    The polygons are imported once for each polygon source of the process graph and rasterized
+    once into a zone raster with the polygon categories as zone ids. The statistics of all zones are
+    computed by t.rast.univar, which results in a row for each map and polygon. The computational
+    region is set to the polygons, or to the zone raster if it was already rasterized, and restored
+    after processing.
+
+    :param input_name: The name of the strds
+    :param polygons: The URL to the vector file that defines the zones
+    :param context: The compilation context
+    :return: A Actinia process chain description
+    """
+
+    input_name = ActiniaInterface.layer_def_to_grass_map_name(input_name)
+
+    rn = context.create_step_id()
+    pc = []
+
+    vector_name = context.vector_imports.get(polygons)
+    if vector_name is None:
+        vector_name = "polygon_%i" % rn
+        context.vector_imports[polygons] = vector_name
+        pc.append({"id": "importer_%i" % rn,
+                   "module": "importer",
+                   "inputs": [{"import_descr": {"source": polygons,
+                                                "type": "vector"},
+                               "param": "map",
+                               "value": vector_name}]})
+
+    pc.append({"id": "g_region_save_%i" % rn,
+               "module": "g.region",
+               "inputs": [{"param": "save",
+                           "value": "previous_region_%i" % rn}],
+               "flags": "g"})
+
+    zones_name = context.zone_rasters.get(polygons)
+    if zones_name is None:
+        zones_name = "%s_zones" % vector_name
+        context.zone_rasters[polygons] = zones_name
+
+        pc.append({"id": "g_region_vector_%i" % rn,
+                   "module": "g.region",
+                   "inputs": [{"param": "vector",
+                               "value": vector_name}],
+                   "flags": "g"})
+
+        pc.append({"id": "v_to_rast_%i" % rn,
+                   "module": "v.to.rast",
+                   "inputs": [{"param": "input",
+                               "value": vector_name},
+                              {"param": "output",
+                               "value": zones_name},
+                              {"param": "use",
+                               "value": "cat"}]})
+    else:
+        # The zone raster has the region of the polygons
+        pc.append({"id": "g_region_raster_%i" % rn,
+                   "module": "g.region",
+                   "inputs": [{"param": "raster",
+                               "value": zones_name}],
+                   "flags": "g"})
+
+    pc.append({"id": "t_rast_univar_%i" % rn,
+               "module": "t.rast.univar",
+               "inputs": [{"param": "input",
+                           "value": input_name},
+                          {"param": "zones",
+                           "value": zones_name}]})
+
+    pc.append({"id": "g_region_restore_%i" % rn,
+               "module": "g.region",
+               "inputs": [{"param": "region",
+                           "value": "previous_region_%i" % rn}],
+               "flags": "g"})
+
+    return pc
+
+
+def get_process_list(process, context: CompilationContext):
     """Analyse the process description and return the Actinia process chain and the name of the processing result layer
     which is a single raster layer
 
     :param process: The process description
+    :param context: The compilation context
     :return: (output_names, actinia_process_list)
     """
 
-    # Get the input description and the process chain to attach this process
-    input_names, process_list = analyse_process_graph(process)
+    input_names, process_list = analyse_process_graph(process, context)
     output_names = []
 
+    mode = process.get("mode", Config.ZONAL_STATISTICS_MODE)
+    if mode not in ("mask", "zones"):
+        raise Exception("Unsupported mode <%s> of process %s" % (mode, PROCESS_NAME))
+
     for input_name in input_names:
 
         output_name = input_name
@@ -161,8 +256,12 @@ def get_process_list(process):
         else:
             raise Exception("The vector polygon is missing in the process description")
 
-        pc = create_process_chain_entry(input_name=input_name,
-                                        polygons=polygons)
+        if mode == "zones":
+            pc = create_zones_process_chain_entry(input_name=input_name,
+                                                  polygons=polygons, context=context)
+        else:
+            pc = create_process_chain_entry(input_name=input_name,
+                                            polygons=polygons, context=context)
         process_list.extend(pc)
 
     return output_names, process_list
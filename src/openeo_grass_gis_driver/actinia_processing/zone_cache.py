@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import time
+from copy import deepcopy
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+import requests
+from openeo_grass_gis_driver.actinia_processing.config import Config
+from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+from openeo_grass_gis_driver.database import get_database
+from openeo_grass_gis_driver.lru_cache import LRUCache
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+# The content hashes of the polygon sources, source URL -> hex digest
+SOURCE_HASH_CACHE = LRUCache(maxsize=1024, ttl=Config.ZONE_CACHE_SOURCE_TTL)
+
+
+def source_hash(source: str) -> Optional[str]:
+    """Return the hash of the content of a polygon source, the hashes are cached for ZONE_CACHE_SOURCE_TTL seconds
+
+    Only http(s) sources of the ZONE_CACHE_SOURCE_HOSTS are downloaded, so that the requests
+    of the users can not make the driver read arbitrary URLs.
+
+    :param source: The URL of the polygon source
+    :return: The hex digest of the SHA-256 hash or None if the source is not allowed,
+             can not be read or is too large
+    """
+
+    url = urlparse(source)
+    if url.scheme not in ("http", "https") or url.hostname not in Config.ZONE_CACHE_SOURCE_HOSTS:
+        return None
+
+    digest = SOURCE_HASH_CACHE.get(source)
+    if digest is not None:
+        return digest
+
+    sha = hashlib.sha256()
+    size = 0
+    try:
+        with requests.get(source, stream=True, timeout=(Config.CONNECT_TIMEOUT, Config.READ_TIMEOUT)) as r:
+            if r.status_code != 200:
+                return None
+            for chunk in r.iter_content(chunk_size=65536):
+                size += len(chunk)
+                if size > Config.ZONE_CACHE_MAX_SOURCE_SIZE:
+                    return None
+                sha.update(chunk)
+    except requests.RequestException:
+        return None
+
+    digest = sha.hexdigest()
+    SOURCE_HASH_CACHE.set(source, digest)
+    return digest
+
+
+def _parameters(step: dict) -> Dict[str, str]:
+    return {entry["param"]: entry.get("value") for entry in step.get("inputs", []) if "param" in entry}
+
+
+def _region_step(step: dict) -> dict:
+    return {"module": "g.region", "inputs": deepcopy(step.get("inputs", [])), "flags": step.get("flags", "")}
+
+
+class ZoneCache(object):
+    """The cache of the zone rasters of polygon sources in persistent mapsets
+
+    The zone rasters are created by v.to.rast from the imported polygons in the region
+    that is set to the polygons. The cache key is the hash of the content of the polygon
+    source, the location and the region settings of the process chain before the region
+    was set to the polygons, so that the cached zone raster has the same region and resolution.
+
+    Process chains that use cached zone rasters skip the import and the rasterization.
+    Uncached zone rasters are created by a persistent processing job in the background
+    and are used by the following process chains. Each zone raster has its own mapset,
+    so that actinia does not lock the mapset of concurrent creations. The least recently
+    used zone rasters are removed if the cache has more than ZONE_CACHE_SIZE entries.
+
+    The jobs are run and polled by the configured actinia user, so that the pending zone
+    rasters can be checked by the requests of all users.
+    """
+
+    def __init__(self, iface: ActiniaInterface, location: str, creator: Optional[str] = None, tracker=None):
+        """Constructor
+
+        :param iface: The actinia interface of the configured user that runs the persistent processing jobs
+        :param location: The location of the process chains
+        :param creator: The user whose process chains create the zone rasters
+        :param tracker: The job status tracker that polls the jobs until they are finished,
+                        so that their actinia nodes are released, the JOB_STATUS_TRACKER if None
+        """
+        if tracker is None:
+            from openeo_grass_gis_driver.job_status_tracker import JOB_STATUS_TRACKER
+            tracker = JOB_STATUS_TRACKER
+
+        self.iface = iface
+        self.location = location
+        self.creator = creator
+        self.tracker = tracker
+        self.db = get_database()
+
+    @staticmethod
+    def mapset_name(key: str) -> str:
+        return "%s_%s" % (Config.ZONE_CACHE_MAPSET, key[:32])
+
+    @staticmethod
+    def cache_key(location: str, digest: str, region_steps: List[dict]) -> str:
+        document = json.dumps([location, digest, region_steps], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(document.encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Return the name of the cached zone raster with the mapset
+
+        Pending zone rasters are checked and marked as available if their job was finished.
+
+        :param key: The cache key
+        :return: The name map@mapset or None if the zone raster is not available
+        """
+
+        row = self.db.execute("SELECT map_name, mapset, status, resource_id FROM zone_cache WHERE key = ?",
+                              (key,)).fetchone()
+        if row is None:
+            return None
+
+        map_name, mapset, status, resource_id = row
+        if status == "pending":
+            code, info = self.iface.resource_info(resource_id)
+            job_status = info.get("status") if code == 200 and isinstance(info, dict) else None
+            if job_status in ("error", "terminated") or code == 404:
+                self.db.execute("DELETE FROM zone_cache WHERE key = ?", (key,))
+                return None
+            if job_status != "finished":
+                return None
+            self.db.execute("UPDATE zone_cache SET status = 'ready' WHERE key = ?", (key,))
+
+        self.db.execute("UPDATE zone_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+        return "%s@%s" % (map_name, mapset)
+
+    def create(self, key: str, source: str, region_steps: List[dict]):
+        """Start the persistent processing job that creates the zone raster of a polygon source
+
+        :param key: The cache key
+        :param source: The URL of the polygon source
+        :param region_steps: The g.region steps that set the region before the region is set to the polygons
+        """
+
+        map_name = "zones_%s" % key[:32]
+        vector_name = "polygons_%s" % key[:32]
+
+        process_list = [{"id": "importer_1",
+                         "module": "importer",
+                         "inputs": [{"import_descr": {"source": source, "type": "vector"},
+                                     "param": "map",
+                                     "value": vector_name}]},
+                        {"id": "g_region_default", "module": "g.region", "flags": "d"}]
+        for number, step in enumerate(region_steps):
+            process_list.append(dict(step, id="g_region_%i" % (number + 1)))
+        process_list.append({"id": "g_region_vector",
+                             "module": "g.region",
+                             "inputs": [{"param": "vector", "value": vector_name}]})
+        process_list.append({"id": "v_to_rast_1",
+                             "module": "v.to.rast",
+                             "inputs": [{"param": "input", "value": vector_name},
+                                        {"param": "output", "value": map_name},
+                                        {"param": "use", "value": "cat"}]})
+
+        # Reserve the entry, so that concurrent process chains do not start the same job
+        now = time.time()
+        mapset = self.mapset_name(key)
+        cursor = self.db.execute("INSERT OR IGNORE INTO zone_cache VALUES (?, ?, ?, ?, ?, 'pending', NULL, ?, ?, ?)",
+                                 (key, self.location, mapset, map_name, source, now, now, self.creator))
+        if cursor.rowcount == 0:
+            return
+
+        code, response = self.iface.async_persistent_processing(location=self.location, mapset=mapset,
+                                                                process_chain=dict(list=process_list, version="1"))
+        if code != 200 or not isinstance(response, dict) or "resource_id" not in response:
+            self.db.execute("DELETE FROM zone_cache WHERE key = ?", (key,))
+            return
+
+        self.db.execute("UPDATE zone_cache SET resource_id = ? WHERE key = ?", (response["resource_id"], key))
+        self.tracker.track(resource_id=response["resource_id"], auth=self.iface.auth)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used zone rasters that exceed the ZONE_CACHE_SIZE"""
+
+        rows = self.db.execute("SELECT key, location, mapset FROM zone_cache WHERE status = 'ready' "
+                               "ORDER BY last_used DESC LIMIT -1 OFFSET ?",
+                               (max(Config.ZONE_CACHE_SIZE - self.pending(), 0),)).fetchall()
+        for key, location, mapset in rows:
+            self.db.execute("DELETE FROM zone_cache WHERE key = ?", (key,))
+            self.iface.delete_mapset(location=location, mapset=mapset)
+
+    def pending(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM zone_cache WHERE status = 'pending'").fetchone()[0]
+
+    def apply(self, process_list: List[dict]) -> List[dict]:
+        """Replace the import and the rasterization of cached polygon sources in a process chain
+        with the cached zone rasters and create the zone rasters of the uncached sources
+
+        :param process_list: The list of steps of the process chain, it is not modified
+        :return: The list of steps that use the cached zone rasters
+        """
+
+        sources = {}
+        for step in process_list:
+            if step.get("module") == "importer":
+                for entry in step.get("inputs", []):
+                    descr = entry.get("import_descr", {})
+                    if descr.get("type") == "vector" and descr.get("source"):
+                        sources[entry.get("value")] = descr["source"]
+        if not sources:
+            return process_list
+
+        optimized = []
+        # The region settings of the process chain and the settings of the saved regions
+        region_steps = []
+        saved = {}
+        # The names of the vector maps that were replaced by cached zone rasters, vector -> zones
+        replaced = {}
+        # The renamed zone rasters, rasterized name -> cached name
+        renamed = {}
+
+        for step in process_list:
+            parameters = _parameters(step)
+            module = step.get("module")
+
+            if module == "g.region" and parameters.get("vector") in sources:
+                vector_name = parameters["vector"]
+                digest = source_hash(sources[vector_name])
+                zones = None
+                if digest is not None:
+                    key = self.cache_key(self.location, digest, region_steps)
+                    zones = self.lookup(key)
+                    if zones is None:
+                        self.create(key, sources[vector_name], deepcopy(region_steps))
+                if zones is not None:
+                    replaced[vector_name] = zones
+                    optimized.append({"id": step["id"], "module": "g.region",
+                                      "inputs": [{"param": "raster", "value": zones}]})
+                    region_steps = [_region_step(optimized[-1])]
+                    continue
+
+            if module == "g.region":
+                if set(parameters) == {"save"}:
+                    saved[parameters["save"]] = list(region_steps)
+                elif "region" in parameters and parameters["region"] in saved:
+                    region_steps = list(saved[parameters["region"]])
+                elif parameters:
+                    region_steps = region_steps + [_region_step(step)]
+
+            if module == "v.to.rast" and parameters.get("input") in replaced:
+                renamed[parameters["output"]] = replaced[parameters["input"]]
+                continue
+
+            if module == "r.mask" and parameters.get("vector") in replaced:
+                optimized.append({"id": step["id"], "module": "r.mask",
+                                  "inputs": [{"param": "raster", "value": replaced[parameters["vector"]]}]})
+                continue
+
+            if renamed and any(entry.get("value") in renamed for entry in step.get("inputs", [])):
+                step = deepcopy(step)
+                for entry in step["inputs"]:
+                    if entry.get("value") in renamed:
+                        entry["value"] = renamed[entry["value"]]
+
+            optimized.append(step)
+
+        # Remove the imports of the polygons that are no longer used
+        used = set()
+        for step in optimized:
+            if step.get("module") != "importer":
+                used.update(str(value) for value in _parameters(step).values())
+        return [step for step in optimized if step.get("module") != "importer" or
+                any(entry.get("value") in used or entry.get("value") not in replaced
+                    for entry in step.get("inputs", []))]
+
+
+def apply_zone_cache(process_list: List[dict], location: str, iface: ActiniaInterface) -> List[dict]:
+    """Use the cached zone rasters in a process chain if the ZONE_CACHE is enabled
+
+    :param process_list: The list of steps of the process chain
+    :param location: The location of the process chain
+    :param iface: The actinia interface of the user
+    :return: The list of steps
+    """
+
+    if not Config.ZONE_CACHE:
+        return process_list
+
+    return ZoneCache(iface=ActiniaInterface(), location=location, creator=iface.user).apply(process_list)
@@ -2,6 +2,7 @@
 from flask import Flask
 from flask_cors import CORS
 from flask_restful import Api
+from openeo_grass_gis_driver.response_encoding import encode_response
 
 __author__ = "Sören Gebbert"
 __copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
@@ -11,3 +12,5 @@ __email__ = "soerengebbert@googlemail.com"
 flask_app = Flask(__name__)
 CORS(flask_app)
 flask_api = Api(flask_app)
+# Responses are indented on request and compressed if the client accepts it
+flask_app.after_request(encode_response)
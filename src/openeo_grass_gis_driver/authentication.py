@@ -28,18 +28,50 @@ __license__ = "Apache-2.0"
 from flask_restful import Resource
 from flask import make_response, jsonify, request
 import functools
+import hashlib
+import hmac
+import os
 
 from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+from openeo_grass_gis_driver.actinia_processing.circuit_breaker import CIRCUIT_BREAKERS, CircuitOpenError
+from openeo_grass_gis_driver.actinia_processing.config import Config
+from openeo_grass_gis_driver.lru_cache import LRUCache
+from openeo_grass_gis_driver.error_schemas import ErrorSchema
+
+# The cache of credentials that were verified by actinia,
+# the keys are (username, salted hash of username and password)
+CREDENTIAL_CACHE = LRUCache(maxsize=Config.AUTH_CACHE_SIZE, ttl=Config.AUTH_CACHE_TTL)
+# The random salt of the credential hashes, it never leaves the process
+CREDENTIAL_SALT = os.urandom(32)
+
+
+def credential_key(username, password):
+    """Return the cache key of a (username, password) pair that does not contain the password"""
+    digest = hmac.new(CREDENTIAL_SALT, f"{username}:{password}".encode("utf-8"), hashlib.sha256).hexdigest()
+    return username, digest
+
+
+def invalidate_credentials(username=None):
+    """Remove the verified credentials of a single user or of all users from the cache"""
+    if username is None:
+        CREDENTIAL_CACHE.clear()
+    else:
+        CREDENTIAL_CACHE.remove_if(lambda key: key[0] == username)
 
 
 def ok_user_and_password(username, password):
 
+    key = credential_key(username, password)
+    if CREDENTIAL_CACHE.get(key) is True:
+        return True
+
     iface = ActiniaInterface()
     iface.set_auth(username, password)
     status_code, locations = iface.list_locations()
     if status_code != 200:
         return False
     else:
+        CREDENTIAL_CACHE.set(key, True)
         return True
 
 
@@ -60,9 +92,33 @@ def requires_authorization(f):
     return decorated
 
 
+def service_unavailable(error):
+    resp = make_response(ErrorSchema(id="123456678", code=503, message=str(error)).to_json(), 503)
+    resp.headers['Retry-After'] = str(int(error.retry_after + 0.999))
+    return resp
+
+
+def fails_fast_on_open_circuit(f):
+    """Answer with 503 if a request to actinia was rejected by an open circuit,
+    also if the resource handled the error itself"""
+    @functools.wraps(f)
+    def decorated(*args, **kwargs):
+        CIRCUIT_BREAKERS.clear_rejection()
+        try:
+            resp = f(*args, **kwargs)
+        except CircuitOpenError as e:
+            return service_unavailable(e)
+        rejection = CIRCUIT_BREAKERS.rejection()
+        if rejection is not None:
+            return service_unavailable(rejection)
+        return resp
+    return decorated
+
+
 class ResourceBase(Resource):
     decorators = []
     decorators.append(requires_authorization)
+    decorators.append(fails_fast_on_open_circuit)
 
     def __init__(self):
         Resource.__init__(self)
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+import threading
+import traceback
+from typing import Callable, List, Tuple, Optional, Iterable
+from openeo_grass_gis_driver.actinia_processing.config import Config
+from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+from openeo_grass_gis_driver.actinia_processing.async_actinia_interface import AsyncActiniaInterface, \
+    gather_bounded, run_async
+from openeo_grass_gis_driver.lru_cache import LRUCache
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+# The GRASS GIS datatypes that are listed for each mapset
+DATATYPES = ["strds", "raster", "vector"]
+
+
+class CollectionListingError(Exception):
+    pass
+
+
+def is_internal_mapset(mapset: str) -> bool:
+    """Return True if the mapset is created by the driver for its own processing and is no collection
+
+    :param mapset: The name of the mapset
+    :return: True for the zone cache mapsets and the mapsets of the time window jobs
+    """
+    return mapset.startswith(Config.ZONE_CACHE_MAPSET) or mapset.startswith(Config.TEMPORAL_MAPSET_PREFIX)
+
+
+class CollectionCatalogue(object):
+    """This class caches the mapset listings of the GRASS GIS locations and the layer listings
+    of the mapsets, keyed by location and by (location, mapset, datatype).
+
+    Entries younger than the time to live are served from the cache. Entries that are older,
+    but not older than the time to live plus the maximum staleness, are served as well while
+    a background thread refreshes them (stale-while-revalidate). All other entries are fetched
+    from actinia before the listing is returned.
+
+    The refresh of a location only fetches the layer listings of mapsets that were added to the
+    location, the listings of removed mapsets are dropped and the listings of the remaining
+    mapsets are kept until they become stale themselves. The internal mapsets of the driver
+    are not listed.
+    """
+
+    def __init__(self, ttl: float = None, max_stale: float = None, maxsize: int = None,
+                 interface: Callable[[], AsyncActiniaInterface] = None):
+        """Constructor
+
+        :param ttl: The time to live of the listings in seconds
+        :param max_stale: The time in seconds after the time to live in which stale listings are served
+        :param maxsize: The maximum number of cached listings of each kind
+        :param interface: A function that returns the asyncio actinia interface of the requests
+        """
+
+        if ttl is None:
+            ttl = Config.CATALOGUE_TTL
+        if max_stale is None:
+            max_stale = Config.CATALOGUE_MAX_STALE
+        if maxsize is None:
+            maxsize = Config.CATALOGUE_MAX_ENTRIES
+
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.interface = AsyncActiniaInterface if interface is None else interface
+        # location -> list of mapsets
+        self.mapsets = LRUCache(maxsize=maxsize)
+        # (location, mapset, datatype) -> list of layer names
+        self.layers = LRUCache(maxsize=maxsize)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def _classify(self, cache: LRUCache, key, force_refresh: bool = False) -> Tuple[Optional[list], bool]:
+        """Return the cached value of a key and whether it must be refreshed
+
+        :return: (value, stale), value is None if the entry must be fetched before it can be served
+        """
+
+        if force_refresh:
+            return None, False
+
+        entry = cache.get_entry(key)
+        if entry is None:
+            return None, False
+
+        value, age = entry
+        if age < self.ttl:
+            return value, False
+        if age < self.ttl + self.max_stale:
+            return value, True
+        return None, False
+
+    async def list_layers(self, force_refresh: bool = False) -> List[Tuple[str, str, str, list]]:
+        """Return the layer listings of all mapsets of all configured locations
+
+        :param force_refresh: Fetch all listings of this call from actinia, the cached listings of
+                              the other callers are replaced by the fetched listings but not removed
+        :return: A list of (location, mapset, datatype, layer_names) tuples
+        """
+
+        iface = self.interface()
+        stale_keys = []
+
+        # Mapset listings of all locations
+        location_mapsets = {}
+        missing_locations = []
+        for location in Config.LOCATIONS:
+            mapsets, stale = self._classify(self.mapsets, location, force_refresh)
+            if mapsets is None:
+                missing_locations.append(location)
+            else:
+                location_mapsets[location] = mapsets
+                if stale:
+                    stale_keys.append(location)
+
+        if missing_locations:
+            fetched = await gather_bounded([self._fetch_mapsets(iface, location) for location in missing_locations])
+            location_mapsets.update(zip(missing_locations, fetched))
+
+        # Layer listings of all mapsets
+        keys = []
+        for location in Config.LOCATIONS:
+            for mapset in location_mapsets[location]:
+                for datatype in DATATYPES:
+                    keys.append((location, mapset, datatype))
+
+        layer_lists = {}
+        missing_keys = []
+        for key in keys:
+            layer_names, stale = self._classify(self.layers, key, force_refresh)
+            if layer_names is None:
+                missing_keys.append(key)
+            else:
+                layer_lists[key] = layer_names
+                if stale:
+                    stale_keys.append(key)
+
+        if missing_keys:
+            fetched = await gather_bounded([self._fetch_layers(iface, *key) for key in missing_keys])
+            layer_lists.update(zip(missing_keys, fetched))
+
+        if stale_keys:
+            self._refresh_in_background(stale_keys)
+
+        return [(location, mapset, datatype, layer_lists[(location, mapset, datatype)])
+                for location, mapset, datatype in keys]
+
+    async def _fetch_mapsets(self, iface: AsyncActiniaInterface, location: str) -> list:
+        status_code, mapsets = await iface.list_mapsets(location=location)
+        if status_code != 200:
+            raise CollectionListingError("An internal error occurred "
+                                         "while catching mapset "
+                                         "from location %s!" % location)
+        mapsets = [mapset for mapset in mapsets if not is_internal_mapset(mapset)]
+
+        previous = self.mapsets.get_entry(location)
+        self.mapsets.set(location, mapsets)
+
+        # Drop the listings of mapsets that were removed from the location
+        if previous is not None:
+            removed = set(previous[0]) - set(mapsets)
+            if removed:
+                self.layers.remove_if(lambda key: key[0] == location and key[1] in removed)
+
+        return mapsets
+
+    async def _fetch_layers(self, iface: AsyncActiniaInterface, location: str, mapset: str, datatype: str) -> list:
+        if datatype == "strds":
+            status_code, layer_names = await iface.list_strds(location=location, mapset=mapset)
+        elif datatype == "raster":
+            status_code, layer_names = await iface.list_raster(location=location, mapset=mapset)
+        else:
+            status_code, layer_names = await iface.list_vector(location=location, mapset=mapset)
+
+        if status_code != 200:
+            raise CollectionListingError("An internal error occurred "
+                                         "while catching %s layers!" % datatype)
+
+        self.layers.set((location, mapset, datatype), layer_names)
+        return layer_names
+
+    async def refresh(self, keys: Iterable):
+        """Fetch the provided location and (location, mapset, datatype) keys from actinia
+
+        The layer listings of mapsets that are new in a refreshed location are fetched as well.
+
+        :param keys: The location names and layer listing keys to refresh
+        """
+
+        iface = self.interface()
+        keys = list(keys)
+        locations = [key for key in keys if isinstance(key, str)]
+        layer_keys = [key for key in keys if not isinstance(key, str)]
+
+        for location in locations:
+            previous = self.mapsets.get_entry(location)
+            mapsets = await self._fetch_mapsets(iface, location)
+            known = set(previous[0]) if previous is not None else set()
+            for mapset in mapsets:
+                if mapset not in known:
+                    layer_keys.extend((location, mapset, datatype) for datatype in DATATYPES)
+
+        await gather_bounded([self._fetch_layers(iface, *key) for key in layer_keys])
+
+    def _refresh_in_background(self, keys: list):
+        with self._lock:
+            keys = [key for key in keys if key not in self._refreshing]
+            if not keys:
+                return
+            self._refreshing.update(keys)
+
+        def refresh():
+            try:
+                run_async(self.refresh(keys))
+            except Exception:
+                # The stale entries are served until the next refresh succeeds
+                traceback.print_exc()
+            finally:
+                with self._lock:
+                    self._refreshing.difference_update(keys)
+
+        threading.Thread(target=refresh, name="catalogue-refresh", daemon=True).start()
+
+    def invalidate(self, location: Optional[str] = None, mapset: Optional[str] = None,
+                   datatype: Optional[str] = None):
+        """Remove cached listings, all listings are removed if no argument was provided
+
+        :param location: Only remove the listings of this location
+        :param mapset: Only remove the listings of this mapset
+        :param datatype: Only remove the listings of this datatype
+        """
+
+        def match(key):
+            return (location is None or key[0] == location) and \
+                   (mapset is None or key[1] == mapset) and \
+                   (datatype is None or key[2] == datatype)
+
+        self.layers.remove_if(match)
+
+        # Created and deleted mapsets change the mapset listing of their location
+        if datatype is None:
+            self.mapsets.remove_if(lambda key: location is None or key == location)
+
+    def statistics(self) -> dict:
+        return {"mapsets": self.mapsets.statistics(),
+                "layers": self.layers.statistics()}
+
+
+CATALOGUE = CollectionCatalogue()
+
+
+def invalidate_catalogue(location: Optional[str] = None, mapset: Optional[str] = None,
+                         datatype: Optional[str] = None):
+    """Invalidate the cached collection listings, see CollectionCatalogue.invalidate()"""
+    CATALOGUE.invalidate(location=location, mapset=mapset, datatype=datatype)
+
+
+# Mapsets that are created, deleted or modified by the driver invalidate their listings
+ActiniaInterface.MAPSET_CHANGE_LISTENERS.append(invalidate_catalogue)
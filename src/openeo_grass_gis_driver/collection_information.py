@@ -1,9 +1,17 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import json
+import threading
+from typing import Tuple
 from flask_restful import Resource
 from flask import make_response, jsonify, request
+from openeo_grass_gis_driver.actinia_processing.config import Config
 from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+from openeo_grass_gis_driver.actinia_processing.async_actinia_interface import AsyncActiniaInterface, \
+    gather_bounded, run_async
 from openeo_grass_gis_driver.collection_schemas import CollectionInformation, Extent, EoLinks
-from osgeo import osr, ogr
+from openeo_grass_gis_driver.lru_cache import LRUCache
+from osgeo import osr
 
 __license__ = "Apache License, Version 2.0"
 __author__ = "Sören Gebbert"
@@ -76,59 +84,118 @@ raster_example = {
 }
 
 
+# layer name -> layer information
+LAYER_INFO_CACHE = LRUCache(maxsize=Config.LAYER_INFO_CACHE_SIZE, ttl=Config.LAYER_INFO_CACHE_TTL)
+# (location, mapset) -> projection WKT of the mapset
+MAPSET_PROJECTION_CACHE = LRUCache(maxsize=Config.LAYER_INFO_CACHE_SIZE, ttl=Config.LAYER_INFO_CACHE_TTL)
+# sha256 of the source WKT -> (coordinate transformation to EPSG:4326, lock)
+TRANSFORM_CACHE = LRUCache(maxsize=Config.TRANSFORM_CACHE_SIZE)
+
+
+def invalidate_layer_metadata(location: str, mapset: str):
+    """Remove the cached layer information and projection of a mapset"""
+    LAYER_INFO_CACHE.remove_if(lambda key: key.startswith("%s.%s." % (location, mapset)))
+    MAPSET_PROJECTION_CACHE.pop((location, mapset))
+
+
+ActiniaInterface.MAPSET_CHANGE_LISTENERS.append(invalidate_layer_metadata)
+
+
+def get_transform_to_EPSG_4326(crs: str) -> Tuple[osr.CoordinateTransformation, threading.Lock]:
+    """Return the cached coordinate transformation from the provided WKT to EPSG:4326
+
+    The transformation objects are not thread-safe, hence they must only be used
+    while holding the returned lock.
+
+    :param crs: The WKT of the source coordinate reference system
+    :return: (transformation, lock)
+    """
+
+    key = hashlib.sha256(crs.encode("utf-8")).hexdigest()
+    entry = TRANSFORM_CACHE.get(key)
+
+    if entry is None:
+        source = osr.SpatialReference()
+        source.ImportFromWkt(crs)
+
+        target = osr.SpatialReference()
+        target.ImportFromEPSG(4326)
+
+        entry = (osr.CoordinateTransformation(source, target), threading.Lock())
+        TRANSFORM_CACHE.set(key, entry)
+
+    return entry
+
+
 def coorindate_transform_extent_to_EPSG_4326(crs: str, extent: Extent):
     """Tranfor the extent coordinates to lat/lon
 
+    The lower left and upper right corners are transformed in a single batch
+    with a cached coordinate transformation.
+
     :param crs:
     :param extent:
     :return:
     """
 
-    source = osr.SpatialReference()
-    source.ImportFromWkt(crs)
+    transform, lock = get_transform_to_EPSG_4326(crs)
 
-    target = osr.SpatialReference()
-    target.ImportFromEPSG(4326)
+    points = [(extent.spatial[0], extent.spatial[1]),
+              (extent.spatial[2], extent.spatial[3])]
 
-    transform = osr.CoordinateTransformation(source, target)
+    with lock:
+        lower_left, upper_right = transform.TransformPoints(points)
 
-    lower_left = ogr.CreateGeometryFromWkt(f"POINT ({extent.spatial[0]} {extent.spatial[1]})")
-    lower_left.Transform(transform)
-    upper_right = ogr.CreateGeometryFromWkt(f"POINT ({extent.spatial[2]} {extent.spatial[3]})")
-    upper_right.Transform(transform)
+    extent.spatial = (lower_left[0], lower_left[1], upper_right[0], upper_right[1])
+    return extent
 
-    a0 = lower_left.GetPoint()[0]
-    a1 = lower_left.GetPoint()[1]
-    a2 = upper_right.GetPoint()[0]
-    a3 = upper_right.GetPoint()[1]
 
-    extent.spatial = (a0, a1, a2, a3)
-    return extent
+def cache_statistics() -> dict:
+    return {"layer_info": LAYER_INFO_CACHE.statistics(),
+            "mapset_projection": MAPSET_PROJECTION_CACHE.statistics(),
+            "transform": TRANSFORM_CACHE.statistics()}
 
 
 class CollectionInformationResource(Resource):
 
     def __init__(self):
-        self.iface = ActiniaInterface()
+        self.iface = AsyncActiniaInterface()
 
     def get(self, name):
 
         # List strds maps from the GRASS location
         location, mapset, datatype, layer = self.iface.layer_def_to_components(name)
 
-        status_code, layer_data = self.iface.layer_info(layer_name=name)
-        if status_code != 200:
-            return make_response(jsonify({"description": "An internal error occurred "
-                                                         "while catching GRASS GIS layer information "
-                                                         "for layer <%s>!\n Error: %s"
-                                                         ""%(name, str(layer_data))}, 400))
-
-        # Get the projection from the GRASS mapset
-        status_code, mapset_info = self.iface.mapset_info(location=location, mapset=mapset)
-        if status_code != 200:
-            return make_response(jsonify({"description": "An internal error occurred "
-                                                         "while catching mapset info "
-                                                         "for mapset <%s>!"%mapset}, 400))
+        layer_data = LAYER_INFO_CACHE.get(name)
+        crs = MAPSET_PROJECTION_CACHE.get((location, mapset))
+
+        # Request the missing layer information and the projection of the mapset concurrently
+        pending = []
+        if layer_data is None:
+            pending.append(self.iface.layer_info(layer_name=name))
+        if crs is None:
+            pending.append(self.iface.mapset_info(location=location, mapset=mapset))
+
+        responses = run_async(gather_bounded(pending)) if pending else []
+
+        if layer_data is None:
+            status_code, layer_data = responses.pop(0)
+            if status_code != 200:
+                return make_response(jsonify({"description": "An internal error occurred "
+                                                             "while catching GRASS GIS layer information "
+                                                             "for layer <%s>!\n Error: %s"
+                                                             ""%(name, str(layer_data))}, 400))
+            LAYER_INFO_CACHE.set(name, layer_data)
+
+        if crs is None:
+            # Get the projection from the GRASS mapset
+            status_code, mapset_info = responses.pop(0)
+            if status_code != 200:
+                return make_response(jsonify({"description": "An internal error occurred "
+                                                             "while catching mapset info "
+                                                             "for mapset <%s>!"%mapset}, 400))
+            crs = mapset_info["projection"]
+            MAPSET_PROJECTION_CACHE.set((location, mapset), crs)
 
         extent = Extent(spatial=(float(layer_data["west"]), float(layer_data["south"]),
                                  float(layer_data["east"]), float(layer_data["north"])))
@@ -143,7 +210,6 @@ class CollectionInformationResource(Resource):
             title = "Vector dataset"
 
         description = "GRASS GIS location/mapset path: /%s/%s" % (location, mapset)
-        crs = mapset_info["projection"]
 
         coorindate_transform_extent_to_EPSG_4326(crs=crs, extent=extent)
 
@@ -151,4 +217,7 @@ class CollectionInformationResource(Resource):
                                    description=description,
                                    extent=extent)
 
-        return make_response(ci.to_json(), 200)
+        response = make_response(ci.to_json(), 200)
+        response.headers["X-Cache-Statistics"] = json.dumps(cache_statistics(), separators=(",", ":"))
+
+        return response
@@ -36,6 +36,8 @@ class Extent(JsonableObject):
 
     """
 
+    __slots__ = ("spatial", "temporal")
+
     def __init__(self, spatial: Optional[Tuple[float, float, float, float]] = None,
                  temporal: Optional[Tuple[str, Optional[str]]] = None):
         self.spatial = spatial
@@ -69,6 +71,8 @@ class CollectionEntry(JsonableObject):
 
         """
 
+    __slots__ = ("name", "title", "description", "license", "extent", "links")
+
     def __init__(self, name: str, title=None, description: str = None, license: str = None,
                  links: EoLinks = EoLinks(links=[EoLink(href="unknown")]), extent: Extent = Extent()):
         self.name = name
@@ -83,6 +87,8 @@ class Collection(JsonableObject):
     """A collection of data description entries
     """
 
+    __slots__ = ("collections", "links")
+
     def __init__(self, collections: List[CollectionEntry],
                  links: EoLinks = EoLinks(links=[EoLink(href="unknown")])):
         self.collections = collections
@@ -91,6 +97,8 @@ class Collection(JsonableObject):
 
 class CollectionInformation(CollectionEntry):
 
+    __slots__ = ("keywords", "version")
+
     def __init__(self, keywords: Optional[List[str]] = None, version: str = None, **kwargs):
         super(CollectionInformation, self).__init__(**kwargs)
 
@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
+from typing import List
 from flask_restful import Resource
-from flask import make_response, jsonify, request
+from flask import make_response, jsonify
 
-from .actinia_processing.actinia_interface import ActiniaInterface
-from openeo_grass_gis_driver.actinia_processing.config import Config
+from .actinia_processing.async_actinia_interface import run_async
+from openeo_grass_gis_driver.collection_catalogue import CATALOGUE, CollectionListingError
 from openeo_grass_gis_driver.collection_schemas import Collection, CollectionEntry
 
 __license__ = "Apache License, Version 2.0"
@@ -13,67 +14,50 @@ __maintainer__ = "Soeren Gebbert"
 __email__ = "soerengebbert@googlemail.com"
 
 
-class Collections(Resource):
-
-    def __init__(self):
-        self.iface = ActiniaInterface()
+def create_collection_entries(location: str, mapset: str, datatype: str, layer_names: list) -> List[CollectionEntry]:
+    """Create the collection entries of the layers of a single datatype in a mapset
 
-    def get(self):
-
-        dataset_list = []
+    :param location: The GRASS GIS location
+    :param mapset: The GRASS GIS mapset
+    :param datatype: The datatype strds, raster or vector
+    :param layer_names: The names of the layers
+    :return: The list of collection entries
+    """
 
-        for location in Config.LOCATIONS:
+    if datatype == "strds":
+        title = "Space time raster dataset"
+        description = "Space time raster dataset GRASS GIS location/mapset path: /%s/%s" % (location, mapset)
+    elif datatype == "raster":
+        title = "Raster dataset"
+        description = "Raster dataset GRASS GIS location/mapset path: /%s/%s" % (location, mapset)
+    else:
+        title = "Vector dataset"
+        description = "Raster Vector GRASS GIS location/mapset path: /%s/%s" % (location, mapset)
 
-            status_code, mapsets = self.iface.list_mapsets(location=location)
-            if status_code != 200:
-                return make_response(jsonify({"description": "An internal error occurred "
-                                                             "while catching mapset "
-                                                             "from location %s!" % location}, 400))
+    entries = []
+    for entry in layer_names:
+        layer_id = "%s.%s.%s.%s" % (location, mapset, datatype, entry)
+        entries.append(CollectionEntry(name=layer_id,
+                                       title=title,
+                                       license="unknown",
+                                       description=description))
 
-            for mapset in mapsets:
+    return entries
 
-                # List strds maps from the GRASS location
-                status_code, strds_data = self.iface.list_strds(location=location, mapset=mapset)
-                if status_code != 200:
-                    return make_response(jsonify({"description": "An internal error occurred "
-                                                                 "while catching strds layers!"}, 400))
 
-                for entry in strds_data:
-                    strds_id = "%s.%s.strds.%s" % (location, mapset, entry)
-                    ds = CollectionEntry(name=strds_id,
-                                         title="Space time raster dataset",
-                                         license="unknown",
-                                         description="Space time raster dataset GRASS GIS location/mapset path: /%s/%s" % (location, mapset))
-                    dataset_list.append(ds)
-
-                # List raster maps from the GRASS location
-                status_code, raster_data = self.iface.list_raster(location=location, mapset=mapset)
-                if status_code != 200:
-                    return make_response(jsonify({"description": "An internal error occurred "
-                                                                 "while catching raster layers!"}, 400))
+class Collections(Resource):
 
-                for entry in raster_data:
-                    raster_id = "%s.%s.raster.%s" % (location, mapset, entry)
-                    ds = CollectionEntry(name=raster_id,
-                                         title="Raster dataset",
-                                         license="unknown",
-                                         description="Raster dataset GRASS GIS location/mapset path: /%s/%s" % (location, mapset))
-                    dataset_list.append(ds)
+    def get(self):
 
-                # List vector maps from the GRASS location
-                status_code, vector_data = self.iface.list_vector(location=location, mapset=mapset)
-                if status_code != 200:
-                    return make_response(jsonify({"description": "An internal error occurred "
-                                                                 "while catching vector layers!"}, 400))
+        try:
+            listings = run_async(CATALOGUE.list_layers())
+        except CollectionListingError as e:
+            return make_response(jsonify({"description": str(e)}, 400))
 
-                for entry in vector_data:
-                    vector_id = "%s.%s.vector.%s" % (location, mapset, entry)
-                    ds = CollectionEntry(name=vector_id,
-                                         title="Vector dataset",
-                                         license="unknown",
-                                         description="Raster Vector GRASS GIS location/mapset path: /%s/%s" % (
-                                         location, mapset))
-                    dataset_list.append(ds)
+        dataset_list = []
+        for location, mapset, datatype, layer_names in listings:
+            dataset_list.extend(create_collection_entries(location=location, mapset=mapset,
+                                                          datatype=datatype, layer_names=layer_names))
 
         c = Collection(collections=dataset_list)
 
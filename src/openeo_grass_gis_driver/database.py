@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import os
+import pickle
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    user TEXT,
+    title TEXT,
+    description TEXT,
+    status TEXT,
+    submitted TEXT,
+    updated TEXT,
+    actinia_id TEXT,
+    graph_id TEXT,
+    process_graph TEXT,
+    info TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS jobs_submitted ON jobs (submitted);
+CREATE INDEX IF NOT EXISTS jobs_updated ON jobs (updated);
+CREATE INDEX IF NOT EXISTS jobs_actinia_id ON jobs (actinia_id);
+CREATE INDEX IF NOT EXISTS jobs_graph_id ON jobs (graph_id);
+
+CREATE TABLE IF NOT EXISTS graphs (
+    graph_id TEXT PRIMARY KEY,
+    title TEXT,
+    description TEXT,
+    document TEXT
+);
+
+CREATE TABLE IF NOT EXISTS zone_cache (
+    key TEXT PRIMARY KEY,
+    location TEXT,
+    mapset TEXT,
+    map_name TEXT,
+    source TEXT,
+    status TEXT,
+    resource_id TEXT,
+    created REAL,
+    last_used REAL,
+    creator TEXT
+);
+CREATE INDEX IF NOT EXISTS zone_cache_last_used ON zone_cache (last_used);
+
+CREATE TABLE IF NOT EXISTS job_tiles (
+    job_id TEXT,
+    tile INTEGER,
+    stage INTEGER,
+    row INTEGER,
+    col INTEGER,
+    extent TEXT,
+    location TEXT,
+    mapset TEXT,
+    process_chain TEXT,
+    mosaic INTEGER,
+    status TEXT,
+    resource_id TEXT,
+    info TEXT,
+    PRIMARY KEY (job_id, tile)
+);
+CREATE INDEX IF NOT EXISTS job_tiles_resource_id ON job_tiles (resource_id);
+
+CREATE TABLE IF NOT EXISTS job_queue (
+    job_id TEXT PRIMARY KEY,
+    user TEXT,
+    priority INTEGER,
+    submitted REAL,
+    status TEXT,
+    location TEXT,
+    process_chain TEXT
+);
+CREATE INDEX IF NOT EXISTS job_queue_status ON job_queue (status);
+
+CREATE TABLE IF NOT EXISTS actinia_resources (
+    resource_id TEXT PRIMARY KEY,
+    node TEXT
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class Database(object):
+    """The single sqlite store of the jobs and process graphs
+
+    Each thread uses its own connection to the database file that is opened once
+    and reused by all requests that are served by this thread. The database runs
+    in write-ahead-log mode, so that readers are not blocked by a writer.
+
+    Statements run in autocommit mode, unless they are grouped with transaction().
+    """
+
+    def __init__(self, filename: str):
+        """Constructor
+
+        :param filename: The sqlite database file
+        """
+
+        self.filename = filename
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the connection of the current thread"""
+
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.filename, timeout=30, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.depth = 0
+
+            with self._lock:
+                if not self._initialized:
+                    connection.executescript(SCHEMA)
+                    migrate_legacy_databases(connection)
+                    self._initialized = True
+
+        return connection
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Group all statements of the context into a single transaction
+
+        Nested transactions are merged into the outermost one, so that a batch of
+        writes is committed once.
+        """
+
+        connection = self.connection()
+
+        if self._local.depth == 0:
+            connection.execute("BEGIN IMMEDIATE")
+        self._local.depth += 1
+        try:
+            yield connection
+        except Exception:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                connection.execute("ROLLBACK")
+            raise
+        else:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                connection.execute("COMMIT")
+
+    def execute(self, sql: str, parameters=()) -> sqlite3.Cursor:
+        return self.connection().execute(sql, parameters)
+
+    def close(self):
+        """Close the connection of the current thread"""
+
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+_DATABASE: Optional[Database] = None
+_DATABASE_LOCK = threading.Lock()
+
+
+def get_database() -> Database:
+    """Return the database of the configured DATABASE file
+
+    :return: The shared database
+    """
+    global _DATABASE
+
+    with _DATABASE_LOCK:
+        if _DATABASE is None or _DATABASE.filename != ActiniaConfig.DATABASE:
+            _DATABASE = Database(ActiniaConfig.DATABASE)
+        return _DATABASE
+
+
+class LegacyObject(object):
+    """Stand-in for the objects that were pickled into the legacy databases"""
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            state, slot_state = state
+            state = dict(state or {}, **(slot_state or {}))
+        self.__dict__.update(state or {})
+
+
+class LegacyUnpickler(pickle.Unpickler):
+    """Unpickle the values of the legacy databases
+
+    The classes of this package are replaced by LegacyObject, so that the values
+    can be read independently of the current class definitions, all other classes,
+    except the builtins, are refused.
+    """
+
+    def find_class(self, module, name):
+        if module.startswith("openeo_grass_gis_driver"):
+            return LegacyObject
+        if module in ("builtins", "copyreg", "collections", "datetime"):
+            return pickle.Unpickler.find_class(self, module, name)
+        raise pickle.UnpicklingError(f"Unable to migrate the pickled class {module}.{name}")
+
+
+def _read_legacy_database(filename: str) -> dict:
+    """Read all entries of a legacy SqliteDict database file
+
+    :param filename: The database file
+    :return: A dictionary of all keys and unpickled values
+    """
+
+    if not os.path.isfile(filename):
+        return {}
+
+    connection = sqlite3.connect(filename)
+    try:
+        rows = connection.execute('SELECT key, value FROM "unnamed"').fetchall()
+    except sqlite3.DatabaseError:
+        return {}
+    finally:
+        connection.close()
+
+    return {key: LegacyUnpickler(io.BytesIO(value)).load() for key, value in rows}
+
+
+def migrate_legacy_databases(connection: sqlite3.Connection):
+    """Copy the jobs, process graphs and actinia job ids of the legacy SqliteDict
+    database files into the database, this is done only once
+
+    :param connection: The connection to the database
+    """
+
+    from openeo_grass_gis_driver.job_db import job_to_row
+
+    if connection.execute("SELECT value FROM meta WHERE key = 'legacy_migrated'").fetchone() is not None:
+        return
+
+    jobs = _read_legacy_database(ActiniaConfig.JOB_DB)
+    graphs = _read_legacy_database(ActiniaConfig.GRAPH_DB)
+    actinia_jobs = _read_legacy_database(ActiniaConfig.ACTINIA_JOB_DB)
+
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        for job_id, job in jobs.items():
+            row = job_to_row(job_id, job, user=None, actinia_id=actinia_jobs.get(job_id))
+            connection.execute("INSERT OR IGNORE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+        for graph_id, graph in graphs.items():
+            connection.execute("INSERT OR IGNORE INTO graphs VALUES (?, ?, ?, ?)",
+                               (graph_id, graph.get("title"), graph.get("description"), json.dumps(graph)))
+
+        connection.execute("INSERT INTO meta VALUES ('legacy_migrated', ?)",
+                           (json.dumps({"jobs": len(jobs), "graphs": len(graphs)}),))
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from openeo_grass_gis_driver.app import flask_api
 from openeo_grass_gis_driver.capabilities import Capabilities, ServiceTypes
+from openeo_grass_gis_driver.health import Health
 from openeo_grass_gis_driver.collections import Collections
 from openeo_grass_gis_driver.collection_information import CollectionInformationResource
 from openeo_grass_gis_driver.processes import Processes
@@ -10,6 +11,8 @@ from openeo_grass_gis_driver.jobs_job_id import JobsJobId
 from openeo_grass_gis_driver.process_graph_validation import GraphValidation
 from openeo_grass_gis_driver.preview import Preview
 from openeo_grass_gis_driver.jobs_job_id_results import JobsJobIdResults
+from openeo_grass_gis_driver.jobs_job_id_zonal_statistics import JobsJobIdZonalStatistics
+from openeo_grass_gis_driver.jobs_job_id_results_mosaics import JobsJobIdResultsMosaics
 from openeo_grass_gis_driver.process_graphs import ProcessGraphs
 from openeo_grass_gis_driver.process_graphs_id import ProcessGraphId
 
@@ -25,6 +28,7 @@ def create_endpoints():
     """
     flask_api.add_resource(Capabilities, '/')
     flask_api.add_resource(ServiceTypes, '/service_types')
+    flask_api.add_resource(Health, '/health')
 
     flask_api.add_resource(Collections, '/collections')
     flask_api.add_resource(CollectionInformationResource, '/collections/<string:name>')
@@ -41,4 +45,6 @@ def create_endpoints():
     flask_api.add_resource(Jobs, '/jobs')
     flask_api.add_resource(JobsJobId, '/jobs/<string:job_id>')
     flask_api.add_resource(JobsJobIdResults, '/jobs/<string:job_id>/results')
+    flask_api.add_resource(JobsJobIdZonalStatistics, '/jobs/<string:job_id>/results/zonal_statistics')
+    flask_api.add_resource(JobsJobIdResultsMosaics, '/jobs/<string:job_id>/results/mosaics/<string:name>')
 
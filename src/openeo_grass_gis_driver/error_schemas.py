@@ -15,6 +15,8 @@ class ErrorSchema(JsonableObject):
 
     """
 
+    __slots__ = ("id", "code", "message", "links")
+
     def __init__(self, id: str, code: int, message: str,
                  links: List[Optional[EoLinks]] = list()):
 
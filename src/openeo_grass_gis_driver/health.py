@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from flask_restful import Resource
+from flask import make_response, jsonify
+from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+class Health(Resource):
+
+    def get(self, ):
+        """Return the cached health of the actinia backend, the state of its circuits
+        and the statistics of the coalesced requests
+
+        The response status is 503 if no actinia node is healthy, otherwise 200.
+        """
+        health = ActiniaInterface.health()
+        return make_response(jsonify(health), 503 if health["status"] == "unavailable" else 200)
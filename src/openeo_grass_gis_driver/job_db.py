@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
-from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
-from sqlitedict import SqliteDict
+import json
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+from openeo_grass_gis_driver.database import get_database
+from openeo_grass_gis_driver.job_schemas import JobInformation, OutputFormat
+from openeo_grass_gis_driver.schema_base import EoLink, EoLinks, as_dict_without_nones
 
 __license__ = "Apache License, Version 2.0"
 __author__ = "Sören Gebbert"
@@ -9,9 +14,247 @@ __maintainer__ = "Soeren Gebbert"
 __email__ = "soerengebbert@googlemail.com"
 
 
-class JobDB(SqliteDict):
+# The columns of the job table without the process graph
+JOB_LIST_COLUMNS = "job_id, user, title, description, status, submitted, updated, actinia_id, graph_id, info"
+JOB_COLUMNS = "job_id, user, title, description, status, submitted, updated, actinia_id, graph_id, info, " \
+              "process_graph"
+
+# The fields of the job listings and the columns of the job table that store them
+JOB_LIST_FIELDS = {"job_id": "job_id",
+                   "title": "title",
+                   "description": "description",
+                   "status": "status",
+                   "submitted": "submitted",
+                   "updated": "updated",
+                   "output": "info",
+                   "plan": "info",
+                   "cost": "info",
+                   "budget": "info",
+                   "additional_info": "info",
+                   "links": "info"}
+
+
+def job_to_row(job_id: str, job, user: Optional[str] = None, actinia_id: Optional[str] = None) -> tuple:
+    """Convert a job into a row of the job table
+
+    :param job_id: The job id
+    :param job: The JobInformation object
+    :param user: The user that owns the job
+    :param actinia_id: The id of the actinia resource of the job
+    :return: The row in the column order of the job table
+    """
+
+    info = dict(output=getattr(job, "output", None),
+                plan=getattr(job, "plan", "free"),
+                cost=getattr(job, "cost", 0.0),
+                budget=getattr(job, "budget", 0.0),
+                additional_info=getattr(job, "additional_info", None),
+                links=getattr(job, "links", None))
+
+    return (job_id, user, getattr(job, "title", None), getattr(job, "description", None),
+            getattr(job, "status", None), getattr(job, "submitted", None), getattr(job, "updated", None),
+            actinia_id, getattr(job, "graph_id", None),
+            json.dumps(getattr(job, "process_graph", None)),
+            json.dumps(info, default=as_dict_without_nones))
+
+
+def _links_from_json(links):
+    if isinstance(links, list):
+        return [EoLink(**link) for link in links]
+    if isinstance(links, dict) and "links" in links:
+        return EoLinks(links=[EoLink(**link) for link in links["links"]])
+    return links
+
+
+def row_to_job(row: tuple) -> JobInformation:
+    """Convert a row of the job table into a job
+
+    :param row: The row with the JOB_LIST_COLUMNS and optionally the process graph
+    :return: The JobInformation object, its process graph is None if the row has no process graph
+    """
+
+    job_id, user, title, description, status, submitted, updated, actinia_id, graph_id, info = row[:10]
+    process_graph = json.loads(row[10]) if len(row) > 10 else None
+    info = json.loads(info)
+
+    output = info.get("output")
+    if isinstance(output, dict):
+        output = OutputFormat(format=output.get("format"), parameters=output.get("parameters"))
+
+    job = JobInformation(job_id=job_id, title=title, description=description, status=status,
+                         process_graph=process_graph, output=output, submitted=submitted,
+                         updated=updated, plan=info.get("plan", "free"), cost=info.get("cost", 0.0),
+                         budget=info.get("budget", 0.0), links=_links_from_json(info.get("links")))
+    job.additional_info = info.get("additional_info")
+
+    return job
+
+
+class JobDB(MutableMapping):
     """This is the storage of all jobs that where committed
 
+    The jobs are rows of the job table of the shared database. The process graph
+    is stored in a separate column, so that job listings do not need to read it.
     """
-    def __init__(self):
-        SqliteDict.__init__(self, filename=ActiniaConfig.JOB_DB, autocommit=True)
+    def __init__(self, user: Optional[str] = None):
+        """Constructor
+
+        :param user: The user that owns the jobs that are added with this object
+        """
+        self.db = get_database()
+        self.user = user
+
+    def __getitem__(self, job_id: str) -> JobInformation:
+        row = self.db.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(job_id)
+        return row_to_job(row)
+
+    def __setitem__(self, job_id: str, job: JobInformation):
+        self.db.execute("INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (job_id) DO UPDATE SET "
+                        "user = COALESCE(excluded.user, jobs.user), title = excluded.title, "
+                        "description = excluded.description, status = excluded.status, "
+                        "submitted = excluded.submitted, updated = excluded.updated, "
+                        "graph_id = COALESCE(excluded.graph_id, jobs.graph_id), "
+                        "process_graph = excluded.process_graph, info = excluded.info",
+                        job_to_row(job_id, job, user=self.user))
+
+    def update_status(self, job_id: str, job: JobInformation) -> bool:
+        """Store the status, the update time and the additional information of a job
+
+        Only these columns are written, so that a concurrent update of the title, the
+        description or the process graph of the job is not overwritten, and a job that
+        was deleted in the meantime is not stored again.
+
+        :param job_id: The job id
+        :param job: The job with the new status, update time and additional information
+        :return: True if the job exists, False otherwise
+        """
+        additional_info = json.dumps(getattr(job, "additional_info", None), default=as_dict_without_nones)
+        return self.db.execute("UPDATE jobs SET status = ?, updated = ?, "
+                               "info = json_set(info, '$.additional_info', json(?)) WHERE job_id = ?",
+                               (job.status, job.updated, additional_info, job_id)).rowcount > 0
+
+    def __delitem__(self, job_id: str):
+        if self.db.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,)).rowcount == 0:
+            raise KeyError(job_id)
+
+    def status(self, job_id: str) -> Optional[str]:
+        """Return the status of a job without reading the whole job
+
+        :param job_id: The job id
+        :return: The status or None if the job does not exist
+        """
+        row = self.db.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def owner(self, job_id: str) -> Optional[str]:
+        """Return the user that owns a job
+
+        :param job_id: The job id
+        :return: The user or None if the job does not exist or was migrated without owner
+        """
+        row = self.db.execute("SELECT user FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def __contains__(self, job_id) -> bool:
+        return self.db.execute("SELECT 1 FROM jobs WHERE job_id = ?", (job_id,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for row in self.db.execute("SELECT job_id FROM jobs ORDER BY rowid").fetchall():
+            yield row[0]
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def clear(self):
+        self.db.execute("DELETE FROM jobs")
+
+    def list_jobs(self, limit: Optional[int] = None, after: Optional[int] = None,
+                  status: Optional[str] = None, submitted_from: Optional[str] = None,
+                  submitted_to: Optional[str] = None, title_prefix: Optional[str] = None,
+                  fields: Optional[List[str]] = None) -> Tuple[List[JobInformation], Optional[int]]:
+        """Return a page of jobs without their process graphs
+
+        The jobs are returned in the order of their creation. The filters, the
+        paging and the projection are applied by the database, so that only the
+        requested page is read.
+
+        :param limit: The maximum number of jobs, all jobs are returned if None
+        :param after: The cursor of the previous page, only jobs created after it are returned
+        :param status: Only return jobs with this status
+        :param submitted_from: Only return jobs that were submitted at or after this time
+        :param submitted_to: Only return jobs that were submitted before this time
+        :param title_prefix: Only return jobs which title starts with this prefix
+        :param fields: Only return these fields of the jobs, see JOB_LIST_FIELDS, all fields if None
+        :return: (jobs, cursor) the cursor of the next page is None if this is the last page
+        """
+
+        if fields is None:
+            fields = list(JOB_LIST_FIELDS)
+        unknown = set(fields) - set(JOB_LIST_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+
+        columns = ["rowid"]
+        columns.extend(JOB_LIST_FIELDS[field] for field in JOB_LIST_FIELDS
+                       if field in fields and JOB_LIST_FIELDS[field] != "info")
+        if any(JOB_LIST_FIELDS[field] == "info" for field in fields):
+            columns.append("info")
+        if "job_id" not in columns:
+            columns.append("job_id")
+
+        conditions = []
+        parameters = []
+        if after is not None:
+            conditions.append("rowid > ?")
+            parameters.append(after)
+        if status is not None:
+            conditions.append("status = ?")
+            parameters.append(status)
+        if submitted_from is not None:
+            conditions.append("submitted >= ?")
+            parameters.append(submitted_from)
+        if submitted_to is not None:
+            conditions.append("submitted < ?")
+            parameters.append(submitted_to)
+        if title_prefix is not None:
+            escaped = title_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            conditions.append("title LIKE ? ESCAPE '\\'")
+            parameters.append(escaped + "%")
+
+        sql = f"SELECT {', '.join(columns)} FROM jobs"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY rowid"
+        if limit is not None:
+            # One more row tells whether there is a next page
+            sql += " LIMIT ?"
+            parameters.append(limit + 1)
+
+        rows = self.db.execute(sql, parameters).fetchall()
+
+        cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            cursor = rows[-1][0]
+
+        jobs = []
+        for row in rows:
+            values = dict(zip(columns, row))
+            values.setdefault("info", "{}")
+            job = row_to_job(tuple(values.get(column) for column in JOB_LIST_COLUMNS.split(", ")))
+            # Remove the fields that were not requested, they are not serialised
+            for field in JOB_LIST_FIELDS:
+                if field not in fields and field != "job_id":
+                    setattr(job, field, None)
+            jobs.append(job)
+
+        return jobs, cursor
+
+    @contextmanager
+    def transaction(self):
+        """Commit all jobs that are stored in this context at once"""
+        with self.db.transaction():
+            yield self
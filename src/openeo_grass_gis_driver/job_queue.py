@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+import heapq
+import json
+import threading
+import time
+import traceback
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from openeo_grass_gis_driver.actinia_processing.config import Config
+from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+from openeo_grass_gis_driver.actinia_processing.actinia_job_db import ActiniaJobDB
+from openeo_grass_gis_driver.database import get_database
+from openeo_grass_gis_driver.job_db import JobDB
+from openeo_grass_gis_driver.job_schemas import JobInformation
+from openeo_grass_gis_driver.job_status_tracker import JOB_STATUS_TRACKER, FINAL_JOB_STATES, \
+    FINAL_RESOURCE_STATES, JobStatusTracker
+from openeo_grass_gis_driver.tile_dispatcher import TILE_DISPATCHER, TileDispatcher
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+def send_job(iface: ActiniaInterface, location: str, process_chain: dict) -> Tuple[int, dict]:
+    """Send the process chain of a job to actinia
+
+    :param iface: The actinia interface with the credentials of the job owner
+    :param location: The location of the process chain
+    :param process_chain: The validated process chain of the job
+    :return: The status code and the response of actinia
+    """
+
+    return iface.async_ephemeral_processing_export(location=location, process_chain=process_chain)
+
+
+def fair_share_order(rows: List[Tuple[str, str, int, float]], running: Dict[str, int]) -> List[Tuple[str, str]]:
+    """Order the waiting jobs for their release
+
+    Jobs with a higher priority are released first. Jobs of the same priority are shared
+    between the users, the next job is the oldest job of the user with the least running
+    and already ordered jobs, hence a user that submits a burst of jobs does not block the
+    jobs of the other users.
+
+    :param rows: The (job id, user, priority, submitted) of the waiting jobs
+    :param running: The number of running jobs of each user
+    :return: The (job id, user) of the waiting jobs in the order of their release
+    """
+
+    running = defaultdict(int, running)
+    priorities: Dict[int, Dict[str, deque]] = defaultdict(lambda: defaultdict(deque))
+    for job_id, user, priority, submitted in sorted(rows, key=lambda row: row[3]):
+        priorities[priority][user].append((job_id, submitted))
+
+    order = []
+    for priority in sorted(priorities, reverse=True):
+        users = priorities[priority]
+        heap = [(running[user], jobs[0][1], user) for user, jobs in users.items()]
+        heapq.heapify(heap)
+        while heap:
+            count, submitted, user = heapq.heappop(heap)
+            job_id, submitted = users[user].popleft()
+            order.append((job_id, user))
+            running[user] += 1
+            if users[user]:
+                heapq.heappush(heap, (running[user], users[user][0][1], user))
+
+    return order
+
+
+class JobQueue(object):
+    """This class is the admission queue of the jobs in front of actinia
+
+    Started jobs are stored with their validated process chain in the persistent job_queue
+    table and wait in the queued state. Tiled jobs wait in the queue as well, their tiles are
+    stored by the tile dispatcher, that sends them when the job was released.
+    The dispatcher releases the waiting jobs to actinia while less than QUEUE_MAX_RUNNING
+    actinia resources are running and the owner of a job has less than QUEUE_USER_MAX_RUNNING
+    released jobs that are not finished. The waiting jobs are released in fair-share order.
+
+    The dispatcher thread runs when a job was submitted, when a released job was finished and
+    every QUEUE_DISPATCH_INTERVAL seconds, so that capacity that was freed by other
+    resources is used as well. The jobs are claimed in a single database transaction, hence
+    the capacity is shared by all processes of the driver, and sent to actinia afterwards.
+
+    The credentials of the job owners are only held in the memory of the process that
+    received them, hence a waiting job is only released by a process that holds the
+    credentials of its owner. The other processes skip the job. Jobs that were waiting
+    during a restart of the driver wait until their owner requests them again, see authorize().
+    """
+
+    def __init__(self, interface: Callable[[], ActiniaInterface] = ActiniaInterface,
+                 tracker: JobStatusTracker = JOB_STATUS_TRACKER,
+                 sender: Callable[[ActiniaInterface, str, dict], Tuple[int, dict]] = send_job,
+                 tiles: TileDispatcher = TILE_DISPATCHER):
+        """Constructor
+
+        :param interface: The factory of the actinia interfaces that send the jobs
+        :param tracker: The job status tracker that polls the released jobs
+        :param sender: The function that sends a job to actinia
+        :param tiles: The tile dispatcher that sends the tiles of the released tiled jobs
+        """
+        self.interface = interface
+        self.tracker = tracker
+        self.sender = sender
+        self.tiles = tiles
+        self._lock = threading.RLock()
+        self._condition = threading.Condition()
+        self._woken = False
+        self._thread: Optional[threading.Thread] = None
+        # job id -> the (user, password) credentials that are used to send and poll the job
+        self._auth: Dict[str, Tuple[str, str]] = {}
+
+    @property
+    def db(self):
+        return get_database()
+
+    def start(self):
+        """Start the dispatcher thread"""
+
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="job-queue", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._woken, Config.QUEUE_DISPATCH_INTERVAL)
+                self._woken = False
+            try:
+                self.cleanup()
+                self.dispatch()
+            except Exception:
+                traceback.print_exc()
+
+    def wake(self):
+        """Run the dispatcher thread now"""
+
+        with self._condition:
+            self._woken = True
+            self._condition.notify_all()
+
+    def submit(self, job_id: str, user: Optional[str], location: str, process_chain: Optional[dict],
+               priority: Optional[int] = None, auth: Optional[Tuple[str, str]] = None):
+        """Add a job to the queue, the dispatcher thread releases it when there is capacity
+
+        The process chain of the job is validated before, the queue only sends it.
+
+        :param job_id: The openEO job id
+        :param user: The owner of the job
+        :param location: The location of the process chain
+        :param process_chain: The validated process chain of the job, None for a tiled job
+                              whose tiles were submitted to the tile dispatcher
+        :param priority: The priority of the job, the configured QUEUE_DEFAULT_PRIORITY is used if None
+        :param auth: The (user, password) credentials that are used to send and poll the job
+        """
+
+        if priority is None:
+            priority = Config.QUEUE_DEFAULT_PRIORITY
+
+        with self._lock:
+            self.db.execute("INSERT OR REPLACE INTO job_queue VALUES (?, ?, ?, ?, 'waiting', ?, ?)",
+                            (job_id, user, priority, time.time(), location,
+                             None if process_chain is None else json.dumps(process_chain)))
+            if auth is not None:
+                self._auth[job_id] = auth
+
+        self.start()
+        self.wake()
+
+    def authorize(self, job_id: str, auth: Tuple[str, str]) -> bool:
+        """Provide the credentials of a request to release a waiting job by this process
+
+        The credentials are only used if they belong to the owner of the job.
+
+        :param job_id: The openEO job id
+        :param auth: The (user, password) credentials of the request
+        :return: True if the job is waiting and the credentials belong to its owner
+        """
+
+        row = self.db.execute("SELECT user FROM job_queue WHERE job_id = ? AND status = 'waiting'",
+                              (job_id,)).fetchone()
+        if row is None or row[0] != auth[0]:
+            return False
+
+        with self._lock:
+            self._auth[job_id] = auth
+
+        self.start()
+        self.wake()
+        return True
+
+    def remove(self, job_id: str) -> bool:
+        """Remove a job from the queue
+
+        :param job_id: The openEO job id
+        :return: True if the job was waiting for its release
+        """
+
+        with self._lock:
+            self._auth.pop(job_id, None)
+        with self.db.transaction():
+            waiting = self.is_waiting(job_id)
+            self.db.execute("DELETE FROM job_queue WHERE job_id = ?", (job_id,))
+        return waiting
+
+    def is_waiting(self, job_id: str) -> bool:
+        return self.db.execute("SELECT 1 FROM job_queue WHERE job_id = ? AND status = 'waiting'",
+                               (job_id,)).fetchone() is not None
+
+    def _running_jobs(self) -> Dict[str, int]:
+        return dict(self.db.execute("SELECT user, COUNT(*) FROM job_queue WHERE status IN ('releasing', 'released') "
+                                    "GROUP BY user").fetchall())
+
+    def cleanup(self):
+        """Remove the released jobs that finished without being reported, for example
+        the jobs that were released before a restart, called by the dispatcher thread"""
+
+        self.db.execute("DELETE FROM job_queue WHERE status IN ('releasing', 'released') AND job_id NOT IN "
+                        "(SELECT job_id FROM jobs WHERE status NOT IN (%s))" %
+                        ", ".join("?" * len(FINAL_JOB_STATES)), tuple(FINAL_JOB_STATES))
+
+    def order(self) -> List[Tuple[str, str]]:
+        """Return the (job id, user) of the waiting jobs in the order of their release"""
+
+        with self.db.transaction():
+            running = self._running_jobs()
+            rows = self.db.execute("SELECT job_id, user, priority, submitted FROM job_queue "
+                                   "WHERE status = 'waiting'").fetchall()
+        return fair_share_order(rows, running)
+
+    def position(self, job_id: str) -> Optional[Tuple[int, int]]:
+        """Return the position of a waiting job in the queue
+
+        :param job_id: The openEO job id
+        :return: The (position starting at 1, number of waiting jobs) or None if the job is not waiting
+        """
+
+        if not self.is_waiting(job_id):
+            return None
+
+        order = [waiting for waiting, user in self.order()]
+        if job_id not in order:
+            return None
+        return order.index(job_id) + 1, len(order)
+
+    def annotate(self, job: JobInformation) -> JobInformation:
+        """Add the queue position to the information of a waiting job
+
+        :param job: The job
+        :return: The job
+        """
+
+        position = self.position(job.job_id)
+        if position is not None:
+            self.start()
+            job.additional_info = {"queue_position": position[0], "queue_length": position[1]}
+        return job
+
+    def dispatch(self):
+        """Release the waiting jobs to actinia while there is capacity, the jobs whose
+        owner credentials are not held by this process are skipped"""
+
+        for job_id, auth in self._claim():
+            self._release(job_id, auth)
+
+    def _claim(self) -> List[Tuple[str, Tuple[str, str]]]:
+        """Claim the waiting jobs that are released by this process
+
+        The capacity is checked and the claimed jobs are set to the releasing state in a single
+        transaction, so that concurrent dispatchers do not exceed the capacity.
+
+        :return: The (job id, credentials) of the claimed jobs in the order of their release
+        """
+
+        with self._lock:
+            held = set(self._auth)
+        if not held:
+            return []
+
+        active = self.tracker.active_resources()
+        claimed = []
+        with self.db.transaction():
+            running = self._running_jobs()
+            rows = self.db.execute("SELECT job_id, user, priority, submitted FROM job_queue "
+                                   "WHERE status = 'waiting'").fetchall()
+
+            capacity = Config.QUEUE_MAX_RUNNING - max(active, sum(running.values()))
+            for job_id, user in fair_share_order(rows, running):
+                if capacity <= 0:
+                    break
+                if job_id not in held:
+                    continue
+                if running.get(user, 0) >= Config.QUEUE_USER_MAX_RUNNING:
+                    continue
+                self.db.execute("UPDATE job_queue SET status = 'releasing' WHERE job_id = ?", (job_id,))
+                claimed.append(job_id)
+                running[user] = running.get(user, 0) + 1
+                capacity -= 1
+
+        with self._lock:
+            return [(job_id, self._auth.pop(job_id)) for job_id in claimed if job_id in self._auth]
+
+    def _release(self, job_id: str, auth: Tuple[str, str]) -> bool:
+        """Send a claimed job to actinia and track its resource, the tiles of a tiled job
+        are sent by the tile dispatcher
+
+        :param job_id: The openEO job id
+        :param auth: The (user, password) credentials of the owner
+        :return: True if the job was sent, False if it failed or does not exist anymore
+        """
+
+        job_db = JobDB()
+        row = self.db.execute("SELECT location, process_chain FROM job_queue WHERE job_id = ?",
+                              (job_id,)).fetchone()
+        if job_id not in job_db or row is None:
+            self.db.execute("DELETE FROM job_queue WHERE job_id = ?", (job_id,))
+            return False
+        job = job_db[job_id]
+        location, process_chain = row
+
+        if process_chain is None:
+            if self.db.execute("UPDATE job_queue SET status = 'released' WHERE job_id = ? AND status = 'releasing'",
+                               (job_id,)).rowcount == 0:
+                return False
+            self.tiles.start(job_id=job_id, auth=auth, listener=self._on_job_finished)
+            return True
+
+        iface = self.interface()
+        iface.set_auth(*auth)
+
+        try:
+            code, response = self.sender(iface, location, json.loads(process_chain))
+            if code != 200 or not isinstance(response, dict) or "resource_id" not in response:
+                raise Exception(f"Unable to send the job to actinia: {response}")
+        except Exception as e:
+            traceback.print_exc()
+            self.db.execute("DELETE FROM job_queue WHERE job_id = ?", (job_id,))
+            job.additional_info = {"message": str(e)}
+            job.status = "error"
+            job.updated = str(datetime.now())
+            job_db.update_status(job_id, job)
+            self.tracker.set_job_status(job_id=job_id, status=job.status)
+            return False
+
+        if self.db.execute("UPDATE job_queue SET status = 'released' WHERE job_id = ? AND status = 'releasing'",
+                           (job_id,)).rowcount == 0:
+            # The job was canceled while it was sent
+            iface.delete_resource(resource_id=response["resource_id"])
+            return False
+        ActiniaJobDB()[job_id] = response["resource_id"]
+
+        job.additional_info = response
+        job.status = "queued"
+        job.updated = str(datetime.now())
+        job_db.update_status(job_id, job)
+
+        # The status of the job is polled in the background
+        self.tracker.track(resource_id=response["resource_id"], job_id=job_id, auth=iface.auth,
+                           status=job.status, listener=self._on_resource_change)
+        return True
+
+    def _on_resource_change(self, resource_id: str, code: int, info: dict):
+        """Remove a finished job from the queue and release the next jobs"""
+
+        if code == 404 or (isinstance(info, dict) and info.get("status") in FINAL_RESOURCE_STATES):
+            job_id = ActiniaJobDB().job_id(resource_id)
+            if job_id is not None:
+                self._on_job_finished(job_id)
+
+    def _on_job_finished(self, job_id: str):
+        """Remove a finished job from the queue and release the next jobs"""
+
+        self.db.execute("DELETE FROM job_queue WHERE job_id = ? AND status = 'released'", (job_id,))
+        self.wake()
+
+
+JOB_QUEUE = JobQueue()
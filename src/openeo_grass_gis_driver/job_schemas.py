@@ -16,6 +16,8 @@ class OutputFormat(JsonableObject):
     https://open-eo.github.io/openeo-api/v/0.3.0/apireference/#tag/Job-Management/paths/~1jobs~1{job_id}/get
     """
 
+    __slots__ = ("format", "parameters")
+
     def __init__(self, format: str, parameters: Dict[str, str]):
 
         self.format = format
@@ -28,6 +30,9 @@ class JobInformation(JsonableObject):
     https://open-eo.github.io/openeo-api/v/0.3.0/apireference/#tag/Job-Management/paths/~1jobs~1{job_id}/get
     """
 
+    __slots__ = ("job_id", "title", "description", "process_graph", "output", "status", "submitted",
+                 "updated", "plan", "cost", "budget", "additional_info", "links")
+
     def __init__(self, job_id: str, title: str,
                  description: str, status: str,
                  process_graph: dict(),
@@ -57,6 +62,8 @@ class JobList(JsonableObject):
     https://open-eo.github.io/openeo-api/v/0.3.0/apireference/#tag/Job-Management/paths/~1jobs/get
     """
 
+    __slots__ = ("jobs", "links")
+
     def __init__(self, jobs: List[JobInformation],
                  links: Optional[EoLinks] = None):
         self.jobs = jobs
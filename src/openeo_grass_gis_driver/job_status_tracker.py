@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import traceback
+from typing import Callable, Dict, Optional, Tuple
+from openeo_grass_gis_driver.actinia_processing.config import Config
+from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+from openeo_grass_gis_driver.actinia_processing.actinia_job_db import ActiniaJobDB
+from openeo_grass_gis_driver.job_db import JobDB
+from openeo_grass_gis_driver.job_schemas import JobInformation
+from openeo_grass_gis_driver.lru_cache import LRUCache
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+# The openEO job status of each actinia resource status
+ACTINIA_STATUS_TO_JOB_STATUS = {"accepted": "queued",
+                                "running": "running",
+                                "finished": "finished",
+                                "error": "error",
+                                "terminated": "canceled"}
+
+# Resources in these actinia states will not change anymore
+FINAL_RESOURCE_STATES = {"finished", "error", "terminated"}
+# Jobs in these openEO states will not change anymore
+FINAL_JOB_STATES = {"finished", "error", "canceled"}
+
+
+def update_job_from_resource_info(job: JobInformation, code: int, job_info) -> bool:
+    """Update the status of an openEO job with the actinia resource information
+
+    :param job: The job that should be updated
+    :param code: The HTTP status code of the resource info request
+    :param job_info: The actinia resource information
+    :return: True if the job was modified, False otherwise
+    """
+
+    if job.additional_info == job_info:
+        return False
+
+    job.additional_info = job_info
+
+    if code == 200:
+        # Add the actinia information to the openeo job
+        job.updated = job_info["datetime"]
+        if job_info["status"] in ACTINIA_STATUS_TO_JOB_STATUS:
+            job.status = ACTINIA_STATUS_TO_JOB_STATUS[job_info["status"]]
+
+    return True
+
+
+class TrackedResource(object):
+    """The polling state of a single actinia resource"""
+
+    def __init__(self, resource_id: str, job_id: Optional[str], auth: Tuple[str, str], max_interval: float,
+                 listener: Optional[Callable[[str, int, dict], None]] = None):
+        self.resource_id = resource_id
+        self.job_id = job_id
+        self.auth = auth
+        self.max_interval = max_interval
+        self.listener = listener
+        self.interval = Config.JOB_POLL_MIN_INTERVAL
+        self.next_poll = time.monotonic()
+        self.code: Optional[int] = None
+        self.info = None
+
+    @property
+    def finished(self) -> bool:
+        return isinstance(self.info, dict) and self.info.get("status") in FINAL_RESOURCE_STATES
+
+
+class JobStatusTracker(object):
+    """This class polls the status of all active actinia resources in a background thread
+    and stores the status changes of their openEO jobs in the job database.
+
+    Each resource is polled with an adaptive interval that starts at JOB_POLL_MIN_INTERVAL,
+    grows by the factor JOB_POLL_BACKOFF up to JOB_POLL_MAX_INTERVAL while the resource does
+    not change and is reset when it changes. Resources are removed from the tracker when they
+    reached a final state.
+
+    Clients can wait for status changes without polling actinia themselves,
+    hence any number of clients waiting for the same job cost a single upstream poll.
+    """
+
+    def __init__(self, interface: Callable[[], ActiniaInterface] = None):
+        """Constructor
+
+        :param interface: A function that returns the actinia interface of the polls
+        """
+        self.interface = ActiniaInterface if interface is None else interface
+        self._resources: Dict[str, TrackedResource] = {}
+        self._job_status: Dict[str, str] = {}
+        # resource id -> the last (status code, resource information) of resources that are not polled anymore
+        self._final = LRUCache(maxsize=Config.JOB_POLL_MAX_FINAL)
+        # job id -> the last status of jobs that are not polled anymore
+        self._final_job_status = LRUCache(maxsize=Config.JOB_POLL_MAX_FINAL)
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the polling thread and track all active jobs of the job database"""
+
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="job-status-tracker", daemon=True)
+
+        self._recover()
+        self._thread.start()
+
+    def _recover(self):
+        """Track the active jobs that were submitted before the tracker was started
+
+        The credentials of these jobs are unknown, hence the configured actinia user polls them
+        until the owner of a job requests it and provides the credentials, see track().
+        """
+
+        job_db = JobDB()
+        actinia_job_db = ActiniaJobDB()
+
+        for job_id in actinia_job_db:
+            if job_id not in job_db:
+                continue
+            job = job_db[job_id]
+            if job.status not in FINAL_JOB_STATES:
+                self._track(resource_id=actinia_job_db[job_id], job_id=job_id,
+                            auth=None, status=job.status)
+
+    def track(self, resource_id: str, job_id: Optional[str] = None, auth: Optional[Tuple[str, str]] = None,
+              status: Optional[str] = None, max_interval: Optional[float] = None,
+              listener: Optional[Callable[[str, int, dict], None]] = None):
+        """Start tracking an actinia resource, the credentials of a tracked resource
+        that is polled by the configured actinia user are replaced by the provided credentials
+
+        :param resource_id: The actinia resource id
+        :param job_id: The openEO job of the resource that is updated on status changes
+        :param auth: The (user, password) credentials that are used to poll the resource
+        :param status: The current openEO status of the job
+        :param max_interval: The maximum poll interval of this resource in seconds
+        :param listener: A function that is called with (resource id, status code, resource information)
+                         in the polling thread when the resource information changed
+        """
+        self.start()
+        self._track(resource_id=resource_id, job_id=job_id, auth=auth,
+                    status=status, max_interval=max_interval, listener=listener)
+
+    def _track(self, resource_id: str, job_id: Optional[str], auth: Optional[Tuple[str, str]],
+               status: Optional[str] = None, max_interval: Optional[float] = None,
+               listener: Optional[Callable[[str, int, dict], None]] = None):
+
+        if max_interval is None:
+            max_interval = Config.JOB_POLL_MAX_INTERVAL
+
+        with self._condition:
+            resource = self._resources.get(resource_id)
+            if resource is None:
+                self._resources[resource_id] = TrackedResource(resource_id=resource_id, job_id=job_id,
+                                                               auth=auth, max_interval=max_interval,
+                                                               listener=listener)
+            elif resource.auth is None and auth is not None:
+                resource.auth = auth
+                resource.interval = Config.JOB_POLL_MIN_INTERVAL
+                resource.next_poll = time.monotonic()
+            if job_id is not None and status is not None:
+                self._job_status[job_id] = status
+            self._condition.notify_all()
+
+    def is_tracked(self, resource_id: str) -> bool:
+        with self._condition:
+            return resource_id in self._resources
+
+    def active_resources(self) -> int:
+        """Return the number of tracked actinia resources that are not finished"""
+
+        with self._condition:
+            return len(self._resources)
+
+    def resource_info(self, resource_id: str) -> Tuple[Optional[int], Optional[dict]]:
+        """Return the latest polled (status code, resource information) of a resource"""
+
+        with self._condition:
+            resource = self._resources.get(resource_id)
+            if resource is None:
+                return self._final.get(resource_id, (None, None))
+            return resource.code, resource.info
+
+    def wait_for_resource(self, resource_id: str, timeout: float) -> Tuple[Optional[int], Optional[dict]]:
+        """Wait until the resource reached a final state or the timeout was reached
+
+        :param resource_id: The actinia resource id that must be tracked
+        :param timeout: The maximum time to wait in seconds
+        :return: The latest polled (status code, resource information)
+        """
+
+        deadline = time.monotonic() + timeout
+
+        with self._condition:
+            while True:
+                resource = self._resources.get(resource_id)
+                if resource is None:
+                    return self._final.get(resource_id, (None, None))
+                remaining = deadline - time.monotonic()
+                if resource.finished or remaining <= 0:
+                    return resource.code, resource.info
+                self._condition.wait(remaining)
+
+    def wait_for_job_status_change(self, job_id: str, status: str, timeout: float) -> Optional[str]:
+        """Wait until the status of a job differs from the provided status or the timeout was reached
+
+        :param job_id: The openEO job id
+        :param status: The status the client knows
+        :param timeout: The maximum time to wait in seconds
+        :return: The current status of the job or None if the job was never tracked
+                 and is not in the job database
+        """
+
+        deadline = time.monotonic() + timeout
+        job_db = JobDB()
+
+        while True:
+            with self._condition:
+                current = self._job_status.get(job_id, self._final_job_status.get(job_id))
+                remaining = deadline - time.monotonic()
+                if (current is not None and current != status) or remaining <= 0:
+                    return current
+                self._condition.wait(min(remaining, Config.JOB_LONG_POLL_DB_INTERVAL))
+
+            # The resource of the job may be polled by another worker process,
+            # that stores the status changes in the job database
+            stored = job_db.status(job_id)
+            if stored is not None and stored != status:
+                return stored
+
+    def _run(self):
+
+        job_db = JobDB()
+
+        while True:
+            with self._condition:
+                now = time.monotonic()
+                due = [r for r in self._resources.values() if r.next_poll <= now]
+                if not due:
+                    next_poll = min([r.next_poll for r in self._resources.values()], default=None)
+                    self._condition.wait(None if next_poll is None else next_poll - now)
+                    continue
+
+            polled = []
+            for resource in due:
+                try:
+                    polled.append(self._poll(resource, job_db))
+                except Exception:
+                    traceback.print_exc()
+                    with self._condition:
+                        resource.interval = min(resource.interval * Config.JOB_POLL_BACKOFF, resource.max_interval)
+                        resource.next_poll = time.monotonic() + resource.interval
+
+            # The modified jobs of a poll round are stored in a single transaction,
+            # before the waiting clients are notified
+            try:
+                with job_db.transaction():
+                    for resource, code, info, job in polled:
+                        if job is not None:
+                            job_db.update_status(resource.job_id, job)
+            except Exception:
+                traceback.print_exc()
+
+            for resource, code, info, job in polled:
+                if self._update(resource, code, info, job) and resource.listener is not None:
+                    try:
+                        resource.listener(resource.resource_id, code, info)
+                    except Exception:
+                        traceback.print_exc()
+
+    def _poll(self, resource: TrackedResource, job_db: JobDB) -> Tuple[TrackedResource, int, dict,
+                                                                         Optional[JobInformation]]:
+        """Poll a resource and update its job
+
+        :return: (resource, status code, resource information, job) the job is None if it was not modified
+        """
+
+        iface = self.interface()
+        if resource.auth is not None:
+            iface.set_auth(*resource.auth)
+
+        code, info = iface.resource_info(resource_id=resource.resource_id)
+
+        # The configured actinia user can not read the resources of other users,
+        # the resource is polled again when the owner provides the credentials
+        if resource.auth is None and code in (401, 403, 404):
+            return resource, resource.code, resource.info, None
+
+        job = None
+        if resource.job_id is not None and resource.job_id in job_db:
+            job = job_db[resource.job_id]
+            if not update_job_from_resource_info(job, code, info):
+                job = None
+
+        return resource, code, info, job
+
+    def _update(self, resource: TrackedResource, code: int, info: dict, job: Optional[JobInformation]) -> bool:
+        """Store the polled information of a resource
+
+        :return: True if the resource information changed
+        """
+
+        with self._condition:
+            changed = code != resource.code or info != resource.info
+            resource.code = code
+            resource.info = info
+
+            if changed:
+                resource.interval = Config.JOB_POLL_MIN_INTERVAL
+            else:
+                resource.interval = min(resource.interval * Config.JOB_POLL_BACKOFF, resource.max_interval)
+            resource.next_poll = time.monotonic() + resource.interval
+
+            if job is not None:
+                self._job_status[resource.job_id] = job.status
+
+            # Resources in a final state or unknown to actinia are not polled anymore,
+            # their last information is kept for the waiting clients
+            final = resource.finished or code == 404
+            if final:
+                self._final.set(resource.resource_id, (code, info))
+                self._resources.pop(resource.resource_id, None)
+                if resource.job_id in self._job_status:
+                    self._final_job_status.set(resource.job_id, self._job_status.pop(resource.job_id))
+
+            self._condition.notify_all()
+
+        # The node of the resource is released and the mapset of a persistent resource is reported as modified
+        if final:
+            ActiniaInterface.notify_resource_finished(resource.resource_id)
+
+        return changed
+
+    def set_job_status(self, job_id: str, status: str):
+        """Set the status of a job whose status is not tracked by a single resource
+        and notify the clients that wait for a status change
+
+        :param job_id: The openEO job id
+        :param status: The new status of the job
+        """
+
+        with self._condition:
+            if status in FINAL_JOB_STATES:
+                self._job_status.pop(job_id, None)
+                self._final_job_status.set(job_id, status)
+            else:
+                self._job_status[job_id] = status
+            self._condition.notify_all()
+
+
+JOB_STATUS_TRACKER = JobStatusTracker()
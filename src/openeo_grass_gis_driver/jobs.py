@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 from uuid import uuid4
 from datetime import datetime
+from typing import Optional
+from urllib.parse import urlencode
 from flask_restful import Resource
 from flask import make_response, jsonify, request
 from openeo_grass_gis_driver.process_graph_db import GraphDB
@@ -9,6 +11,8 @@ from openeo_grass_gis_driver.actinia_processing.actinia_interface import Actinia
 from openeo_grass_gis_driver.job_schemas import JobInformation, JobList
 from openeo_grass_gis_driver.error_schemas import ErrorSchema
 from openeo_grass_gis_driver.authentication import ResourceBase
+from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
+from openeo_grass_gis_driver.schema_base import EoLink
 
 __license__ = "Apache License, Version 2.0"
 __author__ = "Sören Gebbert"
@@ -48,20 +52,53 @@ class Jobs(ResourceBase):
         self.iface = ActiniaInterface()
         self.iface.set_auth(request.authorization.username, request.authorization.password)
         self.graph_db = GraphDB()
-        self.job_db = JobDB()
+        self.job_db = JobDB(user=request.authorization.username)
 
     def get(self):
-        """Return all jobs in the job database"""
+        """Return a page of jobs of the job database
+
+        The following query parameters are supported:
+
+            limit: The maximum number of jobs in the page
+            after: The cursor of the page, it is provided by the next link of the previous page
+            status: Only list jobs with this status
+            submitted_from, submitted_to: Only list jobs submitted in this ISO 8601 time range
+            title: Only list jobs which title starts with this prefix
+            fields: A comma separated list of the job fields in the listing
+        """
         # TODO: Implement user specific database access
 
-        jobs = []
+        try:
+            limit = int(request.args.get("limit", ActiniaConfig.JOB_LIST_LIMIT))
+            if limit < 1:
+                raise ValueError("The limit must be a positive number")
+            limit = min(limit, ActiniaConfig.JOB_LIST_MAX_LIMIT)
+
+            after = request.args.get("after")
+            if after is not None:
+                after = int(after)
+
+            fields = request.args.get("fields")
+            if fields is not None:
+                fields = [field.strip() for field in fields.split(",") if field.strip()]
+
+            jobs, cursor = self.job_db.list_jobs(limit=limit, after=after,
+                                                 status=request.args.get("status"),
+                                                 submitted_from=normalize_datetime(request.args.get("submitted_from")),
+                                                 submitted_to=normalize_datetime(request.args.get("submitted_to")),
+                                                 title_prefix=request.args.get("title"),
+                                                 fields=fields)
+        except ValueError as e:
+            error = ErrorSchema(id=str(uuid4()), code=400, message=str(e))
+            return make_response(error.to_json(), 400)
 
-        for key in self.job_db:
-            job = self.job_db[key]
-            job.process_graph = None
-            jobs.append(job)
+        links = None
+        if cursor is not None:
+            args = request.args.to_dict()
+            args["after"] = cursor
+            links = [EoLink(href=f"{request.base_url}?{urlencode(args)}", rel="next")]
 
-        job_list = JobList(jobs=jobs)
+        job_list = JobList(jobs=jobs, links=links)
 
         return make_response(job_list.to_json(), 200)
 
@@ -106,3 +143,27 @@ def check_job(job, job_id):
                               submitted=submitted, status="submitted")
 
     return job_info
+
+
+def normalize_datetime(value: Optional[str]) -> Optional[str]:
+    """Convert an ISO 8601 time into the format of the submitted time of the stored jobs
+
+    The submitted times are stored as naive local times, hence times with a
+    time zone, like the UTC suffix Z, are converted into the local time zone.
+
+    :param value: The ISO 8601 time or None
+    :return: The time in the stored format or None
+    """
+    if value is None:
+        return None
+
+    try:
+        if value[-1:] in ("Z", "z"):
+            value = value[:-1] + "+00:00"
+        time = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Wrong time format {value}, an ISO 8601 time is required")
+
+    if time.tzinfo is not None:
+        time = time.astimezone().replace(tzinfo=None)
+    return str(time)
@@ -6,9 +6,16 @@ from flask import make_response, jsonify, request
 from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
 from openeo_grass_gis_driver.process_graph_db import GraphDB
 from openeo_grass_gis_driver.job_db import JobDB
+from openeo_grass_gis_driver.actinia_processing.actinia_job_db import ActiniaJobDB
 from openeo_grass_gis_driver.error_schemas import ErrorSchema
 from openeo_grass_gis_driver.jobs import check_job
 from openeo_grass_gis_driver.authentication import ResourceBase
+from openeo_grass_gis_driver.actinia_processing.config import Config
+from openeo_grass_gis_driver.job_status_tracker import JOB_STATUS_TRACKER
+from openeo_grass_gis_driver.zonal_results import ZonalResultStore, zonal_result_key
+from openeo_grass_gis_driver.tile_dispatcher import TILE_DISPATCHER
+from openeo_grass_gis_driver.job_queue import JOB_QUEUE
+from openeo_grass_gis_driver.jobs_job_id_results import resume_job
 
 __license__ = "Apache License, Version 2.0"
 __author__ = "Sören Gebbert"
@@ -24,15 +31,34 @@ class JobsJobId(ResourceBase):
         self.iface.set_auth(request.authorization.username, request.authorization.password)
         self.db = GraphDB()
         self.job_db = JobDB()
+        self.actinia_job_db = ActiniaJobDB()
 
     def get(self, job_id):
         """Return information about a single job
 
         https://open-eo.github.io/openeo-api/v/0.3.0/apireference/#tag/Job-Management/paths/~1jobs~1{job_id}/get
+
+        The request can wait for a status change of the job (long polling) with the query parameters
+        wait, the maximum number of seconds to wait, and status, the job status the client knows.
+        The response is sent as soon as the status of the job differs from the provided status.
         """
 
         if job_id in self.job_db:
-            job = self.job_db[job_id]
+            # The status of the job is updated in the background with the credentials of its owner
+            job = resume_job(job_id=job_id, job=self.job_db[job_id], auth=self.iface.auth)
+
+            try:
+                wait = min(float(request.args.get("wait", 0)), Config.JOB_LONG_POLL_MAX)
+            except ValueError:
+                return make_response(ErrorSchema(id="123456678", code=400,
+                                                 message="The wait parameter must be a number of seconds").to_json(),
+                                     400)
+
+            status = request.args.get("status", job.status)
+            if wait > 0 and job.status == status:
+                JOB_STATUS_TRACKER.wait_for_job_status_change(job_id=job_id, status=status, timeout=wait)
+                job = JOB_QUEUE.annotate(self.job_db[job_id])
+
             return make_response(job.to_json(), 200)
         else:
             return make_response(ErrorSchema(id="123456678", code=404,
@@ -71,6 +97,11 @@ class JobsJobId(ResourceBase):
         """
 
         if job_id in self.job_db:
+            if job_id in self.actinia_job_db:
+                ZonalResultStore().delete(zonal_result_key(job_id, self.actinia_job_db[job_id]))
+                del self.actinia_job_db[job_id]
+            TILE_DISPATCHER.delete(job_id)
+            JOB_QUEUE.remove(job_id)
             del self.job_db[job_id]
             return make_response("The job has been successfully deleted", 204)
         else:
@@ -2,6 +2,7 @@
 import sys
 import traceback
 from datetime import datetime
+from typing import Tuple
 from flask import make_response, jsonify, request
 from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
 from openeo_grass_gis_driver.process_graph_db import GraphDB
@@ -9,9 +10,17 @@ from openeo_grass_gis_driver.job_db import JobDB
 from openeo_grass_gis_driver.actinia_processing.actinia_job_db import ActiniaJobDB
 from openeo_grass_gis_driver.error_schemas import ErrorSchema
 from openeo_grass_gis_driver.job_schemas import JobInformation
-from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph
+from openeo_grass_gis_driver.actinia_processing.base import compile_process_graph
+from openeo_grass_gis_driver.actinia_processing.tile_planner import plan_tiles
+from openeo_grass_gis_driver.actinia_processing.temporal_planner import plan_temporal_windows
+from openeo_grass_gis_driver.actinia_processing.process_chain_optimizer import prepare_process_chain
+from openeo_grass_gis_driver.actinia_processing.zone_cache import apply_zone_cache
 from openeo_grass_gis_driver.authentication import ResourceBase
 from openeo_grass_gis_driver.schema_base import EoLink
+from openeo_grass_gis_driver.job_status_tracker import JOB_STATUS_TRACKER, FINAL_JOB_STATES
+from openeo_grass_gis_driver.tile_dispatcher import TILE_DISPATCHER
+from openeo_grass_gis_driver.job_queue import JOB_QUEUE
+from openeo_grass_gis_driver.actinia_processing.config import Config
 
 __license__ = "Apache License, Version 2.0"
 __author__ = "Sören Gebbert"
@@ -20,6 +29,39 @@ __maintainer__ = "Soeren Gebbert"
 __email__ = "soerengebbert@googlemail.com"
 
 
+def resume_job(job_id: str, job: JobInformation, auth: Tuple[str, str]) -> JobInformation:
+    """Continue the processing of a job with the credentials of a request of its owner
+
+    The status of the actinia resource of the job is updated by the job status tracker
+    with the credentials of the owner, hence actinia is not polled here. The tiles of tiled jobs are tracked by the tile
+    dispatcher. Jobs that wait in the admission queue are released by this process and
+    show their queue position.
+
+    :param job_id: The openEO job id
+    :param job: The job from the job database
+    :param auth: The (user, password) credentials of the request
+    :return: The current job information
+    """
+
+    actinia_job_db = ActiniaJobDB()
+
+    if job_id in actinia_job_db:
+        # Only the owner of a job can read the status of its resource
+        if job.status not in FINAL_JOB_STATES and JobDB().owner(job_id) in (None, auth[0]):
+            JOB_STATUS_TRACKER.track(resource_id=actinia_job_db[job_id], job_id=job_id,
+                                     auth=auth, status=job.status)
+        return job
+
+    # The tiles of a tiled job that waits in the admission queue are sent after its release
+    if job.status not in FINAL_JOB_STATES and TILE_DISPATCHER.is_tiled(job_id) and \
+            not JOB_QUEUE.is_waiting(job_id):
+        TILE_DISPATCHER.resume(job_id=job_id, auth=auth)
+        return JobDB()[job_id]
+
+    JOB_QUEUE.authorize(job_id=job_id, auth=auth)
+    return JOB_QUEUE.annotate(job)
+
+
 class JobsJobIdResults(ResourceBase):
 
     def __init__(self):
@@ -36,48 +78,27 @@ class JobsJobIdResults(ResourceBase):
         """
 
         if job_id in self.job_db:
-            job: JobInformation = self.job_db[job_id]
+            job = resume_job(job_id=job_id, job=self.job_db[job_id], auth=self.iface.auth)
 
-            # Check for the actinia id to get the latest actinia job information
-            if job_id in self.actinia_job_db:
-                actinia_id = self.actinia_job_db[job_id]
-                print("Resource id", actinia_id)
-                code, job_info = self.iface.resource_info(resource_id=actinia_id)
-
-                if code == 200:
-                    # Add the actinia information to the openeo job
-                    if job.additional_info != job_info:
-                        job.additional_info = job_info
-                        job.updated = job_info["datetime"]
-                        if job_info["status"] == "finished":
-                            job.status = "finished"
-                        if job_info["status"] == "error":
-                            job.status = "error"
-                        if job_info["status"] == "accepted":
-                            job.status = "queued"
-                        if job_info["status"] == "terminated":
-                            job.status = "canceled"
-                        if job_info["status"] == "running":
-                            job.status = "running"
-
-                        # Store the updated job in the database
-                        self.job_db[job_id] = job
-                else:
-                    if job.additional_info != job_info:
-                        job.additional_info = job_info
-                        self.job_db[job_id] = job
+            if (isinstance(job.additional_info, dict) and
+                job.additional_info.get('urls') and
+                job.additional_info['urls'].get('resources')):
+                resource_links = job.additional_info['urls']['resources']
 
+                if job.links is None:
+                    job.links = []
 
-                if (job.additional_info['urls'] and
-                    job.additional_info['urls']['resources']):
-                    resource_links = job.additional_info['urls']['resources']
+                for link in resource_links:
+                    eo_link = EoLink(href=link)
+                    job.links.append(eo_link)
 
-                    if job.links is None:
-                        job.links = []
+            # The mosaics of the tiled jobs are served by the driver
+            if isinstance(job.additional_info, dict) and job.additional_info.get('mosaics'):
+                if job.links is None:
+                    job.links = []
 
-                    for link in resource_links:
-                        eo_link = EoLink(href=link)
-                        job.links.append(eo_link)
+                for name in job.additional_info['mosaics']:
+                    job.links.append(EoLink(href=f"{request.url_root}jobs/{job_id}/results/mosaics/{name}"))
 
             return make_response(job.to_json(), 200)
         else:
@@ -88,19 +109,55 @@ class JobsJobIdResults(ResourceBase):
         """Start a processing job in the actinia backend
 
         https://open-eo.github.io/openeo-api/v/0.3.0/apireference/#tag/Job-Management/paths/~1jobs~1{job_id}~1results/post
+
+        The process graph of the job is compiled and validated by actinia, then the job is added
+        to the admission queue, that sends it to actinia when there is capacity. The optional
+        query parameter priority sets the priority of the job in the queue.
         """
+        try:
+            priority = min(int(request.args.get("priority", Config.QUEUE_DEFAULT_PRIORITY)),
+                           Config.QUEUE_MAX_PRIORITY)
+        except ValueError:
+            return make_response(ErrorSchema(id="123456678", code=400,
+                                             message="The priority parameter must be an integer").to_json(), 400)
+
         try:
             if job_id in self.job_db:
                 job: JobInformation = self.job_db[job_id]
 
-                status, response = self.send_actinia_processing_request(job=job)
-                self.actinia_job_db[job_id] = response["resource_id"]
-
-                job.additional_info = response
+                # Jobs with large extents are processed in tiles, the reductions of long time series in time windows
+                result_names, process_list, location = compile_process_graph({"process_graph": job.process_graph})
+                plan = plan_tiles(process_list)
+                if plan is None:
+                    plan = plan_temporal_windows(process_list, job_id=job_id, iface=self.iface, location=location)
+                if plan is not None:
+                    process_chain = None
+                else:
+                    # Invalid process chains are rejected before the job is queued, the validated
+                    # process chain is sent to actinia unchanged
+                    process_list = apply_zone_cache(process_list, location, self.iface)
+                    process_chain = prepare_process_chain(process_list, result_names)
+                    status, response = self.iface.sync_ephemeral_processing_validation(
+                        location=location, process_chain=process_chain)
+                    if status != 200:
+                        return make_response(ErrorSchema(id="123456678", code=400,
+                                                         message=str(response)).to_json(), 400)
+
+                JOB_QUEUE.remove(job_id)
+                TILE_DISPATCHER.delete(job_id)
+                if job_id in self.actinia_job_db:
+                    del self.actinia_job_db[job_id]
+
+                job.additional_info = None
                 job.status = "queued"
                 job.updated = str(datetime.now())
+                self.job_db.update_status(job_id, job)
 
-                self.job_db[job_id] = job
+                # The job or the tiles of the job are sent to actinia by the admission queue
+                if plan is not None:
+                    TILE_DISPATCHER.submit(job_id=job_id, plan=plan, location=location, result_names=result_names)
+                JOB_QUEUE.submit(job_id=job_id, user=self.iface.user, location=location, process_chain=process_chain,
+                                 priority=priority, auth=self.iface.auth)
 
                 return make_response("The creation of the resource has been queued successfully.", 202)
             else:
@@ -115,37 +172,6 @@ class JobsJobIdResults(ResourceBase):
             error = ErrorSchema(id="1234567890", code=2, message=str(traceback_model))
             return make_response(error.to_json(), 400)
 
-    def send_actinia_processing_request(self, job: JobInformation):
-        try:
-            # Empty the process location
-            ActiniaInterface.PROCESS_LOCATION = {}
-            # Transform the process graph into a process chain and store the input location
-            # Check all locations in the process graph
-            result_name, process_list = analyse_process_graph({"process_graph":job.process_graph})
-
-            if len(ActiniaInterface.PROCESS_LOCATION) == 0 or len(ActiniaInterface.PROCESS_LOCATION) > 1:
-                raise Exception("Processes can only be defined for a single location!")
-
-            location = ActiniaInterface.PROCESS_LOCATION.keys()
-            location = list(location)[0]
-
-            process_chain = dict(list=process_list,
-                                 version="1")
-
-            # pprint.pprint(process_chain)
-
-            status, response = self.iface.async_ephemeral_processing_export(location=location,
-                                                                            process_chain=process_chain)
-
-            return status, response
-        except Exception:
-
-            e_type, e_value, e_tb = sys.exc_info()
-            traceback_model = dict(message=str(e_value),
-                                   traceback=traceback.format_tb(e_tb),
-                                   type=str(e_type))
-            raise Exception(str(traceback_model))
-
     def delete(self, job_id):
         """Cancel a running job
 
@@ -154,11 +180,22 @@ class JobsJobIdResults(ResourceBase):
 
         if job_id in self.job_db:
 
+            # Jobs that wait in the admission queue are not sent anymore
+            if JOB_QUEUE.remove(job_id):
+                job = self.job_db[job_id]
+                job.status = "canceled"
+                job.updated = str(datetime.now())
+                self.job_db.update_status(job_id, job)
+                JOB_STATUS_TRACKER.set_job_status(job_id=job_id, status=job.status)
+
             # Check for the actinia id to get the latest actinia job information
             if job_id in self.actinia_job_db:
                 actinia_id = self.actinia_job_db[job_id]
                 code, job_info = self.iface.delete_resource(resource_id=actinia_id)
 
+            if TILE_DISPATCHER.is_tiled(job_id):
+                TILE_DISPATCHER.cancel(job_id)
+
             return make_response("The job has been successfully cancelled", 204)
         else:
             return make_response(ErrorSchema(id="123456678", code=404,
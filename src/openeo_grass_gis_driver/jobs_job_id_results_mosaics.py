@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import os
+from flask import make_response, send_from_directory
+from openeo_grass_gis_driver.job_db import JobDB
+from openeo_grass_gis_driver.error_schemas import ErrorSchema
+from openeo_grass_gis_driver.authentication import ResourceBase
+from openeo_grass_gis_driver.tile_dispatcher import TILE_DISPATCHER
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+class JobsJobIdResultsMosaics(ResourceBase):
+
+    def __init__(self):
+        self.job_db = JobDB()
+
+    def get(self, job_id, name):
+        """Download a mosaic of the tile exports of a tiled job
+        """
+
+        directory = TILE_DISPATCHER.mosaic_directory(job_id)
+        if job_id not in self.job_db or not os.path.isfile(os.path.join(directory, os.path.basename(name))):
+            return make_response(ErrorSchema(id="123456678", code=404,
+                                             message=f"mosaic {name} of job {job_id} not found.").to_json(), 404)
+
+        return send_from_directory(directory, os.path.basename(name), mimetype="image/tiff")
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from flask import make_response, request, Response, stream_with_context
+from openeo_grass_gis_driver.job_db import JobDB
+from openeo_grass_gis_driver.actinia_processing.actinia_job_db import ActiniaJobDB
+from openeo_grass_gis_driver.error_schemas import ErrorSchema
+from openeo_grass_gis_driver.job_schemas import JobInformation
+from openeo_grass_gis_driver.authentication import ResourceBase
+from openeo_grass_gis_driver.zonal_results import ZonalResultStore, ZONAL_FORMATS, ZONAL_STREAMS, \
+    parse_process_log, zonal_result_key
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+class JobsJobIdZonalStatistics(ResourceBase):
+
+    def __init__(self):
+        self.job_db = JobDB()
+        self.actinia_job_db = ActiniaJobDB()
+        self.store = ZonalResultStore()
+
+    def get(self, job_id):
+        """Stream the zonal statistics of a finished job as table
+
+        The t.rast.univar outputs of the process log are parsed at the first download and
+        stored as columns, the following downloads stream the stored columns.
+        The format of the table is set with the query parameter format: csv (default),
+        ndjson or arrow, if pyarrow is installed.
+        """
+
+        output_format = request.args.get("format", "csv")
+        if output_format not in ZONAL_FORMATS:
+            return make_response(ErrorSchema(id="123456678", code=400,
+                                             message=f"Unsupported format {output_format}, supported formats "
+                                                     f"are {', '.join(sorted(ZONAL_FORMATS))}").to_json(), 400)
+
+        if job_id not in self.job_db or job_id not in self.actinia_job_db:
+            return make_response(ErrorSchema(id="123456678", code=404,
+                                             message=f"job with id {job_id} not found in database.").to_json(), 404)
+
+        job: JobInformation = self.job_db[job_id]
+        if job.status != "finished":
+            return make_response(ErrorSchema(id="123456678", code=400,
+                                             message=f"job with id {job_id} is not finished.").to_json(), 400)
+
+        key = zonal_result_key(job_id, self.actinia_job_db[job_id])
+        if key not in self.store:
+            process_log = job.additional_info.get("process_log") if isinstance(job.additional_info, dict) else None
+            columns = parse_process_log(process_log)
+            if not len(columns["map"]):
+                return make_response(ErrorSchema(id="123456678", code=404,
+                                                 message=f"job with id {job_id} has no zonal statistics.").to_json(),
+                                     404)
+            self.store.store(key, columns)
+
+        columns = self.store.load(key)
+        # The streamed response is neither compressed nor pretty printed
+        return Response(stream_with_context(ZONAL_STREAMS[output_format](columns)),
+                        mimetype=ZONAL_FORMATS[output_format], direct_passthrough=True)
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+class LRUCache(object):
+    """A thread-safe in-process cache with least recently used eviction
+    and an optional time to live for each entry
+
+    The cache counts hits, misses, expired entries and evictions that can be
+    requested with statistics().
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        """Constructor
+
+        :param maxsize: The maximum number of entries
+        :param ttl: The time to live of an entry in seconds, entries never expire if None
+        """
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def _is_expired(self, timestamp: float) -> bool:
+        return self.ttl is not None and time.monotonic() - timestamp >= self.ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the value of a key if it exists and was not expired
+
+        :param key: The key
+        :param default: The value that is returned if the key was not found or was expired
+        :return: The cached value or default
+        """
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, timestamp = entry
+            if self._is_expired(timestamp):
+                del self._data[key]
+                self.expired += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_entry(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """Return the value and the age in seconds of a key regardless of its time to live
+
+        This allows to serve stale entries while they are revalidated.
+
+        :param key: The key
+        :return: (value, age) or None if the key was not found
+        """
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            value, timestamp = entry
+            return value, time.monotonic() - timestamp
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value and evict the least recently used entries if the cache is full
+
+        :param key: The key
+        :param value: The value
+        """
+
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove a key and return its value
+
+        :param key: The key
+        :param default: The value that is returned if the key was not found
+        :return: The removed value or default
+        """
+
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return default
+            return entry[0]
+
+    def remove_if(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove all entries which keys match the predicate
+
+        :param predicate: A function that gets a key and returns True if the entry must be removed
+        :return: The number of removed entries
+        """
+
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._data.keys())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and not self._is_expired(entry[1])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def statistics(self) -> dict:
+        """Return the cache statistics
+
+        :return: A dictionary with size, maxsize, ttl, hits, misses, expired and evictions
+        """
+
+        with self._lock:
+            return {"size": len(self._data),
+                    "maxsize": self.maxsize,
+                    "ttl": self.ttl,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "expired": self.expired,
+                    "evictions": self.evictions}
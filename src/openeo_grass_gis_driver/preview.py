@@ -1,13 +1,15 @@
 # -*- coding: utf-8 -*-
-import time
 import sys
 import traceback
 from flask import make_response, jsonify, request
-from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph
+from openeo_grass_gis_driver.actinia_processing.base import compile_process_graph, ProcessLocationError
+from openeo_grass_gis_driver.actinia_processing.process_chain_optimizer import prepare_process_chain
+from openeo_grass_gis_driver.actinia_processing.zone_cache import apply_zone_cache
 from openeo_grass_gis_driver.process_graph_db import GraphDB
 from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
 from openeo_grass_gis_driver.error_schemas import ErrorSchema
 from openeo_grass_gis_driver.authentication import ResourceBase
+from openeo_grass_gis_driver.job_status_tracker import JOB_STATUS_TRACKER, FINAL_RESOURCE_STATES
 
 __license__ = "Apache License, Version 2.0"
 __author__ = "Sören Gebbert"
@@ -29,23 +31,17 @@ class Preview(ResourceBase):
         """
 
         try:
-            # Empty the process location
-            ActiniaInterface.PROCESS_LOCATION = {}
             request_doc = request.get_json()
             process_graph = request_doc["process_graph"]
             # Transform the process graph into a process chain and store the input location
             # Check all locations in the process graph
-            result_name, process_list = analyse_process_graph(process_graph)
+            try:
+                result_name, process_list, location = compile_process_graph(process_graph)
+            except ProcessLocationError as e:
+                return make_response(jsonify({"description": str(e)}, 400))
 
-            if len(ActiniaInterface.PROCESS_LOCATION) == 0 or len(ActiniaInterface.PROCESS_LOCATION) > 1:
-                return make_response(jsonify({"description":"Processes can only be defined for a single location!"},
-                                             400))
-
-            location = ActiniaInterface.PROCESS_LOCATION.keys()
-            location = list(location)[0]
-
-            process_chain = dict(list=process_list,
-                                 version="1")
+            process_list = apply_zone_cache(process_list, location, self.iface)
+            process_chain = prepare_process_chain(process_list, result_name)
 
             # pprint.pprint(process_chain)
 
@@ -86,24 +82,25 @@ class Preview(ResourceBase):
         # Check if the resource was accepted
 
         resource_id = response["resource_id"]
-        start_time = time.time()
 
-        while True:
-            status, resp_data = self.iface.resource_info(resource_id)
+        # The resource is polled by the job status tracker, the preview is short lived,
+        # hence its poll interval is bounded to one second
+        JOB_STATUS_TRACKER.track(resource_id=resource_id, auth=self.iface.auth, max_interval=1)
+        status, resp_data = JOB_STATUS_TRACKER.wait_for_resource(resource_id=resource_id, timeout=max_time)
+
+        if isinstance(resp_data, dict) is False or "status" not in resp_data:
+            raise Exception("wrong return values %s" % str(resp_data))
+
+        if resp_data["status"] not in FINAL_RESOURCE_STATES:
+            status_code, data = self.iface.delete_resource(resource_id=resource_id)
+
+            if status_code != 200:
+                raise Exception(f"Unable to terminate job, error: {data}")
+
+            # Wait for the termination of the resource
+            status, resp_data = JOB_STATUS_TRACKER.wait_for_resource(resource_id=resource_id, timeout=max_time)
 
             if isinstance(resp_data, dict) is False or "status" not in resp_data:
                 raise Exception("wrong return values %s" % str(resp_data))
-            if resp_data["status"] == "finished" or \
-                    resp_data["status"] == "error" or \
-                    resp_data["status"] == "terminated":
-                break
-            time.sleep(1)
-
-            current_time = time.time()
-            if current_time - start_time > max_time:
-                status_code, data = self.iface.delete_resource(resource_id=resource_id)
-
-                if status_code != 200:
-                    raise Exception(f"Unable to terminate job, error: {data}")
 
         return status, resp_data
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
-from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
-from sqlitedict import SqliteDict
+import json
+from collections.abc import MutableMapping
+from typing import Iterator, List, Tuple
+from openeo_grass_gis_driver.database import get_database
 
 __license__ = "Apache License, Version 2.0"
 __author__ = "Sören Gebbert"
@@ -9,9 +11,44 @@ __maintainer__ = "Soeren Gebbert"
 __email__ = "soerengebbert@googlemail.com"
 
 
-class GraphDB(SqliteDict):
+class GraphDB(MutableMapping):
     """This is the storage of the process graphs that were commited for processing
 
+    The graphs are rows of the graph table of the shared database.
     """
     def __init__(self):
-        SqliteDict.__init__(self, filename=ActiniaConfig.GRAPH_DB, autocommit=True)
+        self.db = get_database()
+
+    def __getitem__(self, graph_id: str) -> dict:
+        row = self.db.execute("SELECT document FROM graphs WHERE graph_id = ?", (graph_id,)).fetchone()
+        if row is None:
+            raise KeyError(graph_id)
+        return json.loads(row[0])
+
+    def __setitem__(self, graph_id: str, graph: dict):
+        self.db.execute("INSERT OR REPLACE INTO graphs VALUES (?, ?, ?, ?)",
+                        (graph_id, graph.get("title"), graph.get("description"), json.dumps(graph)))
+
+    def __delitem__(self, graph_id: str):
+        if self.db.execute("DELETE FROM graphs WHERE graph_id = ?", (graph_id,)).rowcount == 0:
+            raise KeyError(graph_id)
+
+    def __contains__(self, graph_id) -> bool:
+        return self.db.execute("SELECT 1 FROM graphs WHERE graph_id = ?", (graph_id,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for row in self.db.execute("SELECT graph_id FROM graphs ORDER BY rowid").fetchall():
+            yield row[0]
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM graphs").fetchone()[0]
+
+    def clear(self):
+        self.db.execute("DELETE FROM graphs")
+
+    def list_graphs(self) -> List[Tuple[str, str, str]]:
+        """Return the id, title and description of all process graphs without reading the graphs
+
+        :return: A list of (graph_id, title, description) tuples
+        """
+        return self.db.execute("SELECT graph_id, title, description FROM graphs ORDER BY rowid").fetchall()
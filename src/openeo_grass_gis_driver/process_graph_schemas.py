@@ -15,6 +15,8 @@ class ProcessGraphDefinition(JsonableObject):
 
     """
 
+    __slots__ = ("process_id", "process_description")
+
     def __init__(self, process_id: str, process_description: str):
 
         self.process_id = process_id
@@ -26,6 +28,8 @@ class ProcessGraph(JsonableObject):
 
     """
 
+    __slots__ = ("title", "description", "process_graph")
+
     def __init__(self, title: str, description: str, process_graph: ProcessGraphDefinition):
 
         self.title = title
@@ -38,6 +42,8 @@ class ProcessGraphListEntry(JsonableObject):
 
     """
 
+    __slots__ = ("title", "description", "process_graph_id")
+
     def __init__(self, title: str, description: str, process_graph_id: str):
 
         self.title = title
@@ -50,6 +56,8 @@ class ProcessGraphList(JsonableObject):
 
     """
 
+    __slots__ = ("process_graphs", "links")
+
     def __init__(self, process_graphs: List[ProcessGraphListEntry],
                  links: Optional[EoLinks] = None):
 
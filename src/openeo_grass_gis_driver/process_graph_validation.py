@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 from pprint import pprint
 from flask import make_response, jsonify, request
-from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph
+from openeo_grass_gis_driver.actinia_processing.base import compile_process_graph, ProcessLocationError
 from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
 from openeo_grass_gis_driver.error_schemas import ErrorSchema
 from openeo_grass_gis_driver.authentication import ResourceBase
@@ -27,22 +27,16 @@ class GraphValidation(ResourceBase):
         """
 
         try:
-            # Empty the process location
-            ActiniaInterface.PROCESS_LOCATION = {}
             process_graph = request.get_json()
             # Transform the process graph into a process chain and store the input location
             # Check all locations in the process graph
-            result_name, process_list = analyse_process_graph(process_graph)
-
-            if len(ActiniaInterface.PROCESS_LOCATION) == 0 or len(ActiniaInterface.PROCESS_LOCATION) > 1:
-                msg = "Processes can only be defined for a single location!"
+            try:
+                result_name, process_list, location = compile_process_graph(process_graph)
+            except ProcessLocationError as e:
                 status = 400
-                es = ErrorSchema(id=str(datetime.now()), code=status, message=str(msg))
+                es = ErrorSchema(id=str(datetime.now()), code=status, message=str(e))
                 return make_response(es.to_json(), status)
 
-            location = ActiniaInterface.PROCESS_LOCATION.keys()
-            location = list(location)[0]
-
             process_chain = dict(list=process_list,
                                  version="1")
 
@@ -31,11 +31,10 @@ class ProcessGraphs(ResourceBase):
 
         process_graphs = []
 
-        for key in self.graph_db:
-            graph = self.graph_db[key]
+        for process_graph_id, title, description in self.graph_db.list_graphs():
 
-            entry = ProcessGraphListEntry(title=graph["title"], description=graph["description"],
-                                          process_graph_id=key)
+            entry = ProcessGraphListEntry(title=title, description=description,
+                                          process_graph_id=process_graph_id)
 
             process_graphs.append(entry)
 
@@ -29,6 +29,8 @@ class DependentObject(JsonableObject):
         Embedded literal value that the referenced parameter MUST hold for this dependency to apply.
     """
 
+    __slots__ = ("parameter", "description", "ref_values")
+
     def __init__(self, parameter: str,
                  description: str,
                  ref_values: dict = None):
@@ -70,6 +72,8 @@ class Parameter(JsonableObject):
 
     """
 
+    __slots__ = ("description", "schema", "required", "dependencies", "depricated", "mime_type", "enum")
+
     def __init__(self, description: str,
                  schema: dict,
                  required: bool = False,
@@ -105,6 +109,8 @@ class ReturnValue(JsonableObject):
         Additional values for format are defined centrally in the API documentation, e.g. bbox or crs.
     """
 
+    __slots__ = ("description", "schema", "mime_type")
+
     def __init__(self, description: str, schema: dict, mime_type: Optional[str] = None):
 
         self.description = description
@@ -127,6 +133,8 @@ class ProcessException(JsonableObject):
 
     """
 
+    __slots__ = ("code", "description")
+
     def __init__(self, code: int,description: str):
 
         self.code = code
@@ -135,6 +143,9 @@ class ProcessException(JsonableObject):
 
 class ProcessDescription(JsonableObject):
 
+    __slots__ = ("name", "description", "parameters", "returns", "links", "summary", "min_parameters",
+                 "deprecated", "exceptions", "examples")
+
     def __init__(self, name: str, description: str,
                  parameters: Dict[str, Parameter],
                  returns: ReturnValue,
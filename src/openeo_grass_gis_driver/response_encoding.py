@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import gzip
+import json
+from typing import Optional
+from flask import request, Response
+from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+def _compress_gzip(data: bytes) -> bytes:
+    return gzip.compress(data, compresslevel=ActiniaConfig.GZIP_LEVEL)
+
+
+def _compress_brotli(data: bytes) -> bytes:
+    return brotli.compress(data, quality=ActiniaConfig.BROTLI_QUALITY)
+
+
+# The supported content encodings in the order of preference
+CONTENT_ENCODINGS = {}
+if brotli is not None:
+    CONTENT_ENCODINGS["br"] = _compress_brotli
+CONTENT_ENCODINGS["gzip"] = _compress_gzip
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Select the preferred supported content encoding of an Accept-Encoding header
+
+    :param accept_encoding: The value of the Accept-Encoding header
+    :return: The content encoding or None if the response should not be compressed
+    """
+
+    if not accept_encoding:
+        return None
+
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    best = None
+    best_quality = 0.0
+    for coding in CONTENT_ENCODINGS:
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+
+    return best
+
+
+def prettify_response(response: Response) -> Response:
+    """Indent the JSON document of a response if the request has the pretty query parameter"""
+
+    if request.args.get("pretty", "false").lower() not in ("true", "1", "yes"):
+        return response
+    if response.direct_passthrough or response.headers.get("Content-Encoding"):
+        return response
+
+    try:
+        document = json.loads(response.get_data())
+    except ValueError:
+        return response
+
+    response.set_data(json.dumps(document, indent=2))
+    return response
+
+
+def compress_response(response: Response) -> Response:
+    """Compress the response with the content encoding that was negotiated with the client"""
+
+    response.vary.add("Accept-Encoding")
+
+    if response.direct_passthrough or response.status_code < 200 or response.status_code >= 300:
+        return response
+    if response.status_code == 204 or "Content-Encoding" in response.headers:
+        return response
+
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < ActiniaConfig.COMPRESSION_MIN_SIZE:
+        return response
+
+    response.set_data(CONTENT_ENCODINGS[encoding](data))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def encode_response(response: Response) -> Response:
+    """The after request hook of the application that prettifies and compresses the responses"""
+    return compress_response(prettify_response(response))
@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
 import json
-from typing import List
+from typing import Any, Callable, Dict, List, Tuple
+from uuid import UUID
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 __author__ = "Sören Gebbert"
 __copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
@@ -8,26 +14,100 @@ __maintainer__ = "Sören Gebbert"
 __email__ = "soerengebbert@googlemail.com"
 
 
+def json_fields(cls) -> Tuple[str, ...]:
+    """Return the serialised fields of a class, the slots of the class and its bases
+    in the order of their definition, the list is computed once per class
+
+    :param cls: The JsonableObject class
+    :return: The tuple of field names
+    """
+
+    fields = cls.__dict__.get("_json_fields")
+    if fields is None:
+        fields = []
+        for base in reversed(cls.__mro__):
+            for name in base.__dict__.get("__slots__", ()):
+                if name not in fields:
+                    fields.append(name)
+        fields = tuple(fields)
+        cls._json_fields = fields
+    return fields
+
+
 def as_dict_without_nones(o):
 
-    d = o.__dict__
+    if isinstance(o, UUID):
+        return str(o)
 
     r = dict()
 
-    for key in d:
-        if d[key] is None:
+    for key in json_fields(type(o)):
+        value = getattr(o, key, None)
+        if value is None:
             continue
-        r[key] = d[key]
+        r[key] = value
+
+    d = getattr(o, "__dict__", None)
+    if d:
+        for key in d:
+            if d[key] is None:
+                continue
+            r[key] = d[key]
 
     return r
 
 
+def _dumps_json(obj: Any, pretty: bool) -> str:
+    if pretty:
+        return json.dumps(obj, default=as_dict_without_nones, sort_keys=False, indent=2)
+    # The compact separators allow the C accelerated encoder
+    return json.dumps(obj, default=as_dict_without_nones, sort_keys=False, separators=(",", ":"))
+
+
+def _dumps_orjson(obj: Any, pretty: bool) -> str:
+    option = orjson.OPT_NON_STR_KEYS
+    if pretty:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, default=as_dict_without_nones, option=option).decode("utf-8")
+
+
+# The available JSON serialisation backends, the name of the backend
+# and the function that serialises an object (obj, pretty) -> str
+JSON_BACKENDS: Dict[str, Callable[[Any, bool], str]] = {"json": _dumps_json}
+if orjson is not None:
+    JSON_BACKENDS["orjson"] = _dumps_orjson
+
+
+def dumps(obj: Any, pretty: bool = False) -> str:
+    """Serialise an object with the configured JSON_BACKEND
+
+    :param obj: The object that may contain JsonableObject's
+    :param pretty: Indent the JSON document
+    :return: The JSON document
+    """
+
+    # The actinia_processing package imports the schemas, hence the configuration is imported here
+    from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
+
+    backend = ActiniaConfig.JSON_BACKEND
+    if backend == "auto":
+        backend = "orjson" if "orjson" in JSON_BACKENDS else "json"
+
+    return JSON_BACKENDS[backend](obj, pretty)
+
+
 class JsonableObject:
     """This class is the base class for all openEO responses that serialises
-    the response classes into JSON"""
+    the response classes into JSON
+
+    The response classes define their fields as __slots__, the serialised
+    field list of each class is computed once.
+    """
 
-    def to_json(self):
-        return json.dumps(self, default=lambda o: as_dict_without_nones(o), sort_keys=False, indent=2)
+    __slots__ = ()
+
+    def to_json(self, pretty: bool = False):
+        return dumps(self, pretty=pretty)
 
 
 class EoLink(JsonableObject):
@@ -43,6 +123,8 @@ class EoLink(JsonableObject):
 
     """
 
+    __slots__ = ("rel", "href")
+
     def __init__(self, href: str, rel: str = None):
         self.rel = rel
         self.href = href
@@ -56,5 +138,7 @@ class EoLinks(JsonableObject):
 
     """
 
+    __slots__ = ("links",)
+
     def __init__(self, links: List[EoLink]):
         self.links = links
@@ -0,0 +1,468 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+from openeo_grass_gis_driver.actinia_processing.config import Config
+from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+from openeo_grass_gis_driver.actinia_processing.process_chain_optimizer import prepare_process_chain
+from openeo_grass_gis_driver.actinia_processing.tile_planner import TilePlan
+from openeo_grass_gis_driver.database import get_database
+from openeo_grass_gis_driver.job_db import JobDB
+from openeo_grass_gis_driver.job_status_tracker import JOB_STATUS_TRACKER, ACTINIA_STATUS_TO_JOB_STATUS, \
+    JobStatusTracker
+
+try:
+    from osgeo import gdal
+except ImportError:
+    gdal = None
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+# The states of the tiles that are sent to or processed by actinia
+ACTIVE_TILE_STATES = ("submitted", "queued", "running")
+
+# The file extensions of the tile exports that are stitched into a mosaic
+MOSAIC_EXTENSIONS = (".tif", ".tiff")
+
+
+class TileDispatcher(object):
+    """This class processes the tiles of tiled jobs as separate actinia jobs
+
+    The tiles of a job, spatial tiles or time windows, are stored in the job_tiles table and
+    are sent to actinia concurrently, at most TILE_PARALLELISM tiles of a job are processed
+    at the same time. The tiles of a stage are sent after all tiles of the previous stages
+    were finished. Tiles with a mapset store their results in this persistent mapset, so
+    that the tiles of the following stages can use them, the mapsets are removed when the
+    job is finished. The tile resources are polled by the job status tracker, that informs
+    the dispatcher about status changes, so that the next tiles are sent when a tile was finished.
+
+    The status of the job and the status and progress of each tile are stored in the
+    job after each change. When all tiles were finished, the GeoTIFF exports of the tiles
+    are stitched into one mosaic per result with GDAL, if the job requested a mosaic.
+    A job fails if a tile fails, the other tiles of the job are canceled.
+
+    The tiles of a job are sent after the job was released by the admission queue, see start(),
+    so that tiled jobs share the capacity of actinia with the other jobs.
+
+    The credentials of the job owners are only held in the memory of the process that
+    received them until the job reached a final state, hence the tiles of a job are only
+    sent by a process that holds the credentials of its owner. The tiles of a job whose credentials were lost, for example
+    by a restart of the driver, wait until the owner requests the job again, see resume().
+    """
+
+    def __init__(self, interface: Callable[[], ActiniaInterface] = ActiniaInterface,
+                 tracker: JobStatusTracker = JOB_STATUS_TRACKER):
+        """Constructor
+
+        :param interface: The factory of the actinia interfaces that send and cancel the tiles
+        :param tracker: The job status tracker that polls the tile resources
+        """
+        self.interface = interface
+        self.tracker = tracker
+        self._lock = threading.RLock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # job id -> the (user, password) credentials that are used to send and poll the tiles,
+        # they are dropped when the job reached a final state
+        self._auth: Dict[str, Tuple[str, str]] = {}
+        # job id -> the function that is called with the job id when the job reached a final state
+        self._listeners: Dict[str, Callable[[str], None]] = {}
+        # The futures of the tiles that are sent
+        self._futures: Set[Future] = set()
+
+    @property
+    def db(self):
+        return get_database()
+
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(Config.TILE_PARALLELISM, 1),
+                                                    thread_name_prefix="tile-dispatcher")
+            return self._executor
+
+    def _iface(self, job_id: str) -> ActiniaInterface:
+        iface = self.interface()
+        auth = self._auth.get(job_id)
+        if auth is not None:
+            iface.set_auth(*auth)
+        return iface
+
+    @staticmethod
+    def mosaic_directory(job_id: str) -> str:
+        return os.path.join(Config.TILE_RESULT_DIRECTORY, re.sub(r"[^A-Za-z0-9_.-]", "_", job_id))
+
+    def is_tiled(self, job_id: str) -> bool:
+        return self.db.execute("SELECT 1 FROM job_tiles WHERE job_id = ? LIMIT 1", (job_id,)).fetchone() is not None
+
+    def submit(self, job_id: str, plan: TilePlan, location: str, result_names: List[str]):
+        """Store the tiles of a job, the tiles are sent when the job is started
+
+        The tiles of a previous run of the job are replaced.
+
+        :param job_id: The openEO job id
+        :param plan: The tile plan of the process chain of the job
+        :param location: The location of the process chain
+        :param result_names: The names of the results of the process chain
+        """
+
+        mosaic = plan.mosaic and gdal is not None
+        rows = []
+        for tile in plan.tiles:
+            process_chain = prepare_process_chain(tile.process_list, tile.result_names or result_names)
+            rows.append((job_id, tile.index, tile.stage, tile.row, tile.col, json.dumps(tile.extent), location,
+                         tile.mapset, json.dumps(process_chain), int(mosaic)))
+
+        self.delete(job_id)
+        with self.db.transaction():
+            for row in rows:
+                self.db.execute("INSERT INTO job_tiles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'waiting', NULL, NULL)",
+                                row)
+        self.update_job(job_id)
+
+    def start(self, job_id: str, auth: Tuple[str, str], listener: Optional[Callable[[str], None]] = None):
+        """Send the first tiles of a submitted job to actinia, called by the admission queue
+
+        :param job_id: The openEO job id
+        :param auth: The (user, password) credentials of the owner
+        :param listener: The function that is called with the job id when the job reached a final state
+        """
+
+        self._auth[job_id] = auth
+        if listener is not None:
+            self._listeners[job_id] = listener
+        self.dispatch(job_id)
+
+    def resume(self, job_id: str, auth: Optional[Tuple[str, str]] = None):
+        """Track the processed tiles of a job again and send its waiting tiles, for example after
+        a restart of the driver
+
+        The credentials are only used if they belong to the owner of the job, nothing is done
+        if this process does not hold the credentials of the owner.
+
+        :param job_id: The openEO job id
+        :param auth: The (user, password) credentials of the user
+        """
+
+        if auth is not None and auth[0] == JobDB().owner(job_id):
+            self._auth.setdefault(job_id, auth)
+
+        if job_id not in self._auth:
+            return
+
+        iface = self._iface(job_id)
+        for resource_id, in self.db.execute("SELECT resource_id FROM job_tiles WHERE job_id = ? AND "
+                                            "status IN ('queued', 'running')", (job_id,)).fetchall():
+            if not self.tracker.is_tracked(resource_id):
+                self.tracker.track(resource_id=resource_id, auth=iface.auth, listener=self._on_resource_change)
+        self.dispatch(job_id)
+
+    def dispatch(self, job_id: str):
+        """Send the waiting tiles of the current stage of a job to actinia, until TILE_PARALLELISM
+        tiles are processed, the tiles are only sent if this process holds the credentials of the owner
+
+        :param job_id: The openEO job id
+        """
+
+        if job_id not in self._auth:
+            self.update_job(job_id)
+            return
+
+        with self._lock:
+            stage = self.db.execute("SELECT MIN(stage) FROM job_tiles WHERE job_id = ? AND status != 'finished'",
+                                    (job_id,)).fetchone()[0]
+            active = self.db.execute("SELECT COUNT(*) FROM job_tiles WHERE job_id = ? AND status IN (?, ?, ?)",
+                                     (job_id,) + ACTIVE_TILE_STATES).fetchone()[0]
+            rows = self.db.execute("SELECT tile, location, mapset, process_chain FROM job_tiles "
+                                   "WHERE job_id = ? AND stage = ? AND status = 'waiting' ORDER BY tile LIMIT ?",
+                                   (job_id, stage, max(Config.TILE_PARALLELISM - active, 0))).fetchall()
+            for tile, location, mapset, process_chain in rows:
+                self.db.execute("UPDATE job_tiles SET status = 'submitted' WHERE job_id = ? AND tile = ?",
+                                (job_id, tile))
+
+        # The tiles are sent concurrently in the background, this method is called by the polling
+        # thread of the job status tracker, that must not wait for the requests
+        for row in rows:
+            future = self.executor().submit(self._send, job_id, *row)
+            with self._lock:
+                self._futures.add(future)
+            future.add_done_callback(self._sent)
+        self.update_job(job_id)
+
+    def _sent(self, future: Future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def wait(self, timeout: Optional[float] = None):
+        """Wait until the tiles that are sent in the background were sent
+
+        :param timeout: The maximum time to wait in seconds
+        """
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures, timeout=timeout)
+
+    def _send(self, job_id: str, tile: int, location: str, mapset: Optional[str], process_chain: str):
+
+        try:
+            self._send_tile(job_id, tile, location, mapset, process_chain)
+        except Exception:
+            traceback.print_exc()
+        self.update_job(job_id)
+
+    def _send_tile(self, job_id: str, tile: int, location: str, mapset: Optional[str], process_chain: str):
+
+        # The job reached a final state and its credentials were dropped before the tile was sent
+        if job_id not in self._auth:
+            self.db.execute("UPDATE job_tiles SET status = 'canceled' WHERE job_id = ? AND tile = ? AND "
+                            "status = 'submitted'", (job_id, tile))
+            return
+
+        iface = self._iface(job_id)
+        try:
+            if mapset is not None:
+                code, response = iface.async_persistent_processing(location=location, mapset=mapset,
+                                                                   process_chain=json.loads(process_chain))
+            else:
+                code, response = iface.async_ephemeral_processing_export(location=location,
+                                                                         process_chain=json.loads(process_chain))
+        except Exception as e:
+            code, response = None, str(e)
+
+        if code == 200 and isinstance(response, dict) and "resource_id" in response:
+            resource_id = response["resource_id"]
+            if self.db.execute("UPDATE job_tiles SET status = 'queued', resource_id = ?, info = ? "
+                               "WHERE job_id = ? AND tile = ? AND status = 'submitted'",
+                               (resource_id, json.dumps(response), job_id, tile)).rowcount == 0:
+                # The job was canceled while the tile was sent
+                iface.delete_resource(resource_id=resource_id)
+                return
+            self.tracker.track(resource_id=resource_id, auth=iface.auth, listener=self._on_resource_change)
+        else:
+            self.db.execute("UPDATE job_tiles SET status = 'error', info = ? WHERE job_id = ? AND tile = ?",
+                            (json.dumps(response), job_id, tile))
+
+    def _on_resource_change(self, resource_id: str, code: int, info: dict):
+        """Store the polled information of a tile resource, called by the job status tracker"""
+
+        row = self.db.execute("SELECT job_id, tile FROM job_tiles WHERE resource_id = ?", (resource_id,)).fetchone()
+        if row is None:
+            return
+        job_id, tile = row
+
+        if code == 200 and isinstance(info, dict):
+            status = ACTINIA_STATUS_TO_JOB_STATUS.get(info.get("status"), "queued")
+        elif code == 404:
+            status = "error"
+        else:
+            return
+
+        self.db.execute("UPDATE job_tiles SET status = ?, info = ? WHERE job_id = ? AND tile = ? AND "
+                        "status IN (?, ?, ?)", (status, json.dumps(info), job_id, tile) + ACTIVE_TILE_STATES)
+
+        if status == "finished":
+            self.dispatch(job_id)
+        elif status in ("error", "canceled"):
+            self.cancel(job_id)
+        else:
+            self.update_job(job_id)
+
+    def cancel(self, job_id: str):
+        """Cancel the waiting and processed tiles of a job
+
+        :param job_id: The openEO job id
+        """
+
+        with self._lock:
+            rows = self.db.execute("SELECT resource_id FROM job_tiles WHERE job_id = ? AND resource_id IS NOT NULL "
+                                   "AND status IN ('queued', 'running')", (job_id,)).fetchall()
+            self.db.execute("UPDATE job_tiles SET status = 'canceled' WHERE job_id = ? AND "
+                            "status IN ('waiting', ?, ?, ?)", (job_id,) + ACTIVE_TILE_STATES)
+
+        iface = self._iface(job_id)
+        for resource_id, in rows:
+            try:
+                iface.delete_resource(resource_id=resource_id)
+            except Exception:
+                traceback.print_exc()
+
+        self.update_job(job_id)
+
+    def delete(self, job_id: str):
+        """Cancel the tiles of a job and remove the tiles, their mapsets, their actinia nodes and the mosaics
+
+        :param job_id: The openEO job id
+        """
+
+        if self.is_tiled(job_id):
+            self.cancel(job_id)
+            self.remove_mapsets(job_id)
+            with self.db.transaction():
+                self.db.execute("DELETE FROM actinia_resources WHERE resource_id IN "
+                                "(SELECT resource_id FROM job_tiles WHERE job_id = ?)", (job_id,))
+                self.db.execute("DELETE FROM job_tiles WHERE job_id = ?", (job_id,))
+        self._auth.pop(job_id, None)
+        self._listeners.pop(job_id, None)
+        shutil.rmtree(self.mosaic_directory(job_id), ignore_errors=True)
+
+    def remove_mapsets(self, job_id: str):
+        """Remove the persistent mapsets of the tiles of a job
+
+        :param job_id: The openEO job id
+        """
+
+        with self._lock:
+            rows = self.db.execute("SELECT DISTINCT location, mapset FROM job_tiles WHERE job_id = ? AND "
+                                   "mapset IS NOT NULL", (job_id,)).fetchall()
+            self.db.execute("UPDATE job_tiles SET mapset = NULL WHERE job_id = ?", (job_id,))
+
+        iface = self._iface(job_id)
+        for location, mapset in rows:
+            try:
+                iface.delete_mapset(location=location, mapset=mapset)
+            except Exception:
+                traceback.print_exc()
+
+    def update_job(self, job_id: str):
+        """Store the status of a tiled job and the status and progress of its tiles in the job,
+        the mosaic is started when all tiles were finished
+
+        :param job_id: The openEO job id
+        """
+
+        job_db = JobDB()
+
+        with self._lock:
+            rows = self.db.execute("SELECT tile, stage, row, col, extent, mosaic, status, resource_id, info "
+                                   "FROM job_tiles WHERE job_id = ? ORDER BY tile", (job_id,)).fetchall()
+            if not rows or job_id not in job_db:
+                return
+
+            job = job_db[job_id]
+            previous = job.additional_info if isinstance(job.additional_info, dict) else {}
+            # The results of the job are the exports of the tiles of the last stage
+            last_stage = max(row[1] for row in rows)
+            tiles = []
+            resources = []
+            for tile, stage, row, col, extent, mosaic, status, resource_id, info in rows:
+                info = json.loads(info) if info else None
+                tiles.append({"tile": tile, "stage": stage, "row": row, "col": col, "extent": json.loads(extent),
+                              "status": status, "resource_id": resource_id,
+                              "progress": info.get("progress") if isinstance(info, dict) else None})
+                if stage == last_stage and status == "finished" and isinstance(info, dict):
+                    resources.extend((info.get("urls") or {}).get("resources") or [])
+
+            mosaic = bool(rows[0][5])
+            statuses = [tile["status"] for tile in tiles]
+            finished = statuses.count("finished")
+            additional_info = {"tiles": tiles, "progress": round(100.0 * finished / len(tiles), 1)}
+
+            if "error" in statuses:
+                status = "error"
+            elif "canceled" in statuses:
+                status = "canceled"
+            elif finished == len(tiles):
+                if not mosaic:
+                    status = "finished"
+                    additional_info["urls"] = {"resources": resources}
+                else:
+                    mosaic_status = previous.get("mosaic")
+                    additional_info["mosaic"] = mosaic_status or "running"
+                    additional_info["mosaics"] = previous.get("mosaics", [])
+                    status = {"finished": "finished", "error": "error"}.get(mosaic_status, "running")
+                    if mosaic_status is None:
+                        threading.Thread(target=self._mosaic, args=(job_id,), name="tile-mosaic",
+                                         daemon=True).start()
+            elif "running" in statuses or finished:
+                status = "running"
+            else:
+                status = "queued"
+
+            if job.status != status or previous.get("tiles") != tiles or previous.get("mosaic") != \
+                    additional_info.get("mosaic"):
+                job.status = status
+                job.additional_info = additional_info
+                job.updated = str(datetime.now())
+                job_db.update_status(job_id, job)
+                self.tracker.set_job_status(job_id=job_id, status=status)
+
+        # The partial results and the credentials of the owner are not needed anymore
+        if status in ("finished", "error", "canceled"):
+            self.remove_mapsets(job_id)
+            self._auth.pop(job_id, None)
+            listener = self._listeners.pop(job_id, None)
+            if listener is not None:
+                listener(job_id)
+
+    def _mosaic(self, job_id: str):
+
+        try:
+            names = self.stitch(job_id)
+            mosaic_status = "finished"
+        except Exception:
+            traceback.print_exc()
+            names = []
+            mosaic_status = "error"
+
+        job_db = JobDB()
+        with self._lock:
+            if job_id not in job_db:
+                return
+            job = job_db[job_id]
+            job.additional_info = dict(job.additional_info or {}, mosaic=mosaic_status, mosaics=names)
+            job_db.update_status(job_id, job)
+        self.update_job(job_id)
+
+    def stitch(self, job_id: str) -> List[str]:
+        """Download the GeoTIFF exports of the tiles of a job and stitch them into one mosaic per result
+
+        :param job_id: The openEO job id
+        :return: The file names of the mosaics in the mosaic directory of the job
+        """
+
+        directory = self.mosaic_directory(job_id)
+        os.makedirs(directory, exist_ok=True)
+        download = tempfile.mkdtemp(dir=directory)
+        iface = self._iface(job_id)
+
+        try:
+            files = {}
+            for tile, info in self.db.execute("SELECT tile, info FROM job_tiles WHERE job_id = ? ORDER BY tile",
+                                              (job_id,)).fetchall():
+                info = json.loads(info) if info else {}
+                for url in (info.get("urls") or {}).get("resources") or []:
+                    name = os.path.basename(urlparse(url).path)
+                    if not name.lower().endswith(MOSAIC_EXTENSIONS):
+                        continue
+                    filename = os.path.join(download, "%i_%s" % (tile, name))
+                    code = iface.download_resource_file(url=url, filename=filename)
+                    if code != 200:
+                        raise Exception(f"Unable to download the export {url} of tile {tile}, status code {code}")
+                    files.setdefault(name, []).append(filename)
+
+            for name, filenames in files.items():
+                dataset = gdal.BuildVRT(os.path.join(download, name + ".vrt"), filenames)
+                mosaic = gdal.Translate(os.path.join(directory, name), dataset,
+                                        creationOptions=["TILED=YES", "COMPRESS=DEFLATE", "BIGTIFF=IF_SAFER"])
+                if mosaic is None:
+                    raise Exception(f"Unable to create the mosaic {name}")
+                dataset = mosaic = None
+
+            return sorted(files)
+        finally:
+            shutil.rmtree(download, ignore_errors=True)
+
+
+TILE_DISPATCHER = TileDispatcher()
@@ -74,6 +74,36 @@ REDUCE_TIME_MIN = {
     }
 }
 
+REDUCE_TIME_MULTI = {
+    "process_graph": {
+        "process_id": "raster_exporter",
+        "minimum": {
+            "process_id": "reduce_time",
+            "method": "minimum",
+            "images": {
+                "process_id": "get_data",
+                "data_id": "latlong_wgs84.modis_ndvi_global.strds.ndvi_16_5600m"
+            }
+        },
+        "maximum": {
+            "process_id": "reduce_time",
+            "method": "maximum",
+            "images": {
+                "process_id": "get_data",
+                "data_id": "latlong_wgs84.modis_ndvi_global.strds.ndvi_16_5600m"
+            }
+        },
+        "average": {
+            "process_id": "reduce_time",
+            "method": "average",
+            "images": {
+                "process_id": "get_data",
+                "data_id": "latlong_wgs84.modis_ndvi_global.strds.ndvi_16_5600m"
+            }
+        }
+    }
+}
+
 NDVI_1 = {
     "process_graph": {
         "process_id": "NDVI",
@@ -148,6 +178,65 @@ RASTER_EXPORT = {
     }
 }
 
+RASTER_EXPORT_BBOX = {
+    "process_graph": {
+        "process_id": "raster_exporter",
+        "imagery": {
+            "process_id": "filter_bbox",
+            "imagery": {
+                "process_id": "get_data",
+                "data_id": "nc_spm_08.PERMANENT.raster.elevation"
+            },
+            "spatial_extent": {
+                "left": 630000,
+                "right": 645000,
+                "top": 228500,
+                "bottom": 215000,
+                "width_res": 10,
+                "height_res": 10,
+            }
+        }
+    }
+}
+
+BAND_MATH = {
+    "process_graph": {
+        "process_id": "raster_exporter",
+        "imagery": {
+            "process_id": "band_math",
+            "expression": "(ndvi * 2 * 5 + 0) / (savi + 1 + 2)",
+            "color": "ndvi",
+            "bands": {
+                "ndvi": {
+                    "process_id": "NDVI2",
+                    "red": {
+                        "process_id": "get_data",
+                        "data_id": "nc_spm_08.landsat.strds.lsat5_red"
+                    },
+                    "nir": {
+                        "process_id": "get_data",
+                        "data_id": "nc_spm_08.landsat.strds.lsat5_nir"
+                    }
+                },
+                "savi": {
+                    "process_id": "band_math",
+                    "expression": "1.5 * (nir - red) / (nir + red + 0.5)",
+                    "bands": {
+                        "red": {
+                            "process_id": "get_data",
+                            "data_id": "nc_spm_08.landsat.strds.lsat5_red"
+                        },
+                        "nir": {
+                            "process_id": "get_data",
+                            "data_id": "nc_spm_08.landsat.strds.lsat5_nir"
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
+
 ZONAL_STATISTICS_SINGLE = {
     "process_graph": {
         "process_id": "zonal_statistics",
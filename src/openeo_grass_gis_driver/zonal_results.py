@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+import csv
+import io
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+from typing import Dict, Iterator, List, Optional
+import numpy
+from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+# The columns of the zonal statistics tables and their types, the text columns are
+# stored as fixed width unicode arrays, the zone is -1 if the statistics were computed with a mask
+ZONAL_COLUMNS = (("strds", "U"),
+                 ("map", "U"),
+                 ("zone", "int64"),
+                 ("start", "U"),
+                 ("end", "U"),
+                 ("count", "int64"),
+                 ("min", "float64"),
+                 ("max", "float64"),
+                 ("mean", "float64"),
+                 ("stddev", "float64"))
+
+# The streamed formats of the zonal statistics tables and their content types
+ZONAL_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+if pyarrow is not None:
+    ZONAL_FORMATS["arrow"] = "application/vnd.apache.arrow.stream"
+
+
+def _float(value: Optional[str]) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _int(value: Optional[str], default: int = 0) -> int:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_univar_output(output: str, strds: str = "") -> Dict[str, list]:
+    """Parse the output of t.rast.univar into the columns of the zonal statistics
+
+    The first line of the output is the header of the columns, the columns are
+    identified by their name, so that the output with and without zones is supported.
+
+    :param output: The pipe separated output of t.rast.univar
+    :param strds: The name of the input strds
+    :return: A dictionary with a list of values for each ZONAL_COLUMNS
+    """
+
+    columns = {name: [] for name, dtype in ZONAL_COLUMNS}
+    lines = [line for line in output.splitlines() if line.strip()]
+    if not lines:
+        return columns
+
+    header = lines[0].strip().split("|")
+    for line in lines[1:]:
+        row = dict(zip(header, line.strip().split("|")))
+        if "id" not in row:
+            continue
+
+        if "non_null_cells" in row:
+            count = _int(row["non_null_cells"])
+        else:
+            count = _int(row.get("cells")) - _int(row.get("null_cells"))
+
+        columns["strds"].append(strds)
+        columns["map"].append(row["id"])
+        columns["zone"].append(_int(row.get("zone"), -1))
+        columns["start"].append(row.get("start", ""))
+        columns["end"].append(row.get("end", ""))
+        columns["count"].append(count)
+        columns["min"].append(_float(row.get("min")))
+        columns["max"].append(_float(row.get("max")))
+        columns["mean"].append(_float(row.get("mean")))
+        columns["stddev"].append(_float(row.get("stddev")))
+
+    return columns
+
+
+def parse_process_log(process_log: List[dict]) -> Dict[str, numpy.ndarray]:
+    """Parse the outputs of all t.rast.univar steps of an actinia process log into a columnar table
+
+    :param process_log: The process log of the actinia resource information
+    :return: A dictionary with a NumPy array for each ZONAL_COLUMNS
+    """
+
+    columns = {name: [] for name, dtype in ZONAL_COLUMNS}
+    for entry in process_log or []:
+        if entry.get("executable") != "t.rast.univar":
+            continue
+
+        strds = ""
+        for parameter in entry.get("parameter", []):
+            if isinstance(parameter, str) and parameter.startswith("input="):
+                strds = parameter[len("input="):]
+
+        stdout = entry.get("stdout", "")
+        if isinstance(stdout, list):
+            stdout = "\n".join(stdout)
+        for name, values in parse_univar_output(stdout, strds=strds).items():
+            columns[name].extend(values)
+
+    return {name: numpy.array(columns[name], dtype=dtype) for name, dtype in ZONAL_COLUMNS}
+
+
+def zonal_result_key(job_id: str, resource_id: str) -> str:
+    """Return the key of the zonal statistics of a job run, a restarted job gets a new table
+
+    :param job_id: The id of the job
+    :param resource_id: The id of the actinia resource of the job run
+    :return: The key of the table in the ZonalResultStore
+    """
+    return "%s-%s" % (job_id, resource_id)
+
+
+class ZonalResultStore(object):
+    """The store of the parsed zonal statistics of the jobs
+
+    The columns of a table are stored as NumPy files in a directory per job, that are
+    memory mapped when the table is streamed, hence the process log is parsed once and
+    a table is never loaded completely into memory.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        """Constructor
+
+        :param directory: The directory of the tables, the configured ZONAL_RESULT_DIRECTORY is used if None
+        """
+        self.directory = directory or ActiniaConfig.ZONAL_RESULT_DIRECTORY
+
+    def path(self, job_id: str) -> str:
+        return os.path.join(self.directory, re.sub(r"[^A-Za-z0-9_.-]", "_", job_id))
+
+    def __contains__(self, job_id: str) -> bool:
+        return os.path.isfile(os.path.join(self.path(job_id), "table.json"))
+
+    def store(self, job_id: str, columns: Dict[str, numpy.ndarray]):
+        """Store the columns of a table, an existing table of the job is replaced
+
+        :param job_id: The id of the job
+        :param columns: The NumPy arrays of the ZONAL_COLUMNS
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+        directory = tempfile.mkdtemp(dir=self.directory)
+        for name, dtype in ZONAL_COLUMNS:
+            numpy.save(os.path.join(directory, name + ".npy"), columns[name])
+        with open(os.path.join(directory, "table.json"), "w") as f:
+            json.dump({"rows": int(len(columns["map"])), "columns": [name for name, dtype in ZONAL_COLUMNS]}, f)
+
+        path = self.path(job_id)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.replace(directory, path)
+
+    def load(self, job_id: str) -> Dict[str, numpy.ndarray]:
+        """Return the memory mapped columns of a table
+
+        :param job_id: The id of the job
+        :return: The NumPy arrays of the ZONAL_COLUMNS
+        """
+        path = self.path(job_id)
+        return {name: numpy.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name, dtype in ZONAL_COLUMNS}
+
+    def delete(self, job_id: str):
+        shutil.rmtree(self.path(job_id), ignore_errors=True)
+
+
+def _chunks(columns: Dict[str, numpy.ndarray]) -> Iterator[Dict[str, list]]:
+    """Yield the rows of a table in chunks of ZONAL_RESULT_CHUNK_SIZE rows as lists of python values"""
+
+    rows = len(columns["map"])
+    size = ActiniaConfig.ZONAL_RESULT_CHUNK_SIZE
+    for start in range(0, rows, size):
+        yield {name: columns[name][start:start + size].tolist() for name, dtype in ZONAL_COLUMNS}
+
+
+def _json_value(value):
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def stream_csv(columns: Dict[str, numpy.ndarray]) -> Iterator[str]:
+    names = [name for name, dtype in ZONAL_COLUMNS]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(names)
+    for chunk in _chunks(columns):
+        writer.writerows(map(lambda values: map(_json_value, values), zip(*(chunk[name] for name in names))))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_ndjson(columns: Dict[str, numpy.ndarray]) -> Iterator[str]:
+    names = [name for name, dtype in ZONAL_COLUMNS]
+    for chunk in _chunks(columns):
+        lines = []
+        for values in zip(*(chunk[name] for name in names)):
+            lines.append(json.dumps(dict(zip(names, map(_json_value, values))), separators=(",", ":")))
+        yield "\n".join(lines) + "\n"
+
+
+def stream_arrow(columns: Dict[str, numpy.ndarray]) -> Iterator[bytes]:
+    names = [name for name, dtype in ZONAL_COLUMNS]
+    schema = pyarrow.schema([(name, pyarrow.string() if dtype == "U" else pyarrow.from_numpy_dtype(dtype))
+                             for name, dtype in ZONAL_COLUMNS])
+    buffer = io.BytesIO()
+    writer = pyarrow.ipc.new_stream(buffer, schema)
+    rows = len(columns["map"])
+    size = ActiniaConfig.ZONAL_RESULT_CHUNK_SIZE
+    for start in range(0, rows, size):
+        arrays = [pyarrow.array(numpy.asarray(columns[name][start:start + size]), type=schema.field(name).type)
+                  for name in names]
+        writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema=schema))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    writer.close()
+    yield buffer.getvalue()
+
+
+# The functions that stream a table in a format
+ZONAL_STREAMS = {"csv": stream_csv, "ndjson": stream_ndjson}
+if pyarrow is not None:
+    ZONAL_STREAMS["arrow"] = stream_arrow
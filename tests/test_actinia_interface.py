@@ -72,6 +72,19 @@ class ActiniaInterfaceTestCase(TestBase):
 
         self.assertEqual(status, 200)
 
+    def test_connection_reuse(self):
+        iface = ActiniaInterface(self.gconf)
+        iface.list_mapsets(location="nc_spm_08")
+        key = list(ActiniaInterface.connection_statistics().keys())[0]
+        hits = ActiniaInterface.connection_statistics()[key]["hits"]
+
+        status, mapsets = iface.list_mapsets(location="nc_spm_08")
+        stats = ActiniaInterface.connection_statistics()[key]
+        pprint(stats)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(stats["hits"], hits + 1)
+
     def test_layer_exists_1(self):
         iface = ActiniaInterface(self.gconf)
         status = iface.check_layer_exists(layer_name="latlong_wgs84.modis_ndvi_global.strds.ndvi_16_5600m")
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+from openeo_grass_gis_driver.test_base import TestBase
+from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
+from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+from openeo_grass_gis_driver.actinia_processing.actinia_job_db import ActiniaJobDB
+from openeo_grass_gis_driver.actinia_processing.actinia_nodes import ActiniaNodePool, NODE_POOL
+from openeo_grass_gis_driver.job_db import JobDB
+from openeo_grass_gis_driver.job_schemas import JobInformation
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+NODE_A = "http://actinia-a:8088/latest"
+NODE_B = "http://actinia-b:8088/latest"
+NODE_C = "http://actinia-c:8088/latest"
+
+
+class ActiniaNodesTestCase(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.database = ActiniaConfig.DATABASE
+        ActiniaConfig.DATABASE = os.path.join(self.tempdir.name, "database.sqlite")
+
+        self.config = ActiniaConfig()
+        self.config.ACTINIA_NODES = [{"host": "http://actinia-a", "port": 8088},
+                                     {"host": "http://actinia-b", "port": 8088},
+                                     {"host": "http://actinia-c", "port": 8088, "locations": ["nc_spm_08"]}]
+        self.config.ACTINIA_HEALTH_INTERVAL = 3600
+        self.health = {NODE_A: True, NODE_B: True, NODE_C: True}
+        self.pool = ActiniaNodePool(check=lambda url: self.health[url])
+        self.pool.check_nodes(config=self.config)
+
+    def tearDown(self):
+        ActiniaConfig.DATABASE = self.database
+        self.tempdir.cleanup()
+
+    def test_round_robin(self):
+        self.config.ACTINIA_ROUTING = "round_robin"
+        nodes = [self.pool.select(config=self.config) for i in range(6)]
+        self.assertEqual({NODE_A, NODE_B, NODE_C}, set(nodes))
+        self.assertEqual(nodes[:3], nodes[3:])
+
+        # Only the nodes that serve a location receive its requests
+        self.assertEqual({NODE_A, NODE_B}, {self.pool.select("latlong_wgs84", config=self.config)
+                                            for i in range(6)})
+
+    def test_least_outstanding(self):
+        self.config.ACTINIA_ROUTING = "least_outstanding"
+        self.pool.assign("resource_id-1", NODE_A)
+        self.pool.assign("resource_id-2", NODE_A)
+        self.pool.assign("resource_id-3", NODE_B)
+        self.assertEqual(NODE_C, self.pool.select("nc_spm_08", config=self.config))
+        self.assertEqual(NODE_B, self.pool.select("latlong_wgs84", config=self.config))
+
+        self.pool.release("resource_id-1")
+        self.pool.release("resource_id-2")
+        self.assertEqual(NODE_A, self.pool.select("latlong_wgs84", config=self.config))
+
+    def test_location_affinity(self):
+        self.config.ACTINIA_ROUTING = "location_affinity"
+        node = self.pool.select("nc_spm_08", config=self.config)
+        self.assertEqual({node}, {self.pool.select("nc_spm_08", config=self.config) for i in range(6)})
+
+    def test_ejection(self):
+        # A failed health check ejects a node, a successful one admits it again
+        self.health[NODE_B] = False
+        self.pool.check_nodes(config=self.config)
+        self.assertEqual({NODE_A}, {self.pool.select("latlong_wgs84", config=self.config) for i in range(6)})
+
+        self.health[NODE_B] = True
+        self.pool.check_nodes(config=self.config)
+        self.assertEqual({NODE_A, NODE_B}, {self.pool.select("latlong_wgs84", config=self.config)
+                                            for i in range(6)})
+
+        # A connection error ejects the node of the request
+        self.pool.report_failure("http://actinia-a:8088/latest/locations")
+        self.assertEqual({NODE_B}, {self.pool.select("latlong_wgs84", config=self.config) for i in range(6)})
+        statistics = {node["url"]: node for node in self.pool.statistics(config=self.config)}
+        self.assertFalse(statistics[NODE_A]["healthy"])
+        self.assertEqual(1, statistics[NODE_A]["ejections"])
+
+        # The requests are sent to all nodes if no node is healthy
+        self.health = {NODE_A: False, NODE_B: False, NODE_C: False}
+        self.pool.check_nodes(config=self.config)
+        self.assertEqual({NODE_A, NODE_B}, {self.pool.select("latlong_wgs84", config=self.config)
+                                            for i in range(6)})
+
+    def test_resource_owner(self):
+        self.pool.assign("resource_id-1", NODE_C)
+        self.assertEqual(NODE_C, self.pool.select(resource_id="resource_id-1", config=self.config))
+
+        # The owner is remembered in the actinia job database
+        self.assertEqual(NODE_C, ActiniaJobDB().node("resource_id-1"))
+        pool = ActiniaNodePool(check=lambda url: True)
+        self.assertEqual(NODE_C, pool.select(resource_id="resource_id-1", config=self.config))
+
+        # The requests of the resources are sent to their owner
+        NODE_POOL.assign("resource_id-2", NODE_B)
+        iface = ActiniaInterface(self.config)
+        self.assertEqual(NODE_B, iface._base_url(resource_id="resource_id-2"))
+        self.assertEqual(NODE_A, ActiniaInterface(self.config, node=NODE_A).base_url)
+
+    def test_finished_resources(self):
+        JobDB(user="user")["job-1"] = JobInformation(job_id="job-1", title="Title", description="Description",
+                                                     status="queued", process_graph={}, output=None,
+                                                     submitted="2018-01-01", updated=None)
+        ActiniaJobDB()["job-1"] = "resource_id-1"
+        self.pool.assign("resource_id-1", NODE_A)
+        self.pool.assign("resource_id-2", NODE_A)
+        self.assertEqual(2, self.pool.nodes(self.config)[0].to_dict()["outstanding"])
+
+        # Finished resources are released, only the nodes of the job resources are remembered
+        self.pool.finish("resource_id-1")
+        self.pool.finish("resource_id-2")
+        self.assertEqual(0, self.pool.nodes(self.config)[0].to_dict()["outstanding"])
+        self.assertEqual(NODE_A, ActiniaJobDB().node("resource_id-1"))
+        self.assertIsNone(ActiniaJobDB().node("resource_id-2"))
+        self.assertIsNone(self.pool.owner("resource_id-2"))
+
+    def test_single_node(self):
+        config = ActiniaConfig()
+        self.assertEqual(["%s:%s/latest" % (config.HOST, config.PORT)],
+                         [node["url"] for node in NODE_POOL.statistics(config=config)])
+        self.assertEqual("%s:%s/latest" % (config.HOST, config.PORT), ActiniaInterface(config).base_url)
+
+
+if __name__ == "__main__":
+    unittest.main()
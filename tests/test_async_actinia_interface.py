@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import inspect
+import unittest
+from openeo_grass_gis_driver.test_base import TestBase
+from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+from openeo_grass_gis_driver.actinia_processing.async_actinia_interface import AsyncActiniaInterface, \
+    gather_bounded, run_async
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+class RecordingInterface(object):
+    """Records the requests instead of sending them to actinia"""
+
+    user = "user"
+
+    def __init__(self):
+        self.requests = []
+
+    def list_strds_raster_layers(self, location, mapset, strds, timeout=None):
+        self.requests.append(("list_strds_raster_layers", location, mapset, strds))
+        return 200, {"process_results": []}
+
+
+class AsyncActiniaInterfaceTestCase(TestBase):
+
+    def test_method_surface(self):
+        # All public methods of the actinia interface are provided by the asyncio interface
+        methods = [name for name, member in inspect.getmembers(ActiniaInterface)
+                   if callable(member) and not name.startswith("_")]
+        for name in methods:
+            self.assertTrue(hasattr(AsyncActiniaInterface, name), name)
+            # The requests are awaitable, the static helpers are not
+            if not isinstance(inspect.getattr_static(ActiniaInterface, name), staticmethod) \
+                    and name != "set_auth":
+                self.assertTrue(inspect.iscoroutinefunction(getattr(AsyncActiniaInterface, name)), name)
+
+        iface = RecordingInterface()
+        code, info = run_async(AsyncActiniaInterface(iface=iface).list_strds_raster_layers("nc", "landsat", "red"))
+        self.assertEqual(200, code)
+        self.assertEqual([("list_strds_raster_layers", "nc", "landsat", "red")], iface.requests)
+
+    def test_gather_bounded(self):
+        running = 0
+        maximum = 0
+
+        async def work(number):
+            nonlocal running, maximum
+            running += 1
+            maximum = max(maximum, running)
+            # The later coroutines finish first
+            await asyncio.sleep(0.001 * (20 - number))
+            running -= 1
+            return number
+
+        results = run_async(gather_bounded([work(number) for number in range(20)], limit=3))
+        # The results are in the order of the coroutines, at most limit of them were running
+        self.assertEqual(list(range(20)), results)
+        self.assertEqual(3, maximum)
+
+        maximum = 0
+        self.assertEqual([0], run_async(gather_bounded([work(0)], limit=1)))
+        self.assertEqual(1, maximum)
+        self.assertEqual([], run_async(gather_bounded([], limit=3)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import unittest
+from openeo_grass_gis_driver.test_base import TestBase
+from openeo_grass_gis_driver.authentication import CREDENTIAL_CACHE, credential_key, \
+    invalidate_credentials, ok_user_and_password
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+class AuthenticationTestCase(TestBase):
+
+    def test_credential_key(self):
+        key = credential_key("user", "secret")
+
+        self.assertEqual(key[0], "user")
+        self.assertFalse("secret" in key[1])
+        self.assertEqual(key, credential_key("user", "secret"))
+        self.assertNotEqual(key, credential_key("user", "other"))
+
+    def test_credential_cache(self):
+        invalidate_credentials()
+
+        self.assertTrue(ok_user_and_password(self.gconf.USER, self.gconf.PASSWORD))
+        self.assertTrue(credential_key(self.gconf.USER, self.gconf.PASSWORD) in CREDENTIAL_CACHE)
+        # The second verification is served from the cache
+        self.assertTrue(ok_user_and_password(self.gconf.USER, self.gconf.PASSWORD))
+        self.assertFalse(ok_user_and_password(self.gconf.USER, "wrong_password"))
+
+        invalidate_credentials(self.gconf.USER)
+        self.assertFalse(credential_key(self.gconf.USER, self.gconf.PASSWORD) in CREDENTIAL_CACHE)
+
+
+if __name__ == "__main__":
+    unittest.main()
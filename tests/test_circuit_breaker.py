@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+import unittest
+from openeo_grass_gis_driver.test_base import TestBase
+from openeo_grass_gis_driver.app import flask_api
+from openeo_grass_gis_driver.authentication import fails_fast_on_open_circuit
+from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
+from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+from openeo_grass_gis_driver.actinia_processing.circuit_breaker import CircuitBreakerRegistry, CircuitOpenError, \
+    CIRCUIT_BREAKERS, endpoint_class
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+NODE = "http://actinia-down:8088/latest"
+
+
+class CircuitBreakerTestCase(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.config = {key: getattr(ActiniaConfig, key) for key in ("CIRCUIT_BREAKER", "CIRCUIT_RESET_TIMEOUT")}
+        self.healthy = False
+        self.probes = []
+        self.registry = CircuitBreakerRegistry(probe=self.probe)
+
+    def tearDown(self):
+        for key, value in self.config.items():
+            setattr(ActiniaConfig, key, value)
+        CIRCUIT_BREAKERS.reset()
+
+    def probe(self, url):
+        self.probes.append(url)
+        return self.healthy
+
+    def test_endpoint_class(self):
+        self.assertEqual("health", endpoint_class("GET", NODE + "/health_check"))
+        self.assertEqual("processing", endpoint_class("POST", NODE + "/locations/nc_spm_08/processing_async"))
+        self.assertEqual("resources", endpoint_class("GET", NODE + "/resources/user/resource_id-1"))
+        self.assertEqual("data", endpoint_class("GET", NODE + "/locations/nc_spm_08/mapsets"))
+
+    def test_thresholds(self):
+        url = NODE + "/locations/nc_spm_08/processing_async"
+        for i in range(2):
+            self.registry.before_request("POST", url)
+            self.registry.record("POST", url, 503)
+        # A success resets the consecutive failures
+        self.registry.record("POST", url, 400)
+        for i in range(2):
+            self.registry.record("POST", url, None)
+        self.registry.before_request("POST", url)
+        self.registry.record("POST", url, 504)
+
+        # The processing circuit opens after three failures, the other endpoint classes are not affected
+        self.assertRaises(CircuitOpenError, self.registry.before_request, "POST", url)
+        self.registry.before_request("GET", NODE + "/locations/nc_spm_08/mapsets")
+        self.registry.before_request("GET", NODE + "/health_check")
+        self.assertEqual([], self.probes)
+
+        circuits = {circuit["endpoint"]: circuit for circuit in self.registry.statistics()}
+        self.assertEqual("open", circuits["processing"]["state"])
+        self.assertEqual(1, circuits["processing"]["trips"])
+        self.assertEqual("closed", circuits["data"]["state"])
+
+    def test_half_open(self):
+        ActiniaConfig.CIRCUIT_RESET_TIMEOUT = 0.05
+        url = NODE + "/locations/nc_spm_08/mapsets"
+        for i in range(5):
+            self.registry.record("GET", url, None)
+        self.assertRaises(CircuitOpenError, self.registry.before_request, "GET", url)
+
+        # The probe of the half-open circuit fails, the circuit opens again
+        time.sleep(0.06)
+        self.assertRaises(CircuitOpenError, self.registry.before_request, "GET", url)
+        self.assertEqual([url], self.probes)
+        self.assertRaises(CircuitOpenError, self.registry.before_request, "GET", url)
+        self.assertEqual(1, len(self.probes))
+
+        # The probe succeeds, the circuit is closed
+        time.sleep(0.06)
+        self.healthy = True
+        self.registry.before_request("GET", url)
+        self.registry.before_request("GET", url)
+        self.assertEqual(2, len(self.probes))
+        self.assertEqual("closed", self.registry.statistics()[0]["state"])
+
+    def test_fail_fast(self):
+        url = NODE + "/locations"
+        for i in range(5):
+            CIRCUIT_BREAKERS.record("GET", url, None)
+
+        # The request is not sent
+        iface = ActiniaInterface(node=NODE)
+        start = time.monotonic()
+        self.assertRaises(CircuitOpenError, iface.list_locations)
+        self.assertLess(time.monotonic() - start, 0.1)
+
+        # The resources answer with 503, even if they handle the error
+        @fails_fast_on_open_circuit
+        def resource():
+            try:
+                iface.list_locations()
+            except Exception:
+                pass
+            return "handled"
+
+        with flask_api.app.test_request_context():
+            response = resource()
+        self.assertEqual(503, response.status_code)
+        self.assertEqual("30", response.headers["Retry-After"])
+        self.assertEqual(503, json.loads(response.data.decode())["code"])
+
+        # Disabled circuit breakers never reject requests
+        ActiniaConfig.CIRCUIT_BREAKER = False
+        CIRCUIT_BREAKERS.before_request("GET", url)
+
+    def test_health(self):
+        response = self.app.get('/health')
+        self.assertEqual(200, response.status_code)
+        health = json.loads(response.data.decode())
+        self.assertIn(health["status"], ("ok", "degraded"))
+        self.assertTrue(health["nodes"][0]["healthy"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+import time
+import unittest
+from openeo_grass_gis_driver.test_base import TestBase
+from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+from openeo_grass_gis_driver.actinia_processing.async_actinia_interface import run_async
+from openeo_grass_gis_driver.collection_catalogue import CollectionCatalogue, invalidate_catalogue, CATALOGUE
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+class FakeInterface(object):
+    """Serves the mapsets and layers of a dictionary and records the requests"""
+
+    def __init__(self, locations: dict):
+        # location -> mapset -> list of layer names
+        self.locations = locations
+        self.requests = []
+
+    async def list_mapsets(self, location):
+        self.requests.append(("mapsets", location))
+        return 200, list(self.locations[location])
+
+    async def _list(self, datatype, location, mapset):
+        self.requests.append((datatype, location, mapset))
+        return 200, list(self.locations[location][mapset]) if datatype == "raster" else []
+
+    async def list_strds(self, location, mapset):
+        return await self._list("strds", location, mapset)
+
+    async def list_raster(self, location, mapset):
+        return await self._list("raster", location, mapset)
+
+    async def list_vector(self, location, mapset):
+        return await self._list("vector", location, mapset)
+
+
+class CollectionCatalogueTestCase(TestBase):
+
+    def setUp(self):
+        self.fake = FakeInterface({"nc_spm_08": {"PERMANENT": ["elevation"], "landsat": ["lsat7_2002_10"]}})
+
+    def catalogue(self, ttl=100, max_stale=100):
+        return CollectionCatalogue(ttl=ttl, max_stale=max_stale, maxsize=100, interface=lambda: self.fake)
+
+    def wait_for_refresh(self, catalogue):
+        for _ in range(100):
+            if not catalogue._refreshing:
+                return
+            time.sleep(0.01)
+        self.fail("The background refresh did not finish")
+
+    def test_cached_listing(self):
+        catalogue = self.catalogue()
+        listing = run_async(catalogue.list_layers())
+        self.assertIn(("nc_spm_08", "PERMANENT", "raster", ["elevation"]), listing)
+        self.assertEqual(7, len(self.fake.requests))
+
+        # Fresh listings are served from the cache
+        self.assertEqual(listing, run_async(catalogue.list_layers()))
+        self.assertEqual(7, len(self.fake.requests))
+
+    def test_internal_mapsets(self):
+        self.fake.locations["nc_spm_08"]["openeo_zone_cache"] = ["zones_1"]
+        self.fake.locations["nc_spm_08"]["openeo_window_1"] = ["window_1"]
+
+        listing = run_async(self.catalogue().list_layers())
+        self.assertEqual({"PERMANENT", "landsat"}, set(mapset for _, mapset, _, _ in listing))
+
+    def test_stale_while_revalidate(self):
+        catalogue = self.catalogue(ttl=0)
+        run_async(catalogue.list_layers())
+        self.fake.requests.clear()
+
+        # A new mapset and a new layer, the stale listing is served while it is refreshed
+        self.fake.locations["nc_spm_08"]["new"] = ["new_map"]
+        self.fake.locations["nc_spm_08"]["PERMANENT"].append("slope")
+        listing = run_async(catalogue.list_layers())
+        self.assertNotIn("new", set(mapset for _, mapset, _, _ in listing))
+        self.assertIn(("nc_spm_08", "PERMANENT", "raster", ["elevation"]), listing)
+
+        self.wait_for_refresh(catalogue)
+        catalogue.ttl = 100
+        listing = run_async(catalogue.list_layers())
+        self.assertIn(("nc_spm_08", "new", "raster", ["new_map"]), listing)
+        self.assertIn(("nc_spm_08", "PERMANENT", "raster", ["elevation", "slope"]), listing)
+
+    def test_refresh_new_mapsets(self):
+        catalogue = self.catalogue()
+        run_async(catalogue.list_layers())
+        self.fake.requests.clear()
+
+        # Only the layers of the new mapset are fetched with the mapset listing
+        self.fake.locations["nc_spm_08"]["new"] = ["new_map"]
+        del self.fake.locations["nc_spm_08"]["landsat"]
+        run_async(catalogue.refresh(["nc_spm_08"]))
+        self.assertEqual([("mapsets", "nc_spm_08"), ("strds", "nc_spm_08", "new"),
+                          ("raster", "nc_spm_08", "new"), ("vector", "nc_spm_08", "new")], self.fake.requests)
+
+        # The listings of the removed mapset were dropped
+        self.assertNotIn(("nc_spm_08", "landsat", "raster"), catalogue.layers)
+        self.assertIn(("nc_spm_08", "PERMANENT", "raster"), catalogue.layers)
+
+    def test_invalidate(self):
+        catalogue = self.catalogue()
+        run_async(catalogue.list_layers())
+        self.fake.requests.clear()
+
+        # Only the layer listings of the modified mapset are fetched again
+        catalogue.invalidate(location="nc_spm_08", mapset="landsat", datatype="raster")
+        run_async(catalogue.list_layers())
+        self.assertEqual([("raster", "nc_spm_08", "landsat")], self.fake.requests)
+        self.fake.requests.clear()
+
+        # A modified mapset changes the mapset listing of its location
+        catalogue.invalidate(location="nc_spm_08", mapset="landsat")
+        run_async(catalogue.list_layers())
+        self.assertEqual([("mapsets", "nc_spm_08"), ("strds", "nc_spm_08", "landsat"),
+                          ("raster", "nc_spm_08", "landsat"), ("vector", "nc_spm_08", "landsat")],
+                         self.fake.requests)
+
+    def test_invalidate_on_finished_resource(self):
+        CATALOGUE.mapsets.set("nc_spm_08", ["PERMANENT", "result"])
+        CATALOGUE.layers.set(("nc_spm_08", "result", "raster"), [])
+        ActiniaInterface.PERSISTENT_RESOURCES.set("resource_id-1", ("nc_spm_08", "result"))
+        try:
+            # The listings are kept while the persistent processing resource is running
+            ActiniaInterface.notify_resource_finished("resource_id-2")
+            self.assertIn(("nc_spm_08", "result", "raster"), CATALOGUE.layers)
+
+            ActiniaInterface.notify_resource_finished("resource_id-1")
+            self.assertNotIn(("nc_spm_08", "result", "raster"), CATALOGUE.layers)
+            self.assertNotIn("nc_spm_08", CATALOGUE.mapsets)
+        finally:
+            invalidate_catalogue()
+
+
+if __name__ == "__main__":
+    unittest.main()
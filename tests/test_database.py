@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timezone
+from openeo_grass_gis_driver.test_base import TestBase
+from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
+from openeo_grass_gis_driver.actinia_processing.actinia_job_db import ActiniaJobDB
+from openeo_grass_gis_driver.database import get_database
+from openeo_grass_gis_driver.job_db import JobDB
+from openeo_grass_gis_driver.job_schemas import JobInformation, OutputFormat
+from openeo_grass_gis_driver.jobs import normalize_datetime
+from openeo_grass_gis_driver.job_status_tracker import JobStatusTracker
+from openeo_grass_gis_driver.process_graph_db import GraphDB
+
+try:
+    from sqlitedict import SqliteDict
+except ImportError:
+    SqliteDict = None
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+class DatabaseTestCase(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.config = {key: getattr(ActiniaConfig, key) for key in ("DATABASE", "JOB_DB", "GRAPH_DB",
+                                                                   "ACTINIA_JOB_DB", "JOB_LONG_POLL_DB_INTERVAL")}
+        # Use an empty database without legacy databases to migrate
+        for key in ("DATABASE", "JOB_DB", "GRAPH_DB", "ACTINIA_JOB_DB"):
+            setattr(ActiniaConfig, key, os.path.join(self.tempdir.name, f"{key}.sqlite"))
+
+    def tearDown(self):
+        for key, value in self.config.items():
+            setattr(ActiniaConfig, key, value)
+        self.tempdir.cleanup()
+
+    @staticmethod
+    def create_job(job_id: str) -> JobInformation:
+        return JobInformation(job_id=job_id, title="Title", description="Description", status="submitted",
+                              process_graph={"process_id": "get_data"}, output=None,
+                              submitted="2018-01-01T00:00:00", updated=None)
+
+    def test_job_db(self):
+        job_db = JobDB(user="user")
+        actinia_job_db = ActiniaJobDB()
+
+        with job_db.transaction():
+            for i in range(10):
+                job_db[f"job_{i}"] = self.create_job(f"job_{i}")
+
+        self.assertEqual(len(job_db), 10)
+        self.assertEqual(list(job_db)[0], "job_0")
+
+        actinia_job_db["job_1"] = "resource_id-1"
+        job = job_db["job_1"]
+        job.status = "queued"
+        job_db["job_1"] = job
+
+        self.assertEqual(job_db["job_1"].status, "queued")
+        self.assertEqual(job_db["job_1"].process_graph, {"process_id": "get_data"})
+        self.assertEqual(actinia_job_db["job_1"], "resource_id-1")
+        self.assertEqual(actinia_job_db.job_id("resource_id-1"), "job_1")
+
+        # The process graphs are not read for job listings
+        jobs, cursor = job_db.list_jobs()
+        self.assertEqual(len(jobs), 10)
+        self.assertIsNone(cursor)
+        self.assertIsNone(jobs[0].process_graph)
+
+        del job_db["job_1"]
+        self.assertFalse("job_1" in job_db)
+        self.assertFalse("job_1" in actinia_job_db)
+
+    def test_update_status(self):
+        job_db = JobDB()
+        job_db["job_1"] = self.create_job("job_1")
+
+        # The tracker reads the job, the job is patched, the tracker stores the status change
+        tracked = job_db["job_1"]
+        patched = self.create_job("job_1")
+        patched.title = "Patched"
+        patched.process_graph = {"process_id": "filter_bbox"}
+        job_db["job_1"] = patched
+
+        tracked.status = "running"
+        tracked.updated = "2018-01-01T00:01:00"
+        tracked.additional_info = {"resource_id": "resource_id-1", "status": "running"}
+        self.assertTrue(job_db.update_status("job_1", tracked))
+
+        job = job_db["job_1"]
+        self.assertEqual("Patched", job.title)
+        self.assertEqual({"process_id": "filter_bbox"}, job.process_graph)
+        self.assertEqual("running", job.status)
+        self.assertEqual("2018-01-01T00:01:00", job.updated)
+        self.assertEqual({"resource_id": "resource_id-1", "status": "running"}, job.additional_info)
+
+        # Deleted jobs are not stored again
+        del job_db["job_1"]
+        self.assertFalse(job_db.update_status("job_1", tracked))
+        self.assertFalse("job_1" in job_db)
+
+    @unittest.skipIf(SqliteDict is None, "The legacy databases are written with sqlitedict")
+    def test_legacy_migration(self):
+        # The legacy databases pickled the objects into SqliteDict files
+        job = self.create_job("job_1")
+        job.output = OutputFormat(format="GTiff", parameters={})
+        job.status = "finished"
+        with SqliteDict(filename=ActiniaConfig.JOB_DB, autocommit=True) as legacy_job_db:
+            legacy_job_db["job_1"] = job
+            legacy_job_db["job_2"] = self.create_job("job_2")
+        with SqliteDict(filename=ActiniaConfig.GRAPH_DB, autocommit=True) as legacy_graph_db:
+            legacy_graph_db["graph_1"] = {"title": "Graph", "description": "Description",
+                                          "process_graph": {"process_id": "get_data"}}
+        with SqliteDict(filename=ActiniaConfig.ACTINIA_JOB_DB, autocommit=True) as legacy_actinia_job_db:
+            legacy_actinia_job_db["job_1"] = "resource_id-1"
+
+        job_db = JobDB()
+        self.assertEqual(["job_1", "job_2"], sorted(job_db))
+        job = job_db["job_1"]
+        self.assertEqual("finished", job.status)
+        self.assertEqual("Title", job.title)
+        self.assertEqual({"process_id": "get_data"}, job.process_graph)
+        self.assertEqual("GTiff", job.output.format)
+        self.assertEqual("resource_id-1", ActiniaJobDB()["job_1"])
+        self.assertEqual("Graph", GraphDB()["graph_1"]["title"])
+
+        # The migration runs once, deleted jobs are not migrated again
+        del job_db["job_2"]
+        get_database().close()
+        get_database()._initialized = False
+        self.assertEqual(["job_1"], list(JobDB()))
+
+    def test_long_poll(self):
+        ActiniaConfig.JOB_LONG_POLL_DB_INTERVAL = 0.05
+        job_db = JobDB()
+        job_db["job_1"] = self.create_job("job_1")
+
+        # The job is not tracked in this process, another worker process stores its status change
+        def finish():
+            time.sleep(0.2)
+            job = JobDB()["job_1"]
+            job.status = "finished"
+            JobDB()["job_1"] = job
+
+        thread = threading.Thread(target=finish)
+        thread.start()
+        start = time.monotonic()
+        status = JobStatusTracker().wait_for_job_status_change(job_id="job_1", status="submitted", timeout=10)
+        thread.join()
+
+        self.assertEqual("finished", status)
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_job_listing(self):
+        job_db = JobDB()
+
+        with job_db.transaction():
+            for i in range(25):
+                job = self.create_job(f"job_{i}")
+                job.title = f"Title {i % 2}"
+                job.status = "finished" if i < 5 else "submitted"
+                job.submitted = f"2018-01-{i + 1:02} 00:00:00"
+                job_db[job.job_id] = job
+
+        # Page through all jobs
+        job_ids = []
+        cursor = None
+        while True:
+            jobs, cursor = job_db.list_jobs(limit=10, after=cursor)
+            job_ids.extend(job.job_id for job in jobs)
+            if cursor is None:
+                break
+        self.assertEqual(job_ids, [f"job_{i}" for i in range(25)])
+
+        jobs, cursor = job_db.list_jobs(status="finished", title_prefix="Title 1")
+        self.assertEqual([job.job_id for job in jobs], ["job_1", "job_3"])
+
+        jobs, cursor = job_db.list_jobs(submitted_from="2018-01-10 00:00:00", submitted_to="2018-01-12 00:00:00")
+        self.assertEqual([job.job_id for job in jobs], ["job_9", "job_10"])
+
+        # Times with a time zone are compared in the local time of the stored times
+        local = datetime(2018, 1, 10, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+        self.assertEqual(str(local), normalize_datetime("2018-01-10T00:00:00Z"))
+        self.assertEqual(str(local), normalize_datetime("2018-01-10T01:00:00+01:00"))
+        self.assertEqual("2018-01-10 00:00:00", normalize_datetime("2018-01-10T00:00:00"))
+        self.assertRaises(ValueError, normalize_datetime, "10.01.2018")
+
+        jobs, cursor = job_db.list_jobs(limit=1, fields=["status"])
+        self.assertEqual(jobs[0].status, "finished")
+        self.assertIsNone(jobs[0].title)
+        self.assertIsNone(jobs[0].plan)
+        self.assertEqual(jobs[0].job_id, "job_0")
+
+        self.assertRaises(ValueError, job_db.list_jobs, fields=["process_graph"])
+
+    def test_graph_db(self):
+        graph_db = GraphDB()
+        graph_db["graph_1"] = {"title": "Title", "description": "Description", "process_graph": {}}
+
+        self.assertEqual(graph_db["graph_1"]["title"], "Title")
+        self.assertEqual(graph_db.list_graphs(), [("graph_1", "Title", "Description")])
+
+        graph_db.clear()
+        self.assertEqual(len(graph_db), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import threading
+import unittest
+from openeo_grass_gis_driver.test_base import TestBase
+from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
+from openeo_grass_gis_driver.actinia_processing.actinia_job_db import ActiniaJobDB
+from openeo_grass_gis_driver.actinia_processing.base import compile_process_graph
+from openeo_grass_gis_driver.actinia_processing.process_chain_optimizer import prepare_process_chain
+from openeo_grass_gis_driver.job_db import JobDB
+from openeo_grass_gis_driver.job_queue import JobQueue, fair_share_order
+from openeo_grass_gis_driver.job_schemas import JobInformation
+from openeo_grass_gis_driver.utils.process_graph_examples_v03 import RASTER_EXPORT
+
+# The process chain of the queued jobs
+RESULT_NAMES, PROCESS_LIST, LOCATION = compile_process_graph(RASTER_EXPORT)
+PROCESS_CHAIN = prepare_process_chain(PROCESS_LIST, RESULT_NAMES)
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+class RecordingInterface(object):
+
+    auth = ("user", "password")
+
+    def set_auth(self, user, password):
+        self.auth = (user, password)
+
+
+class RecordingTracker(object):
+    """Records the tracked job resources instead of polling them"""
+
+    def __init__(self):
+        self.resources = {}
+        self.job_status = {}
+
+    def track(self, resource_id, job_id=None, auth=None, status=None, listener=None, **kwargs):
+        self.resources[resource_id] = (job_id, auth, listener)
+
+    def active_resources(self):
+        return len(self.resources)
+
+    def set_job_status(self, job_id, status):
+        self.job_status[job_id] = status
+
+    def finish(self, resource_id):
+        job_id, auth, listener = self.resources.pop(resource_id)
+        job_db = JobDB()
+        job = job_db[job_id]
+        job.status = "finished"
+        job_db[job_id] = job
+        listener(resource_id, 200, {"status": "finished"})
+
+
+class RecordingTiles(object):
+    """Records the started tiled jobs instead of sending their tiles"""
+
+    def __init__(self):
+        self.started = {}
+
+    def start(self, job_id, auth, listener=None):
+        self.started[job_id] = (auth, listener)
+
+
+class JobQueueTestCase(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.config = {key: getattr(ActiniaConfig, key) for key in ("DATABASE", "QUEUE_MAX_RUNNING",
+                                                                   "QUEUE_USER_MAX_RUNNING")}
+        ActiniaConfig.DATABASE = os.path.join(self.tempdir.name, "database.sqlite")
+        ActiniaConfig.QUEUE_MAX_RUNNING = 3
+        ActiniaConfig.QUEUE_USER_MAX_RUNNING = 2
+
+        self.sent = []
+        self.tracker = RecordingTracker()
+        self.tiles = RecordingTiles()
+        self.queue = JobQueue(interface=RecordingInterface, tracker=self.tracker, sender=self.send, tiles=self.tiles)
+        # The dispatcher is run by the tests
+        self.queue.start = lambda: None
+
+        job_db = JobDB()
+        for job_id in ("a-1", "a-2", "a-3", "a-4", "b-1", "b-2", "c-1"):
+            job_db[job_id] = JobInformation(job_id=job_id, title=job_id, description=job_id, status="queued",
+                                            process_graph=RASTER_EXPORT["process_graph"], output=None,
+                                            submitted="2018-01-01", updated=None)
+
+    def tearDown(self):
+        for key, value in self.config.items():
+            setattr(ActiniaConfig, key, value)
+        self.tempdir.cleanup()
+
+    def submit(self, job_id, user, auth=None, queue=None, tiled=False):
+        # The location of the process chain is the job id, so that the sent jobs are recorded
+        (queue or self.queue).submit(job_id=job_id, user=user, location=job_id,
+                                     process_chain=None if tiled else PROCESS_CHAIN, auth=auth or (user, "password"))
+
+    def send(self, iface, location, process_chain):
+        self.assertEqual(PROCESS_CHAIN, process_chain)
+        if location == "c-1":
+            return 400, "Invalid process chain"
+        self.sent.append((location, iface.auth[0]))
+        return 200, {"resource_id": f"resource_id-{location}", "status": "accepted"}
+
+    def test_fair_share_order(self):
+        rows = [("a-1", "a", 0, 1.0), ("a-2", "a", 0, 2.0), ("a-3", "a", 0, 3.0),
+                ("b-1", "b", 0, 4.0), ("b-2", "b", 0, 5.0), ("c-1", "c", 5, 6.0)]
+        self.assertEqual(["c-1", "a-1", "b-1", "a-2", "b-2", "a-3"],
+                         [job_id for job_id, user in fair_share_order(rows, {})])
+        # Users with running jobs are served after the others
+        self.assertEqual(["c-1", "b-1", "b-2", "a-1", "a-2", "a-3"],
+                         [job_id for job_id, user in fair_share_order(rows, {"a": 2})])
+
+    def test_dispatch(self):
+        # A burst of jobs of user a, the first two are released, the others wait for the user cap
+        for job_id in ("a-1", "a-2", "a-3", "a-4"):
+            self.submit(job_id, "a")
+        # The jobs are released by the dispatcher thread
+        self.assertEqual([], self.sent)
+        self.queue.dispatch()
+        self.assertEqual([("a-1", "a"), ("a-2", "a")], self.sent)
+        self.assertEqual(["a-3", "a-4"], [job_id for job_id, user in self.queue.order()])
+
+        # The job of user b is released before the waiting jobs of user a
+        self.submit("b-1", "b")
+        self.submit("b-2", "b")
+        self.queue.dispatch()
+        self.assertEqual(("b-1", "b"), self.sent[-1])
+        self.assertEqual("resource_id-b-1", ActiniaJobDB()["b-1"])
+
+        # The queue position is shown for the waiting jobs, the global capacity is used up
+        job = self.queue.annotate(JobDB()["b-2"])
+        self.assertEqual({"queue_position": 1, "queue_length": 3}, job.additional_info)
+        self.assertEqual({"queue_position": 3, "queue_length": 3},
+                         self.queue.annotate(JobDB()["a-4"]).additional_info)
+        self.assertEqual({"resource_id": "resource_id-a-1", "status": "accepted"},
+                         self.queue.annotate(JobDB()["a-1"]).additional_info)
+
+        # A finished job frees capacity for the next job in fair-share order,
+        # both users have a single running job and the oldest job is released
+        self.tracker.finish("resource_id-a-1")
+        self.queue.dispatch()
+        self.assertEqual(("a-3", "a"), self.sent[-1])
+        self.tracker.finish("resource_id-b-1")
+        self.queue.dispatch()
+        self.assertEqual(("b-2", "b"), self.sent[-1])
+
+        # Canceled jobs are removed from the queue
+        self.assertTrue(self.queue.remove("a-4"))
+        self.assertFalse(self.queue.remove("a-3"))
+        self.assertEqual([], self.queue.order())
+
+    def test_error(self):
+        self.submit("c-1", "c")
+        self.queue.dispatch()
+        job = JobDB()["c-1"]
+        self.assertEqual("error", job.status)
+        self.assertEqual("error", self.tracker.job_status["c-1"])
+        self.assertFalse(self.queue.is_waiting("c-1"))
+
+    def test_restart(self):
+        # The waiting jobs and the released jobs survive a restart of the driver
+        for job_id in ("a-1", "a-2", "a-3"):
+            self.submit(job_id, "a")
+        self.queue.dispatch()
+
+        queue = JobQueue(interface=RecordingInterface, tracker=RecordingTracker(), sender=self.send)
+        queue.start = lambda: None
+        self.assertEqual([("a-3", "a")], queue.order())
+        queue.dispatch()
+        self.assertEqual(2, len(self.sent))
+
+        # Released jobs that finished while the driver was stopped free their capacity,
+        # but the credentials of the waiting job were lost, hence it is not sent as another user
+        job_db = JobDB()
+        job = job_db["a-1"]
+        job.status = "finished"
+        job_db["a-1"] = job
+        queue.cleanup()
+        queue.dispatch()
+        self.assertEqual(2, len(self.sent))
+        self.assertEqual([("a-3", "a")], queue.order())
+
+        # The job is released when it is requested with the credentials of its owner
+        self.assertFalse(queue.authorize("a-3", ("b", "password")))
+        queue.dispatch()
+        self.assertEqual(2, len(self.sent))
+        self.assertTrue(queue.authorize("a-3", ("a", "secret")))
+        queue.dispatch()
+        self.assertEqual(("a-3", "a"), self.sent[-1])
+        self.assertFalse(queue.authorize("a-3", ("a", "secret")))
+
+    def test_other_process(self):
+        # A queue without the credentials of a job, like the queue of another worker process, skips the job
+        queue = JobQueue(interface=RecordingInterface, tracker=RecordingTracker(), sender=self.send)
+        queue.start = lambda: None
+        self.submit("a-1", "a")
+        self.submit("b-1", "b", queue=queue)
+
+        queue.dispatch()
+        self.assertEqual([("b-1", "b")], self.sent)
+        self.assertTrue(queue.is_waiting("a-1"))
+
+    def test_tiled_jobs(self):
+        # Tiled jobs share the capacity and the user cap with the other jobs
+        self.submit("a-1", "a", tiled=True)
+        for job_id in ("a-2", "a-3"):
+            self.submit(job_id, "a")
+        self.queue.dispatch()
+        self.assertEqual(["a-1"], list(self.tiles.started))
+        self.assertEqual([("a-2", "a")], self.sent)
+        self.assertEqual([("a-3", "a")], self.queue.order())
+
+        # The finished tiled job frees its capacity
+        auth, listener = self.tiles.started["a-1"]
+        self.assertEqual(("a", "password"), auth)
+        listener("a-1")
+        self.queue.dispatch()
+        self.assertEqual(("a-3", "a"), self.sent[-1])
+
+    def test_release_outside_lock(self):
+        # The queue is read while a job is sent and the job counts against the capacity
+        ActiniaConfig.QUEUE_MAX_RUNNING = 1
+        results = []
+
+        def read():
+            results.append((self.queue.annotate(JobDB()["b-1"]).additional_info,
+                            self.queue.is_waiting("a-1")))
+
+        def send(iface, location, process_chain):
+            thread = threading.Thread(target=read)
+            thread.start()
+            thread.join(5)
+            return self.send(iface, location, process_chain)
+
+        self.queue.sender = send
+        self.submit("a-1", "a")
+        self.submit("b-1", "b")
+        self.queue.dispatch()
+        self.assertEqual([({"queue_position": 1, "queue_length": 1}, False)], results)
+        self.assertEqual([("a-1", "a")], self.sent)
+
+
+if __name__ == "__main__":
+    unittest.main()
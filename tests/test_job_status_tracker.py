@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+from openeo_grass_gis_driver.test_base import TestBase
+from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
+from openeo_grass_gis_driver.actinia_processing.actinia_job_db import ActiniaJobDB
+from openeo_grass_gis_driver.job_db import JobDB
+from openeo_grass_gis_driver.job_schemas import JobInformation
+from openeo_grass_gis_driver.job_status_tracker import JobStatusTracker
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+class OwnerInterface(object):
+    """Serves the resources of the user "owner" only"""
+
+    polls = []
+
+    def __init__(self):
+        self.auth = (ActiniaConfig.USER, ActiniaConfig.PASSWORD)
+
+    def set_auth(self, user, password):
+        self.auth = (user, password)
+
+    def resource_info(self, resource_id, timeout=None):
+        self.polls.append(self.auth[0])
+        if self.auth[0] != "owner":
+            return 404, {"message": "Resource does not exist"}
+        return 200, {"status": "running", "datetime": "2018-01-01T00:00:00"}
+
+
+class JobStatusTrackerTestCase(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.config = {key: getattr(ActiniaConfig, key) for key in ("DATABASE", "JOB_DB", "GRAPH_DB",
+                                                                   "ACTINIA_JOB_DB")}
+        for key in self.config:
+            setattr(ActiniaConfig, key, os.path.join(self.tempdir.name, f"{key}.sqlite"))
+        OwnerInterface.polls = []
+
+        self.job_db = JobDB(user="owner")
+        self.job_db["job_1"] = JobInformation(job_id="job_1", title="Title", description="Description",
+                                              status="queued", process_graph={"process_id": "get_data"},
+                                              output=None, submitted="2018-01-01T00:00:00", updated=None)
+        ActiniaJobDB()["job_1"] = "resource_id-1"
+        self.tracker = JobStatusTracker(interface=OwnerInterface)
+
+    def tearDown(self):
+        for key, value in self.config.items():
+            setattr(ActiniaConfig, key, value)
+        self.tempdir.cleanup()
+
+    def poll(self):
+        resource = self.tracker._resources["resource_id-1"]
+        resource, code, info, job = self.tracker._poll(resource, self.job_db)
+        if job is not None:
+            self.job_db.update_status(resource.job_id, job)
+        self.tracker._update(resource, code, info, job)
+
+    def test_recover_without_credentials(self):
+        self.tracker._recover()
+        self.poll()
+
+        # The configured user can not read the resource, the job is not modified and still tracked
+        self.assertEqual([ActiniaConfig.USER], OwnerInterface.polls)
+        self.assertTrue(self.tracker.is_tracked("resource_id-1"))
+        self.assertEqual("queued", self.job_db["job_1"].status)
+        self.assertIsNone(self.job_db["job_1"].additional_info)
+
+        # The request of the owner provides the credentials of the polls
+        self.tracker._track(resource_id="resource_id-1", job_id="job_1", auth=("owner", "password"))
+        self.poll()
+        self.assertEqual("owner", OwnerInterface.polls[-1])
+        self.assertEqual("running", self.job_db["job_1"].status)
+
+        # The credentials of the owner are not replaced
+        self.tracker._track(resource_id="resource_id-1", job_id="job_1", auth=("other", "password"))
+        self.poll()
+        self.assertEqual("owner", OwnerInterface.polls[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
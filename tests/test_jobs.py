@@ -129,6 +129,46 @@ class JobsTestResultsCase(TestBase):
         print(data)
         self.assertEqual(200, response.status_code)
 
+    def test_job_processing_long_poll(self):
+        """Wait for the status change of a job with long polling
+        """
+        JOB_TEMPLATE["process_graph"] = FILTER_BOX["process_graph"]
+
+        response = self.app.post('/jobs', data=json.dumps(JOB_TEMPLATE), content_type="application/json", headers=self.auth)
+        self.assertEqual(201, response.status_code)
+        job_id = response.get_data().decode("utf-8")
+
+        # Start the job
+        response = self.app.post(f'/jobs/{job_id}/results', headers=self.auth)
+        self.assertEqual(202, response.status_code)
+
+        # Wait until the job is not queued anymore
+        response = self.app.get(f'/jobs/{job_id}?wait=30&status=queued', headers=self.auth)
+        self.assertEqual(200, response.status_code)
+        data = json.loads(response.get_data().decode("utf-8"))
+        print(data)
+        self.assertNotEqual(data["status"], "queued")
+
+        response = self.app.get(f'/jobs/{job_id}?wait=no_number', headers=self.auth)
+        self.assertEqual(400, response.status_code)
+
+    def test_job_processing_invalid(self):
+        """Jobs with process graphs that can not be compiled are rejected and not queued
+        """
+        JOB_TEMPLATE["process_graph"] = {"process_id": "unknown_process",
+                                         "imagery": FILTER_BOX["process_graph"]["imagery"]}
+
+        response = self.app.post('/jobs', data=json.dumps(JOB_TEMPLATE), content_type="application/json", headers=self.auth)
+        self.assertEqual(201, response.status_code)
+        job_id = response.get_data().decode("utf-8")
+
+        response = self.app.post(f'/jobs/{job_id}/results', headers=self.auth)
+        self.assertEqual(400, response.status_code)
+
+        response = self.app.get(f'/jobs/{job_id}', headers=self.auth)
+        data = json.loads(response.get_data().decode("utf-8"))
+        self.assertNotEqual(data["status"], "queued")
+
     def test_job_creation_and_processing_zonal_stats(self):
         """Run the test in the ephemeral database
         """
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import unittest
+import time
+from openeo_grass_gis_driver.test_base import TestBase
+from openeo_grass_gis_driver.lru_cache import LRUCache
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+class LRUCacheTestCase(TestBase):
+
+    def test_eviction(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        # Touch a, so that b is the least recently used entry
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+
+        self.assertTrue("a" in cache)
+        self.assertFalse("b" in cache)
+        self.assertTrue("c" in cache)
+        self.assertEqual(cache.statistics()["evictions"], 1)
+
+    def test_ttl(self):
+        cache = LRUCache(maxsize=10, ttl=0.1)
+        cache.set("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+
+        time.sleep(0.15)
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.statistics()["expired"], 1)
+
+    def test_stale_entry(self):
+        cache = LRUCache(maxsize=10, ttl=0.1)
+        cache.set("a", 1)
+
+        time.sleep(0.15)
+
+        value, age = cache.get_entry("a")
+        self.assertEqual(value, 1)
+        self.assertTrue(age >= 0.1)
+
+    def test_remove_if(self):
+        cache = LRUCache(maxsize=10)
+        cache.set(("nc_spm_08", "PERMANENT", "raster"), ["elevation"])
+        cache.set(("nc_spm_08", "PERMANENT", "vector"), ["lakes"])
+        cache.set(("nc_spm_08", "landsat", "raster"), ["lsat5_1987_10"])
+
+        removed = cache.remove_if(lambda key: key[1] == "PERMANENT")
+
+        self.assertEqual(removed, 2)
+        self.assertEqual(len(cache), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+import unittest
+from openeo_grass_gis_driver.test_base import TestBase
+from openeo_grass_gis_driver.actinia_processing.base import compile_process_graph
+from openeo_grass_gis_driver.actinia_processing.process_chain_optimizer import optimize_process_chain
+from openeo_grass_gis_driver.utils.process_graph_examples_v03 import ZONAL_STATISTICS, RASTER_EXPORT, \
+    REDUCE_TIME_MULTI
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+def g_region(id: str, **parameters) -> dict:
+    return {"id": id, "module": "g.region",
+            "inputs": [{"param": key, "value": str(value)} for key, value in parameters.items()]}
+
+
+def t_info(id: str, name: str) -> dict:
+    return {"id": id, "module": "t.info", "inputs": [{"param": "input", "value": name}], "flags": "g"}
+
+
+class ProcessChainOptimizerTestCase(TestBase):
+
+    def test_duplicate_probes(self):
+        process_list = [t_info("t_info_1", "red@landsat"),
+                        t_info("t_info_2", "nir@landsat"),
+                        t_info("t_info_3", "red@landsat")]
+
+        optimized, statistics = optimize_process_chain(process_list, rules=["duplicate_probes"])
+        self.assertEqual(["t_info_1", "t_info_2"], [step["id"] for step in optimized])
+        self.assertEqual(3, statistics["steps_before"])
+        self.assertEqual(2, statistics["steps_after"])
+
+    def test_redundant_regions(self):
+        bbox = dict(n=10, s=0, e=10, w=0, ewres=1, nsres=1)
+        process_list = [g_region("g_region_1", **bbox),
+                        t_info("t_info_1", "red@landsat"),
+                        g_region("g_region_2", n=20, s=0, e=20, w=0, ewres=1, nsres=1),
+                        g_region("g_region_3", n=20, s=0, e=20, w=0, ewres=1, nsres=1),
+                        {"id": "t_rast_series_1", "module": "t.rast.series",
+                         "inputs": [{"param": "input", "value": "red@landsat"},
+                                    {"param": "output", "value": "red_min"}]},
+                        g_region("g_region_4", **bbox)]
+
+        optimized, statistics = optimize_process_chain(process_list, result_names=["red_min"],
+                                                       rules=["redundant_regions"])
+        # The first region was never used and the third is equal to the second
+        self.assertEqual(["t_info_1", "g_region_2", "t_rast_series_1", "g_region_4"],
+                         [step["id"] for step in optimized])
+        self.assertEqual(2, statistics["rules"]["redundant_regions"])
+
+    def test_dead_steps(self):
+        process_list = [t_info("t_info_1", "red@landsat"),
+                        {"id": "t_rast_mapcalc_1", "module": "t.rast.mapcalc",
+                         "inputs": [{"param": "expression", "value": "unused = red * 2"},
+                                    {"param": "output", "value": "unused"}]},
+                        {"id": "t_rast_colors_1", "module": "t.rast.colors",
+                         "inputs": [{"param": "input", "value": "unused"},
+                                    {"param": "color", "value": "ndvi"}]},
+                        {"id": "t_rast_series_1", "module": "t.rast.series",
+                         "inputs": [{"param": "input", "value": "red@landsat"},
+                                    {"param": "output", "value": "red_min"}]}]
+
+        optimized, statistics = optimize_process_chain(process_list, result_names=["red_min"],
+                                                       rules=["dead_steps"])
+        self.assertEqual(["t_info_1", "t_rast_series_1"], [step["id"] for step in optimized])
+
+    def test_fused_series(self):
+        result_names, process_list, location = compile_process_graph(REDUCE_TIME_MULTI)
+        self.assertEqual(3, len(set(result_names)))
+
+        optimized, statistics = optimize_process_chain(process_list, result_names)
+        series = [step for step in optimized if step["module"] == "t.rast.series"]
+        self.assertEqual(1, len(series))
+        parameters = {entry["param"]: entry["value"] for entry in series[0]["inputs"]}
+        self.assertEqual("minimum,maximum,average", parameters["method"])
+        self.assertEqual(",".join(result_names), parameters["output"])
+        # The duplicate probes are removed and each output is exported
+        self.assertEqual(["t.info", "t.rast.series", "exporter", "exporter", "exporter"],
+                         [step["module"] for step in optimized])
+        # The compiled process list is not modified
+        self.assertEqual(3, len([step for step in process_list if step["module"] == "t.rast.series"]))
+
+        # The series are not merged if the region was changed between them
+        region = {"id": "g_region_1", "module": "g.region", "inputs": [{"param": "raster", "value": "mask"}]}
+        first = [step["module"] for step in process_list].index("t.rast.series")
+        process_list.insert(first + 1, region)
+        optimized, statistics = optimize_process_chain(process_list, result_names)
+        self.assertEqual(2, len([step for step in optimized if step["module"] == "t.rast.series"]))
+
+    def test_compiled_process_graphs(self):
+        # The region of the last zonal statistics is not restored
+        result_names, process_list, location = compile_process_graph(ZONAL_STATISTICS)
+        optimized, statistics = optimize_process_chain(process_list, result_names)
+        self.assertEqual(len(process_list) - 1, len(optimized))
+        self.assertEqual("r.mask", optimized[-1]["module"])
+
+        # The region is used by the exports
+        result_names, process_list, location = compile_process_graph(RASTER_EXPORT)
+        optimized, statistics = optimize_process_chain(process_list, result_names)
+        self.assertEqual(process_list, optimized)
+
+        self.assertRaises(Exception, optimize_process_chain, process_list, rules=["unknown"])
+
+
+if __name__ == "__main__":
+    unittest.main()
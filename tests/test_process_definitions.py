@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 import unittest
+from copy import deepcopy
 from pprint import pprint
-from openeo_grass_gis_driver.actinia_processing import config
+from openeo_grass_gis_driver.actinia_processing import config, filter_daterange_process
 from openeo_grass_gis_driver.test_base import TestBase
-from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph
+from concurrent.futures import ThreadPoolExecutor
+from openeo_grass_gis_driver.actinia_processing.base import analyse_process_graph, compile_process_graph, \
+    process_graph_hash, COMPILE_CACHE, CompilationContext
 from openeo_grass_gis_driver.utils.process_graph_examples_v03 import *
 
 __license__ = "Apache License, Version 2.0"
@@ -15,6 +18,78 @@ __email__ = "soerengebbert@googlemail.com"
 
 class ProcessDefinitionTestCase(TestBase):
 
+    def test_compile_cache(self):
+
+        COMPILE_CACHE.clear()
+        # The cache statistics are not reset by clear(), other tests may have compiled graphs
+        hits = COMPILE_CACHE.statistics()["hits"]
+
+        names, pc, location = compile_process_graph(OPENEO_USECASE_1)
+        self.assertEqual(location, "LL")
+        # The step ids are deterministic, hence the process chains are equal
+        pc[0]["id"] = "modified"
+        cached_names, cached_pc, cached_location = compile_process_graph(OPENEO_USECASE_1)
+        self.assertNotEqual(cached_pc[0]["id"], "modified")
+        self.assertEqual(cached_pc, compile_process_graph(OPENEO_USECASE_1)[1])
+        self.assertEqual(COMPILE_CACHE.statistics()["hits"] - hits, 2)
+
+        # Graphs are compiled again if the compilation settings were changed
+        mode = config.Config.FILTER_DATERANGE_MODE
+        config.Config.FILTER_DATERANGE_MODE = "extract" if mode == "view" else "view"
+        try:
+            self.assertNotEqual(cached_pc, compile_process_graph(OPENEO_USECASE_1)[1])
+        finally:
+            config.Config.FILTER_DATERANGE_MODE = mode
+        self.assertEqual(cached_pc, compile_process_graph(OPENEO_USECASE_1)[1])
+
+        # The hash does not depend on the order of the keys
+        reordered = {"process_graph": dict(reversed(list(OPENEO_USECASE_1["process_graph"].items())))}
+        self.assertEqual(process_graph_hash(reordered), process_graph_hash(OPENEO_USECASE_1))
+
+    def test_compile_process_graph(self):
+
+        COMPILE_CACHE.clear()
+
+        # The nodes are compiled by the process converters, like the recursive analysis
+        for graph in (FILTER_BOX, OPENEO_USECASE_1):
+            names, pc = analyse_process_graph(graph)
+            compiled_names, compiled_pc, location = compile_process_graph(graph)
+            self.assertEqual(names, compiled_names)
+            self.assertEqual([step["module"] for step in pc], [step["module"] for step in compiled_pc])
+
+        # The data source that is shared by the three reductions is compiled once
+        names, pc, location = compile_process_graph(REDUCE_TIME_MULTI)
+        pprint(pc)
+        self.assertEqual(len(names), 3)
+        self.assertEqual(len([step for step in pc if step["module"] == "t.info"]), 1)
+        self.assertEqual(len([step for step in pc if step["module"] == "t.rast.series"]), 3)
+
+    def test_concurrent_compilation(self):
+        """Compile process graphs of different locations concurrently and check that
+        each compilation only sees its own locations and datasets
+        """
+
+        def compile_graph(i):
+            location = f"location_{i % 7}"
+            data_id = f"{location}.PERMANENT.strds.temperature_{i}"
+            graph = {"process_graph": {"process_id": "reduce_time", "method": "minimum",
+                                       "imagery": {"process_id": "get_data", "data_id": data_id}}}
+
+            context = CompilationContext()
+            names, pc = analyse_process_graph(graph, context)
+            cached_names, cached_pc, cached_location = compile_process_graph(graph)
+
+            return location, data_id, context, cached_location
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(compile_graph, range(2000)))
+
+        for location, data_id, context, cached_location in results:
+            self.assertEqual(context.location, location)
+            self.assertEqual(cached_location, location)
+            self.assertEqual(context.datasets, [data_id])
+            self.assertEqual(context.names, [f"temperature_{data_id.rsplit('_', 1)[1]}_reduce_time"])
+
     def test_get_data_1(self):
 
         output_names, pc = analyse_process_graph(graph=GET_DATA_1)
@@ -58,6 +133,23 @@ class ProcessDefinitionTestCase(TestBase):
 
         self.assertTrue(pc[1]["module"] == "t.rast.extract")
 
+    def test_daterange_modes(self):
+
+        context = CompilationContext()
+        view = filter_daterange_process.create__process_chain_entry(
+            "latlong_wgs84.modis_ndvi_global.strds.ndvi_16_5600m", "2001-01-01", "2005-01-01",
+            "ndvi_filter_daterange", context=context, mode="view")
+        extract = filter_daterange_process.create__process_chain_entry(
+            "latlong_wgs84.modis_ndvi_global.strds.ndvi_16_5600m", "2001-01-01", "2005-01-01",
+            "ndvi_filter_daterange", context=context, mode="extract")
+
+        # The view registers the maps of the date range without map algebra
+        view_parameters = [entry["param"] for entry in view["inputs"]]
+        extract_parameters = [entry["param"] for entry in extract["inputs"]]
+        self.assertEqual(view_parameters, ["input", "where", "output"])
+        self.assertTrue("expression" in extract_parameters)
+        self.assertEqual(view["inputs"][1], extract["inputs"][1])
+
     def test_reduce_time_min(self):
 
         name, pc = analyse_process_graph(graph=REDUCE_TIME_MIN)
@@ -73,7 +165,9 @@ class ProcessDefinitionTestCase(TestBase):
         pprint(pc)
 
         self.assertEqual(names[0], "lsat5_red_NDVI")
-        self.assertEqual(len(pc), 4)
+        # The color table is only applied if the result is exported
+        self.assertEqual(len(pc), 3)
+        self.assertEqual(pc[-1]["module"], "t.rast.mapcalc")
 
     def test_ndvi_2(self):
 
@@ -82,7 +176,9 @@ class ProcessDefinitionTestCase(TestBase):
         pprint(pc)
 
         self.assertEqual(names[0], "S2A_B04_NDVI")
-        self.assertEqual(len(pc), 4)
+        # The color table is only applied if the result is exported
+        self.assertEqual(len(pc), 3)
+        self.assertEqual(pc[-1]["module"], "t.rast.mapcalc")
 
     def test_ndvi_3(self):
 
@@ -91,7 +187,9 @@ class ProcessDefinitionTestCase(TestBase):
         pprint(pc)
 
         self.assertEqual(names[0], "lsat5_red_NDVI2")
-        self.assertEqual(len(pc), 4)
+        # The color table is only applied if the result is exported
+        self.assertEqual(len(pc), 3)
+        self.assertEqual(pc[-1]["module"], "t.rast.mapcalc")
 
     def test_ndvi_4(self):
 
@@ -100,7 +198,9 @@ class ProcessDefinitionTestCase(TestBase):
         pprint(pc)
 
         self.assertEqual(names[0], "S2A_B04_NDVI2")
-        self.assertEqual(len(pc), 4)
+        # The color table is only applied if the result is exported
+        self.assertEqual(len(pc), 3)
+        self.assertEqual(pc[-1]["module"], "t.rast.mapcalc")
 
     def test_raster_export(self):
 
@@ -122,6 +222,93 @@ class ProcessDefinitionTestCase(TestBase):
         self.assertEqual(names[0], "latlong_wgs84.modis_ndvi_global.strds.ndvi_16_5600m")
         self.assertEqual(len(pc), 16)
 
+    def test_band_math(self):
+
+        names, pc = analyse_process_graph(graph=BAND_MATH)
+        pprint(names)
+        pprint(pc)
+
+        self.assertEqual(names[0], "lsat5_red_band_math")
+        # The NDVI and the nested band math are fused into a single expression
+        modules = [step["module"] for step in pc]
+        self.assertEqual(modules, ["t.info"] * 4 + ["t.rast.mapcalc", "t.rast.colors", "exporter"])
+        expression = pc[4]["inputs"][0]["value"]
+        self.assertTrue(expression.startswith("lsat5_red_band_math = "))
+        self.assertTrue("* 10)" in expression)
+        self.assertTrue("+ 3)" in expression)
+        self.assertEqual(pc[4]["inputs"][1]["value"], "lsat5_red@landsat,lsat5_nir@landsat")
+
+    def test_band_math_mixed_datatypes(self):
+
+        graph = deepcopy(BAND_MATH)
+        graph["process_graph"]["imagery"]["bands"]["savi"] = {"process_id": "get_data",
+                                                               "data_id": "nc_spm_08.PERMANENT.raster.elevation"}
+        # t.rast.mapcalc can not compute the maps of a space-time raster dataset with a raster layer
+        with self.assertRaises(Exception) as error:
+            analyse_process_graph(graph=graph)
+        self.assertIn("can not combine raster layers and space-time raster datasets", str(error.exception))
+
+    def test_ndvi_export(self):
+
+        graph = {"process_graph": {"process_id": "raster_exporter", "imagery": NDVI_3["process_graph"]}}
+        names, pc = analyse_process_graph(graph=graph)
+        # The NDVI is a fused expression, its color table is set before the export
+        self.assertEqual([step["module"] for step in pc], ["t.info", "t.info", "t.rast.mapcalc",
+                                                           "t.rast.colors", "exporter"])
+        self.assertEqual(pc[3]["inputs"][1]["value"], "ndvi")
+        self.assertEqual(pc[2]["inputs"][2]["value"], "ndvi")
+
+        # The color table is only set for exports
+        names, pc = analyse_process_graph(graph={"process_graph": BAND_MATH["process_graph"]["imagery"]})
+        self.assertEqual([step["module"] for step in pc], ["t.info"] * 4 + ["t.rast.mapcalc"])
+
+        raster_graph = {"process_id": "band_math",
+                        "expression": "-elevation + 2 ** 3",
+                        "bands": {"elevation": {"process_id": "get_data",
+                                                "data_id": "nc_spm_08.PERMANENT.raster.elevation"}}}
+        names, pc = analyse_process_graph(graph={"process_graph": raster_graph})
+        self.assertEqual(pc[-1]["module"], "r.mapcalc")
+        self.assertEqual(pc[-1]["inputs"][0]["value"], "elevation_band_math = (-(elevation@PERMANENT) + 8)")
+
+        # Constants that r.mapcalc can not parse are not folded
+        for expression, value in [("elevation * (1e300 * 1e300)", "(elevation@PERMANENT * (1e+300 * 1e+300))"),
+                                  ("elevation + 10 ** 100", "(elevation@PERMANENT + (10 ^ 100))"),
+                                  ("(elevation * 1e300) * 1e300", "((elevation@PERMANENT * 1e+300) * 1e+300)")]:
+            raster_graph["expression"] = expression
+            names, pc = analyse_process_graph(graph={"process_graph": raster_graph})
+            self.assertEqual(pc[-1]["inputs"][0]["value"], f"elevation_band_math = {value}")
+
+        for expression in ["elevation % 2", "__import__('os')", "slope + 1", "ndvi(elevation)", "elevation * 1e400"]:
+            raster_graph["expression"] = expression
+            self.assertRaises(Exception, analyse_process_graph, {"process_graph": raster_graph})
+
+    def test_zonal_statistics_zones(self):
+
+        graph = deepcopy(ZONAL_STATISTICS)
+        graph["process_graph"]["mode"] = "zones"
+        names, pc = analyse_process_graph(graph=graph)
+        pprint(names)
+        pprint(pc)
+
+        modules = [step["module"] for step in pc]
+        # The polygons are imported and rasterized once for both time series and no mask is used
+        self.assertEqual(modules.count("importer"), 1)
+        self.assertEqual(modules.count("v.to.rast"), 1)
+        self.assertEqual(modules.count("t.rast.univar"), 2)
+        self.assertFalse("r.mask" in modules)
+
+        zones = [step for step in pc if step["module"] == "v.to.rast"][0]
+        for univar in [step for step in pc if step["module"] == "t.rast.univar"]:
+            self.assertEqual(univar["inputs"][1], {"param": "zones", "value": zones["inputs"][1]["value"]})
+
+        # The region of the second time series is set to the zone raster
+        regions = [step["inputs"][0] for step in pc if step["module"] == "g.region"]
+        self.assertEqual(regions.count({"param": "vector", "value": zones["inputs"][0]["value"]}), 1)
+        self.assertEqual(regions.count({"param": "raster", "value": zones["inputs"][1]["value"]}), 1)
+
+        graph["process_graph"]["mode"] = "unknown"
+        self.assertRaises(Exception, analyse_process_graph, graph)
+
     def test_ndvi_error(self):
 
         try:
@@ -138,7 +325,7 @@ class ProcessDefinitionTestCase(TestBase):
         pprint(name)
         pprint(pc)
 
-        self.assertEqual(len(pc), 9)
+        self.assertEqual(len(pc), 8)
 
     def test_openeo_usecase_1a(self):
 
@@ -146,7 +333,7 @@ class ProcessDefinitionTestCase(TestBase):
         pprint(name)
         pprint(pc)
 
-        self.assertEqual(len(pc), 8)
+        self.assertEqual(len(pc), 7)
 
     def otest_openeo_usecase_2(self):
         # Disabled since UDF is not supported
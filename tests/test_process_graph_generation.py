@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 import unittest
+from copy import deepcopy
 from openeo_grass_gis_driver.test_base import TestBase
-from openeo_grass_gis_driver.actinia_processing.base import ProcessNode, ProcessGraph
+from openeo_grass_gis_driver.actinia_processing.base import ProcessNode, ProcessGraph, ProcessGraphCycleError, \
+  CompilationContext, PROCESS_DICT
 from openeo_grass_gis_driver.utils.process_graph_examples_v04 import OPENEO_EXAMPLE_1, \
   FILTER_BBOX, NDVI_STRDS, USE_CASE_1, ZONAL_STATISTICS, DATERANGE
 
@@ -109,5 +111,113 @@ class GraphValidationTestCase(TestBase):
         self.assertEqual(1, len(pg.root_nodes))
         self.assertEqual(7, len(pg.node_dict))
 
+    def test_graph_fan_out_compilation(self):
+
+        graph = {"title": "Fan-out", "description": "Two filters of the same data",
+                 "process_graph": {"filter_1": {"process_id": "filter_bbox",
+                                                "arguments": {"data": {"from_node": "get_data_1"}}},
+                                   "filter_2": {"process_id": "filter_bbox",
+                                                "arguments": {"data": {"from_node": "get_data_1"}}},
+                                   "get_data_1": FILTER_BBOX["process_graph"]["get_data_1"]}}
+
+        pg = ProcessGraph(graph)
+        self.assertEqual(2, len(pg.root_nodes))
+        self.assertEqual([pg.node_dict["filter_1"], pg.node_dict["filter_2"]], pg.node_dict["get_data_1"].children)
+        self.assertEqual(["get_data_1", "filter_1", "filter_2"], [node.id for node in pg.topological_order()])
+
+        compiled = []
+
+        def compile_node(node, context):
+            compiled.append(node.id)
+            inputs = [name for parent in node.parents for name in context.node_outputs[parent.id]]
+            return [f"{node.id}_output"], [{"id": node.id, "inputs": inputs}]
+
+        outputs, processes = pg.to_actinia_process_chain(CompilationContext(), node_compiler=compile_node)
+        # The shared node is compiled once and its output is used by both filters
+        self.assertEqual(["get_data_1", "filter_1", "filter_2"], compiled)
+        self.assertEqual(["filter_1_output", "filter_2_output"], outputs)
+        self.assertEqual(["get_data_1_output"], processes[2]["inputs"])
+
+    def test_graph_compilation_filter_bbox(self):
+
+        pg = ProcessGraph(FILTER_BBOX)
+        outputs, processes = pg.to_actinia_process_chain(CompilationContext())
+
+        self.assertEqual(["nc_spm_08.PERMANENT.raster.elevation"], outputs)
+        self.assertEqual(["r.info", "g.region"], [step["module"] for step in processes])
+        self.assertEqual({"param": "n", "value": "228500"}, processes[1]["inputs"][0])
+
+    def test_graph_compilation_use_case_1(self):
+
+        pg = ProcessGraph(USE_CASE_1)
+        outputs, processes = pg.to_actinia_process_chain(CompilationContext())
+
+        self.assertEqual(["lsat5_red_NDVI2_filter_daterange_reduce_time"], outputs)
+        self.assertEqual(["t.info", "t.info", "g.region", "g.region", "t.rast.mapcalc",
+                          "t.rast.extract", "t.rast.series"], [step["module"] for step in processes])
+
+    def test_graph_compilation_shared_node(self):
+
+        graph = {"title": "Fan-out", "description": "Two exports of the same filtered data",
+                 "process_graph": {"export_1": {"process_id": "raster_exporter",
+                                                "arguments": {"data": {"from_node": "filter_bbox_1"}}},
+                                   "export_2": {"process_id": "raster_exporter",
+                                                "arguments": {"data": {"from_node": "filter_bbox_1"}}},
+                                   "filter_bbox_1": FILTER_BBOX["process_graph"]["filter_bbox_1"],
+                                   "get_data_1": FILTER_BBOX["process_graph"]["get_data_1"]}}
+
+        compiled = []
+        get_data = PROCESS_DICT["get_data"]
+
+        def compile_get_data(process, context):
+            compiled.append(process["data"]["name"])
+            return get_data(process, context)
+
+        PROCESS_DICT["get_data"] = compile_get_data
+        try:
+            outputs, processes = ProcessGraph(graph).to_actinia_process_chain(CompilationContext())
+        finally:
+            PROCESS_DICT["get_data"] = get_data
+
+        # The shared nodes are compiled once and their outputs are used by both exports
+        self.assertEqual(["nc_spm_08.PERMANENT.raster.elevation"], compiled)
+        self.assertEqual(["r.info", "g.region", "exporter", "exporter"], [step["module"] for step in processes])
+
+    def test_graph_compilation_region(self):
+
+        # The second consumer of the shared filter is compiled after the region was changed
+        # by the first consumer, hence the region of the shared filter is set again
+        filter_bbox = deepcopy(FILTER_BBOX["process_graph"]["filter_bbox_1"])
+        filter_bbox["arguments"].update(data={"from_node": "filter_bbox_1"}, left=640000)
+        graph = {"title": "Regions", "description": "Two consumers of a filter",
+                 "process_graph": {"filter_bbox_2": filter_bbox,
+                                   "export_1": {"process_id": "raster_exporter",
+                                                "arguments": {"data": {"from_node": "filter_bbox_1"}}},
+                                   "filter_bbox_1": FILTER_BBOX["process_graph"]["filter_bbox_1"],
+                                   "get_data_1": FILTER_BBOX["process_graph"]["get_data_1"]}}
+
+        outputs, processes = ProcessGraph(graph).to_actinia_process_chain(CompilationContext())
+
+        self.assertEqual(["r.info", "g.region", "g.region", "g.region", "exporter"],
+                         [step["module"] for step in processes])
+        self.assertEqual({"param": "w", "value": "640000"}, processes[2]["inputs"][3])
+        self.assertEqual(processes[1]["inputs"], processes[3]["inputs"])
+
+    def test_graph_cycle_detection(self):
+
+        graph = {"title": "Cycle", "description": "Two filters that depend on each other",
+                 "process_graph": {"filter_1": {"process_id": "filter_bbox",
+                                                "arguments": {"data": {"from_node": "filter_2"}}},
+                                   "filter_2": {"process_id": "filter_bbox",
+                                                "arguments": {"data": {"from_node": "filter_1"}}}}}
+
+        pg = ProcessGraph(graph)
+        self.assertRaises(ProcessGraphCycleError, pg.topological_order)
+        self.assertRaises(ProcessGraphCycleError, pg.to_actinia_process_chain)
+
+        graph["process_graph"]["filter_1"]["arguments"]["data"]["from_node"] = "missing"
+        self.assertRaises(Exception, ProcessGraph, graph)
+
+
 if __name__ == "__main__":
     unittest.main()
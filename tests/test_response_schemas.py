@@ -1,11 +1,16 @@
 # -*- coding: utf-8 -*-
 from flask import json
+import gzip
 import unittest
+from uuid import uuid4
 from datetime import datetime
 from pprint import pprint
 from openeo_grass_gis_driver.collection_schemas import Extent, CollectionEntry, Collection, EoLinks, EoLink
 from openeo_grass_gis_driver.collection_schemas import CollectionInformation
 from openeo_grass_gis_driver.test_base import TestBase
+from openeo_grass_gis_driver.error_schemas import ErrorSchema
+from openeo_grass_gis_driver.response_encoding import negotiate_encoding
+from openeo_grass_gis_driver.schema_base import JSON_BACKENDS
 
 __license__ = "Apache License, Version 2.0"
 __author__ = "Sören Gebbert"
@@ -35,6 +40,35 @@ class ResponseSchemaTestCase(TestBase):
                              extent=e, links=[cl,])
         print("CollectionInformation", ci.to_json())
 
+    def test_json_backends(self):
+
+        ci = CollectionInformation(name="raster", description="Test", title="title", license="unknown",
+                                   links=[EoLink(href="http://unknown")], version="1.0")
+        document = json.loads(ci.to_json())
+
+        self.assertEqual(list(document.keys()), ["name", "title", "description", "license",
+                                                 "extent", "links", "version"])
+        self.assertFalse("\n" in ci.to_json())
+        self.assertTrue("\n" in ci.to_json(pretty=True))
+
+        for name, backend in JSON_BACKENDS.items():
+            self.assertEqual(json.loads(backend(ci, False)), document, name)
+
+        error = ErrorSchema(id=uuid4(), code=400, message="error")
+        self.assertEqual(json.loads(error.to_json())["id"], str(error.id))
+
+    def test_compression(self):
+
+        self.assertEqual(negotiate_encoding("gzip, deflate"), "gzip")
+        self.assertIsNone(negotiate_encoding("gzip;q=0"))
+        self.assertIsNone(negotiate_encoding(None))
+
+        response = self.app.get('/collections', headers=self.auth)
+        self.assertEqual(200, response.status_code)
+        compressed = self.app.get('/collections', headers=dict(self.auth, **{"Accept-Encoding": "gzip"}))
+        self.assertEqual(compressed.headers["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(compressed.data)), json.loads(response.data))
+
 
 if __name__ == "__main__":
     unittest.main()
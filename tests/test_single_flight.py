@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import unittest
+import requests
+from openeo_grass_gis_driver.test_base import TestBase
+from openeo_grass_gis_driver.actinia_processing.actinia_interface import ActiniaInterface
+from openeo_grass_gis_driver.actinia_processing.actinia_session import ActiniaSessionPool
+from openeo_grass_gis_driver.actinia_processing.single_flight import SingleFlight
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+NODE = "http://actinia-single-flight:8088/latest"
+
+
+class SlowSession(object):
+    """Answers all requests after a delay and records them"""
+
+    def __init__(self):
+        self.requests = []
+
+    def request(self, method, url, timeout=None, auth=None, **kwargs):
+        self.requests.append((method, url, auth))
+        time.sleep(0.2)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"process_results": ["PERMANENT"]}'
+        return response
+
+
+def run_concurrently(func, number):
+    results = [None] * number
+    barrier = threading.Barrier(number)
+
+    def run(index):
+        barrier.wait()
+        results[index] = func(index)
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(number)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class SingleFlightTestCase(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.session = SlowSession()
+        ActiniaSessionPool._sessions[ActiniaSessionPool.host_key(NODE)] = self.session
+        self.single_flight = ActiniaInterface.SINGLE_FLIGHT
+        ActiniaInterface.SINGLE_FLIGHT = SingleFlight()
+
+    def tearDown(self):
+        ActiniaSessionPool._sessions.pop(ActiniaSessionPool.host_key(NODE), None)
+        ActiniaInterface.SINGLE_FLIGHT = self.single_flight
+
+    def test_single_flight(self):
+        single_flight = SingleFlight()
+        calls = []
+
+        def call():
+            calls.append(1)
+            time.sleep(0.2)
+            return len(calls)
+
+        results = run_concurrently(lambda index: single_flight.do("key", call), 8)
+        self.assertEqual([1] * 8, results)
+        self.assertEqual({"calls": 1, "hits": 7, "max_fan_in": 8, "mean_fan_in": 8.0, "in_flight": 0},
+                         single_flight.statistics())
+
+        # The result is not cached
+        self.assertEqual(2, single_flight.do("key", call))
+
+        # The callers that share a failed call receive its exception
+        def fail():
+            time.sleep(0.2)
+            raise ValueError("failed")
+
+        def do(index):
+            try:
+                single_flight.do("key", fail)
+            except ValueError as e:
+                return str(e)
+
+        self.assertEqual(["failed"] * 4, run_concurrently(do, 4))
+
+    def test_coalesced_requests(self):
+        def list_mapsets(index):
+            iface = ActiniaInterface(node=NODE)
+            iface.set_auth("user-%i" % (index % 2), "password")
+            return iface.list_mapsets(location="nc_spm_08")
+
+        # One upstream request per user scope and url
+        results = run_concurrently(list_mapsets, 10)
+        self.assertEqual([(200, ["PERMANENT"])] * 10, results)
+        self.assertEqual(2, len(self.session.requests))
+        self.assertEqual({"user-0", "user-1"}, {auth[0] for method, url, auth in self.session.requests})
+        statistics = ActiniaInterface.coalescing_statistics()
+        self.assertEqual(2, statistics["calls"])
+        self.assertEqual(8, statistics["hits"])
+
+        # Requests that modify the backend are never coalesced
+        def delete_mapset(index):
+            return ActiniaInterface(node=NODE).delete_mapset(location="nc_spm_08", mapset="mapset")
+
+        run_concurrently(delete_mapset, 4)
+        self.assertEqual(6, len(self.session.requests))
+
+
+if __name__ == "__main__":
+    unittest.main()
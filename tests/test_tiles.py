@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import threading
+import unittest
+from copy import deepcopy
+from openeo_grass_gis_driver.test_base import TestBase
+from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
+from openeo_grass_gis_driver.actinia_processing.base import compile_process_graph
+from openeo_grass_gis_driver.actinia_processing.tile_planner import plan_tiles
+from openeo_grass_gis_driver.actinia_processing.temporal_planner import plan_windows
+from openeo_grass_gis_driver.job_db import JobDB
+from openeo_grass_gis_driver.job_schemas import JobInformation
+from openeo_grass_gis_driver.tile_dispatcher import TileDispatcher
+from openeo_grass_gis_driver.utils.process_graph_examples_v03 import RASTER_EXPORT_BBOX, ZONAL_STATISTICS, \
+    REDUCE_TIME_MIN, REDUCE_TIME_MULTI
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+class RecordingInterface(object):
+    """Records the tile jobs instead of sending them to actinia"""
+
+    jobs = []
+    persistent = []
+    deleted = []
+    deleted_mapsets = []
+    auth = ("user", "password")
+
+    def set_auth(self, user, password):
+        self.auth = (user, password)
+
+    # The tiles are sent concurrently
+    lock = threading.Lock()
+
+    def async_ephemeral_processing_export(self, location, process_chain, timeout=None):
+        with self.lock:
+            self.jobs.append(process_chain)
+            return 200, {"resource_id": f"resource_id-{len(self.jobs)}"}
+
+    def async_persistent_processing(self, location, mapset, process_chain, timeout=None):
+        with self.lock:
+            self.persistent.append(mapset)
+            self.jobs.append(process_chain)
+            return 200, {"resource_id": f"resource_id-{len(self.jobs)}"}
+
+    def delete_resource(self, resource_id, timeout=None):
+        self.deleted.append(resource_id)
+        return 200, {}
+
+    def delete_mapset(self, location, mapset, timeout=None):
+        self.deleted_mapsets.append(mapset)
+        return 200, {}
+
+
+class RecordingTracker(object):
+    """Records the tracked tile resources instead of polling them"""
+
+    def __init__(self):
+        self.resources = {}
+        self.job_status = {}
+
+    def track(self, resource_id, auth=None, listener=None, **kwargs):
+        self.resources[resource_id] = listener
+
+    def is_tracked(self, resource_id):
+        return resource_id in self.resources
+
+    def set_job_status(self, job_id, status):
+        self.job_status[job_id] = status
+
+
+class TilesTestCase(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.config = {key: getattr(ActiniaConfig, key) for key in ("DATABASE", "JOB_DB", "GRAPH_DB",
+                                                                   "ACTINIA_JOB_DB", "TILE_PARALLELISM",
+                                                                   "TILE_RESULT_DIRECTORY")}
+        for key in ("DATABASE", "JOB_DB", "GRAPH_DB", "ACTINIA_JOB_DB"):
+            setattr(ActiniaConfig, key, os.path.join(self.tempdir.name, f"{key}.sqlite"))
+        ActiniaConfig.TILE_RESULT_DIRECTORY = self.tempdir.name
+        RecordingInterface.jobs = []
+        RecordingInterface.persistent = []
+        RecordingInterface.deleted = []
+        RecordingInterface.deleted_mapsets = []
+
+    def tearDown(self):
+        for key, value in self.config.items():
+            setattr(ActiniaConfig, key, value)
+        self.tempdir.cleanup()
+
+    def test_plan_tiles(self):
+        result_names, process_list, location = compile_process_graph(RASTER_EXPORT_BBOX)
+
+        # The region has 1500 x 1350 cells
+        plan = plan_tiles(process_list, tile_size=512, mosaic=False)
+        self.assertEqual((3, 3), (plan.rows, plan.cols))
+        self.assertEqual(9, len(plan.tiles))
+        self.assertEqual({"n": 228500, "s": 223380, "e": 635120, "w": 630000}, plan.tiles[0].extent)
+        self.assertEqual({"n": 218260, "s": 215000, "e": 645000, "w": 640240}, plan.tiles[-1].extent)
+
+        # Only the region differs between the tiles
+        for tile in plan.tiles:
+            self.assertEqual([step["module"] for step in process_list],
+                             [step["module"] for step in tile.process_list])
+            self.assertEqual(process_list[2], tile.process_list[2])
+
+        # Small regions and process chains that are not per-pixel are not tiled
+        self.assertIsNone(plan_tiles(process_list, tile_size=4096))
+        self.assertIsNone(plan_tiles(process_list, tile_size=0))
+        result_names, process_list, location = compile_process_graph(ZONAL_STATISTICS)
+        self.assertIsNone(plan_tiles(process_list, tile_size=1))
+
+    def test_tile_dispatcher(self):
+        ActiniaConfig.TILE_PARALLELISM = 2
+        tracker = RecordingTracker()
+        dispatcher = TileDispatcher(interface=RecordingInterface, tracker=tracker)
+        job_db = JobDB()
+        job_db["job-1"] = JobInformation(job_id="job-1", title="tiles", description="tiles", status="queued",
+                                         process_graph=RASTER_EXPORT_BBOX["process_graph"], output=None,
+                                         submitted="2018-01-01", updated=None)
+
+        result_names, process_list, location = compile_process_graph(RASTER_EXPORT_BBOX)
+        plan = plan_tiles(process_list, tile_size=512, mosaic=False)
+        dispatcher.submit(job_id="job-1", plan=plan, location=location, result_names=result_names)
+        finished = []
+        dispatcher.start("job-1", auth=("user", "password"), listener=finished.append)
+        dispatcher.wait()
+
+        # Only TILE_PARALLELISM tiles are processed at the same time
+        self.assertEqual(2, len(RecordingInterface.jobs))
+        self.assertTrue(dispatcher.is_tiled("job-1"))
+        job = job_db["job-1"]
+        self.assertEqual("queued", job.status)
+        self.assertEqual(["queued"] * 2 + ["waiting"] * 7, [tile["status"] for tile in job.additional_info["tiles"]])
+
+        # A finished tile releases the next tile
+        listener = tracker.resources["resource_id-1"]
+        urls = {"resources": ["https://actinia/resource/tile_1/elevation.tif"]}
+        listener("resource_id-1", 200, {"status": "finished", "urls": urls})
+        listener("resource_id-2", 200, {"status": "running", "progress": {"step": 1, "num_of_steps": 3}})
+        dispatcher.wait()
+        self.assertEqual(3, len(RecordingInterface.jobs))
+        job = job_db["job-1"]
+        self.assertEqual("running", job.status)
+        self.assertEqual(11.1, job.additional_info["progress"])
+        self.assertEqual({"step": 1, "num_of_steps": 3}, job.additional_info["tiles"][1]["progress"])
+        self.assertEqual("running", tracker.job_status["job-1"])
+
+        # All tiles finished, the exports of the tiles are the results of the job
+        for number in range(2, 10):
+            listener(f"resource_id-{number}", 200, {"status": "finished", "urls": urls})
+            dispatcher.wait()
+        self.assertEqual(9, len(RecordingInterface.jobs))
+        job = job_db["job-1"]
+        self.assertEqual("finished", job.status)
+        self.assertEqual(100, job.additional_info["progress"])
+        self.assertEqual(9, len(job.additional_info["urls"]["resources"]))
+        # The credentials of the owner are dropped with the final state of the job
+        self.assertNotIn("job-1", dispatcher._auth)
+        # The admission queue is informed about the finished job
+        self.assertEqual(["job-1"], finished)
+
+        # A failed tile cancels the other tiles of the job
+        dispatcher.submit(job_id="job-1", plan=plan, location=location, result_names=result_names)
+        dispatcher.start("job-1", auth=("user", "password"))
+        dispatcher.wait()
+        listener("resource_id-10", 200, {"status": "error"})
+        self.assertEqual(["resource_id-11"], RecordingInterface.deleted)
+        job = job_db["job-1"]
+        self.assertEqual("error", job.status)
+        self.assertEqual("error", tracker.job_status["job-1"])
+        self.assertNotIn("job-1", dispatcher._auth)
+
+        dispatcher.delete("job-1")
+        self.assertFalse(dispatcher.is_tiled("job-1"))
+
+    def test_tile_dispatcher_restart(self):
+        tracker = RecordingTracker()
+        dispatcher = TileDispatcher(interface=RecordingInterface, tracker=tracker)
+        JobDB(user="owner")["job-1"] = JobInformation(job_id="job-1", title="tiles", description="tiles",
+                                                      status="queued", output=None, submitted="2018-01-01",
+                                                      process_graph=RASTER_EXPORT_BBOX["process_graph"],
+                                                      updated=None)
+
+        result_names, process_list, location = compile_process_graph(RASTER_EXPORT_BBOX)
+        plan = plan_tiles(process_list, tile_size=512, mosaic=False)
+        dispatcher.submit(job_id="job-1", plan=plan, location=location, result_names=result_names)
+        dispatcher.start("job-1", auth=("owner", "password"))
+        dispatcher.wait()
+        self.assertEqual(ActiniaConfig.TILE_PARALLELISM, len(RecordingInterface.jobs))
+
+        # A restarted dispatcher does not hold the credentials of the owner, the tiles are not
+        # sent or tracked as another user
+        tracker = RecordingTracker()
+        dispatcher = TileDispatcher(interface=RecordingInterface, tracker=tracker)
+        RecordingInterface.jobs = []
+        dispatcher.dispatch("job-1")
+        dispatcher.resume("job-1", auth=("other", "password"))
+        dispatcher.wait()
+        self.assertEqual([], RecordingInterface.jobs)
+        self.assertEqual({}, tracker.resources)
+
+        # The tiles are tracked and sent again when the owner requests the job
+        dispatcher.resume("job-1", auth=("owner", "password"))
+        dispatcher.wait()
+        self.assertEqual(ActiniaConfig.TILE_PARALLELISM, len(tracker.resources))
+        listener = tracker.resources["resource_id-1"]
+        listener("resource_id-1", 200, {"status": "finished"})
+        dispatcher.wait()
+        self.assertEqual(1, len(RecordingInterface.jobs))
+
+    def test_plan_windows(self):
+        result_names, process_list, location = compile_process_graph(REDUCE_TIME_MULTI)
+        start_times = ["%i-%02i-01 00:00:00" % (year, month) for year in (2001, 2002) for month in range(1, 13)]
+
+        plan = plan_windows(process_list, start_times, job_id="job-1", window_size=10)
+        windows, merge = plan.tiles[:-1], plan.tiles[-1]
+        self.assertEqual(3, len(windows))
+        self.assertEqual([{"start": "2001-01-01 00:00:00", "end": "2001-11-01 00:00:00"},
+                          {"start": "2001-11-01 00:00:00", "end": "2002-09-01 00:00:00"},
+                          {"start": "2002-09-01 00:00:00", "end": None}], [window.extent for window in windows])
+
+        # Each window reads the time series once and stores the partial results in its mapset
+        series = windows[1].process_list[-1]
+        parameters = {entry["param"]: entry["value"] for entry in series["inputs"]}
+        self.assertEqual("minimum,maximum,sum,count", parameters["method"])
+        self.assertEqual("start_time >= '2001-11-01 00:00:00' AND start_time < '2002-09-01 00:00:00'",
+                         parameters["where"])
+        self.assertEqual(parameters["output"].split(","), windows[1].result_names)
+        self.assertEqual(3, len({window.mapset for window in windows}))
+        self.assertEqual([0, 0, 0, 1], [tile.stage for tile in plan.tiles])
+
+        # The final stage merges the partial results and exports the results
+        self.assertIsNone(merge.mapset)
+        self.assertEqual(["r.mapcalc"] * 3 + ["exporter"] * 3, [step["module"] for step in merge.process_list])
+        expression = merge.process_list[0]["inputs"][0]["value"]
+        self.assertTrue(expression.startswith("%s = nmin(" % result_names[0]))
+        self.assertTrue(all(window.mapset in expression for window in windows))
+        self.assertTrue("float(" in merge.process_list[2]["inputs"][0]["value"])
+
+        # Short time series and reductions that are not associative are not split
+        self.assertIsNone(plan_windows(process_list, start_times, job_id="job-1", window_size=100))
+        median = deepcopy(REDUCE_TIME_MIN)
+        median["process_graph"]["method"] = "median"
+        result_names, process_list, location = compile_process_graph(median)
+        self.assertIsNone(plan_windows(process_list, start_times, job_id="job-1", window_size=10))
+
+    def test_window_dispatcher(self):
+        tracker = RecordingTracker()
+        dispatcher = TileDispatcher(interface=RecordingInterface, tracker=tracker)
+        job_db = JobDB()
+        job_db["job-1"] = JobInformation(job_id="job-1", title="windows", description="windows", status="queued",
+                                         process_graph=REDUCE_TIME_MULTI["process_graph"], output=None,
+                                         submitted="2018-01-01", updated=None)
+
+        result_names, process_list, location = compile_process_graph(REDUCE_TIME_MULTI)
+        start_times = ["%i-%02i-01 00:00:00" % (year, month) for year in (2001, 2002) for month in range(1, 13)]
+        plan = plan_windows(process_list, start_times, job_id="job-1", window_size=10)
+        dispatcher.submit(job_id="job-1", plan=plan, location=location, result_names=result_names)
+        dispatcher.start("job-1", auth=("user", "password"))
+        dispatcher.wait()
+
+        # The windows are processed concurrently in their mapsets, the merge waits for them
+        self.assertEqual(sorted(tile.mapset for tile in plan.tiles[:-1]), sorted(RecordingInterface.persistent))
+        # The partial results are not removed from the window process chains
+        self.assertEqual("t.rast.series", RecordingInterface.jobs[0]["list"][-1]["module"])
+
+        listener = tracker.resources["resource_id-1"]
+        for number in range(1, 4):
+            listener(f"resource_id-{number}", 200, {"status": "finished"})
+        dispatcher.wait()
+        self.assertEqual(4, len(RecordingInterface.jobs))
+        self.assertEqual("r.mapcalc", RecordingInterface.jobs[-1]["list"][0]["module"])
+        self.assertEqual("running", job_db["job-1"].status)
+        self.assertEqual([], RecordingInterface.deleted_mapsets)
+
+        # The results of the job are the exports of the merge, the mapsets of the windows are removed
+        urls = {"resources": ["https://actinia/resource/merge/%s.tif" % name for name in result_names]}
+        listener("resource_id-4", 200, {"status": "finished", "urls": urls})
+        job = job_db["job-1"]
+        self.assertEqual("finished", job.status)
+        self.assertEqual(urls, job.additional_info["urls"])
+        self.assertEqual(sorted(RecordingInterface.persistent), sorted(RecordingInterface.deleted_mapsets))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import csv
+import io
+import json
+import math
+import tempfile
+import unittest
+from openeo_grass_gis_driver.test_base import TestBase
+from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
+from openeo_grass_gis_driver.zonal_results import ZonalResultStore, ZONAL_STREAMS, parse_process_log, pyarrow
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+PROCESS_LOG = [
+    {"executable": "g.region", "parameter": ["vector=polygons"], "stdout": ""},
+    {"executable": "t.rast.univar",
+     "parameter": ["input=S2A_B04@sentinel2A", "separator=pipe"],
+     "stdout": "id|start|end|mean|min|max|mean_of_abs|stddev|variance|coeff_var|sum|null_cells|cells\n"
+               "B04_1@sentinel2A|2017-04-12 11:17:08|2017-04-12 11:17:09|1060.5|3|4900|1060.5|406.2|1.6e5|38.3|"
+               "1.0e7|10|9810\n"
+               "B04_2@sentinel2A|2017-04-15 11:17:08|2017-04-15 11:17:09|||||||||9810|9810\n"},
+    {"executable": "t.rast.univar",
+     "parameter": ["input=S2A_B08@sentinel2A", "zones=zones_1", "separator=pipe"],
+     "stdout": "id|start|end|zone|mean|min|max|mean_of_abs|stddev|variance|coeff_var|sum|null_cells|cells|"
+               "non_null_cells\n"
+               "B08_1@sentinel2A|2017-04-12 11:17:08|2017-04-12 11:17:09|1|2500|100|5000|2500|50|2500|2|5000|0|2|2\n"
+               "B08_1@sentinel2A|2017-04-12 11:17:08|2017-04-12 11:17:09|2|3500|200|6000|3500|60|3600|2|7000|1|3|2\n"}
+]
+
+
+class ZonalResultsTestCase(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.chunk_size = ActiniaConfig.ZONAL_RESULT_CHUNK_SIZE
+        ActiniaConfig.ZONAL_RESULT_CHUNK_SIZE = 2
+        self.store = ZonalResultStore(directory=self.tempdir.name)
+
+    def tearDown(self):
+        ActiniaConfig.ZONAL_RESULT_CHUNK_SIZE = self.chunk_size
+        self.tempdir.cleanup()
+
+    def test_parse_process_log(self):
+        columns = parse_process_log(PROCESS_LOG)
+        self.assertEqual(4, len(columns["map"]))
+        self.assertEqual(["S2A_B04@sentinel2A"] * 2 + ["S2A_B08@sentinel2A"] * 2, columns["strds"].tolist())
+        self.assertEqual([-1, -1, 1, 2], columns["zone"].tolist())
+        self.assertEqual([9800, 0, 2, 2], columns["count"].tolist())
+        self.assertEqual("float64", str(columns["mean"].dtype))
+        self.assertEqual(1060.5, columns["mean"][0])
+        self.assertTrue(math.isnan(columns["mean"][1]))
+        self.assertEqual(60.0, columns["stddev"][3])
+
+    def test_store_and_stream(self):
+        self.assertFalse("job-1" in self.store)
+        self.store.store("job-1", parse_process_log(PROCESS_LOG))
+        self.assertTrue("job-1" in self.store)
+        columns = self.store.load("job-1")
+
+        rows = list(csv.DictReader(io.StringIO("".join(ZONAL_STREAMS["csv"](columns)))))
+        self.assertEqual(4, len(rows))
+        self.assertEqual("B04_2@sentinel2A", rows[1]["map"])
+        self.assertEqual("", rows[1]["mean"])
+        self.assertEqual("2", rows[3]["zone"])
+
+        chunks = list(ZONAL_STREAMS["ndjson"](columns))
+        self.assertEqual(2, len(chunks))
+        rows = [json.loads(line) for line in "".join(chunks).splitlines()]
+        self.assertEqual(4, len(rows))
+        self.assertEqual(None, rows[1]["mean"])
+        self.assertEqual(3500.0, rows[3]["mean"])
+
+        self.store.delete("job-1")
+        self.assertFalse("job-1" in self.store)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_stream_arrow(self):
+        self.store.store("job-1", parse_process_log(PROCESS_LOG))
+        data = b"".join(ZONAL_STREAMS["arrow"](self.store.load("job-1")))
+        table = pyarrow.ipc.open_stream(data).read_all()
+        self.assertEqual(4, table.num_rows)
+        self.assertEqual([-1, -1, 1, 2], table.column("zone").to_pylist())
+
+
+if __name__ == "__main__":
+    unittest.main()
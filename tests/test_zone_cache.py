@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+from copy import deepcopy
+from openeo_grass_gis_driver.test_base import TestBase
+from openeo_grass_gis_driver.actinia_processing.config import Config as ActiniaConfig
+from openeo_grass_gis_driver.actinia_processing.base import compile_process_graph
+from openeo_grass_gis_driver.actinia_processing.zone_cache import ZoneCache, SOURCE_HASH_CACHE, source_hash
+from openeo_grass_gis_driver.utils.process_graph_examples_v03 import ZONAL_STATISTICS_SINGLE
+
+__license__ = "Apache License, Version 2.0"
+__author__ = "Sören Gebbert"
+__copyright__ = "Copyright 2018, Sören Gebbert, mundialis"
+__maintainer__ = "Soeren Gebbert"
+__email__ = "soerengebbert@googlemail.com"
+
+
+class RecordingInterface(object):
+    """Records the persistent processing jobs instead of sending them to actinia"""
+
+    def __init__(self):
+        self.jobs = []
+        self.deleted = []
+        self.status = "accepted"
+        self.auth = ("actinia-gdi", "actinia-gdi")
+
+    def async_persistent_processing(self, location, mapset, process_chain, timeout=None):
+        self.jobs.append((location, mapset, process_chain))
+        return 200, {"resource_id": f"resource_id-{len(self.jobs)}"}
+
+    def resource_info(self, resource_id, timeout=None):
+        return 200, {"status": self.status}
+
+    def delete_mapset(self, location, mapset, timeout=None):
+        self.deleted.append(mapset)
+        return 200, {}
+
+
+class RecordingTracker(object):
+    """Records the tracked resources instead of polling them"""
+
+    def __init__(self):
+        self.resources = []
+
+    def track(self, resource_id, auth=None, **kwargs):
+        self.resources.append(resource_id)
+
+
+class ZoneCacheTestCase(TestBase):
+
+    def setUp(self):
+        TestBase.setUp(self)
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.config = {key: getattr(ActiniaConfig, key) for key in ("DATABASE", "JOB_DB", "GRAPH_DB",
+                                                                   "ACTINIA_JOB_DB", "ZONE_CACHE_SIZE",
+                                                                   "ZONE_CACHE_SOURCE_HOSTS")}
+        for key in ("DATABASE", "JOB_DB", "GRAPH_DB", "ACTINIA_JOB_DB"):
+            setattr(ActiniaConfig, key, os.path.join(self.tempdir.name, f"{key}.sqlite"))
+        ActiniaConfig.ZONE_CACHE_SOURCE_HOSTS = ["example.com"]
+
+    def tearDown(self):
+        for key, value in self.config.items():
+            setattr(ActiniaConfig, key, value)
+        self.tempdir.cleanup()
+
+    def compile(self, mode: str, source: str = "https://example.com/fields.geojson"):
+        graph = deepcopy(ZONAL_STATISTICS_SINGLE)
+        graph["process_graph"]["mode"] = mode
+        graph["process_graph"]["polygons"] = source
+        SOURCE_HASH_CACHE.set(source, "hash-" + source)
+        result_names, process_list, location = compile_process_graph(graph)
+        return process_list
+
+    def test_zone_cache(self):
+        iface = RecordingInterface()
+        tracker = RecordingTracker()
+        cache = ZoneCache(iface=iface, location="LL", tracker=tracker)
+
+        # The first query creates the zone raster in the background
+        process_list = self.compile("zones")
+        self.assertEqual(process_list, cache.apply(process_list))
+        self.assertEqual(1, len(iface.jobs))
+        location, mapset, process_chain = iface.jobs[0]
+        # Each zone raster is created in its own mapset
+        self.assertTrue(mapset.startswith(ActiniaConfig.ZONE_CACHE_MAPSET + "_"))
+        self.assertEqual(["importer", "g.region", "g.region", "v.to.rast"],
+                         [step["module"] for step in process_chain["list"]])
+
+        # The job is polled until it is finished, so that its actinia node is released
+        self.assertEqual(["resource_id-1"], tracker.resources)
+
+        # The job is still running
+        self.assertEqual(process_list, cache.apply(process_list))
+        self.assertEqual(1, len(iface.jobs))
+
+        # The cached zone raster replaces the import and the rasterization
+        iface.status = "finished"
+        optimized = cache.apply(process_list)
+        modules = [step["module"] for step in optimized]
+        self.assertFalse("importer" in modules)
+        self.assertFalse("v.to.rast" in modules)
+        zones = process_chain["list"][-1]["inputs"][1]["value"] + "@" + mapset
+        univar = [step for step in optimized if step["module"] == "t.rast.univar"][0]
+        self.assertEqual({"param": "zones", "value": zones}, univar["inputs"][1])
+
+        # The mask mode uses the same zone raster
+        optimized = cache.apply(self.compile("mask"))
+        mask = [step for step in optimized if step["module"] == "r.mask"][0]
+        self.assertEqual([{"param": "raster", "value": zones}], mask["inputs"])
+        self.assertFalse("importer" in [step["module"] for step in optimized])
+
+    def test_zone_cache_eviction(self):
+        ActiniaConfig.ZONE_CACHE_SIZE = 2
+        iface = RecordingInterface()
+        iface.status = "finished"
+        cache = ZoneCache(iface=iface, location="LL", tracker=RecordingTracker())
+
+        for i in range(4):
+            process_list = self.compile("zones", source=f"https://example.com/fields_{i}.geojson")
+            cache.apply(process_list)
+            cache.apply(process_list)
+
+        self.assertEqual(4, len(iface.jobs))
+        self.assertEqual(4, len(set(mapset for location, mapset, process_chain in iface.jobs)))
+        # The mapsets of the least recently used zone rasters are removed
+        self.assertEqual([mapset for location, mapset, process_chain in iface.jobs[:2]], iface.deleted)
+        count = cache.db.execute("SELECT COUNT(*) FROM zone_cache").fetchone()[0]
+        self.assertEqual(2, count)
+
+    def test_source_hosts(self):
+        SOURCE_HASH_CACHE.set("https://example.com/fields.geojson", "hash")
+        SOURCE_HASH_CACHE.set("https://internal.example.org/fields.geojson", "hash")
+
+        # The sources of other hosts and schemes are not read by the driver
+        self.assertEqual("hash", source_hash("https://example.com/fields.geojson"))
+        self.assertIsNone(source_hash("https://internal.example.org/fields.geojson"))
+        self.assertIsNone(source_hash("file:///etc/passwd"))
+
+
+if __name__ == "__main__":
+    unittest.main()